@@ -0,0 +1,241 @@
+"""
+融思政平台 - 签到并发压测
+
+模拟几百名学生在同一时刻对同一个签到代码签到，统计每次签到的耗时分布（p50/p99），
+并核对签到记录数、attended_students 计数与签到汇总是否一致（丢失更新 / 重复记录）。
+
+压测在独立的临时数据库上进行，不会写入平台数据库：
+
+    python attendance_loadtest.py                      # 300 名学生，每人签到 1 次
+    python attendance_loadtest.py -n 500 --attempts 3  # 每人连点 3 次，检查重复签到
+    python attendance_loadtest.py --mode direct        # 每次签到单独一个事务（不经过后台写线程）
+    python attendance_loadtest.py --mode legacy        # 对比原先逐条查询、无显式事务的写法
+"""
+import argparse
+import logging
+import math
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import platform_attendance
+import platform_db
+import platform_migrations
+import platform_writer
+
+SESSION_CODE = "ATTLOAD1"
+CLASS_CODE = "CLSLOAD1"
+TEACHER = "load_teacher"
+
+
+def setup_database(path, students):
+    """建表并创建一个班级、若干学生和一个正在进行的签到活动"""
+    platform_migrations.migrate(path)
+    now = datetime.utcnow() + timedelta(hours=8)
+    fmt = platform_attendance.TIME_FORMAT
+    usernames = [f"load_student_{i:04d}" for i in range(students)]
+
+    conn = platform_db.connect(path)
+    try:
+        c = conn.cursor()
+        c.execute('''
+            INSERT INTO classrooms (class_code, class_name, teacher_username, max_students, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (CLASS_CODE, "压测班级", TEACHER, students, now.strftime(fmt)))
+        c.executemany('''
+            INSERT INTO classroom_members (class_code, student_username, joined_at)
+            VALUES (?, ?, ?)
+        ''', [(CLASS_CODE, name, now.strftime(fmt)) for name in usernames])
+        c.execute('''
+            INSERT INTO attendance_sessions
+            (session_code, class_code, session_name, teacher_username, start_time, end_time,
+             status, created_at, total_students)
+            VALUES (?, ?, ?, ?, ?, ?, 'scheduled', ?, ?)
+        ''', (SESSION_CODE, CLASS_CODE, "压测签到", TEACHER,
+              (now - timedelta(minutes=1)).strftime(fmt), (now + timedelta(minutes=30)).strftime(fmt),
+              now.strftime(fmt), students))
+        platform_attendance.register_session(c, SESSION_CODE, CLASS_CODE, TEACHER, students)
+        conn.commit()
+    finally:
+        conn.close()
+    return usernames
+
+
+def legacy_check_in(session_code, student_username, path):
+    """原先的签到写法：逐条查询校验后写入，没有显式事务边界（用于对比）"""
+    try:
+        conn = platform_db.connect(path)
+        c = conn.cursor()
+        c.execute("SELECT class_code FROM attendance_sessions WHERE session_code = ?", (session_code,))
+        row = c.fetchone()
+        if not row:
+            conn.close()
+            return False, "签到活动不存在"
+        class_code = row[0]
+        c.execute('''
+            SELECT id FROM classroom_members
+            WHERE class_code = ? AND student_username = ? AND status = 'active'
+        ''', (class_code, student_username))
+        if not c.fetchone():
+            conn.close()
+            return False, "您不在该班级中"
+        c.execute("SELECT id FROM attendance_records WHERE session_code = ? AND student_username = ?",
+                  (session_code, student_username))
+        if c.fetchone():
+            conn.close()
+            return False, "您已经签到过了"
+        now = (datetime.utcnow() + timedelta(hours=8)).strftime(platform_attendance.TIME_FORMAT)
+        c.execute('''
+            INSERT INTO attendance_records
+            (session_code, student_username, class_code, check_in_time, is_late, points_earned)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (session_code, student_username, class_code, now, False, platform_attendance.POINTS_ON_TIME))
+        c.execute("UPDATE attendance_sessions SET attended_students = attended_students + 1 WHERE session_code = ?",
+                  (session_code,))
+        platform_attendance.record_check_in(c, session_code, class_code, student_username,
+                                            False, platform_attendance.POINTS_ON_TIME, now)
+        conn.commit()
+        conn.close()
+        return True, "签到成功"
+    except Exception as e:
+        return False, f"签到失败: {str(e)}"
+
+
+def direct_check_in(session_code, student_username, path):
+    """每次签到单独一个写事务（不经过后台写线程，用于对比）"""
+    conn = platform_db.connect(path)
+    try:
+        with platform_db.write_transaction(conn) as c:
+            return platform_attendance.apply_check_in(c, session_code, student_username, 'load-test')
+    finally:
+        conn.close()
+
+
+def run_load(path, usernames, attempts=1, mode="queued"):
+    """
+    每名学生一个线程，同时开始签到
+
+    返回:
+    - [(学生, 是否成功, 提示信息, 耗时秒数)]
+    """
+    barrier = threading.Barrier(len(usernames))
+    results = []
+    results_lock = threading.Lock()
+
+    def student(username):
+        barrier.wait()
+        for _ in range(attempts):
+            start = time.perf_counter()
+            if mode == "legacy":
+                ok, message = legacy_check_in(SESSION_CODE, username, path)
+            elif mode == "direct":
+                ok, message = direct_check_in(SESSION_CODE, username, path)
+            else:
+                ok, message = platform_attendance.check_in(SESSION_CODE, username, check_in_method='load-test',
+                                                           path=path)
+            elapsed = time.perf_counter() - start
+            with results_lock:
+                results.append((username, ok, message, elapsed))
+
+    threads = [threading.Thread(target=student, args=(name,)) for name in usernames]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def percentile(values, pct):
+    """最近秩法百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def verify(path):
+    """核对签到记录、计数器与汇总"""
+    conn = platform_db.connect(path)
+    try:
+        c = conn.cursor()
+        c.execute("SELECT COUNT(*), COUNT(DISTINCT student_username) FROM attendance_records WHERE session_code = ?",
+                  (SESSION_CODE,))
+        records, distinct_students = c.fetchone()
+        c.execute("SELECT attended_students FROM attendance_sessions WHERE session_code = ?", (SESSION_CODE,))
+        counter = c.fetchone()[0]
+        summary = platform_attendance.get_session_summary(c, SESSION_CODE)
+    finally:
+        conn.close()
+    return {
+        "records": records,
+        "distinct_students": distinct_students,
+        "counter": counter,
+        "rollup": summary["attended_count"] if summary else 0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="签到并发压测（使用临时数据库）")
+    parser.add_argument("-n", "--students", type=int, default=300, help="同时签到的学生数（默认 300）")
+    parser.add_argument("--attempts", type=int, default=1, help="每名学生的签到次数（大于 1 时检查重复签到）")
+    parser.add_argument("--mode", choices=["queued", "direct", "legacy"], default="queued",
+                        help="签到实现：queued 后台批量写入（默认）、direct 逐个事务、legacy 原写法")
+    parser.add_argument("--keep", action="store_true", help="保留临时数据库以便检查")
+    args = parser.parse_args(argv)
+    # 压测时排队等待写锁是预期行为，不输出慢查询日志
+    logging.getLogger("platform_db").setLevel(logging.ERROR)
+
+    workdir = tempfile.mkdtemp(prefix="attendance_loadtest_")
+    path = os.path.join(workdir, "loadtest.db")
+    try:
+        usernames = setup_database(path, args.students)
+        print(f"{args.students} 名学生 × {args.attempts} 次签到，模式 {args.mode}，数据库 {path}")
+
+        start = time.perf_counter()
+        results = run_load(path, usernames, args.attempts, args.mode)
+        wall = time.perf_counter() - start
+
+        latencies = [elapsed for _, _, _, elapsed in results]
+        successes = {username for username, ok, _, _ in results if ok}
+        messages = Counter(message for _, ok, message, _ in results if not ok)
+        check = verify(path)
+
+        print(f"总耗时 {wall:.2f}s，吞吐 {len(results) / wall:.0f} 次/秒")
+        print("耗时 p50 {:.1f}ms  p90 {:.1f}ms  p99 {:.1f}ms  max {:.1f}ms".format(
+            *(percentile(latencies, pct) * 1000 for pct in (50, 90, 99, 100))))
+        print(f"签到成功 {len(successes)} 人；失败 {sum(messages.values())} 次")
+        for stats in platform_writer.get_writer_metrics():
+            print(f"后台写入 {stats['jobs']} 个任务，{stats['batches']} 个事务，"
+                  f"平均每批 {stats['avg_batch']}，最大 {stats['largest_batch']}")
+        for message, count in messages.most_common():
+            print(f"  {count:>5} × {message}")
+
+        expected_failures = args.students * (args.attempts - 1)
+        lost_updates = check["records"] - check["counter"]
+        rollup_drift = check["records"] - check["rollup"]
+        duplicates = check["records"] - check["distinct_students"]
+        missing = args.students - check["records"]
+        print(f"签到记录 {check['records']}，attended_students {check['counter']}，汇总 {check['rollup']}")
+        print(f"丢失更新 {lost_updates}，汇总偏差 {rollup_drift}，重复记录 {duplicates}，未签到成功 {missing}")
+
+        consistent = lost_updates == 0 and rollup_drift == 0 and duplicates == 0
+        if messages.get("您已经签到过了", 0) != sum(messages.values()) or sum(messages.values()) != expected_failures:
+            consistent = False
+        return 0 if consistent and missing == 0 else 1
+    finally:
+        platform_writer.close_all_queues()
+        platform_db.close_all_pools()
+        if args.keep:
+            print(f"临时数据库保留在 {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,6 +11,7 @@ import os
 import base64
 import json
 import requests
+import shutil
 from pathlib import Path
 
 # 页面配置
@@ -27,9 +28,41 @@ GITHUB_REPO = "rongszdigitalimagep"
 GITHUB_TOKEN = st.secrets.get("GITHUB_TOKEN", "")  # 从Streamlit Secrets获取
 GITHUB_API_URL = f"https://api.github.com/repos/{GITHUB_USERNAME}/{GITHUB_REPO}/contents"
 
+# 上传文件按块读写（base64 每 3 字节编码为 4 字符，块大小取 3 的倍数）
+UPLOAD_CHUNK_SIZE = 3 * 256 * 1024
+# 单个上传文件的大小上限（字节）
+MAX_UPLOAD_BYTES = 200 * 1024 * 1024
+
+class Base64JsonBody:
+    """
+    GitHub 内容接口的 JSON 请求体，content 字段从本地文件边读边做 base64 编码
+
+    实现 __len__，requests 会按 Content-Length 发送，整个文件不会同时以原始、
+    base64 和 JSON 三份形式留在内存中。
+    """
+    def __init__(self, local_path, fields):
+        self.local_path = local_path
+        self.prefix = (json.dumps(fields, ensure_ascii=False)[:-1] + ', "content": "').encode('utf-8')
+        self.suffix = b'"}'
+        size = os.path.getsize(local_path)
+        self.length = len(self.prefix) + (size + 2) // 3 * 4 + len(self.suffix)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        yield self.prefix
+        with open(self.local_path, "rb") as f:
+            while True:
+                chunk = f.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield base64.b64encode(chunk)
+        yield self.suffix
+
 # ==================== GitHub API工具函数 ====================
-def github_upload_file(file_path, content, message="Upload file via Streamlit"):
-    """上传文件到GitHub仓库"""
+def github_upload_file(file_path, content=None, message="Upload file via Streamlit", local_path=None):
+    """上传文件到GitHub仓库（给出 local_path 时从本地文件流式上传，不读入内存）"""
     try:
         # 检查GitHub Token是否配置
         if not GITHUB_TOKEN:
@@ -48,8 +81,7 @@ def github_upload_file(file_path, content, message="Upload file via Streamlit"):
         
         # 准备数据
         data = {
-            "message": message,
-            "content": base64.b64encode(content).decode('utf-8')
+            "message": message
         }
         
         # 如果文件已存在，添加SHA
@@ -58,7 +90,12 @@ def github_upload_file(file_path, content, message="Upload file via Streamlit"):
             data["sha"] = existing_file["sha"]
         
         # 上传文件
-        response = requests.put(url, headers=headers, json=data)
+        if local_path:
+            body = Base64JsonBody(local_path, data)
+            response = requests.put(url, headers={**headers, "Content-Type": "application/json"}, data=body)
+        else:
+            data["content"] = base64.b64encode(content).decode('utf-8')
+            response = requests.put(url, headers=headers, json=data)
         
         if response.status_code in [200, 201]:
             print(f"✅ 文件已同步到GitHub: {file_path}")
@@ -172,18 +209,25 @@ def save_file_to_github_and_local(uploaded_file, subdirectory="uploads"):
         local_path = os.path.join(local_dir, file_name)
         github_path = f"data/{subdirectory}/{file_name}"
         
-        # 保存到本地
+        # 检查文件大小
+        if uploaded_file.size > MAX_UPLOAD_BYTES:
+            return {
+                "success": False,
+                "error": f"文件超过 {MAX_UPLOAD_BYTES // (1024 * 1024)}MB 的大小限制"
+            }
+        
+        # 按块保存到本地
+        uploaded_file.seek(0)
         with open(local_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+            shutil.copyfileobj(uploaded_file, f, UPLOAD_CHUNK_SIZE)
         
         print(f"✅ 文件已保存到本地: {local_path}")
         
-        # 同步到GitHub
-        file_content = uploaded_file.getvalue()
+        # 从本地文件流式同步到GitHub
         github_success = github_upload_file(
             github_path,
-            file_content,
-            message=f"Upload {uploaded_file.name} via Streamlit"
+            message=f"Upload {uploaded_file.name} via Streamlit",
+            local_path=local_path
         )
         
         if github_success:
@@ -0,0 +1,258 @@
+"""
+图像处理实验室 - 批处理命令行
+
+在不启动 Streamlit 的情况下，用实验室的图像处理操作批量处理一个目录（或通配符匹配）
+中的图片，例如教师批改时对所有提交的图片重跑同一组操作：
+
+    python lab_batch.py experiment_submissions -o batch_output --op clahe:clip_limit=3 --op canny_edge
+    python lab_batch.py "experiment_submissions/*/*.png" -o batch_output --pipeline pipeline.json
+    python lab_batch.py --list
+
+操作链可以用 --op 逐个指定（"操作名:参数=值,参数=值"，参数值按 JSON 解析），
+也可以用 --pipeline 读取实验室“处理流水线”选项卡导出的 JSON。
+结果按输入的相对路径写入输出目录，并生成逐文件耗时报告 batch_report.csv。
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import cv2
+
+# 支持的图片扩展名
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"}
+
+# 报告文件名（位于输出目录）
+REPORT_FILENAME = "batch_report.csv"
+
+REPORT_FIELDS = ["source", "output", "width", "height", "status", "seconds", "steps", "error"]
+
+
+def parse_op(text):
+    """
+    解析 --op 参数
+
+    "clahe:clip_limit=3,tile_grid_size=[4,4]" -> ("clahe", {"clip_limit": 3, "tile_grid_size": [4, 4]})
+    """
+    name, _, param_text = text.partition(":")
+    params = {}
+    if param_text:
+        # 逗号可能出现在 JSON 数组中，按 “,键=” 切分
+        pieces = []
+        for piece in param_text.split(","):
+            if "=" in piece or not pieces:
+                pieces.append(piece)
+            else:
+                pieces[-1] += "," + piece
+        for piece in pieces:
+            key, sep, value = piece.partition("=")
+            if not sep:
+                raise ValueError(f"参数格式应为 键=值: {piece}")
+            try:
+                params[key.strip()] = json.loads(value)
+            except json.JSONDecodeError:
+                params[key.strip()] = value
+    return name.strip(), params
+
+
+def collect_inputs(patterns):
+    """
+    收集输入图片
+
+    返回:
+    - [(图片路径, 相对路径)]，相对路径用于在输出目录中保持原有结构
+    """
+    inputs = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            root = pattern
+            paths = [os.path.join(dirpath, name)
+                     for dirpath, _, names in os.walk(pattern) for name in names]
+        else:
+            paths = glob.glob(pattern, recursive=True)
+            # 通配符之前的目录部分作为相对路径的起点
+            root = os.path.dirname(pattern.split("*")[0].split("?")[0].split("[")[0]) or "."
+        for path in sorted(paths):
+            if os.path.isfile(path) and os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS:
+                inputs.append((path, os.path.relpath(path, root)))
+    return inputs
+
+
+def _init_worker():
+    """工作进程初始化：关闭结果缓存、分块单线程，限制每个进程的内存与线程数"""
+    import lab_result_cache
+    import lab_tiles
+
+    lab_result_cache.result_cache.max_bytes = 0
+    lab_tiles.TILE_WORKERS = 1
+
+
+def process_file(source, destination, pipeline_json, overwrite=False):
+    """处理单个文件，返回报告中的一行"""
+    from lab_image_store import decode_image_bytes
+    from lab_pipeline import Pipeline
+    import lab_operations  # noqa: F401  导入即注册全部操作
+
+    row = {"source": source, "output": destination, "width": "", "height": "",
+           "status": "ok", "seconds": "", "steps": "", "error": ""}
+    start = time.perf_counter()
+    try:
+        if not overwrite and os.path.exists(destination):
+            row["status"] = "skipped"
+            return row
+
+        with open(source, "rb") as f:
+            image, _ = decode_image_bytes(f.read())
+        row["height"], row["width"] = image.shape[:2]
+
+        timings = []
+        result = Pipeline.from_json(pipeline_json).run(image, timings=timings)
+        row["steps"] = ";".join(f"{op}={seconds:.3f}" for op, seconds in timings)
+
+        ok, encoded = cv2.imencode(os.path.splitext(destination)[1] or ".png", result)
+        if not ok:
+            raise ValueError("图像编码失败")
+        os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+        with open(destination, "wb") as f:
+            f.write(encoded.tobytes())
+    except Exception as e:
+        row["status"] = "error"
+        row["error"] = str(e)
+    row["seconds"] = f"{time.perf_counter() - start:.3f}"
+    return row
+
+
+def run_batch(inputs, output_dir, pipeline_json, workers=None, max_pending=None,
+              output_format=None, overwrite=False, progress=None):
+    """
+    用进程池批量处理
+
+    参数:
+    - inputs: collect_inputs 的结果
+    - max_pending: 同时在途的任务数上限（默认 2 倍进程数），限制内存占用
+    - output_format: 输出扩展名（如 "png"），默认与输入相同
+    - progress: 可选回调，每完成一个文件调用一次 progress(row)
+
+    返回:
+    - 报告行列表（与 inputs 顺序一致）
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+
+    def destination_of(relative):
+        if output_format:
+            relative = os.path.splitext(relative)[0] + "." + output_format.lstrip(".")
+        return os.path.join(output_dir, relative)
+
+    rows = [None] * len(inputs)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             max_tasks_per_child=100) as executor:
+        pending = {}
+        queue = iter(enumerate(inputs))
+        while True:
+            # 在途任务不超过上限，读入内存的图片数量有界
+            for index, (source, relative) in queue:
+                future = executor.submit(process_file, source, destination_of(relative),
+                                         pipeline_json, overwrite)
+                pending[future] = index
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                rows[index] = future.result()
+                if progress is not None:
+                    progress(rows[index])
+    return rows
+
+
+def write_report(rows, path):
+    """写入逐文件耗时报告（CSV，带 BOM 便于 Excel 打开中文路径）"""
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="图像处理实验室批处理：对目录或通配符匹配的图片执行一组处理操作")
+    parser.add_argument("inputs", nargs="*", help="输入目录或通配符（可多个）")
+    parser.add_argument("-o", "--output", default="batch_output", help="输出目录（默认 batch_output）")
+    parser.add_argument("--op", action="append", default=[], metavar="NAME[:K=V,...]",
+                        help="追加一个处理步骤，可重复使用")
+    parser.add_argument("--pipeline", help="处理流水线 JSON 文件（与 --op 二选一）")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="进程数（默认 CPU 核数）")
+    parser.add_argument("--max-pending", type=int, default=None, help="同时在途的文件数上限（默认 2 倍进程数）")
+    parser.add_argument("--format", dest="output_format", help="输出格式扩展名，如 png、jpg（默认与输入相同）")
+    parser.add_argument("--overwrite", action="store_true", help="覆盖已存在的输出文件")
+    parser.add_argument("--report", help=f"报告路径（默认 输出目录/{REPORT_FILENAME}）")
+    parser.add_argument("--list", action="store_true", help="列出可用的处理操作及参数")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    from lab_pipeline import Pipeline, list_operations
+    import lab_operations  # noqa: F401  导入即注册全部操作
+
+    if args.list:
+        for op in list_operations():
+            params = ", ".join(f"{name}={default!r}" for name, default in op.params.items())
+            print(f"{op.name:<28} {op.category} · {op.label}  ({params})")
+        return 0
+
+    if not args.inputs:
+        print("请指定输入目录或通配符（--list 查看可用操作）", file=sys.stderr)
+        return 2
+    if bool(args.op) == bool(args.pipeline):
+        print("请用 --op 或 --pipeline 指定处理步骤（二选一）", file=sys.stderr)
+        return 2
+
+    try:
+        if args.pipeline:
+            pipeline = Pipeline.load(args.pipeline)
+        else:
+            pipeline = Pipeline(parse_op(text) for text in args.op)
+    except (OSError, ValueError) as e:
+        print(f"处理步骤有误: {e}", file=sys.stderr)
+        return 2
+
+    inputs = collect_inputs(args.inputs)
+    if not inputs:
+        print("没有找到图片文件", file=sys.stderr)
+        return 1
+
+    os.makedirs(args.output, exist_ok=True)
+    print(f"共 {len(inputs)} 张图片，{len(pipeline)} 个步骤 -> {args.output}")
+
+    completed = [0]
+
+    def progress(row):
+        completed[0] += 1
+        detail = row["error"] if row["status"] == "error" else f"{row['seconds']}s"
+        print(f"[{completed[0]}/{len(inputs)}] {row['status']:<7} {row['source']}  {detail}")
+
+    start = time.perf_counter()
+    rows = run_batch(inputs, args.output, pipeline.to_json(), workers=args.workers,
+                     max_pending=args.max_pending, output_format=args.output_format,
+                     overwrite=args.overwrite, progress=progress)
+    elapsed = time.perf_counter() - start
+
+    report_path = args.report or os.path.join(args.output, REPORT_FILENAME)
+    write_report(rows, report_path)
+
+    failed = sum(1 for row in rows if row["status"] == "error")
+    print(f"完成：{len(rows) - failed} 成功，{failed} 失败，用时 {elapsed:.1f} 秒；报告 {report_path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
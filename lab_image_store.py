@@ -0,0 +1,153 @@
+"""
+图像处理实验室 - 会话级“解码一次”的上传图像存储
+
+每次 Streamlit 重跑时，各选项卡都会重新执行 Image.open → np.array → cvtColor，
+重复解码同一张 JPEG 并生成多份整幅副本。这里按上传文件的 file_id 缓存解码结果：
+每张图片只保存一份只读的 BGR 主副本，RGB、灰度和缩小预览等视图在首次使用时派生并复用，
+同一会话内的所有选项卡共享。
+"""
+import hashlib
+import io
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# 预览图最长边（像素）
+PREVIEW_MAX_EDGE = 800
+
+# 每个会话最多保留的解码图像数
+STORE_MAX_IMAGES = 4
+
+# 存放在 st.session_state 中的键名
+SESSION_STORE_KEY = "lab_image_store"
+
+
+def _readonly(array):
+    """把视图设为只读，防止共享数组被意外原地修改"""
+    array.flags.writeable = False
+    return array
+
+
+def decode_image_bytes(data):
+    """解码图像字节，返回 (BGR数组, 格式名)"""
+    pil_image = Image.open(io.BytesIO(data))
+    image_format = pil_image.format
+    if pil_image.mode != "RGB":
+        pil_image = pil_image.convert("RGB")
+    image_rgb = np.asarray(pil_image)
+    return cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR), image_format
+
+
+class DecodedImage:
+    """一次解码的上传图像：BGR 主副本加按需派生的视图"""
+
+    def __init__(self, bgr, name="", image_format=None):
+        self.bgr = _readonly(bgr)
+        self.name = name
+        self.format = image_format
+        self._views = {}
+
+    def _view(self, key, build):
+        """获取派生视图，首次访问时计算"""
+        view = self._views.get(key)
+        if view is None:
+            view = _readonly(build())
+            self._views[key] = view
+        return view
+
+    @property
+    def shape(self):
+        return self.bgr.shape
+
+    @property
+    def rgb(self):
+        """RGB 视图（用于 st.image 显示）"""
+        return self._view("rgb", lambda: cv2.cvtColor(self.bgr, cv2.COLOR_BGR2RGB))
+
+    @property
+    def gray(self):
+        """灰度视图"""
+        return self._view("gray", lambda: cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY))
+
+    def preview(self, max_edge=PREVIEW_MAX_EDGE):
+        """缩小后的 BGR 预览（最长边不超过 max_edge，原图更小时直接返回主副本）"""
+        height, width = self.bgr.shape[:2]
+        scale = max_edge / max(height, width)
+        if scale >= 1:
+            return self.bgr
+
+        def build():
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            return cv2.resize(self.bgr, size, interpolation=cv2.INTER_AREA)
+
+        return self._view(("preview", max_edge), build)
+
+    @property
+    def nbytes(self):
+        """主副本与所有已派生视图的总字节数"""
+        return self.bgr.nbytes + sum(v.nbytes for v in self._views.values())
+
+
+class ImageStore:
+    """按上传文件 file_id 缓存解码结果（LRU），相同内容的文件共享同一份解码"""
+
+    def __init__(self, max_images=STORE_MAX_IMAGES):
+        self.max_images = max_images
+        self._by_file = OrderedDict()
+        self._by_content = {}
+
+    @staticmethod
+    def _file_key(uploaded_file):
+        file_id = getattr(uploaded_file, "file_id", None)
+        if file_id:
+            return file_id
+        return (uploaded_file.name, uploaded_file.size)
+
+    def get(self, uploaded_file):
+        """获取上传文件的解码图像，同一文件在会话内只解码一次"""
+        key = self._file_key(uploaded_file)
+        decoded = self._by_file.get(key)
+        if decoded is not None:
+            self._by_file.move_to_end(key)
+            return decoded
+
+        data = uploaded_file.getvalue()
+        content_key = hashlib.blake2b(data, digest_size=16).hexdigest()
+        decoded = self._by_content.get(content_key)
+        if decoded is None:
+            bgr, image_format = decode_image_bytes(data)
+            decoded = DecodedImage(bgr, uploaded_file.name, image_format)
+            decoded.content_key = content_key
+            self._by_content[content_key] = decoded
+
+        self._by_file[key] = decoded
+        while len(self._by_file) > self.max_images:
+            _, evicted = self._by_file.popitem(last=False)
+            if evicted not in self._by_file.values():
+                self._by_content.pop(evicted.content_key, None)
+        return decoded
+
+    def owner_of(self, array):
+        """查找以该数组为 BGR 主副本的解码图像（用于复用缓存的预览视图）"""
+        for decoded in self._by_content.values():
+            if decoded.bgr is array:
+                return decoded
+        return None
+
+    def clear(self):
+        self._by_file.clear()
+        self._by_content.clear()
+
+    @property
+    def nbytes(self):
+        """存储占用的总字节数"""
+        return sum(d.nbytes for d in self._by_content.values())
+
+
+def get_image_store(session_state):
+    """获取（必要时创建）当前会话的图像存储"""
+    if SESSION_STORE_KEY not in session_state:
+        session_state[SESSION_STORE_KEY] = ImageStore()
+    return session_state[SESSION_STORE_KEY]
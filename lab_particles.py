@@ -0,0 +1,244 @@
+"""
+图像处理实验室 - 批量粒子渲染引擎
+
+雨滴、雪花、樱花、星星等特效由成千上万个小粒子组成。逐个调用 cv2.line /
+cv2.circle 绘制时，Python 调用开销远大于实际绘制。这里的做法是：
+
+1. 用随机数生成器一次性生成所有粒子的位置、大小、颜色（NumPy 数组）；
+2. 每种形状只用 OpenCV 预先绘制一次小“精灵”（sprite），记录其像素偏移；
+3. 按精灵分组，用向量化索引把所有粒子一次性“盖章”到图层上。
+
+所有函数都接收 numpy.random.Generator，传入相同种子即可得到相同结果。
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+# 每批盖章写入的最大像素数，限制临时数组的内存占用
+STAMP_CHUNK_PIXELS = 1 << 20
+
+# 精灵：非零像素相对锚点的偏移 (dy, dx) 与覆盖强度 coverage (0-255)
+Sprite = namedtuple("Sprite", ["dy", "dx", "coverage"])
+
+
+def make_rng(seed=None):
+    """创建粒子随机数生成器（seed 相同则结果可复现）"""
+    return np.random.default_rng(seed)
+
+
+def sprite_from_canvas(canvas, origin_x, origin_y):
+    """把小画布上绘制好的形状转换为精灵"""
+    ys, xs = np.nonzero(canvas)
+    return Sprite(
+        (ys - origin_y).astype(np.int32),
+        (xs - origin_x).astype(np.int32),
+        canvas[ys, xs].astype(np.uint32),
+    )
+
+
+def stamp_sprites(canvas, xs, ys, colors, sprite):
+    """
+    把同一精灵批量绘制到画布上（原地修改）
+
+    参数:
+    - canvas: 目标图层 (H, W) 或 (H, W, C)，uint8
+    - xs, ys: 粒子锚点坐标数组
+    - colors: 粒子颜色，形状 (N,)（灰度）或 (N, C)
+    - sprite: 由 sprite_from_canvas 生成的精灵
+    """
+    if len(xs) == 0 or len(sprite.dy) == 0:
+        return canvas
+
+    height, width = canvas.shape[:2]
+    channels = 1 if canvas.ndim == 2 else canvas.shape[2]
+
+    xs = np.asarray(xs, dtype=np.int32)
+    ys = np.asarray(ys, dtype=np.int32)
+    colors = np.asarray(colors, dtype=np.uint32)
+    if colors.ndim == 1:
+        colors = np.repeat(colors[:, None], channels, axis=1)
+
+    # 覆盖强度全为255时可以直接写入颜色
+    full_coverage = bool(np.all(sprite.coverage == 255))
+    chunk = max(1, STAMP_CHUNK_PIXELS // len(sprite.dy))
+
+    for start in range(0, len(xs), chunk):
+        py = ys[start:start + chunk, None] + sprite.dy[None, :]
+        px = xs[start:start + chunk, None] + sprite.dx[None, :]
+        valid = (py >= 0) & (py < height) & (px >= 0) & (px < width)
+
+        particle_colors = colors[start:start + chunk, None, :]
+        if full_coverage:
+            values = np.broadcast_to(particle_colors, py.shape + (channels,))
+        else:
+            values = particle_colors * sprite.coverage[None, :, None] // 255
+
+        values = values[valid].astype(np.uint8)
+        if canvas.ndim == 2:
+            canvas[py[valid], px[valid]] = values[:, 0]
+        else:
+            canvas[py[valid], px[valid]] = values
+
+    return canvas
+
+
+def stamp_sprite_groups(canvas, xs, ys, colors, keys, sprite_factory):
+    """按精灵类型分组批量绘制，keys[i] 传给 sprite_factory 得到第 i 个粒子的精灵"""
+    keys = np.asarray(keys)
+    colors = np.asarray(colors)
+    for key in np.unique(keys, axis=0):
+        selected = np.all(keys.reshape(len(keys), -1) == np.reshape(key, (1, -1)), axis=1)
+        sprite = sprite_factory(*np.atleast_1d(key).tolist())
+        stamp_sprites(canvas, xs[selected], ys[selected], colors[selected], sprite)
+    return canvas
+
+
+# ======================= 精灵定义 =======================
+
+@lru_cache(maxsize=None)
+def disc_sprite(radius):
+    """实心圆精灵"""
+    size = 2 * radius + 3
+    canvas = np.zeros((size, size), dtype=np.uint8)
+    cv2.circle(canvas, (radius + 1, radius + 1), radius, 255, -1)
+    return sprite_from_canvas(canvas, radius + 1, radius + 1)
+
+
+@lru_cache(maxsize=None)
+def rain_sprite(length, thickness):
+    """倾斜雨丝精灵：每下降3像素向右偏移1像素"""
+    pad = thickness + 1
+    canvas = np.zeros((length + 2 * pad, length // 3 + thickness + 2 * pad), dtype=np.uint8)
+    for i in range(length):
+        cv2.line(canvas, (pad + i // 3, pad + i), (pad + i // 3 + thickness, pad + i), 255, thickness)
+    return sprite_from_canvas(canvas, pad, pad)
+
+
+@lru_cache(maxsize=None)
+def star_sprite(radius, rays):
+    """
+    星星精灵
+    rays: 0 无光芒，1 四向光芒，2 四向 + 对角光芒
+    """
+    pad = radius + 4
+    canvas = np.zeros((2 * pad + 1, 2 * pad + 1), dtype=np.uint8)
+    cv2.circle(canvas, (pad, pad), radius, 255, -1)
+    if rays >= 1:
+        for dx, dy in [(2, 0), (-2, 0), (0, 2), (0, -2)]:
+            cv2.circle(canvas, (pad + dx, pad + dy), max(1, radius - 1), 255, -1)
+    if rays >= 2:
+        for dx, dy in [(2, 2), (-2, 2), (2, -2), (-2, -2)]:
+            cv2.circle(canvas, (pad + dx, pad + dy), 1, 255, -1)
+    return sprite_from_canvas(canvas, pad, pad)
+
+
+@lru_cache(maxsize=None)
+def bright_star_sprite():
+    """亮星精灵：实心核心加三圈渐暗光晕"""
+    pad = 7
+    canvas = np.zeros((2 * pad + 1, 2 * pad + 1), dtype=np.uint8)
+    cv2.circle(canvas, (pad, pad), 2, 255, -1)
+    for r in range(3, 6):
+        alpha = 0.5 * (1 - (r - 3) / 3)  # 光晕渐变
+        cv2.circle(canvas, (pad, pad), r, int(255 * alpha), 1)
+    return sprite_from_canvas(canvas, pad, pad)
+
+
+@lru_cache(maxsize=None)
+def sakura_petal_sprite(size):
+    """樱花花瓣精灵：五片圆形花瓣"""
+    pad = size + size // 2 + 2
+    canvas = np.zeros((2 * pad + 1, 2 * pad + 1), dtype=np.uint8)
+    for angle in range(0, 360, 72):
+        rad = np.radians(angle)
+        px = int(pad + size * np.cos(rad))
+        py = int(pad + size * np.sin(rad))
+        cv2.circle(canvas, (px, py), size // 2, 255, -1)
+    return sprite_from_canvas(canvas, pad, pad)
+
+
+# ======================= 特效粒子图层 =======================
+
+def render_rain_layer(layer, count, rng):
+    """在图层上批量绘制雨丝"""
+    height, width = layer.shape[:2]
+    xs = rng.integers(0, width, count)
+    ys = rng.integers(0, height, count)
+    lengths = rng.integers(15, 41, count)
+    thicknesses = rng.integers(1, 4, count)
+    colors = rng.integers(180, 241, count)
+
+    keys = np.stack([lengths, thicknesses], axis=1)
+    return stamp_sprite_groups(layer, xs, ys, colors, keys, rain_sprite)
+
+
+def render_snow_layer(layer, count, rng):
+    """在图层上批量绘制雪花"""
+    height, width = layer.shape[:2]
+    xs = rng.integers(0, width, count)
+    ys = rng.integers(0, height, count)
+    radii = rng.integers(1, 6, count)
+    brightness = rng.integers(180, 256, count)
+    return stamp_sprite_groups(layer, xs, ys, brightness, radii, disc_sprite)
+
+
+def render_sakura_layer(layer, count, rng):
+    """在RGBA图层上批量绘制樱花（花瓣与花心）"""
+    height, width = layer.shape[:2]
+    xs = rng.integers(0, width, count)
+    ys = rng.integers(0, height, count)
+    sizes = rng.integers(3, 8, count)
+
+    # 粉色系花瓣颜色与透明度
+    petal_colors = np.stack([
+        rng.integers(230, 255, count),
+        rng.integers(180, 220, count),
+        rng.integers(200, 240, count),
+        rng.integers(150, 220, count),
+    ], axis=1)
+    stamp_sprite_groups(layer, xs, ys, petal_colors, sizes, sakura_petal_sprite)
+
+    # 花心
+    center_colors = np.tile(np.array([255, 255, 200, 200]), (count, 1))
+    stamp_sprite_groups(layer, xs, ys, center_colors, sizes // 3, disc_sprite)
+    return layer
+
+
+def render_star_particles(canvas, count, rng):
+    """在画布上批量绘制不同大小、色温与光芒的星星"""
+    height, width = canvas.shape[:2]
+    xs = rng.integers(0, width, count)
+    ys = rng.integers(0, height, count)
+    radii = rng.integers(1, 5, count)
+
+    # 星星颜色：60% 白色，20% 黄色，20% 蓝色
+    color_choice = rng.random(count)
+    white = rng.integers(200, 256, count)
+    yellow = rng.integers(180, 231, count)
+    blue = rng.integers(180, 221, count)
+    colors = np.select(
+        [color_choice[:, None] < 0.6, color_choice[:, None] < 0.8],
+        [
+            np.stack([white, white, white], axis=1),
+            np.stack([yellow, yellow, yellow // 2], axis=1),
+        ],
+        np.stack([blue, blue - 30, blue], axis=1),
+    )
+
+    # 50% 的星星有四向光芒，其中一半再加对角光芒
+    rays = (rng.random(count) > 0.5).astype(np.int64)
+    rays += rays * (rng.random(count) > 0.5)
+
+    keys = np.stack([radii, rays], axis=1)
+    return stamp_sprite_groups(canvas, xs, ys, colors, keys, star_sprite)
+
+
+def render_bright_stars(canvas, count, rng):
+    """在画布上批量绘制带光晕的亮星"""
+    height, width = canvas.shape[:2]
+    xs = rng.integers(0, width, count)
+    ys = rng.integers(0, height, count)
+    colors = np.full(count, 255)
+    return stamp_sprites(canvas, xs, ys, colors, bright_star_sprite())
@@ -0,0 +1,240 @@
+"""
+图像处理实验室 - 操作注册表与流水线
+
+实验室中的各个 apply_* 函数通过 register_operation 注册，登记参数（取自函数签名
+的默认值，另可附带取值范围）以及输入/输出颜色空间。Pipeline 按顺序串联多个
+操作，一次执行完成，颜色空间只在确实需要时转换：例如 Canny 输出灰度，下一步是
+可直接处理灰度的操作时，不会经过 灰度→BGR→灰度 的来回转换。
+
+流水线可以序列化为 JSON，保存后在其他图片（或整个文件夹）上重放。
+"""
+import inspect
+import json
+import time
+from collections import OrderedDict, namedtuple
+
+import cv2
+
+# 颜色空间
+COLOR_BGR = "bgr"     # 三通道 BGR
+COLOR_GRAY = "gray"   # 单通道灰度
+COLOR_ANY = "any"     # 输入：灰度与 BGR 均可直接处理
+COLOR_SAME = "same"   # 输出：与输入相同
+
+# 流水线 JSON 格式版本
+PIPELINE_FORMAT_VERSION = 1
+
+# 没有默认值的必填参数
+REQUIRED = object()
+
+# 全部已注册的操作（名称 -> Operation）
+OPERATIONS = OrderedDict()
+
+
+class Operation:
+    """已注册的图像处理操作"""
+
+    def __init__(self, name, func, label, category="", input_space=COLOR_ANY,
+                 output_space=COLOR_SAME, ranges=None):
+        self.name = name
+        self.func = func
+        self.label = label
+        self.category = category
+        self.input_space = input_space
+        self.output_space = output_space
+        self.ranges = dict(ranges or {})
+
+        # 第一个参数为图像，其余参数及默认值取自函数签名
+        parameters = list(inspect.signature(func).parameters.values())[1:]
+        self.params = OrderedDict(
+            (p.name, REQUIRED if p.default is inspect.Parameter.empty else p.default)
+            for p in parameters
+        )
+
+    def bind(self, params=None):
+        """校验参数并补全默认值，返回可直接传给函数的参数字典"""
+        params = dict(params or {})
+        unknown = set(params) - set(self.params)
+        if unknown:
+            raise ValueError(f"操作 {self.name} 不支持参数: {', '.join(sorted(unknown))}")
+
+        bound = {}
+        for name, default in self.params.items():
+            if name in params:
+                value = params[name]
+                # JSON 中的数组恢复为元组（如 tile_grid_size、颜色范围）
+                if isinstance(value, list) and (default is REQUIRED or isinstance(default, tuple)):
+                    value = tuple(value)
+                bound[name] = value
+            elif default is REQUIRED:
+                raise ValueError(f"操作 {self.name} 缺少必填参数: {name}")
+            else:
+                bound[name] = default
+        return bound
+
+    def output_for(self, space):
+        """给定实际输入颜色空间时的输出颜色空间"""
+        return space if self.output_space == COLOR_SAME else self.output_space
+
+    def describe(self):
+        """可序列化为 JSON 的操作说明"""
+        return {
+            "name": self.name,
+            "label": self.label,
+            "category": self.category,
+            "input": self.input_space,
+            "output": self.output_space,
+            "params": {
+                name: {"default": None if default is REQUIRED else default,
+                       "required": default is REQUIRED,
+                       "range": self.ranges.get(name)}
+                for name, default in self.params.items()
+            },
+        }
+
+
+def register_operation(name=None, *, label, category="", input=COLOR_ANY, output=COLOR_SAME, ranges=None):
+    """
+    注册图像处理操作的装饰器
+
+    参数:
+    - name: 流水线中使用的操作名（默认为去掉 apply_ 前缀的函数名）
+    - label: 界面显示名称
+    - category: 所属实验模块
+    - input: 输入颜色空间（bgr / gray / any）
+    - output: 输出颜色空间（bgr / gray / same）
+    - ranges: 参数取值范围，{参数名: (最小值, 最大值) 或 可选值列表}
+    """
+    def decorator(func):
+        op_name = name or func.__name__.replace("apply_", "", 1)
+        # Streamlit 重跑页面时会重新定义函数，同名操作以最新定义为准
+        OPERATIONS[op_name] = Operation(op_name, func, label, category, input, output, ranges)
+        return func
+    return decorator
+
+
+def get_operation(name):
+    """按名称获取已注册的操作"""
+    try:
+        return OPERATIONS[name]
+    except KeyError:
+        raise ValueError(f"未知的图像处理操作: {name}") from None
+
+
+def list_operations(category=None):
+    """列出已注册的操作（可按模块筛选）"""
+    return [op for op in OPERATIONS.values() if category is None or op.category == category]
+
+
+def color_space_of(image):
+    """判断图像的颜色空间"""
+    return COLOR_GRAY if image.ndim == 2 else COLOR_BGR
+
+
+def convert_color(image, target):
+    """把图像转换到目标颜色空间（已是目标空间或目标为 any 时原样返回）"""
+    source = color_space_of(image)
+    if target in (COLOR_ANY, source):
+        return image
+    if target == COLOR_GRAY:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+
+
+# 流水线中的一步：操作名与参数
+PipelineStep = namedtuple("PipelineStep", ["op", "params"])
+
+
+class Pipeline:
+    """按顺序执行的一串图像处理操作"""
+
+    def __init__(self, steps=()):
+        self.steps = []
+        for step in steps:
+            if isinstance(step, dict):
+                self.add(step["op"], **step.get("params", {}))
+            else:
+                op, params = step
+                self.add(op, **(params or {}))
+
+    def add(self, op, **params):
+        """追加一步（立即校验操作名与参数），返回自身以便链式调用"""
+        operation = get_operation(op)
+        operation.bind(params)
+        self.steps.append(PipelineStep(op, params))
+        return self
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __iter__(self):
+        return iter(self.steps)
+
+    def plan(self, input_space=COLOR_BGR, output=COLOR_BGR):
+        """
+        预估执行过程中需要的颜色空间转换
+
+        返回:
+        - [(操作名, 转换前空间, 转换后空间)]，最后一项的操作名为 None 表示输出转换
+        """
+        conversions = []
+        space = input_space
+        for step in self.steps:
+            operation = get_operation(step.op)
+            if operation.input_space not in (COLOR_ANY, space):
+                conversions.append((step.op, space, operation.input_space))
+                space = operation.input_space
+            space = operation.output_for(space)
+        if output not in (COLOR_ANY, space):
+            conversions.append((None, space, output))
+        return conversions
+
+    def run(self, image, output=COLOR_BGR, timings=None):
+        """
+        执行流水线
+
+        参数:
+        - image: 输入图像（BGR 或灰度）
+        - output: 结果颜色空间（bgr / gray / any）
+        - timings: 可选列表，逐步追加 (操作名, 耗时秒数)
+
+        中间结果不写入结果缓存，避免对每一步的中间图像计算哈希。
+        """
+        result = image
+        for step in self.steps:
+            operation = get_operation(step.op)
+            func = getattr(operation.func, "uncached", operation.func)
+            start = time.perf_counter()
+            result = func(convert_color(result, operation.input_space), **operation.bind(step.params))
+            if timings is not None:
+                timings.append((step.op, time.perf_counter() - start))
+        return convert_color(result, output)
+
+    def to_dict(self):
+        return {
+            "version": PIPELINE_FORMAT_VERSION,
+            "steps": [{"op": step.op, "params": dict(step.params)} for step in self.steps],
+        }
+
+    def to_json(self, indent=None):
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=indent)
+
+    @classmethod
+    def from_dict(cls, data):
+        version = data.get("version", PIPELINE_FORMAT_VERSION)
+        if version > PIPELINE_FORMAT_VERSION:
+            raise ValueError(f"不支持的流水线格式版本: {version}")
+        return cls(data.get("steps", []))
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_json(indent=2))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_json(f.read())
@@ -0,0 +1,116 @@
+"""
+图像处理实验室 - 代理分辨率预览
+
+交互调参时在缩小的代理图上运行处理函数，只在需要时（下载、关闭预览）
+按原图全分辨率执行精确处理。缩放规则统一由这里提供，处理函数内部的
+临时降采样（如波普艺术的 K-means）也使用同一套函数。
+"""
+import hashlib
+
+import cv2
+import numpy as np
+
+# 预览代理图默认最长边（像素）
+PREVIEW_DEFAULT_MAX_EDGE = 1024
+
+# 预览最长边可选范围
+PREVIEW_MIN_EDGE = 256
+PREVIEW_MAX_EDGE = 2048
+
+
+def proxy_scale(shape, max_edge=None, max_pixels=None):
+    """计算缩放比例（不放大，始终 <= 1）"""
+    height, width = shape[:2]
+    scale = 1.0
+    if max_edge:
+        scale = min(scale, max_edge / max(height, width))
+    if max_pixels:
+        scale = min(scale, (max_pixels / (height * width)) ** 0.5)
+    return scale
+
+
+def make_proxy(image, max_edge=None, max_pixels=None):
+    """
+    生成代理图
+
+    返回:
+    - (proxy, scale): 代理图与缩放比例；无需缩小时返回原图与 1.0
+    """
+    scale = proxy_scale(image.shape, max_edge, max_pixels)
+    if scale >= 1.0:
+        return image, 1.0
+    height, width = image.shape[:2]
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA), scale
+
+
+def restore_size(result, shape, interpolation=cv2.INTER_LINEAR):
+    """把代理尺寸的结果放大回原图尺寸"""
+    height, width = shape[:2]
+    if result.shape[:2] == (height, width):
+        return result
+    return cv2.resize(result, (width, height), interpolation=interpolation)
+
+
+def to_rgb(result):
+    """把处理结果（BGR 或灰度）转换为 RGB 用于显示与下载"""
+    if result.ndim == 2:
+        return cv2.cvtColor(result, cv2.COLOR_GRAY2RGB)
+    return cv2.cvtColor(result, cv2.COLOR_BGR2RGB)
+
+
+def result_key(image_rgb):
+    """预览结果的内容键（代理图很小，哈希开销可忽略）"""
+    image_rgb = np.ascontiguousarray(image_rgb)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{image_rgb.shape}|{image_rgb.dtype}".encode())
+    h.update(memoryview(image_rgb).cast("B"))
+    return h.hexdigest()
+
+
+class PreviewRecipe:
+    """预览结果对应的全分辨率处理配方"""
+
+    def __init__(self, func, image, args, kwargs, proxy_shape, index=None):
+        self.func = func
+        self.image = image
+        self.args = args
+        self.kwargs = kwargs
+        self.proxy_shape = proxy_shape
+        # 处理函数返回列表时（如通道分离），取第 index 个元素
+        self.index = index
+
+    @property
+    def full_shape(self):
+        return self.image.shape
+
+    def part(self, index):
+        """列表结果中第 index 个元素的配方"""
+        return PreviewRecipe(self.func, self.image, self.args, self.kwargs, self.proxy_shape, index)
+
+    def render(self):
+        """按原图全分辨率执行精确处理"""
+        result = self.func(self.image, *self.args, **self.kwargs)
+        return result if self.index is None else result[self.index]
+
+
+def run_preview(func, image, args, kwargs, max_edge, proxy=None):
+    """
+    在代理图上运行处理函数
+
+    参数:
+    - proxy: 可选的现成代理图（例如解码存储中缓存的预览视图）
+
+    返回:
+    - (result, recipe): 代理结果与全分辨率配方；原图不大于 max_edge 时配方为 None
+    """
+    if proxy is None:
+        proxy, scale = make_proxy(image, max_edge=max_edge)
+    else:
+        scale = proxy.shape[1] / image.shape[1]
+
+    if scale >= 1.0:
+        return func(image, *args, **kwargs), None
+
+    result = func(proxy, *args, **kwargs)
+    return result, PreviewRecipe(func, image, args, kwargs, proxy.shape)
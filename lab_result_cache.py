@@ -0,0 +1,224 @@
+"""
+图像处理实验室 - 内容寻址的处理结果缓存
+
+缓存键为 (解码后图像内容的哈希, 函数名, 规范化后的参数)。同一张示例图片
+在不同学生、不同会话中得到相同的键，因此课堂上几十名学生上传同一张图片
+并拖动滑块时，相同参数的结果只计算一次。
+
+缓存位于模块级（进程内共享），按结果占用的字节数做 LRU 淘汰，
+上限可通过环境变量 LAB_RESULT_CACHE_MB 配置。
+"""
+import functools
+import hashlib
+import inspect
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# 结果缓存的内存上限（MB）
+RESULT_CACHE_MAX_MB = int(os.environ.get("LAB_RESULT_CACHE_MB", "512"))
+
+
+def image_digest(image):
+    """计算图像内容哈希（包含尺寸与数据类型）"""
+    image = np.ascontiguousarray(image)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{image.shape}|{image.dtype}".encode())
+    h.update(memoryview(image).cast("B"))
+    return h.hexdigest()
+
+
+def normalize_param(value):
+    """把参数规范化为可哈希、与类型细节无关的形式"""
+    if isinstance(value, np.ndarray):
+        return ("ndarray", image_digest(value))
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, bool) or value is None or isinstance(value, (int, str)):
+        return value
+    if isinstance(value, float):
+        # 消除滑块浮点步进带来的微小误差
+        return round(value, 10)
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize_param(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, normalize_param(v)) for k, v in value.items()))
+    return repr(value)
+
+
+def _result_nbytes(value):
+    """估算结果占用的字节数"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (list, tuple)):
+        return sum(_result_nbytes(v) for v in value)
+    return 64
+
+
+def _detach(value, image):
+    """
+    复制结果中与输入图像共享内存的数组
+
+    部分函数在出错或无需处理时直接返回输入图像（或其视图），缓存前先复制，
+    以免 _freeze 把调用方自己的数组设为只读。
+    """
+    if isinstance(value, np.ndarray):
+        return value.copy() if np.may_share_memory(value, image) else value
+    if isinstance(value, list):
+        return [_detach(v, image) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_detach(v, image) for v in value)
+    return value
+
+
+def _freeze(value):
+    """缓存中的数组设为只读，防止被调用方原地修改（调用前须经 _detach 与输入分离）"""
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            _freeze(v)
+    return value
+
+
+def _thaw(value):
+    """返回缓存结果的可写副本"""
+    if isinstance(value, np.ndarray):
+        return value.copy()
+    if isinstance(value, list):
+        return [_thaw(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_thaw(v) for v in value)
+    return value
+
+
+class ResultCache:
+    """按字节数限额的线程安全 LRU 结果缓存"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """读取缓存，未命中返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """写入缓存，超出上限时淘汰最久未使用的结果"""
+        size = _result_nbytes(value)
+        if size > self.max_bytes:
+            return
+        _freeze(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """清空缓存并重置计数"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """缓存统计：命中/未命中次数、命中率、条目数与占用内存"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# 全进程共享的结果缓存
+result_cache = ResultCache(RESULT_CACHE_MAX_MB * 1024 * 1024)
+
+
+def make_cache_key(name, image, params):
+    """构造缓存键：(图像哈希, 函数名, 规范化参数)"""
+    return (image_digest(image), name, normalize_param(params))
+
+
+def cached_operation(func=None, *, name=None, when=None, cache=None):
+    """
+    图像处理函数的缓存装饰器
+
+    被装饰函数的第一个参数为图像，其余参数（按函数签名补全默认值后）参与缓存键，
+    因此按位置或按关键字传参得到相同的键。
+    - name: 缓存使用的函数名（默认为函数名）
+    - when: 可选判断函数，接收参数字典，返回 False 时不使用缓存
+            （例如随机特效未指定种子时）
+    - cache: 使用的 ResultCache（默认全局 result_cache）
+    """
+    if func is None:
+        return functools.partial(cached_operation, name=name, when=when, cache=cache)
+
+    op_name = name or func.__name__
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(image, *args, **kwargs):
+        bound = signature.bind(image, *args, **kwargs)
+        bound.apply_defaults()
+        params = dict(bound.arguments)
+        params.pop(next(iter(signature.parameters)))
+
+        if when is not None and not when(params):
+            return func(image, *args, **kwargs)
+
+        target = cache if cache is not None else result_cache
+        key = make_cache_key(op_name, image, params)
+        value = target.get(key)
+        if value is None:
+            value = _detach(func(image, *args, **kwargs), image)
+            target.put(key, value)
+        return _thaw(value)
+
+    wrapper.uncached = func
+    wrapper.cache_when = when
+    return wrapper
+
+
+def nondeterministic(func):
+    """标记使用未设种子随机数的函数：结果不可复现，包含它的流水线也不缓存"""
+    func.nondeterministic = True
+    return func
+
+
+def cacheable(func, params):
+    """函数在给定参数（不含图像）下的结果是否可复现、可以缓存"""
+    if getattr(func, "nondeterministic", False):
+        return False
+    when = getattr(func, "cache_when", None)
+    return when is None or when(params)
+
+
+def seeded(params):
+    """随机特效只在指定了种子时缓存"""
+    return params.get("seed") is not None
@@ -0,0 +1,132 @@
+"""
+图像处理实验室 - 分块并行执行器
+
+双边滤波、油画、detailEnhance 等邻域滤波是绘画/风格选项卡中最耗时的步骤，
+且其中几个在 OpenCV 内部是单线程的。这里把大图切成带重叠边（halo）的块，
+在线程池上并行处理后再拼接：每块只保留中心区域，halo 宽度由滤波半径决定，
+因此拼接处没有可见接缝。OpenCV 在计算时会释放 GIL，线程池即可利用多核。
+
+小图直接整幅处理，不分块。
+
+不适合分块的滤波（1600×1200 图像上与整幅处理对比）：
+- pyrMeanShiftFiltering：均值漂移的收敛结果依赖整幅图像，halo 加宽到 320 像素
+  仍有数百个像素相差二十以上；
+- stylization（sigma_s=100）：halo 要宽到 600 像素才与整幅一致，此时整幅只剩一块，
+  分块没有收益。
+"""
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# 线程池大小（默认 CPU 核数），可通过环境变量 LAB_TILE_WORKERS 配置
+TILE_WORKERS = int(os.environ.get("LAB_TILE_WORKERS", "0")) or os.cpu_count() or 1
+
+# 分块的目标边长（像素，不含 halo）
+TILE_SIZE = 512
+
+# 像素数低于该值的图像不分块
+TILE_MIN_PIXELS = 1024 * 1024
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_tile_executor():
+    """获取进程共享的分块线程池（首次使用时创建）"""
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=TILE_WORKERS, thread_name_prefix="lab-tile")
+        return _executor
+
+
+# ======================= 各滤波的 halo 宽度 =======================
+
+def bilateral_halo(d):
+    """双边滤波：邻域直径 d"""
+    return d // 2 + 1
+
+
+def oil_painting_halo(size):
+    """xphoto.oilPainting：邻域为 (2*size+1) 的方窗"""
+    return size + 1
+
+
+def domain_transform_halo(sigma_s):
+    """
+    detailEnhance（递归域变换滤波）：取 12 倍空间 sigma
+
+    递归滤波在平坦区域的影响范围远大于 3 倍 sigma。1600×1200 图像、sigma_s=10 时：
+    halo 取 30 有四百多个像素相差 1，取 120 与整幅处理逐像素一致；大面积平坦色块的
+    图像上另有十余个像素相差 1，与 halo 宽度无关（浮点舍入）。
+    """
+    return int(math.ceil(12 * sigma_s))
+
+
+# ======================= 分块执行 =======================
+
+def plan_tiles(height, width, halo, tile_size=TILE_SIZE):
+    """
+    计算分块方案
+
+    返回:
+    - [(内部区域, 含 halo 的读取区域)]，区域均为 (y0, y1, x0, x1)
+    """
+    # halo 很宽时增大块尺寸，避免重叠部分的计算量远超块本身
+    tile_size = max(tile_size, 2 * halo)
+    rows = max(1, round(height / tile_size))
+    cols = max(1, round(width / tile_size))
+
+    tiles = []
+    for r in range(rows):
+        y0 = height * r // rows
+        y1 = height * (r + 1) // rows
+        for c in range(cols):
+            x0 = width * c // cols
+            x1 = width * (c + 1) // cols
+            if y0 >= y1 or x0 >= x1:
+                continue
+            read = (max(0, y0 - halo), min(height, y1 + halo),
+                    max(0, x0 - halo), min(width, x1 + halo))
+            tiles.append(((y0, y1, x0, x1), read))
+    return tiles
+
+
+def run_tiled(func, image, halo, tile_size=TILE_SIZE, min_pixels=TILE_MIN_PIXELS):
+    """
+    分块并行执行逐像素邻域滤波
+
+    参数:
+    - func: 滤波函数，接收一块图像并返回同尺寸结果（通道数可不同）
+    - image: 输入图像
+    - halo: 重叠边宽度（像素），应不小于滤波的影响半径
+    - tile_size: 分块目标边长
+    - min_pixels: 像素数低于该值时直接整幅处理
+
+    返回:
+    - 与整幅处理尺寸相同的结果
+    """
+    height, width = image.shape[:2]
+    if height * width < min_pixels or TILE_WORKERS <= 1:
+        return func(image)
+
+    tiles = plan_tiles(height, width, halo, tile_size)
+    if len(tiles) == 1:
+        return func(image)
+
+    def process(tile):
+        (y0, y1, x0, x1), (ry0, ry1, rx0, rx1) = tile
+        block = func(np.ascontiguousarray(image[ry0:ry1, rx0:rx1]))
+        return block[y0 - ry0:y1 - ry0, x0 - rx0:x1 - rx0]
+
+    blocks = list(get_tile_executor().map(process, tiles))
+
+    first = blocks[0]
+    result = np.empty((height, width) + first.shape[2:], dtype=first.dtype)
+    for ((y0, y1, x0, x1), _), block in zip(tiles, blocks):
+        result[y0:y1, x0:x1] = block
+    return result
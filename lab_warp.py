@@ -0,0 +1,185 @@
+"""
+图像处理实验室 - 几何扭曲映射缓存
+
+把旋涡、梵高旋转等扭曲效果预先计算为 cv2.remap 所需的 float32
+(map_x, map_y) 坐标映射，并按图像尺寸与扭曲参数缓存（LRU，按字节数限额）。
+Streamlit 每次交互都会重新执行页面脚本，而导入的模块只加载一次，
+因此缓存放在这里可以跨重跑、跨会话复用。
+"""
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# 映射缓存的内存上限（字节），1200万像素的一组映射约占 96MB
+WARP_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+_warp_cache = OrderedDict()
+_warp_cache_bytes = 0
+_warp_cache_lock = threading.Lock()
+
+
+def _cache_get(key):
+    """读取缓存（命中时移到最近使用的位置）"""
+    with _warp_cache_lock:
+        maps = _warp_cache.get(key)
+        if maps is not None:
+            _warp_cache.move_to_end(key)
+        return maps
+
+
+def _cache_put(key, maps):
+    """写入缓存，超出字节上限时淘汰最久未使用的映射"""
+    global _warp_cache_bytes
+
+    for m in maps:
+        m.flags.writeable = False
+    size = sum(m.nbytes for m in maps)
+    if size > WARP_CACHE_MAX_BYTES:
+        # 单组映射超过上限时不缓存
+        return maps
+
+    with _warp_cache_lock:
+        old = _warp_cache.pop(key, None)
+        if old is not None:
+            _warp_cache_bytes -= sum(m.nbytes for m in old)
+        _warp_cache[key] = maps
+        _warp_cache_bytes += size
+        while _warp_cache_bytes > WARP_CACHE_MAX_BYTES:
+            _, evicted = _warp_cache.popitem(last=False)
+            _warp_cache_bytes -= sum(m.nbytes for m in evicted)
+    return maps
+
+
+def clear_warp_cache():
+    """清空扭曲映射缓存"""
+    global _warp_cache_bytes
+
+    with _warp_cache_lock:
+        _warp_cache.clear()
+        _warp_cache_bytes = 0
+
+
+def get_warp_cache_info():
+    """获取缓存状态：条目数与占用字节数"""
+    with _warp_cache_lock:
+        return {"entries": len(_warp_cache), "bytes": _warp_cache_bytes, "max_bytes": WARP_CACHE_MAX_BYTES}
+
+
+def default_swirl_centers(height, width, radius=50, strength=0.01):
+    """星空风格默认的四个旋涡中心（四等分点）"""
+    return (
+        (width // 4, height // 4, radius, strength),
+        (width * 3 // 4, height // 4, radius, strength),
+        (width // 4, height * 3 // 4, radius, strength),
+        (width * 3 // 4, height * 3 // 4, radius, strength),
+    )
+
+
+def _build_swirl_maps(height, width, swirls):
+    """计算旋涡扭曲的最近邻映射"""
+    map_y, map_x = np.indices((height, width), dtype=np.float32)
+
+    # 按顺序处理，重叠区域以后面的旋涡为准
+    for center_x, center_y, radius, strength in swirls:
+        y0, y1 = max(0, center_y - radius), min(height, center_y + radius)
+        x0, x1 = max(0, center_x - radius), min(width, center_x + radius)
+        if y0 >= y1 or x0 >= x1:
+            continue
+
+        dy, dx = np.mgrid[y0 - center_y:y1 - center_y, x0 - center_x:x1 - center_x]
+        distance = np.sqrt(dx * dx + dy * dy)
+        inside = distance < radius
+
+        # 越靠近中心旋转越强
+        angle = np.arctan2(dy, dx) + (radius - distance) * strength
+        src_x = (center_x + distance * np.cos(angle)).astype(np.int32)
+        src_y = (center_y + distance * np.sin(angle)).astype(np.int32)
+        src_x = np.clip(src_x, 0, width - 1)
+        src_y = np.clip(src_y, 0, height - 1)
+
+        window_x = map_x[y0:y1, x0:x1]
+        window_y = map_y[y0:y1, x0:x1]
+        window_x[inside] = src_x[inside]
+        window_y[inside] = src_y[inside]
+
+    return map_x, map_y
+
+
+def get_swirl_maps(height, width, swirls):
+    """
+    获取旋涡扭曲映射（带缓存）
+
+    参数:
+    - height, width: 图像尺寸
+    - swirls: 旋涡列表，每项为 (center_x, center_y, radius, strength)
+
+    返回:
+    - (map_x, map_y): float32 只读映射，可直接用于 cv2.remap
+    """
+    swirls = tuple((int(cx), int(cy), int(r), float(s)) for cx, cy, r, s in swirls)
+    key = ("swirl", height, width, swirls)
+
+    maps = _cache_get(key)
+    if maps is None:
+        maps = _cache_put(key, _build_swirl_maps(height, width, swirls))
+    return maps
+
+
+def apply_swirl(image, swirls):
+    """对图像应用一组旋涡扭曲（一次 remap 完成）"""
+    height, width = image.shape[:2]
+    map_x, map_y = get_swirl_maps(height, width, swirls)
+    return cv2.remap(image, map_x, map_y, cv2.INTER_NEAREST, borderMode=cv2.BORDER_REPLICATE)
+
+
+def _build_twist_maps(height, width, twist_strength, bilinear):
+    """计算以图像中心为轴的旋转扭曲映射（旋转角随半径线性增加）"""
+    center_x, center_y = width // 2, height // 2
+
+    y_coords, x_coords = np.mgrid[0:height, 0:width]
+    dx = x_coords - center_x
+    dy = y_coords - center_y
+    distance = np.sqrt(dx * dx + dy * dy)
+    angle = np.arctan2(dy, dx) + distance * twist_strength
+
+    src_x = center_x + distance * np.cos(angle)
+    src_y = center_y + distance * np.sin(angle)
+
+    if not bilinear:
+        # 最近邻：与逐像素取整的结果一致
+        src_x = src_x.astype(np.int32)
+        src_y = src_y.astype(np.int32)
+
+    map_x = np.clip(src_x, 0, width - 1).astype(np.float32)
+    map_y = np.clip(src_y, 0, height - 1).astype(np.float32)
+    return map_x, map_y
+
+
+def get_twist_maps(height, width, twist_strength, bilinear=False):
+    """
+    获取梵高风格旋转扭曲映射（带缓存）
+
+    参数:
+    - height, width: 图像尺寸
+    - twist_strength: 扭曲强度（每像素半径增加的旋转弧度）
+    - bilinear: 是否生成用于双线性插值的亚像素映射
+
+    返回:
+    - (map_x, map_y): float32 只读映射
+    """
+    key = ("twist", height, width, float(twist_strength), bool(bilinear))
+
+    maps = _cache_get(key)
+    if maps is None:
+        maps = _cache_put(key, _build_twist_maps(height, width, twist_strength, bilinear))
+    return maps
+
+
+def apply_twist(image, twist_strength, bilinear=False):
+    """对图像应用中心旋转扭曲（一次 remap 完成）"""
+    height, width = image.shape[:2]
+    map_x, map_y = get_twist_maps(height, width, twist_strength, bilinear)
+    interpolation = cv2.INTER_LINEAR if bilinear else cv2.INTER_NEAREST
+    return cv2.remap(image, map_x, map_y, interpolation, borderMode=cv2.BORDER_REPLICATE)
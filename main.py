@@ -5,7 +5,10 @@ from datetime import datetime
 import plotly.express as px
 import plotly.graph_objects as go
 import sqlite3
-import bcrypt
+import platform_auth
+import platform_bootstrap
+import platform_db
+import platform_migrations
 import time
 
 # 页面配置
@@ -17,203 +20,89 @@ st.set_page_config(
 )
 
 # 数据库核心功能
+@platform_bootstrap.once("首页")
 def init_db():
-    """初始化数据库，创建用户表和实验提交表"""
-    conn = sqlite3.connect('image_processing_platform.db')
-    c = conn.cursor()
-    # 创建用户表（包含角色字段）
-    c.execute(''' 
-        CREATE TABLE IF NOT EXISTS users ( 
-            id INTEGER PRIMARY KEY AUTOINCREMENT, 
-            username TEXT UNIQUE NOT NULL, 
-            password TEXT NOT NULL, 
-            role TEXT NOT NULL, 
-            create_time TEXT NOT NULL 
-        ) 
-    ''')
-    
-    # 创建实验提交表
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS experiment_submissions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_username TEXT NOT NULL,
-            experiment_number INTEGER NOT NULL,
-            experiment_title TEXT NOT NULL,
-            submission_content TEXT NOT NULL,
-            submission_time TEXT NOT NULL,
-            status TEXT DEFAULT 'pending',
-            teacher_feedback TEXT DEFAULT '',
-            score INTEGER DEFAULT 0,
-            resubmission_count INTEGER DEFAULT 0,
-            allow_view_score BOOLEAN DEFAULT TRUE,
-            FOREIGN KEY (student_username) REFERENCES users (username)
-        )
-    ''')
-    
-    # 创建思政感悟表
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS ideology_reflections (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_username TEXT NOT NULL,
-            reflection_content TEXT NOT NULL,
-            submission_time TEXT NOT NULL,
-            status TEXT DEFAULT 'pending',
-            teacher_feedback TEXT DEFAULT '',
-            score INTEGER DEFAULT 0,
-            word_count INTEGER DEFAULT 0,
-            allow_view_score BOOLEAN DEFAULT TRUE,
-            FOREIGN KEY (student_username) REFERENCES users (username)
-        )
-    ''')
-    
-    # 创建学习进度表
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS learning_progress (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL,
-            progress_type TEXT NOT NULL,
-            progress_value REAL DEFAULT 0,
-            update_time TEXT NOT NULL,
-            FOREIGN KEY (username) REFERENCES users (username)
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
-    
-    # 创建默认教师账号
-    create_default_teachers()
-
-def create_default_teachers():
-    """创建默认的教师账号"""
-    default_teachers = [
-        {"username": "yhh", "password": "23123yhh", "role": "teacher"},
-        {"username": "yhh1", "password": "23123yhh", "role": "teacher"},
-        {"username": "yhh2", "password": "23123yhh", "role": "teacher"},
-        {"username": "yhh3", "password": "23123yhh", "role": "teacher"},
-        {"username": "yhh4", "password": "23123yhh", "role": "teacher"}
-    ]
-    
-    conn = sqlite3.connect('image_processing_platform.db')
-    c = conn.cursor()
-    
-    for teacher in default_teachers:
-        try:
-            # 检查用户是否已存在
-            c.execute("SELECT id FROM users WHERE username = ?", (teacher["username"],))
-            if c.fetchone() is None:
-                # 密码哈希处理（加盐）
-                salt = bcrypt.gensalt()
-                hashed_password = bcrypt.hashpw(teacher["password"].encode('utf-8'), salt)
-                create_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                c.execute(
-                    "INSERT INTO users (username, password, role, create_time) VALUES (?, ?, ?, ?)", 
-                    (teacher["username"], hashed_password.decode('utf-8'), teacher["role"], create_time)
-                )
-                print(f"创建教师账号: {teacher['username']}")
-        except Exception as e:
-            print(f"创建教师账号 {teacher['username']} 失败: {str(e)}")
-    
-    conn.commit()
-    conn.close()
+    """初始化数据库（建表、索引与默认教师账号由 platform_migrations 统一管理，每个进程只执行一次）"""
+    platform_migrations.ensure_schema('image_processing_platform.db')
 
 def add_user(username, password, role):
     """添加新用户（密码哈希存储）"""
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
+        conn = platform_db.connect('image_processing_platform.db')
         c = conn.cursor()
-        # 密码哈希处理（加盐）
-        salt = bcrypt.gensalt()
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt)
+        # 密码哈希处理（加盐，在认证线程池中计算）
+        hashed_password = platform_auth.hash_password(password)
         create_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         c.execute(
             "INSERT INTO users (username, password, role, create_time) VALUES (?, ?, ?, ?)", 
-            (username, hashed_password.decode('utf-8'), role, create_time)
+            (username, hashed_password, role, create_time)
         )
         conn.commit()
         conn.close()
         return True, "注册成功！"
     except sqlite3.IntegrityError:
         return False, "用户名已存在！"
+    except platform_auth.AuthBusy as e:
+        return False, str(e)
     except Exception as e:
         return False, f"注册失败：{str(e)}"
 
 def verify_user(username, password):
-    """验证用户登录（匹配哈希密码）"""
+    """
+    验证用户登录（匹配哈希密码，在认证线程池中计算）
+
+    返回:
+    - (是否成功, 角色, 会话令牌)
+    """
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
-        c = conn.cursor()
-        c.execute("SELECT password, role FROM users WHERE username = ?", (username,))
-        result = c.fetchone()
-        conn.close()
-        if result:
-            hashed_password, role = result
-            # 验证密码
-            if bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8')):
-                return True, role  # 登录成功，返回角色
-        return False, None  # 用户名或密码错误
+        return platform_auth.login(username, password, 'image_processing_platform.db')
+    except platform_auth.AuthBusy as e:
+        st.warning(f"⏳ {str(e)}")
+        return False, None, None
     except Exception as e:
         st.error(f"登录验证失败：{str(e)}")
-        return False, None
+        return False, None, None
 
 def change_password(username, old_password, new_password):
     """修改用户密码"""
     try:
-        # 首先验证旧密码
-        success, role = verify_user(username, old_password)
-        if not success:
-            return False, "旧密码错误"
-        
-        # 更新为新密码
-        conn = sqlite3.connect('image_processing_platform.db')
-        c = conn.cursor()
-        
-        # 对新密码进行哈希处理
-        salt = bcrypt.gensalt()
-        hashed_new_password = bcrypt.hashpw(new_password.encode('utf-8'), salt)
-        
-        # 更新密码
-        c.execute(
-            "UPDATE users SET password = ? WHERE username = ?",
-            (hashed_new_password.decode('utf-8'), username)
-        )
-        
-        conn.commit()
-        conn.close()
-        return True, "密码修改成功！"
+        return platform_auth.change_password(username, old_password, new_password, 'image_processing_platform.db')
+    except platform_auth.AuthBusy as e:
+        return False, str(e)
     except Exception as e:
         return False, f"修改密码失败：{str(e)}"
 
-def get_user_stats():
-    """获取用户统计数据"""
+# 首页统计缓存有效期（秒）；相关表有写入时立即失效
+STATS_CACHE_TTL = 30
+
+@platform_db.cached_query(ttl=STATS_CACHE_TTL, tables=("users", "experiment_submissions", "ideology_reflections"))
+def query_user_stats():
+    """一次查询得到平台统计数据"""
+    conn = platform_db.connect('image_processing_platform.db')
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
         c = conn.cursor()
-        
-        # 获取总用户数
-        c.execute("SELECT COUNT(*) FROM users")
-        total_users = c.fetchone()[0]
-        
-        # 获取学生数
-        c.execute("SELECT COUNT(*) FROM users WHERE role = 'student'")
-        student_count = c.fetchone()[0]
-        
-        # 获取实验提交总数
-        c.execute("SELECT COUNT(*) FROM experiment_submissions")
-        experiment_count = c.fetchone()[0]
-        
-        # 获取思政感悟总数
-        c.execute("SELECT COUNT(*) FROM ideology_reflections")
-        reflection_count = c.fetchone()[0]
-        
+        c.execute("""
+            SELECT COUNT(*),
+                   COALESCE(SUM(role = 'student'), 0),
+                   (SELECT COUNT(*) FROM experiment_submissions),
+                   (SELECT COUNT(*) FROM ideology_reflections)
+            FROM users
+        """)
+        total_users, student_count, experiment_count, reflection_count = c.fetchone()
+    finally:
         conn.close()
-        
-        return {
-            'total_users': total_users,
-            'student_count': student_count,
-            'experiment_count': experiment_count,
-            'reflection_count': reflection_count
-        }
+    
+    return {
+        'total_users': total_users,
+        'student_count': student_count,
+        'experiment_count': experiment_count,
+        'reflection_count': reflection_count
+    }
+
+def get_user_stats():
+    """获取用户统计数据"""
+    try:
+        return query_user_stats()
     except Exception as e:
         print(f"获取统计数据失败: {str(e)}")
         return {'total_users': 0, 'student_count': 0, 'experiment_count': 0, 'reflection_count': 0}
@@ -988,6 +877,14 @@ def render_sidebar():
         st.text("状态: 🟢 正常运行")
         st.text("版本: v2.1.0")
         
+        # 数据库查询统计（全进程共享的连接池）
+        db_queries = platform_db.query_stats.summary()
+        st.text(f"数据库查询: {db_queries['count']} 次 · 平均 {db_queries['avg'] * 1000:.1f}ms")
+        bootstrap_stats = platform_bootstrap.get_bootstrap_metrics()
+        st.text(f"初始化: 冷启动 {bootstrap_stats['cold_ms']}ms · 重跑 {bootstrap_stats['rerun_avg_us']}µs")
+        auth_stats = platform_auth.get_auth_metrics()
+        st.text(f"登录: {auth_stats['logins']} 次 · p50 {auth_stats['p50_ms']}ms · p99 {auth_stats['p99_ms']}ms")
+        
         # 新增：用户进度
         st.markdown("---")
         st.markdown("**📈 学习进度**")
@@ -1072,6 +969,7 @@ def render_user_area():
                     st.session_state.logged_in = False
                     st.session_state.username = ""
                     st.session_state.role = ""
+                    st.session_state.auth_token = None
                     st.session_state.show_login = False
                     st.session_state.show_change_password = False
                     st.rerun()
@@ -1152,6 +1050,9 @@ def render_change_password_dialog():
                         )
                         
                         if success:
+                            # 修改密码后旧令牌失效，为当前会话重新签发
+                            st.session_state.auth_token = platform_auth.issue_token(
+                                st.session_state.username, st.session_state.role)
                             st.success(f"✅ {message}")
                             st.balloons()
                             # 等待2秒后关闭对话框
@@ -1207,11 +1108,13 @@ def render_login_dialog():
                     
                     if login_submitted:
                         if login_username and login_password:
-                            success, role = verify_user(login_username, login_password)
+                            success, role, token = verify_user(login_username, login_password)
                             if success:
                                 st.session_state.logged_in = True
                                 st.session_state.username = login_username
                                 st.session_state.role = role
+                                # 页面重跑时校验令牌签名即可确认身份，不再查询 users 表
+                                st.session_state.auth_token = token
                                 st.session_state.show_login = False
                                 st.success("🎉 登录成功！")
                                 st.rerun()
@@ -1258,6 +1161,8 @@ def render_login_dialog():
                                     st.session_state.logged_in = True
                                     st.session_state.username = register_username
                                     st.session_state.role = selected_role
+                                    st.session_state.auth_token = platform_auth.issue_token(register_username,
+                                                                                            selected_role)
                                     st.session_state.show_login = False
                                     st.rerun()
                                 else:
@@ -1269,31 +1174,39 @@ def render_login_dialog():
             
             st.markdown("</div>", unsafe_allow_html=True)
 
-def get_experiment_stats():
-    """获取实验作业统计数据（仅教师端使用）"""
+# 提交情况统计：一次扫描内按状态条件聚合
+SUBMISSION_STATS_SQL = """
+    SELECT COUNT(*),
+           COALESCE(SUM(status = 'pending'), 0),
+           COALESCE(SUM(status = 'graded'), 0),
+           AVG(CASE WHEN score > 0 THEN score END)
+    FROM experiment_submissions
+"""
+
+@platform_db.cached_query(ttl=STATS_CACHE_TTL, tables=("experiment_submissions",))
+def query_submission_stats(username=None):
+    """
+    一次查询得到提交总数、待批改数、已批改数与平均分
+
+    参数:
+    - username: 指定学生时只统计该学生的提交（走 student_username 索引）
+    """
+    conn = platform_db.connect('image_processing_platform.db')
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
         c = conn.cursor()
-        
-        # 获取总提交数
-        c.execute("SELECT COUNT(*) FROM experiment_submissions")
-        total_submissions = c.fetchone()[0]
-        
-        # 获取待批改数（status为'pending'）
-        c.execute("SELECT COUNT(*) FROM experiment_submissions WHERE status = 'pending'")
-        pending_count = c.fetchone()[0]
-        
-        # 获取已评分数（status为'graded'）
-        c.execute("SELECT COUNT(*) FROM experiment_submissions WHERE status = 'graded'")
-        graded_count = c.fetchone()[0]
-        
-        # 获取平均分
-        c.execute("SELECT AVG(score) FROM experiment_submissions WHERE score > 0")
-        avg_score_result = c.fetchone()[0]
-        avg_score = round(avg_score_result, 1) if avg_score_result else 0
-        
+        if username is None:
+            c.execute(SUBMISSION_STATS_SQL)
+        else:
+            c.execute(SUBMISSION_STATS_SQL + " WHERE student_username = ?", (username,))
+        total, pending, graded, avg_score = c.fetchone()
+    finally:
         conn.close()
-        
+    return total, pending, graded, round(avg_score, 1) if avg_score else 0
+
+def get_experiment_stats():
+    """获取实验作业统计数据（仅教师端使用）"""
+    try:
+        total_submissions, pending_count, graded_count, avg_score = query_submission_stats()
         return {
             'total_submissions': total_submissions,
             'pending_count': pending_count,
@@ -1312,28 +1225,7 @@ def get_experiment_stats():
 def get_submission_by_username(username):
     """获取指定用户的提交情况"""
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
-        c = conn.cursor()
-        
-        # 获取用户提交总数
-        c.execute("SELECT COUNT(*) FROM experiment_submissions WHERE student_username = ?", (username,))
-        user_total = c.fetchone()[0]
-        
-        # 获取用户已评分数
-        c.execute("SELECT COUNT(*) FROM experiment_submissions WHERE student_username = ? AND status = 'graded'", (username,))
-        user_graded = c.fetchone()[0]
-        
-        # 获取用户待批改数
-        c.execute("SELECT COUNT(*) FROM experiment_submissions WHERE student_username = ? AND status = 'pending'", (username,))
-        user_pending = c.fetchone()[0]
-        
-        # 获取用户平均分
-        c.execute("SELECT AVG(score) FROM experiment_submissions WHERE student_username = ? AND score > 0", (username,))
-        avg_score_result = c.fetchone()[0]
-        user_avg_score = round(avg_score_result, 1) if avg_score_result else 0
-        
-        conn.close()
-        
+        user_total, user_pending, user_graded, user_avg_score = query_submission_stats(username)
         return {
             'user_total': user_total,
             'user_graded': user_graded,
@@ -1364,6 +1256,14 @@ def main():
     if 'show_change_password' not in st.session_state:
         st.session_state.show_change_password = False
     
+    # 会话令牌过期或无效时退出登录（未签发令牌的旧会话不受影响）
+    if st.session_state.logged_in and st.session_state.get('auth_token') and \
+            platform_auth.session_identity(st.session_state) is None:
+        st.session_state.logged_in = False
+        st.session_state.username = ""
+        st.session_state.role = ""
+        st.session_state.auth_token = None
+    
     # 应用现代化CSS
     apply_modern_css()
     
@@ -5,8 +5,13 @@ from PIL import Image
 import io
 from datetime import datetime
 import sqlite3
+import platform_blobs
+import platform_bootstrap
+import platform_db
+import platform_migrations
+import platform_review
+import platform_zip
 import os
-import zipfile
 import tempfile
 import shutil
 import base64
@@ -17,6 +22,33 @@ from scipy import ndimage
 from scipy.signal import convolve2d
 import matplotlib.pyplot as plt
 import warnings
+from streamlit.errors import StreamlitAPIException
+from lab_result_cache import result_cache
+from lab_image_store import get_image_store
+from lab_pipeline import Pipeline, PipelineStep, get_operation, list_operations
+from lab_preview import (PREVIEW_DEFAULT_MAX_EDGE, PREVIEW_MIN_EDGE, PREVIEW_MAX_EDGE,
+                         run_preview, result_key, to_rgb)
+from lab_operations import (
+    set_error_handler,
+    # 图像增强 / 边缘检测 / 线性变换
+    apply_histogram_equalization, apply_contrast_adjustment, apply_gamma_correction, apply_clahe,
+    apply_canny_edge, apply_sobel_edge, apply_affine_transform,
+    # 图像锐化 / 采样与量化
+    apply_sharpen_filter, apply_unsharp_masking, apply_laplacian_sharpening,
+    apply_high_boost_filter, apply_adaptive_sharpen, apply_sampling, apply_quantization,
+    # 彩色图像分割 / 颜色通道
+    apply_rgb_segmentation, apply_hsv_segmentation, split_channels, adjust_channel,
+    # 特效处理 / 图像绘画
+    add_rain_effect, add_snow_effect, apply_sakura_effect, add_starry_night_effect,
+    apply_oil_painting_effect, apply_pencil_sketch_effect, apply_ink_wash_painting_effect,
+    apply_comic_effect, apply_watercolor_effect, apply_pop_art_effect,
+    # 风格迁移 / 老照片上色 / 数字形态学
+    apply_van_gogh_style, apply_starry_sky_style, apply_monet_style, apply_picasso_cubist_style,
+    apply_anime_style, build_smart_colorize_lut, colorize_old_photo,
+    apply_erosion, apply_dilation, apply_opening, apply_closing,
+    # 处理流水线
+    apply_pipeline,
+)
 warnings.filterwarnings('ignore')
 
 st.set_page_config(
@@ -655,10 +687,8 @@ section[data-testid="stSidebar"] {
 </style>
 """, unsafe_allow_html=True)
 
-# 创建上传文件存储目录
+# 上传文件存储目录（在 init_experiment_db 中创建）
 UPLOAD_DIR = "experiment_submissions"
-if not os.path.exists(UPLOAD_DIR):
-    os.makedirs(UPLOAD_DIR)
 
 def get_beijing_time():
     """获取北京时间"""
@@ -673,69 +703,18 @@ def get_beijing_time():
     return beijing_time.strftime('%Y-%m-%d %H:%M:%S')
 
 # 数据库函数 - 完整版
+@platform_bootstrap.once("图像处理实验室")
 def init_experiment_db():
-    """初始化实验提交数据库"""
-    conn = sqlite3.connect('image_processing_platform.db')
-    c = conn.cursor()
-    
-    # 检查表是否存在
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='experiment_submissions'")
-    table_exists = c.fetchone()
-    
-    if table_exists:
-        # 表已存在，检查所有必需的列
-        c.execute("PRAGMA table_info(experiment_submissions)")
-        columns = [column[1] for column in c.fetchall()]
-        
-        required_columns = {
-            'can_view_score': 'BOOLEAN DEFAULT 0',
-            'file_names': 'TEXT DEFAULT ""',
-            'resubmission_count': 'INTEGER DEFAULT 0'
-        }
-        
-        for col_name, col_type in required_columns.items():
-            if col_name not in columns:
-                try:
-                    c.execute(f'ALTER TABLE experiment_submissions ADD COLUMN {col_name} {col_type}')
-                except:
-                    pass
-    else:
-        # 创建新表
-        c.execute('''
-            CREATE TABLE experiment_submissions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                student_username TEXT NOT NULL,
-                experiment_number INTEGER NOT NULL,
-                experiment_title TEXT NOT NULL,
-                submission_content TEXT NOT NULL,
-                submission_time TEXT NOT NULL,
-                status TEXT DEFAULT 'pending',
-                teacher_feedback TEXT DEFAULT '',
-                score INTEGER DEFAULT 0,
-                can_view_score BOOLEAN DEFAULT 0,
-                resubmission_count INTEGER DEFAULT 0,
-                file_names TEXT DEFAULT ''
-            )
-        ''')
-    
-    conn.commit()
-    conn.close()
-
-def save_uploaded_files(uploaded_files, submission_id, student_username):
-    """保存上传的文件"""
-    saved_files = []
-    if uploaded_files:
-        submission_dir = os.path.join(UPLOAD_DIR, f"{student_username}_{submission_id}")
-        if not os.path.exists(submission_dir):
-            os.makedirs(submission_dir)
-        
-        for uploaded_file in uploaded_files:
-            file_path = os.path.join(submission_dir, uploaded_file.name)
-            with open(file_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            saved_files.append(uploaded_file.name)
-    
-    return saved_files
+    """初始化实验提交数据库与上传目录（表结构由 platform_migrations 统一管理，每个进程只执行一次）"""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    platform_migrations.ensure_schema('image_processing_platform.db')
+
+def save_uploaded_files(uploaded_files, submission_id, student_username, c):
+    """保存上传的文件（内容去重存储，文件记录随调用方的事务提交）"""
+    submission_dir = os.path.join(UPLOAD_DIR, f"{student_username}_{submission_id}")
+    saved = platform_blobs.save_uploads(c, uploaded_files, submission_dir,
+                                        f"experiment:{student_username}_{submission_id}")
+    return [filename for filename, _ in saved]
 
 def get_submission_files(submission_id, student_username):
     """获取提交的文件列表"""
@@ -749,22 +728,16 @@ def get_file_path(submission_id, student_username, filename):
     return os.path.join(UPLOAD_DIR, f"{student_username}_{submission_id}", filename)
 
 def create_zip_file(submission_id, student_username):
-    """创建包含所有提交文件的ZIP包"""
+    """打包提交的所有文件（流式打包，返回 ZIP 数据，不在提交目录旁生成 .zip 文件）"""
     submission_dir = os.path.join(UPLOAD_DIR, f"{student_username}_{submission_id}")
     if os.path.exists(submission_dir):
-        zip_path = os.path.join(UPLOAD_DIR, f"{student_username}_{submission_id}.zip")
-        with zipfile.ZipFile(zip_path, 'w') as zipf:
-            for root, dirs, files in os.walk(submission_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    zipf.write(file_path, os.path.relpath(file_path, submission_dir))
-        return zip_path
+        return platform_zip.zip_bytes(platform_zip.directory_entries(submission_dir))
     return None
 
 def submit_experiment(student_username, experiment_number, experiment_title, submission_content, uploaded_files):
     """提交实验"""
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
+        conn = platform_db.connect('image_processing_platform.db')
         c = conn.cursor()
         submission_time = get_beijing_time()  # 使用北京时间
         
@@ -778,7 +751,7 @@ def submit_experiment(student_username, experiment_number, experiment_title, sub
         submission_id = c.lastrowid
         
         # 保存上传的文件
-        saved_files = save_uploaded_files(uploaded_files, submission_id, student_username)
+        saved_files = save_uploaded_files(uploaded_files, submission_id, student_username, c)
         
         # 更新文件名字段
         c.execute('''
@@ -800,7 +773,7 @@ def submit_experiment(student_username, experiment_number, experiment_title, sub
 def get_student_experiments(student_username):
     """获取学生的实验提交记录"""
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
+        conn = platform_db.connect('image_processing_platform.db')
         c = conn.cursor()
         c.execute('''
             SELECT * FROM experiment_submissions 
@@ -814,28 +787,30 @@ def get_student_experiments(student_username):
         st.error(f"获取学生实验记录失败: {str(e)}")
         return []
 
-def get_all_experiments():
-    """获取所有学生的实验提交（教师端使用）"""
+def get_all_experiments(filters=None, after=None):
+    """
+    按页获取学生的实验提交（教师端使用）
+
+    参数:
+    - filters: 筛选条件（status、class_code、date_from/date_to、experiment_number 等，见 platform_review）
+    - after: 上一页返回的游标（None 为第一页）
+
+    返回:
+    - (当前页的提交, 下一页游标)；最新提交在前
+    """
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
-        c = conn.cursor()
-        c.execute('''
-            SELECT es.*, u.role 
-            FROM experiment_submissions es
-            JOIN users u ON es.student_username = u.username
-            ORDER BY es.submission_time DESC
-        ''')
-        results = c.fetchall()
+        conn = platform_db.connect('image_processing_platform.db')
+        page = platform_review.fetch_page(conn.cursor(), "experiments", filters, after)
         conn.close()
-        return results
+        return page.rows, page.next_key
     except Exception as e:
         st.error(f"获取所有实验记录失败: {str(e)}")
-        return []
+        return [], None
 
 def update_experiment_score(submission_id, score, feedback, can_view_score, status):
     """更新实验评分和反馈"""
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
+        conn = platform_db.connect('image_processing_platform.db')
         c = conn.cursor()
         c.execute('''
             UPDATE experiment_submissions 
@@ -852,20 +827,21 @@ def update_experiment_score(submission_id, score, feedback, can_view_score, stat
 def withdraw_experiment(submission_id, student_username):
     """撤回实验提交"""
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
+        conn = platform_db.connect('image_processing_platform.db')
         c = conn.cursor()
         c.execute('''
             DELETE FROM experiment_submissions 
             WHERE id = ? AND student_username = ? AND status = 'pending'
         ''', (submission_id, student_username))
         
-        # 删除对应的文件
-        submission_dir = os.path.join(UPLOAD_DIR, f"{student_username}_{submission_id}")
-        if os.path.exists(submission_dir):
-            shutil.rmtree(submission_dir)
+        # 删除对应的文件（只有确实撤回了提交时才删除）
+        if c.rowcount:
+            submission_dir = os.path.join(UPLOAD_DIR, f"{student_username}_{submission_id}")
+            platform_blobs.release_manifest(c, f"experiment:{student_username}_{submission_id}", submission_dir)
         
         conn.commit()
         conn.close()
+        platform_blobs.schedule_gc('image_processing_platform.db')
         return True, "实验提交已撤回！"
     except Exception as e:
         return False, "撤回失败：只能撤回待批改状态的提交"
@@ -909,1581 +885,157 @@ def get_experiment_description(number):
 # 初始化数据库
 init_experiment_db()
 
-# ======================= 图像处理函数 =======================
+# 图像处理函数中的错误提示显示在页面上
+set_error_handler(st.error)
 
-# 1. 图像增强函数
-def apply_histogram_equalization(image):
-    """直方图均衡化"""
-    if len(image.shape) == 3:
-        img_yuv = cv2.cvtColor(image, cv2.COLOR_BGR2YUV)
-        img_yuv[:,:,0] = cv2.equalizeHist(img_yuv[:,:,0])
-        output = cv2.cvtColor(img_yuv, cv2.COLOR_YUV2BGR)
+def encode_image(image, image_format="JPEG", quality=95):
+    """把RGB或灰度图像编码为JPEG/PNG字节（JPEG统一按RGB保存）"""
+    buffered = io.BytesIO()
+    pil_image = Image.fromarray(image)
+    if image_format == "JPEG":
+        pil_image.convert("RGB").save(buffered, format="JPEG", quality=quality)
     else:
-        output = cv2.equalizeHist(image)
-    return output
-
-def apply_contrast_adjustment(image, alpha, beta):
-    """对比度调整"""
-    output = cv2.convertScaleAbs(image, alpha=alpha, beta=beta)
-    return output
-
-def apply_gamma_correction(image, gamma):
-    """伽马校正"""
-    if gamma <= 0:
-        # 可以返回原图或设置默认值
-        gamma = 0.1  # 或 return image.copy()
-    
-    inv_gamma = 1.0 / gamma
-    table = np.array([((i / 255.0) ** inv_gamma) * 255 for i in np.arange(0, 256)]).astype("uint8")
-    return cv2.LUT(image, table)
-
-def apply_clahe(image, clip_limit=2.0, tile_grid_size=(8,8)):
-    """限制对比度自适应直方图均衡化"""
-    if len(image.shape) == 3:
-        lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
-        l, a, b = cv2.split(lab)
-        clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=tile_grid_size)
-        l = clahe.apply(l)
-        lab = cv2.merge([l, a, b])
-        output = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
-    else:
-        clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=tile_grid_size)
-        output = clahe.apply(image)
-    return output
-
-# 2. 边缘检测函数
-def apply_canny_edge(image, threshold1=50, threshold2=150):
-    """Canny边缘检测"""
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image.copy()
-    edges = cv2.Canny(gray, threshold1, threshold2)
-    return cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
-
-def apply_sobel_edge(image, ksize=3):
-    """Sobel边缘检测"""
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image.copy()
-    
-    sobelx = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=ksize)
-    sobely = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=ksize)
-    
-    # 使用cv2.magnitude计算梯度幅值（更高效）
-    magnitude = cv2.magnitude(sobelx, sobely)
-    
-    # 转换为8位无符号整数（自动取绝对值）
-    magnitude = cv2.convertScaleAbs(magnitude)
-    
-    return cv2.cvtColor(magnitude, cv2.COLOR_GRAY2BGR)
-
-def apply_laplacian_edge(image):
-    """Laplacian边缘检测"""
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image.copy()
-    
-    # 计算Laplacian（可能产生负值）
-    laplacian = cv2.Laplacian(gray, cv2.CV_64F)
-    
-    # 取绝对值并转换为8位
-    laplacian_abs = cv2.convertScaleAbs(laplacian)
-    
-    return cv2.cvtColor(laplacian_abs, cv2.COLOR_GRAY2BGR)
-
-# 3. 线性变换函数
-def apply_affine_transform(image, angle=0, scale=1.0, tx=0, ty=0):
-    """仿射变换"""
-    height, width = image.shape[:2]
-    center = (width // 2, height // 2)
-    matrix = cv2.getRotationMatrix2D(center, angle, scale)
-    matrix[0, 2] += tx
-    matrix[1, 2] += ty
-    return cv2.warpAffine(image, matrix, (width, height))
-
-def apply_perspective_transform(image, perspective_strength=0.1):
-    """透视变换"""
-    height, width = image.shape[:2]
-    
-    src_points = np.float32([[0, 0], [width, 0], [0, height], [width, height]])
-    
-    # 根据strength参数控制透视强度
-    offset_x = int(width * perspective_strength)
-    offset_y = int(height * perspective_strength)
-    
-    dst_points = np.float32([
-        [offset_x, offset_y],
-        [width - offset_x, offset_y],
-        [offset_x, height - offset_y],
-        [width - offset_x, height - offset_y]
-    ])
-    
-    matrix = cv2.getPerspectiveTransform(src_points, dst_points)
-    return cv2.warpPerspective(image, matrix, (width, height))
-
-# 4. 图像锐化函数
-def apply_sharpen_filter(image, kernel_size=3):
-    """
-    应用锐化滤波器
-    kernel_size: 滤波器大小，必须是奇数
-    """
-    # 确保kernel_size是奇数
-    if kernel_size % 2 == 0:
-        kernel_size += 1
-    
-    # 创建锐化核
-    kernel_sharpen = np.zeros((kernel_size, kernel_size), dtype=np.float32)
-    center = kernel_size // 2
-    
-    # 中心为正值，周围为负值
-    for i in range(kernel_size):
-        for j in range(kernel_size):
-            if i == center and j == center:
-                kernel_sharpen[i, j] = kernel_size * kernel_size
-            else:
-                kernel_sharpen[i, j] = -1
-    
-    # 应用滤波器
-    sharpened = cv2.filter2D(image, -1, kernel_sharpen)
-    
-    # 可选：归一化结果
-    sharpened = np.clip(sharpened, 0, 255).astype(np.uint8)
-    
-    return sharpened
+        pil_image.save(buffered, format=image_format)
+    return buffered.getvalue()
 
-def apply_unsharp_masking(image, sigma=1.0, amount=1.0):
-    """
-    应用非锐化掩蔽
-    sigma: 高斯模糊的标准差
-    amount: 锐化程度
-    """
-    # 高斯模糊
-    blurred = cv2.GaussianBlur(image, (0, 0), sigma)
-    
-    # 计算原始与模糊的差异
-    detail = cv2.subtract(image, blurred)
-    
-    # 增强细节并加回原图
-    sharpened = cv2.addWeighted(image, 1.0, detail, amount, 0)
-    
-    # 确保结果在0-255范围内
-    sharpened = np.clip(sharpened, 0, 255).astype(np.uint8)
-    
-    return sharpened
-
-def apply_laplacian_sharpening(image):
-    """
-    拉普拉斯锐化
-    """
-    # 转换为灰度
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image.copy()
-    
-    # 拉普拉斯算子
-    laplacian = cv2.Laplacian(gray, cv2.CV_64F)
-    
-    # 转换为8位并增强
-    laplacian = cv2.convertScaleAbs(laplacian)
-    
-    # 加回原图
-    if len(image.shape) == 3:
-        # 彩色图像
-        result = image.copy().astype(np.float32)
-        for i in range(3):
-            result[:, :, i] = np.clip(result[:, :, i] + laplacian, 0, 255)
-        result = result.astype(np.uint8)
-    else:
-        # 灰度图像
-        result = cv2.addWeighted(gray, 1.0, laplacian, 0.5, 0)
-    
-    return result
+def encode_jpeg(image_rgb):
+    """把RGB图像编码为JPEG字节"""
+    return encode_image(image_rgb)
 
-def apply_high_boost_filter(image, A=1.5):
-    """
-    高频提升滤波
-    A: 增强系数，通常>1
+def find_preview_recipe(image, source=None):
     """
-    # 低通滤波（模糊）
-    low_pass = cv2.GaussianBlur(image, (5, 5), 1.0)
-    
-    # 高频分量 = 原图 - 低通
-    high_freq = cv2.subtract(image, low_pass)
-    
-    # 高频提升 = 原图 + (A-1) * 高频分量
-    result = cv2.addWeighted(image, 1.0, high_freq, A-1, 0)
+    查找预览结果对应的全分辨率配方（不是预览结果时返回 None）
     
-    # 确保结果在有效范围内
-    result = np.clip(result, 0, 255).astype(np.uint8)
-    
-    return result
-
-def apply_adaptive_sharpen(image, strength=0.5):
-    """
-    自适应锐化，基于边缘检测
-    strength: 锐化强度 (0-1)
+    source 为 render_operation 的返回值（BGR或灰度），显示图像经过额外转换（如转灰度）时
+    用它查找；否则按显示的图像（RGB或灰度）查找。
     """
-    # 边缘检测
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if source is not None:
+        lookup = to_rgb(source)
+    elif image.ndim == 2:
+        lookup = to_rgb(image)
     else:
-        gray = image.copy()
-    
-    edges = cv2.Canny(gray, 50, 150)
-    
-    # 创建边缘遮罩
-    edges_mask = edges.astype(np.float32) / 255.0
-    
-    # 应用锐化（仅在有边缘的区域）
-    sharpened = apply_unsharp_masking(image, sigma=1.0, amount=strength*3)
-    
-    # 混合：边缘区域用锐化，其他区域用原图
-    if len(image.shape) == 3:
-        edges_mask = cv2.cvtColor(edges_mask, cv2.COLOR_GRAY2BGR)
-    
-    result = image * (1 - edges_mask) + sharpened * edges_mask
-    result = np.clip(result, 0, 255).astype(np.uint8)
-    
-    return result
-
-# 5. 采样与量化函数
-def apply_sampling(image, ratio=2):
-    """图像采样"""
-    height, width = image.shape[:2]
-    new_height = max(1, height // ratio)  # 防止除0
-    new_width = max(1, width // ratio)
-    return cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
-
-def apply_quantization(image, levels=16):
-    """图像量化"""
-    # 确保levels合理
-    levels = max(2, min(256, levels))
-    
-    step = 256 / levels  # 使用浮点数除法
-    
-    if len(image.shape) == 3:
-        quantized = image.copy().astype(np.float32)
-        for i in range(3):
-            quantized[:,:,i] = np.round(quantized[:,:,i] / step) * step
-    else:
-        quantized = np.round(image.astype(np.float32) / step) * step
-    
-    return np.clip(quantized, 0, 255).astype(np.uint8)
-
-# 6. 彩色图像分割函数
-def apply_rgb_segmentation(image, lower_color, upper_color):
-    """RGB颜色分割"""
-    if len(lower_color) != 3 or len(upper_color) != 3:
-        raise ValueError("颜色范围必须是3个值的元组/列表 (B, G, R)")
-    
-    mask = cv2.inRange(image, lower_color, upper_color)
-    result = cv2.bitwise_and(image, image, mask=mask)
-    return result
-
-def apply_hsv_segmentation(image, lower_hsv, upper_hsv):
-    """HSV颜色分割"""
-    if len(lower_hsv) != 3 or len(upper_hsv) != 3:
-        raise ValueError("HSV范围必须是3个值的元组/列表 (H, S, V)")
-    
-    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-    mask = cv2.inRange(hsv, lower_hsv, upper_hsv)
-    result = cv2.bitwise_and(image, image, mask=mask)
-    return result
-
-# 7. 颜色通道分析与处理
-def split_channels(image):
-    """分离RGB通道"""
-    if len(image.shape) != 3:
-        # 灰度图像处理
-        return [image.copy(), image.copy(), image.copy()]
-    
-    b, g, r = cv2.split(image)
-    zeros = np.zeros_like(b)
-    
-    red_channel = cv2.merge([zeros, zeros, r])
-    green_channel = cv2.merge([zeros, g, zeros])
-    blue_channel = cv2.merge([b, zeros, zeros])
-    
-    return [red_channel, green_channel, blue_channel]
-
-def adjust_channel(image, channel_index, value):
-    """调整特定通道"""
-    adjusted = image.copy()
-    
-    # 确保channel_index有效
-    if channel_index < 0 or channel_index >= adjusted.shape[2]:
-        return adjusted
-    
-    # 使用cv2.add确保不溢出
-    adjusted[:,:,channel_index] = cv2.add(adjusted[:,:,channel_index], value)
-    
-    # 裁剪到有效范围
-    adjusted = np.clip(adjusted, 0, 255).astype(np.uint8)
-    
-    return adjusted
-
-def create_channel_histogram(image):
-    """创建通道直方图"""
-    if len(image.shape) == 3:
-        # 彩色图像
-        histograms = []
-        for i in range(3):
-            hist = cv2.calcHist([image], [i], None, [256], [0, 256])
-            # 归一化以便比较
-            hist = cv2.normalize(hist, hist, 0, 1, cv2.NORM_MINMAX)
-            histograms.append(hist.flatten())
-        return histograms
-    else:
-        # 灰度图像
-        hist = cv2.calcHist([image], [0], None, [256], [0, 256])
-        hist = cv2.normalize(hist, hist, 0, 1, cv2.NORM_MINMAX)
-        return [hist.flatten()]
-
-# 8. 特效处理函数
-def add_rain_effect(image, intensity=100, opacity=0.5):
-    """添加雨滴特效"""
-    rain_layer = np.zeros_like(image, dtype=np.uint8)
-    height, width = image.shape[:2]
-    
-    for _ in range(intensity * 5):  # 增加数量
-        x = random.randint(0, width-1)
-        y = random.randint(0, height-1)
-        length = random.randint(15, 40)
-        thickness = random.randint(1, 3)
-        color = random.randint(180, 240)
-        
-        for i in range(length):
-            if y+i < height and x+i//3 < width:
-                cv2.line(rain_layer, (x+i//3, y+i), (x+i//3+thickness, y+i), 
-                        (color, color, color), thickness)
-    
-    # 高斯模糊
-    rain_layer = cv2.GaussianBlur(rain_layer, (5, 5), 0)
-    
-    # 添加运动模糊（关键改进）
-    kernel_size = 7
-    kernel = np.zeros((kernel_size, kernel_size))
-    kernel[:, kernel_size//2] = 1.0 / kernel_size
-    rain_layer = cv2.filter2D(rain_layer, -1, kernel)
-    
-    result = cv2.addWeighted(image, 1-opacity, rain_layer, opacity, 0)
-    return result
-
-def add_snow_effect(image, intensity=200, opacity=0.3):
-    """添加雪花特效"""
-    snow_layer = np.zeros_like(image, dtype=np.uint8)
-    height, width = image.shape[:2]
-    
-    # 创建雪花（增加大小变化）
-    for _ in range(intensity * 3):  # 增加雪花数量
-        x = random.randint(0, width-1)
-        y = random.randint(0, height-1)
-        radius = random.randint(1, 5)  # 增加大小范围
-        brightness = random.randint(180, 255)  # 增加亮度范围
-    
-        cv2.circle(snow_layer, (x, y), radius, 
-                  (brightness, brightness, brightness), -1)
-    
-    # 应用轻微模糊
-    snow_layer = cv2.GaussianBlur(snow_layer, (5, 5), 0)
-    
-    # 添加垂直运动模糊（关键改进！）
-    kernel = np.array([[0, 0, 0],
-                       [1, 1, 1],
-                       [0, 0, 0]]) / 3.0
-    snow_layer = cv2.filter2D(snow_layer, -1, kernel)
-    
-    # 叠加雪花层
-    result = cv2.addWeighted(image, 1 - opacity, snow_layer, opacity, 0)
-    return result
-
-def apply_sakura_effect(image, sakura_intensity):
-    """添加樱花特效 - 新增"""
-    try:
-        if len(image.shape) == 2:
-            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
-        
-        height, width = image.shape[:2]
-        sakura_layer = np.zeros((height, width, 4), dtype=np.uint8)  # RGBA
-        
-        # 樱花数量
-        num_sakura = int(sakura_intensity * width * height / 800)
-        
-        for _ in range(num_sakura):
-            # 随机位置
-            x = np.random.randint(0, width)
-            y = np.random.randint(0, height)
-            
-            # 樱花大小
-            size = np.random.randint(3, 8)
-            
-            # 樱花颜色（粉色系）
-            pink_color = [
-                np.random.randint(230, 255),  # R
-                np.random.randint(180, 220),  # G
-                np.random.randint(200, 240),  # B
-                np.random.randint(150, 220)   # A
-            ]
-            
-            # 绘制樱花（多个花瓣）
-            for angle in range(0, 360, 72):
-                rad = np.radians(angle)
-                px = int(x + size * np.cos(rad))
-                py = int(y + size * np.sin(rad))
-                cv2.circle(sakura_layer, (px, py), size//2, pink_color, -1)
-            
-            # 花心
-            cv2.circle(sakura_layer, (x, y), size//3, [255, 255, 200, 200], -1)
-        
-        # 模糊樱花层增加柔和感
-        sakura_layer = cv2.GaussianBlur(sakura_layer, (3, 3), 0)
-        
-        # 分离RGBA通道
-        sakura_rgb = sakura_layer[:, :, :3]
-        sakura_alpha = sakura_layer[:, :, 3] / 255.0
-        
-        # 与原始图像混合
-        result = image.copy().astype(np.float32)
-        for c in range(3):
-            result[:, :, c] = result[:, :, c] * (1 - sakura_alpha) + sakura_rgb[:, :, c] * sakura_alpha
-        
-        return result.astype(np.uint8)
-    except Exception as e:
-        st.error(f"樱花特效错误: {str(e)}")
-        return image
+        lookup = image
+    return st.session_state.get(PREVIEW_RECIPES_KEY, {}).get(result_key(lookup))
 
+def like_display(result, image):
+    """把全分辨率处理结果（BGR或灰度）转换为与显示图像相同的形式（RGB或灰度）"""
+    if image.ndim == 2:
+        return result if result.ndim == 2 else cv2.cvtColor(result, cv2.COLOR_BGR2GRAY)
+    return to_rgb(result)
 
-def add_starry_night_effect(image, stars=100):
-    """添加星空特效"""
-    result = image.copy()
-    height, width = image.shape[:2]
-    
-    # 添加不同大小的星星
-    for _ in range(stars * 3):  # 增加星星数量
-        x = random.randint(0, width-1)
-        y = random.randint(0, height-1)
-        
-        # 随机星星大小（1-4像素）
-        radius = random.randint(1, 4)
-        
-        # 星星颜色（不同温度）
-        color_choice = random.random()
-        if color_choice < 0.6:  # 60% 白色星星
-            brightness = random.randint(200, 255)
-            color = (brightness, brightness, brightness)
-        elif color_choice < 0.8:  # 20% 黄色星星
-            brightness = random.randint(180, 230)
-            color = (brightness, brightness, brightness // 2)
-        else:  # 20% 蓝色星星
-            brightness = random.randint(180, 220)
-            color = (brightness, brightness - 30, brightness)
-        
-        # 绘制星星
-        cv2.circle(result, (x, y), radius, color, -1)
-        
-        # 添加星光效果（更自然的形状）
-        if random.random() > 0.5:  # 50%的星星有光芒
-            # 四向光芒
-            for dx, dy in [(2,0), (-2,0), (0,2), (0,-2)]:
-                px = min(max(x + dx, 0), width-1)
-                py = min(max(y + dy, 0), height-1)
-                cv2.circle(result, (px, py), max(1, radius-1), color, -1)
-            
-            # 对角光芒
-            if random.random() > 0.5:
-                for dx, dy in [(2,2), (-2,2), (2,-2), (-2,-2)]:
-                    px = min(max(x + dx, 0), width-1)
-                    py = min(max(y + dy, 0), height-1)
-                    cv2.circle(result, (px, py), 1, color, -1)
-    
-    # 添加高斯模糊使星星更柔和
-    result = cv2.GaussianBlur(result, (3, 3), 0)
-    
-    # 添加一些特别亮的星星
-    for _ in range(stars // 5):
-        x = random.randint(0, width-1)
-        y = random.randint(0, height-1)
-        
-        # 绘制亮星
-        cv2.circle(result, (x, y), 2, (255, 255, 255), -1)
-        
-        # 添加光晕效果
-        for r in range(3, 6):
-            alpha = 0.5 * (1 - (r-3)/3)  # 光晕渐变
-            color_with_alpha = tuple(int(255 * alpha) for _ in range(3))
-            cv2.circle(result, (x, y), r, color_with_alpha, 1)
-    
-    return result
-
-# 9. 图像绘画处理函数
+IMAGE_MIME_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png"}
 
-def apply_oil_painting_effect(image, radius=3, intensity=30, enhance_color=True):
-    """油画效果"""
-    # 确保输入是uint8
-    if image.dtype != np.uint8:
-        image = image.astype(np.uint8)
-    
-    try:
-        oil_painting = cv2.xphoto.oilPainting(image, radius, intensity)
-    except:
-        # 如果xphoto不可用，使用替代方法
-        oil_painting = cv2.stylization(image, sigma_s=60, sigma_r=0.6)
-    
-    if enhance_color:
-        # 增强色彩饱和度
-        hsv = cv2.cvtColor(oil_painting, cv2.COLOR_BGR2HSV)
-        hsv = hsv.astype(np.float32)
-        hsv[:, :, 1] = np.clip(hsv[:, :, 1] * 1.2, 0, 255)
-        hsv = np.clip(hsv, 0, 255).astype(np.uint8)
-        oil_painting = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
-    
-    return oil_painting.astype(np.uint8)
-
-def apply_pencil_sketch_effect(image, style="elegant", intensity=1.0):
-    """素描效果"""
-    # 确保输入是uint8
-    if image.dtype != np.uint8:
-        image = image.astype(np.uint8)
-    
-    if style == "elegant":
-        # 优雅风格 - 使用颜色减淡算法
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        inverted = cv2.bitwise_not(gray)
-        blurred = cv2.GaussianBlur(inverted, (21, 21), 3)
-        
-        # 避免除零错误
-        denominator = 255 - blurred
-        denominator[denominator == 0] = 1
-        
-        sketch = cv2.divide(gray, denominator, scale=256)
-        sketch = cv2.convertScaleAbs(sketch, alpha=1.3 * intensity, beta=0)
-        
-        # 转换为彩色
-        sketch_color = cv2.cvtColor(sketch, cv2.COLOR_GRAY2BGR)
-        return sketch_color.astype(np.uint8)
-    
-    elif style == "artistic":
-        # 艺术风格
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # 使用Canny边缘检测和模糊混合
-        edges = cv2.Canny(gray, 50, 150)
-        blurred = cv2.GaussianBlur(gray, (5, 5), 2)
-        
-        # 混合边缘和模糊
-        sketch = cv2.addWeighted(blurred, 0.8, edges, 0.2, 0)
-        sketch = 255 - sketch  # 反相
-        
-        # 转换为彩色
-        sketch_color = cv2.cvtColor(sketch, cv2.COLOR_GRAY2BGR)
-        return sketch_color.astype(np.uint8)
-    
-    else:  # classic
-        # 使用OpenCV内置函数
-        try:
-            _, sketch = cv2.pencilSketch(image, sigma_s=120, sigma_r=0.1)
-            sketch = cv2.convertScaleAbs(sketch, alpha=1.4, beta=10)
-            sketch_color = cv2.cvtColor(sketch, cv2.COLOR_GRAY2BGR)
-            return sketch_color.astype(np.uint8)
-        except:
-            # 备用方案
-            return apply_pencil_sketch_effect(image, style="elegant", intensity=intensity)
-
-def apply_ink_wash_painting_effect(image, ink_strength=0.4, paper_texture=True):
-    """水墨画效果 - 简化版，避免复杂运算"""
-    # 确保输入是uint8
-    if image.dtype != np.uint8:
-        image = image.astype(np.uint8)
-    
-    try:
-        # 转换为灰度
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # 增强对比度
-        gray = cv2.equalizeHist(gray)
-        
-        # 双边滤波模拟水墨扩散
-        filtered = cv2.bilateralFilter(gray, 9, 150, 150)
-        
-        # 高斯模糊创建晕染效果
-        blurred = cv2.GaussianBlur(filtered, (15, 15), 5)
-        
-        # 边缘检测
-        edges = cv2.adaptiveThreshold(filtered, 255,
-                                     cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                     cv2.THRESH_BINARY_INV, 25, 10)
-        
-        # 转换为彩色
-        ink_color = cv2.cvtColor(blurred, cv2.COLOR_GRAY2BGR)
-        edges_color = cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
-        
-        # 降低饱和度（创建水墨感）
-        hsv = cv2.cvtColor(ink_color, cv2.COLOR_BGR2HSV)
-        hsv = hsv.astype(np.float32)
-        hsv[:, :, 1] = hsv[:, :, 1] * 0.3  # 大幅降低饱和度
-        hsv = np.clip(hsv, 0, 255).astype(np.uint8)
-        ink_color = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
-        
-        # 创建简单的边缘mask
-        edges_float = edges.astype(np.float32) / 255.0
-        
-        # 直接应用边缘（简化版，避免复杂的mask操作）
-        edges_expanded = np.stack([edges_float, edges_float, edges_float], axis=2)
-        
-        # 混合墨迹和边缘
-        result = ink_color * (1 - edges_expanded * ink_strength) + edges_color * edges_expanded * ink_strength * 0.3
-        
-        # 添加轻微模糊
-        result = cv2.GaussianBlur(result, (5, 5), 2)
-        
-        return np.clip(result, 0, 255).astype(np.uint8)
+def provide_download_button(image_rgb, filename, button_text, unique_key_suffix="",
+                            image_format="JPEG", quality=95, source=None, show_note=True):
+    """
+    提供下载按钮 - 用于RGB或灰度图像
     
-    except Exception as e:
-        # 如果出错，返回一个简单的灰度版本
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        result = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
-        return result.astype(np.uint8)
-
-def apply_comic_effect(image, edge_threshold=50, color_style="vibrant"):
-    """漫画效果 - 简化版"""
-    # 确保输入是uint8
-    if image.dtype != np.uint8:
-        image = image.astype(np.uint8)
+    如果图像是预览模式下的代理结果，下载时按原图全分辨率重新渲染。
     
+    Args:
+        image_rgb: RGB格式（或灰度）的图像数组
+        filename: 下载文件名
+        button_text: 按钮文本
+        unique_key_suffix: 唯一key后缀，防止重复ID
+        image_format: "JPEG" 或 "PNG"
+        quality: JPEG质量
+        source: render_operation 的返回值，显示图像经过额外转换时用于查找全分辨率配方
+        show_note: 是否显示全分辨率渲染提示（同一结果的多个下载按钮只需显示一次）
+    """
     try:
-        # 1. 轻微模糊减少噪点
-        smoothed = cv2.bilateralFilter(image, 7, 50, 50)
-        
-        # 2. 边缘检测
-        gray = cv2.cvtColor(smoothed, cv2.COLOR_BGR2GRAY)
-        edges = cv2.Canny(gray, edge_threshold, edge_threshold * 2)
-        
-        # 3. 根据风格处理颜色
-        if color_style == "vibrant":
-            # 鲜艳风格 - 增加对比度和饱和度
-            lab = cv2.cvtColor(smoothed, cv2.COLOR_BGR2LAB)
-            l, a, b = cv2.split(lab)
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-            l = clahe.apply(l)
-            lab = cv2.merge([l, a, b])
-            color_enhanced = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
-            
-            # 增加饱和度
-            hsv = cv2.cvtColor(color_enhanced, cv2.COLOR_BGR2HSV)
-            hsv = hsv.astype(np.float32)
-            hsv[:, :, 1] = np.clip(hsv[:, :, 1] * 1.5, 0, 255)
-            hsv = np.clip(hsv, 0, 255).astype(np.uint8)
-            color_enhanced = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
-            
-        elif color_style == "soft":
-            # 柔和风格 - 使用stylization
-            color_enhanced = cv2.stylization(smoothed, sigma_s=60, sigma_r=0.3)
-            
-        else:  # cel风格
-            # 简单量化
-            color_enhanced = cv2.stylization(smoothed, sigma_s=100, sigma_r=0.1)
-        
-        # 4. 创建边缘mask
-        edges_float = edges.astype(np.float32) / 255.0
-        edges_mask = np.stack([edges_float, edges_float, edges_float], axis=2)
+        # 确保图像是RGB或灰度格式
+        if image_rgb.ndim not in (2, 3) or (image_rgb.ndim == 3 and image_rgb.shape[2] != 3):
+            raise ValueError("图像必须是RGB格式 (H,W,3) 或灰度格式 (H,W)")
         
-        # 5. 描边颜色
-        if color_style == "soft":
-            outline_color = np.array([[[60, 60, 60]]], dtype=np.float32)
-        else:
-            outline_color = np.array([[[10, 10, 10]]], dtype=np.float32)
-        
-        # 6. 应用描边
-        result = color_enhanced.astype(np.float32) * (1 - edges_mask) + outline_color * edges_mask
-        
-        return np.clip(result, 0, 255).astype(np.uint8)
-    
-    except Exception as e:
-        # 备用方案
-        return image.astype(np.uint8)
-
-def apply_watercolor_effect(image, style="classic", texture_strength=0.3):
-    """水彩画效果 - 简化版"""
-    # 确保输入是uint8
-    if image.dtype != np.uint8:
-        image = image.astype(np.uint8)
-    
-    try:
-        if style == "classic":
-            # 经典风格 - 使用stylization
-            result = cv2.stylization(image, sigma_s=100, sigma_r=0.4)
-            
-            # 增加饱和度
-            hsv = cv2.cvtColor(result, cv2.COLOR_BGR2HSV)
-            hsv = hsv.astype(np.float32)
-            hsv[:, :, 1] = np.clip(hsv[:, :, 1] * 1.3, 0, 255)
-            hsv = np.clip(hsv, 0, 255).astype(np.uint8)
-            result = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
-            
-        else:  # modern
-            # 现代风格 - detailEnhance
-            result = cv2.detailEnhance(image, sigma_s=10, sigma_r=0.15)
-            
-            # 边缘保留模糊
-            blurred = cv2.bilateralFilter(result, 7, 100, 100)
-            result = cv2.addWeighted(result, 0.7, blurred, 0.3, 0)
+        # 生成唯一key
+        import time
+        import hashlib
+        timestamp = int(time.time() * 1000)
         
-        # 轻微模糊使效果更柔和
-        result = cv2.GaussianBlur(result, (3, 3), 0.5)
+        # 使用图像内容哈希和当前时间生成唯一key
+        image_hash = hashlib.md5(image_rgb.tobytes()).hexdigest()[:8]
+        unique_key = f"download_{filename}_{image_hash}_{timestamp}_{unique_key_suffix}"
         
-        return result.astype(np.uint8)
-    
-    except Exception as e:
-        # 备用方案
-        return cv2.stylization(image, sigma_s=60, sigma_r=0.3).astype(np.uint8)
-
-def apply_pop_art_effect(image, style="warhol", num_colors=8):
-    """波普艺术效果 - 简化版"""
-    # 确保输入是uint8
-    if image.dtype != np.uint8:
-        image = image.astype(np.uint8)
-    
-    try:
-        # 调整图像大小以提高处理速度
-        height, width = image.shape[:2]
-        if height * width > 800 * 600:
-            scale = min(800 / width, 600 / height)
-            small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        recipe = find_preview_recipe(image_rgb, source)
+        if recipe is None:
+            data = encode_image(image_rgb, image_format, quality)
         else:
-            small = image
+            if show_note:
+                full_height, full_width = recipe.full_shape[:2]
+                st.caption(f"🔍 当前显示为预览结果（{image_rgb.shape[1]}×{image_rgb.shape[0]}），"
+                           f"下载文件按原图 {full_width}×{full_height} 全分辨率渲染")
+            # 点击下载时才执行全分辨率处理
+            data = lambda: encode_image(like_display(recipe.render(), image_rgb), image_format, quality)
         
-        # 使用K-means进行颜色量化
-        pixels = small.reshape((-1, 3))
-        pixels = np.float32(pixels)
+        mime = IMAGE_MIME_TYPES[image_format]
         
-        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 0.2)
-        num_colors = min(num_colors, 12)
-        
-        _, labels, centers = cv2.kmeans(pixels, num_colors, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
-        
-        # 转换为8位
-        centers = np.uint8(centers)
-        
-        # 重塑图像
-        quantized = centers[labels.flatten()]
-        quantized = quantized.reshape(small.shape)
-        
-        # 增加对比度
-        result = cv2.convertScaleAbs(quantized, alpha=1.2, beta=0)
-        
-        # 如果需要，调整回原始大小
-        if height * width > 800 * 600:
-            result = cv2.resize(result, (width, height), interpolation=cv2.INTER_NEAREST)
-        
-        return result.astype(np.uint8)
-    
-    except Exception as e:
-        # 备用方案 - 简单的颜色量化
-        Z = image.reshape((-1,3))
-        Z = np.float32(Z)
-        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 10, 1.0)
-        K = 8
-        ret,label,center = cv2.kmeans(Z, K, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
-        center = np.uint8(center)
-        res = center[label.flatten()]
-        result = res.reshape(image.shape)
-        return result.astype(np.uint8)
-
-def apply_impressionist_effect(image, brush_size=3):
-    """印象派效果 - 简化版"""
-    # 确保输入是uint8
-    if image.dtype != np.uint8:
-        image = image.astype(np.uint8)
-    
-    try:
-        # 创建模糊效果
-        blurred1 = cv2.GaussianBlur(image, (brush_size*2+1, brush_size*2+1), 0)
-        blurred2 = cv2.bilateralFilter(image, 9, 75, 75)
-        
-        # 混合效果
-        result = cv2.addWeighted(blurred1, 0.5, blurred2, 0.5, 0)
-        
-        # 增强颜色
-        hsv = cv2.cvtColor(result, cv2.COLOR_BGR2HSV)
-        hsv = hsv.astype(np.float32)
-        hsv[:, :, 1] = np.clip(hsv[:, :, 1] * 1.2, 0, 255)
-        hsv = np.clip(hsv, 0, 255).astype(np.uint8)
-        result = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
-        
-        return result.astype(np.uint8)
-    
-    except Exception as e:
-        # 备用方案
-        return cv2.GaussianBlur(image, (11, 11), 0).astype(np.uint8)
-
-def apply_pastel_effect(image, softness=0.7):
-    """粉彩画效果 - 简化版"""
-    # 确保输入是uint8
-    if image.dtype != np.uint8:
-        image = image.astype(np.uint8)
-    
-    try:
-        # 深度模糊
-        blurred = cv2.bilateralFilter(image, 9, 150, 150)
-        
-        # 提高亮度
-        lab = cv2.cvtColor(blurred, cv2.COLOR_BGR2LAB)
-        l, a, b = cv2.split(lab)
-        l = cv2.add(l, 30)
-        lab = cv2.merge([l, a, b])
-        result = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
-        
-        # 添加光晕效果
-        bloom = cv2.GaussianBlur(result, (0, 0), 10)
-        result = cv2.addWeighted(result, 0.9, bloom, 0.1, 0)
+        # 下载按钮
+        try:
+            st.download_button(
+                label=button_text,
+                data=data,
+                file_name=filename,
+                mime=mime,
+                use_container_width=True,
+                key=unique_key
+            )
+        except StreamlitAPIException:
+            # 旧版Streamlit不支持延迟生成下载内容，改为立即渲染
+            with st.spinner("正在渲染全分辨率结果..."):
+                full_data = data() if callable(data) else data
+            st.download_button(
+                label=button_text,
+                data=full_data,
+                file_name=filename,
+                mime=mime,
+                use_container_width=True,
+                key=unique_key
+            )
         
-        return result.astype(np.uint8)
-    
     except Exception as e:
-        # 备用方案
-        return cv2.bilateralFilter(image, 9, 150, 150).astype(np.uint8)
-
-
-
-# 10. 风格迁移效果
-def apply_van_gogh_style(image, twist_strength=0.001):
-    """梵高风格（简化版）- 减小旋转程度"""
-    height, width = image.shape[:2]
-    
-    # 1. 增强色彩饱和度
-    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-    hsv[:,:,1] = cv2.multiply(hsv[:,:,1], 1.5).clip(0, 255)
-    vivid = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
-    
-    # 2. 添加油画效果
-    oil_painting = cv2.xphoto.oilPainting(vivid, 7, 30)
-    
-    # 3. 添加旋转扭曲（减小旋转强度）
-    result = np.zeros_like(oil_painting, dtype=np.float32)
-    center_x, center_y = width // 2, height // 2
-    
-    # 使用矢量操作加速
-    y_coords, x_coords = np.mgrid[0:height, 0:width]
-    dx = x_coords - center_x
-    dy = y_coords - center_y
-    distance = np.sqrt(dx*dx + dy*dy)
-    
-    # 使用较小的扭曲强度
-    twist_angle = distance * twist_strength
-    angle = np.arctan2(dy, dx) + twist_angle
-    
-    src_x = (center_x + distance * np.cos(angle)).astype(np.int32)
-    src_y = (center_y + distance * np.sin(angle)).astype(np.int32)
-    
-    # 边界检查
-    src_x = np.clip(src_x, 0, width-1)
-    src_y = np.clip(src_y, 0, height-1)
-    
-    result = oil_painting[src_y, src_x]
-    
-    return result.astype(np.uint8)
-
-def apply_starry_sky_style(image):
-    """星空风格（梵高《星空》效果）- 优化"""
-    # 1. 增强蓝色调和黄色调
-    lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
-    l, a, b = cv2.split(lab)
-    
-    # 增加蓝色和黄色
-    b = cv2.add(b, 25).clip(0, 255)
-    a = cv2.add(a, 10).clip(0, 255)
-    
-    lab = cv2.merge([l, a, b])
-    color_tone = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
-    
-    # 2. 应用梵高风格（使用更小的旋转）
-    van_gogh_style = apply_van_gogh_style(color_tone, 0.0008)
-    
-    # 3. 添加旋涡效果
-    height, width = van_gogh_style.shape[:2]
-    result = van_gogh_style.copy()
-    
-    # 添加多个旋转中心
-    centers = [
-        (width//4, height//4),
-        (width*3//4, height//4),
-        (width//4, height*3//4),
-        (width*3//4, height*3//4)
-    ]
-    
-    for center_x, center_y in centers:
-        for y in range(max(0, center_y-50), min(height, center_y+50)):
-            for x in range(max(0, center_x-50), min(width, center_x+50)):
-                dx = x - center_x
-                dy = y - center_y
-                distance = np.sqrt(dx*dx + dy*dy)
-                
-                if distance < 50:
-                    # 轻微的旋涡效果
-                    twist_angle = (50 - distance) * 0.01
-                    src_x = int(center_x + distance * np.cos(np.arctan2(dy, dx) + twist_angle))
-                    src_y = int(center_y + distance * np.sin(np.arctan2(dy, dx) + twist_angle))
-                    
-                    src_x = max(0, min(src_x, width-1))
-                    src_y = max(0, min(src_y, height-1))
-                    
-                    result[y, x] = van_gogh_style[src_y, src_x]
-    
-    # 4. 添加星星
-    for _ in range(150):
-        x = random.randint(20, width-20)
-        y = random.randint(20, height-20)
-        
-        # 梵高风格的星星（更自然的星芒效果）
-        size = random.randint(1, 2)
-        brightness = random.randint(220, 255)
-        
-        # 绘制星芒
-        for angle in range(0, 360, 45):
-            rad = np.deg2rad(angle)
-            end_x = int(x + 6 * np.cos(rad))
-            end_y = int(y + 6 * np.sin(rad))
-            cv2.line(result, (x, y), (end_x, end_y), 
-                    (brightness, brightness, brightness), 1)
-        
-        # 绘制中心光点
-        cv2.circle(result, (x, y), size, 
-                  (brightness, brightness, brightness), -1)
-    
-    return result
-
-def apply_monet_style(image):
-    """莫奈印象派风格"""
-    height, width = image.shape[:2]
-    
-    # 1. 柔和的颜色模糊（印象派特点）
-    blurred = cv2.bilateralFilter(image, 15, 80, 80)
-    
-    # 2. 添加笔触效果
-    brush_strokes = np.zeros_like(blurred, dtype=np.float32)
-    
-    # 创建随机笔触
-    brush_size = 10
-    for y in range(0, height, brush_size):
-        for x in range(0, width, brush_size):
-            # 随机选择笔触方向
-            angle = random.uniform(0, 2*np.pi)
-            length = random.randint(brush_size, brush_size*2)
-            
-            end_x = int(x + length * np.cos(angle))
-            end_y = int(y + length * np.sin(angle))
-            
-            end_x = max(0, min(end_x, width-1))
-            end_y = max(0, min(end_y, height-1))
-            
-            # 使用线段颜色填充矩形区域
-            color = blurred[y, x].astype(float)
-            cv2.line(brush_strokes, (x, y), (end_x, end_y), color, brush_size)
-    
-    brush_strokes = brush_strokes.astype(np.uint8)
-    
-    # 3. 增强颜色（莫奈的鲜艳色彩）
-    hsv = cv2.cvtColor(brush_strokes, cv2.COLOR_BGR2HSV)
-    
-    # 增加饱和度
-    hsv[:,:,1] = cv2.multiply(hsv[:,:,1], 1.3).clip(0, 255)
-    
-    # 调整色调（偏向蓝色和紫色）
-    hsv[:,:,0] = cv2.add(hsv[:,:,0], 10).clip(0, 255)
-    
-    # 轻微提高亮度
-    hsv[:,:,2] = cv2.multiply(hsv[:,:,2], 1.1).clip(0, 255)
-    
-    result = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
-    
-    # 4. 添加光晕效果
-    glow = cv2.GaussianBlur(result, (0, 0), 15)
-    result = cv2.addWeighted(result, 0.7, glow, 0.3, 0)
-    
-    # 5. 添加画布纹理
-    texture = np.random.randn(height, width) * 10 + 128
-    texture = np.clip(texture, 100, 150).astype(np.uint8)
-    texture_bgr = cv2.cvtColor(texture, cv2.COLOR_GRAY2BGR)
-    
-    result = cv2.addWeighted(result, 0.95, texture_bgr, 0.05, 0)
-    
-    return result
-
-def apply_picasso_cubist_style(image):
-    """毕加索立体主义风格"""
-    height, width = image.shape[:2]
-    
-    # 1. 分割图像为多个几何区域
-    result = np.zeros_like(image)
-    
-    # 创建网格分割
-    grid_size = min(height, width) // 8
-    
-    for y in range(0, height, grid_size):
-        for x in range(0, width, grid_size):
-            # 随机变形网格
-            offset_x = random.randint(-grid_size//2, grid_size//2)
-            offset_y = random.randint(-grid_size//2, grid_size//2)
-            
-            end_x = min(x + grid_size + offset_x, width)
-            end_y = min(y + grid_size + offset_y, height)
-            
-            # 获取区域平均颜色
-            region = image[max(0, y):end_y, max(0, x):end_x]
-            if region.size > 0:
-                avg_color = cv2.mean(region)[:3]
-                
-                # 绘制几何形状
-                shape_type = random.choice(['triangle', 'rectangle', 'polygon'])
-                
-                if shape_type == 'triangle':
-                    # 绘制三角形
-                    pts = np.array([
-                        [x, y],
-                        [x + grid_size, y],
-                        [x + grid_size//2, y + grid_size]
-                    ], np.int32)
-                    cv2.fillPoly(result, [pts], avg_color)
-                    
-                elif shape_type == 'rectangle':
-                    # 绘制矩形（可能旋转）
-                    angle = random.uniform(-30, 30)
-                    center = (x + grid_size//2, y + grid_size//2)
-                    rect = ((x + grid_size//2, y + grid_size//2), 
-                           (grid_size, grid_size), angle)
-                    
-                    box = cv2.boxPoints(rect)
-                    # 修改这里：将 np.int0 改为 np.int32
-                    box = np.int32(box)  # 或者 box.astype(np.int32)
-                    cv2.fillPoly(result, [box], avg_color)
-                    
-                else:  # polygon
-                    # 绘制多边形
-                    num_sides = random.randint(3, 6)
-                    radius = grid_size // 2
-                    center = (x + grid_size//2, y + grid_size//2)
-                    
-                    pts = []
-                    for i in range(num_sides):
-                        angle = 2 * np.pi * i / num_sides + random.uniform(-0.2, 0.2)
-                        px = center[0] + radius * np.cos(angle)
-                        py = center[1] + radius * np.sin(angle)
-                        pts.append([px, py])
-                    
-                    pts = np.array(pts, np.int32)
-                    cv2.fillPoly(result, [pts], avg_color)
-    
-    # 2. 增强边缘（立体主义的特点）
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    edges = cv2.Canny(gray, 50, 150)
-    edges = cv2.dilate(edges, np.ones((3,3), np.uint8), iterations=1)
-    
-    # 添加黑色轮廓
-    edges_bgr = cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
-    result = cv2.bitwise_and(result, cv2.bitwise_not(edges_bgr))
-    
-    # 3. 颜色简化（立体主义的有限色彩）
-    pixels = result.reshape((-1, 3))
-    pixels = np.float32(pixels)
-    
-    # 使用K-means减少颜色数量
-    k = 8
-    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 0.2)
-    _, labels, centers = cv2.kmeans(pixels, k, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
-    
-    centers = np.uint8(centers)
-    simplified = centers[labels.flatten()]
-    result = simplified.reshape(result.shape)
-    
-    # 4. 增强对比度
-    lab = cv2.cvtColor(result, cv2.COLOR_BGR2LAB)
-    l, a, b = cv2.split(lab)
-    
-    # 增强亮度通道的对比度
-    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
-    l = clahe.apply(l)
-    
-    lab = cv2.merge([l, a, b])
-    result = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
-    
-    return result
+        st.error(f"下载功能出错: {str(e)}")
 
-def apply_anime_style(image):
-    """动漫风格"""
-    # 1. 边缘检测（用于描边）
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    
-    # 双边滤波保留边缘
-    filtered = cv2.bilateralFilter(image, 9, 75, 75)
-    
-    # 使用DoG边缘检测
-    g1 = cv2.GaussianBlur(gray, (5, 5), 0.5)
-    g2 = cv2.GaussianBlur(gray, (5, 5), 2.0)
-    dog = g1 - g2
-    
-    # 二值化边缘
-    _, edges = cv2.threshold(dog, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-    
-    # 细化边缘
-    edges = cv2.ximgproc.thinning(edges)
-    
-    # 2. 颜色平坦化（动漫的平坦着色）
-    # 使用均值漂移减少颜色变化
-    filtered_ms = cv2.pyrMeanShiftFiltering(filtered, 20, 50)
-    
-    # 3. 增强饱和度
-    hsv = cv2.cvtColor(filtered_ms, cv2.COLOR_BGR2HSV)
-    hsv[:,:,1] = cv2.multiply(hsv[:,:,1], 1.4).clip(0, 255)
-    hsv[:,:,2] = cv2.multiply(hsv[:,:,2], 1.2).clip(0, 255)
-    enhanced = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
-    
-    # 4. 添加阴影效果
-    height, width = enhanced.shape[:2]
-    
-    # 创建简单光源效果
-    y_coords, x_coords = np.mgrid[0:height, 0:width]
-    
-    # 从左上角的光源
-    light_source = np.sqrt((x_coords/width)**2 + (y_coords/height)**2)
-    light_source = 1 - light_source * 0.3
-    
-    # 应用光照效果
-    result = enhanced.astype(np.float32) * light_source[:,:,np.newaxis]
-    result = np.clip(result, 0, 255).astype(np.uint8)
-    
-    # 5. 添加黑色轮廓
-    edges_bgr = cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
-    
-    # 轮廓颜色可选（黑色或深色）
-    outline_color = (30, 30, 30)
-    edges_colored = cv2.bitwise_and(edges_bgr, outline_color)
-    
-    # 应用轮廓
-    result = cv2.subtract(result, edges_colored)
-    
-    # 6. 添加高光效果
-    # 在边缘区域添加高光
-    highlight_mask = cv2.erode(edges, np.ones((2,2), np.uint8))
-    
-    # 添加白色高光
-    result = cv2.addWeighted(result, 1.0, 
-                           cv2.cvtColor(highlight_mask, cv2.COLOR_GRAY2BGR), 
-                           0.1, 0)
-    
-    return result
+# ======================= 代理分辨率预览 =======================
+# 预览结果 -> 全分辨率配方（按结果内容索引，供下载时重新渲染）
+PREVIEW_RECIPES_KEY = "lab_preview_recipes"
+PREVIEW_RECIPES_MAX = 8
 
-# 11. 老照片上色
-def colorize_old_photo(image, color_intensity=1.0, ai_assist=True):
+def render_operation(func, image, *args, **kwargs):
     """
-    真正的黑白照片上色函数
-    将灰度图像智能上色为彩色
+    按预览设置运行图像处理函数
     
-    参数:
-    - image: 输入图像（BGR格式）
-    - color_intensity: 色彩强度 (0.5-1.5)
-    - ai_assist: 是否使用AI辅助（简化版）
+    预览模式下在缩小的代理图上处理（最长边由侧边栏设置），并登记全分辨率配方，
+    下载按钮据此按原图重新渲染；关闭预览模式时直接处理原图。
     
-    返回:
-    - colorized: 上色后的图像
+    含随机成分或参数以像素为单位的处理（粒子特效、随机笔触、K-means 颜色量化、采样等）
+    在代理图上的结果与原图不一致，这类处理直接在原图上调用，不经过这里。
     """
-    # 确保图像是BGR格式
-    if len(image.shape) == 2:
-        # 如果是灰度图，转换为3通道BGR
-        gray = image.copy()
-        image_bgr = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
-    elif image.shape[2] == 4:
-        # 如果是RGBA，转换为BGR
-        image_bgr = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
-    else:
-        image_bgr = image.copy()
-    
-    # 确保是uint8类型
-    if image_bgr.dtype != np.uint8:
-        image_bgr = image_bgr.astype(np.uint8)
-    
-    # 1. 预处理：增强对比度，去除噪点
-    # 转换为LAB颜色空间
-    lab = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2LAB)
-    l, a, b = cv2.split(lab)
-    
-    # 使用CLAHE增强亮度对比度
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    l_enhanced = clahe.apply(l)
-    
-    # 2. 智能区域检测（简化版AI辅助）
-    gray_float = l_enhanced.astype(np.float32) / 255.0
-    
-    # 根据亮度创建区域掩码
-    # 天空/高亮区域
-    sky_mask = (gray_float > 0.7).astype(np.uint8) * 255
+    if not st.session_state.get("lab_preview_enabled", True):
+        return func(image, *args, **kwargs)
     
-    # 地面/中等亮度区域
-    ground_mask = ((gray_float > 0.3) & (gray_float <= 0.7)).astype(np.uint8) * 255
+    max_edge = st.session_state.get("lab_preview_max_edge", PREVIEW_DEFAULT_MAX_EDGE)
     
-    # 植被区域（通过纹理检测）
-    sobelx = cv2.Sobel(l_enhanced, cv2.CV_64F, 1, 0, ksize=3)
-    sobely = cv2.Sobel(l_enhanced, cv2.CV_64F, 0, 1, ksize=3)
-    gradient = np.sqrt(sobelx**2 + sobely**2)
-    texture_mask = (gradient > np.percentile(gradient, 70)).astype(np.uint8) * 255
+    # 上传的原图直接复用解码存储中缓存的预览视图
+    decoded = image_store.owner_of(image)
+    proxy = decoded.preview(max_edge) if decoded is not None else None
     
-    # 人物/建筑区域（通过边缘检测）
-    edges = cv2.Canny(l_enhanced, 50, 150)
-    
-    # 3. 智能上色：为不同区域分配颜色
-    # 初始化彩色通道（BGR顺序）
-    colored_b = np.zeros_like(l_enhanced, dtype=np.float32)
-    colored_g = np.zeros_like(l_enhanced, dtype=np.float32)
-    colored_r = np.zeros_like(l_enhanced, dtype=np.float32)
-    
-    # 像素级智能上色
-    height, width = l_enhanced.shape
-    
-    for i in range(height):
-        for j in range(width):
-            brightness = l_enhanced[i, j] / 255.0
-            
-            # 区域判断
-            is_sky = sky_mask[i, j] > 0
-            is_ground = ground_mask[i, j] > 0
-            is_textured = texture_mask[i, j] > 0
-            has_edge = edges[i, j] > 0
-            
-            # 智能上色规则
-            if is_sky:
-                # 天空：蓝色调，亮度越高越蓝
-                blue_intensity = 0.7 + brightness * 0.3
-                green_intensity = 0.5 + brightness * 0.2
-                red_intensity = 0.3 + brightness * 0.2
-            elif is_textured and not has_edge:
-                # 植被：绿色调
-                if brightness > 0.4:
-                    green_intensity = 0.6 + brightness * 0.4
-                    blue_intensity = 0.2 + brightness * 0.2
-                    red_intensity = 0.1 + brightness * 0.2
-                else:
-                    # 深色植被
-                    green_intensity = 0.3 + brightness * 0.3
-                    blue_intensity = 0.1 + brightness * 0.2
-                    red_intensity = 0.05 + brightness * 0.1
-            elif has_edge and brightness > 0.5:
-                # 建筑/人物边缘：暖色调
-                red_intensity = 0.6 + brightness * 0.4
-                green_intensity = 0.5 + brightness * 0.3
-                blue_intensity = 0.3 + brightness * 0.2
-            elif is_ground:
-                # 地面：土黄色调
-                red_intensity = 0.5 + brightness * 0.3
-                green_intensity = 0.4 + brightness * 0.3
-                blue_intensity = 0.2 + brightness * 0.2
-            else:
-                # 默认：根据亮度调整颜色
-                if brightness > 0.7:
-                    # 高亮区域：浅黄色
-                    red_intensity = 0.8 + brightness * 0.2
-                    green_intensity = 0.7 + brightness * 0.2
-                    blue_intensity = 0.5 + brightness * 0.2
-                elif brightness > 0.4:
-                    # 中等亮度：中性色
-                    red_intensity = 0.5 + brightness * 0.3
-                    green_intensity = 0.5 + brightness * 0.3
-                    blue_intensity = 0.5 + brightness * 0.3
-                else:
-                    # 暗部：冷色调
-                    red_intensity = 0.2 + brightness * 0.2
-                    green_intensity = 0.3 + brightness * 0.2
-                    blue_intensity = 0.4 + brightness * 0.3
-            
-            # 应用颜色强度
-            colored_r[i, j] = red_intensity * brightness * 255 * color_intensity
-            colored_g[i, j] = green_intensity * brightness * 255 * color_intensity
-            colored_b[i, j] = blue_intensity * brightness * 255 * color_intensity
+    result, recipe = run_preview(func, image, args, kwargs, max_edge, proxy=proxy)
     
-    # 4. 合并彩色通道
-    colored_r = np.clip(colored_r, 0, 255).astype(np.uint8)
-    colored_g = np.clip(colored_g, 0, 255).astype(np.uint8)
-    colored_b = np.clip(colored_b, 0, 255).astype(np.uint8)
-    
-    colorized = cv2.merge([colored_b, colored_g, colored_r])
-    
-    # 5. 后处理：颜色混合和增强
-    # 将原始亮度与颜色混合
-    colored_lab = cv2.cvtColor(colorized, cv2.COLOR_BGR2LAB)
-    cl, ca, cb = cv2.split(colored_lab)
-    
-    # 保持原始亮度，只使用上色的色度信息
-    result_lab = cv2.merge([l_enhanced, ca, cb])
-    result = cv2.cvtColor(result_lab, cv2.COLOR_LAB2BGR)
-    
-    # 6. 添加复古效果
-    # 轻微暖色调滤镜
-    warm_filter = np.array([
-        [1.1, 0.0, 0.0],
-        [0.0, 0.9, 0.0],
-        [0.0, 0.0, 0.8]
-    ], dtype=np.float32)
-    
-    warm_result = cv2.transform(result, warm_filter)
-    warm_result = np.clip(warm_result, 0, 255).astype(np.uint8)
-    
-    # 混合：80%上色 + 20%怀旧暖色
-    final = cv2.addWeighted(result, 0.8, warm_result, 0.2, 0)
-    
-    # 7. 颜色调整和增强
-    hsv = cv2.cvtColor(final, cv2.COLOR_BGR2HSV)
-    h, s, v = cv2.split(hsv)
-    
-    # 增加饱和度
-    s_enhanced = cv2.multiply(s, color_intensity).clip(0, 255)
-    
-    # 稍微调整色调，使其更自然
-    h_enhanced = h.copy()
-    h_shift = 5  # 轻微色调偏移
-    h_enhanced = (h_enhanced + h_shift) % 180
-    
-    # 合并HSV
-    hsv_enhanced = cv2.merge([h_enhanced, s_enhanced, v])
-    final_enhanced = cv2.cvtColor(hsv_enhanced, cv2.COLOR_HSV2BGR)
-    
-    # 8. 添加轻微胶片颗粒效果（可选）
-    if ai_assist:
-        # 添加轻微的噪点模拟胶片颗粒
-        noise = np.random.normal(0, 2, final_enhanced.shape).astype(np.int16)
-        final_with_noise = cv2.add(final_enhanced.astype(np.int16), noise)
-        final_enhanced = np.clip(final_with_noise, 0, 255).astype(np.uint8)
-    
-    # 9. 最后轻微模糊，使颜色过渡更自然
-    final_enhanced = cv2.GaussianBlur(final_enhanced, (3, 3), 0.5)
-    
-    return final_enhanced
-def apply_deep_learning_colorization(image):
-    """
-    深度学习风格的上色（简化版）
-    使用预训练的规则模拟深度学习效果
-    """
-    # 先使用基础的上色
-    base_colorized = colorize_old_photo(image)
-    
-    # 增加颜色丰富度
-    hsv = cv2.cvtColor(base_colorized, cv2.COLOR_BGR2HSV)
-    h, s, v = cv2.split(hsv)
-    
-    # 深度学习风格通常颜色更鲜艳
-    s = cv2.multiply(s, 1.3).clip(0, 255)
-    
-    # 稍微降低亮度，增加对比度
-    v = cv2.convertScaleAbs(v, alpha=1.1, beta=-20)
-    
-    # 色调微调
-    h_shifted = (h + 10) % 180  # 稍微调整色调
-    
-    hsv_enhanced = cv2.merge([h_shifted, s, v])
-    result = cv2.cvtColor(hsv_enhanced, cv2.COLOR_HSV2BGR)
-    
-    return result
-
-def apply_selective_colorization(image, focus_areas='auto'):
-    """
-    选择性焦点上色
-    focus_areas: 'auto', 'center', 'faces', 'full'
-    """
-    base_colorized = colorize_old_photo(image)
-    
-    if focus_areas == 'full':
-        return base_colorized
-    
-    # 创建灰度版本
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    if len(gray.shape) == 2:
-        gray_bgr = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
-    else:
-        gray_bgr = gray
-    
-    # 创建焦点掩码
-    height, width = image.shape[:2]
-    mask = np.zeros((height, width), dtype=np.uint8)
-    
-    if focus_areas == 'center':
-        # 中心区域上色
-        center_x, center_y = width // 2, height // 2
-        radius = min(width, height) // 3
-        cv2.circle(mask, (center_x, center_y), radius, 255, -1)
-    elif focus_areas == 'auto':
-        # 自动检测重要区域（基于边缘密度）
-        edges = cv2.Canny(gray, 50, 150)
-        
-        # 使用形态学操作找到边缘密集区域
-        kernel = np.ones((15, 15), np.uint8)
-        edges_dilated = cv2.dilate(edges, kernel, iterations=1)
-        
-        # 找到轮廓
-        contours, _ = cv2.findContours(edges_dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        # 绘制主要区域
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area > (width * height * 0.01):  # 只处理足够大的区域
-                cv2.drawContours(mask, [contour], -1, 255, -1)
-    else:  # faces
-        # 人脸检测（需要OpenCV的人脸检测器）
-        try:
-            # 转换为灰度进行人脸检测
-            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-            faces = face_cascade.detectMultiScale(gray, 1.1, 4)
-            
-            for (x, y, w, h) in faces:
-                cv2.rectangle(mask, (x, y), (x+w, y+h), 255, -1)
-        except:
-            # 如果人脸检测失败，使用中心区域
-            center_x, center_y = width // 2, height // 2
-            radius = min(width, height) // 4
-            cv2.circle(mask, (center_x, center_y), radius, 255, -1)
-    
-    # 模糊掩码边缘，使过渡更平滑
-    mask = cv2.GaussianBlur(mask, (31, 31), 0)
-    mask = mask.astype(np.float32) / 255.0
-    mask = cv2.merge([mask, mask, mask])
-    
-    # 混合彩色和灰度版本
-    result = cv2.addWeighted(base_colorized.astype(np.float32), mask, 
-                             gray_bgr.astype(np.float32), 1.0 - mask, 0)
-    result = np.clip(result, 0, 255).astype(np.uint8)
+    if recipe is not None:
+        # 返回列表的处理函数（如通道分离）为每个元素分别登记配方
+        if isinstance(result, (list, tuple)):
+            parts = [(item, recipe.part(index)) for index, item in enumerate(result)]
+        else:
+            parts = [(result, recipe)]
+        recipes = st.session_state.setdefault(PREVIEW_RECIPES_KEY, {})
+        for item, item_recipe in parts:
+            if isinstance(item, np.ndarray) and item.ndim in (2, 3):
+                recipes[result_key(to_rgb(item))] = item_recipe
+        while len(recipes) > PREVIEW_RECIPES_MAX:
+            recipes.pop(next(iter(recipes)))
     
     return result
 
-def apply_erosion(image, kernel_size=3):
-    """腐蚀操作（增强版）"""
-    # 使用椭圆核通常效果更好
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
-    
-    # 对于小物体去除，先进行腐蚀
-    eroded = cv2.erode(image, kernel, iterations=1)
-    
-    # 如果图像是彩色的，对每个通道分别处理（可选）
-    if len(image.shape) == 3:
-        # 分离通道处理
-        channels = cv2.split(eroded)
-        processed_channels = []
-        for channel in channels:
-            # 对每个通道应用轻度腐蚀
-            processed = cv2.erode(channel, kernel, iterations=1)
-            processed_channels.append(processed)
-        
-        # 合并通道
-        eroded = cv2.merge(processed_channels)
-    
-    return eroded
-
-def apply_dilation(image, kernel_size=3):
-    """膨胀操作（增强版）"""
-    # 使用椭圆核效果更自然
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
-    
-    # 对于连接断裂，先进行膨胀
-    dilated = cv2.dilate(image, kernel, iterations=1)
-    
-    # 如果图像是彩色的，可以增强边缘效果
-    if len(image.shape) == 3:
-        # 转换为HSV，增强V通道
-        hsv = cv2.cvtColor(dilated, cv2.COLOR_BGR2HSV)
-        h, s, v = cv2.split(hsv)
-        
-        # 对亮度通道进行额外膨胀（增强效果）
-        v = cv2.dilate(v, kernel, iterations=1)
-        
-        # 合并并转换回BGR
-        hsv = cv2.merge([h, s, v])
-        dilated = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
-    
-    return dilated
-
-def apply_opening(image, kernel_size=3):
-    """开运算（增强版）- 去除小物体"""
-    # 使用椭圆核，效果比矩形核更平滑
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
-    
-    # 标准开运算
-    opened = cv2.morphologyEx(image, cv2.MORPH_OPEN, kernel)
-    
-    # 如果图像是灰度图，可以添加对比度增强
-    if len(image.shape) == 2:
-        # 对开运算后的图像进行直方图均衡化
-        opened = cv2.equalizeHist(opened)
-    elif len(image.shape) == 3:
-        # 对彩色图像，增强边缘对比度
-        edges = cv2.Canny(opened, 50, 150)
-        edges_colored = cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
-        
-        # 将边缘叠加到开运算结果上
-        opened = cv2.addWeighted(opened, 0.8, edges_colored, 0.2, 0)
-    
-    return opened
-
-def apply_closing(image, kernel_size=3):
-    """闭运算（增强版）- 填充小孔洞"""
-    # 使用椭圆核
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
-    
-    # 标准闭运算
-    closed = cv2.morphologyEx(image, cv2.MORPH_CLOSE, kernel)
-    
-    # 增强效果：如果图像是二值图，可以优化
-    if len(image.shape) == 2:
-        # 闭运算后可能还有小孔洞，进行填充
-        contours, _ = cv2.findContours(closed, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area < 50:  # 填充小孔洞
-                cv2.drawContours(closed, [contour], 0, 255, -1)
-    
-    return closed
-
-def provide_download_button(image_rgb, filename, button_text, unique_key_suffix=""):
-    """
-    提供下载按钮 - 专门用于RGB图像
-    
-    Args:
-        image_rgb: RGB格式的图像数组
-        filename: 下载文件名
-        button_text: 按钮文本
-        unique_key_suffix: 唯一key后缀，防止重复ID
-    """
-    try:
-        # 确保图像是RGB格式
-        if len(image_rgb.shape) != 3 or image_rgb.shape[2] != 3:
-            raise ValueError("图像必须是RGB格式 (H,W,3)")
-        
-        # 转换为PIL图像
-        image_pil = Image.fromarray(image_rgb)
-        
-        # 保存到字节流
-        buffered = io.BytesIO()
-        image_pil.save(buffered, format="JPEG", quality=95)
-        
-        # 生成唯一key
-        import time
-        import hashlib
-        timestamp = int(time.time() * 1000)
-        
-        # 使用图像内容哈希和当前时间生成唯一key
-        image_hash = hashlib.md5(image_rgb.tobytes()).hexdigest()[:8]
-        unique_key = f"download_{filename}_{image_hash}_{timestamp}_{unique_key_suffix}"
-        
-        # 下载按钮
-        st.download_button(
-            label=button_text,
-            data=buffered.getvalue(),
-            file_name=filename,
-            mime="image/jpeg",
-            use_container_width=True,
-            key=unique_key
-        )
-        
-    except Exception as e:
-        st.error(f"下载功能出错: {str(e)}")
 # ======================= 侧边栏渲染 =======================
 def render_sidebar():
     with st.sidebar:
@@ -2515,6 +1067,13 @@ def render_sidebar():
         if st.button("🏆 成果展示", use_container_width=True):
             st.switch_page("pages/4_🏆_成果展示.py")
         
+        # 预览设置
+        st.markdown("### ⚡ 预览设置")
+        st.checkbox("交互预览（代理分辨率）", value=True, key="lab_preview_enabled",
+                    help="开启时在缩小的代理图上处理，调参反馈更快；关闭即按原图全分辨率渲染。下载始终为全分辨率")
+        st.slider("预览最长边（像素）", PREVIEW_MIN_EDGE, PREVIEW_MAX_EDGE, PREVIEW_DEFAULT_MAX_EDGE, 128,
+                  key="lab_preview_max_edge", disabled=not st.session_state.get("lab_preview_enabled", True))
+        
         # 思政学习进度
         st.markdown("### 📚 思政学习进度")
         
@@ -2579,6 +1138,11 @@ def render_sidebar():
         st.text("状态: 🟢 正常运行")
         st.text("版本: v3.0.0")
         st.text(f"模块数: 13个")
+        
+        # 处理结果缓存（全进程共享）
+        cache_stats = result_cache.stats()
+        st.text(f"结果缓存: 命中 {cache_stats['hits']} / 未命中 {cache_stats['misses']}")
+        st.text(f"命中率: {cache_stats['hit_rate']:.0%} · 占用 {cache_stats['bytes'] / 1024 / 1024:.0f}MB")
 
 # ======================= 主界面 =======================
 # 实验室头部
@@ -2606,38 +1170,27 @@ tab_names = [
     "🎨 图像绘画",
     "🌟 风格迁移",
     "🖼️ 老照片上色",
-    "⚙️ 数字形态学"
+    "⚙️ 数字形态学",
+    "🔗 处理流水线"
 ]
 
 tabs = st.tabs(tab_names)
 
 # 全局图像上传器
 uploaded_file = None
-if 'current_image' not in st.session_state:
-    st.session_state.current_image = None
+
+# 会话级解码图像存储（按上传文件缓存，各选项卡共享同一份解码结果）
+image_store = get_image_store(st.session_state)
 
 def load_and_display_image(uploaded_file, tab_key):
     """通用函数：加载并显示图像"""
     if uploaded_file is not None:
         try:
-            # 读取图像文件
-            image_bytes = uploaded_file.read()
-            nparr = np.frombuffer(image_bytes, np.uint8)
-            
-            # 使用OpenCV读取图像
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            
-            if image is None:
-                st.error("无法读取图像文件，请确保是有效的图像格式")
-                return None
-            
-            # 保存到session state
-            st.session_state[f'image_{tab_key}'] = image
+            # 从会话图像存储读取（同一文件只解码一次，不再为每个选项卡保存副本）
+            decoded_image = image_store.get(uploaded_file)
             
-            # 转换为RGB用于显示（Streamlit使用RGB）
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            
-            return image, image_rgb
+            # BGR用于处理，RGB用于显示（Streamlit使用RGB）
+            return decoded_image.bgr, decoded_image.rgb
             
         except Exception as e:
             st.error(f"加载图像时出错: {str(e)}")
@@ -2667,12 +1220,12 @@ with tabs[0]:
     )
     
     if uploaded_file is not None:
-        # 读取图像
-        pil_image = Image.open(uploaded_file)
-        # 保存RGB版本用于显示
-        image_rgb = np.array(pil_image)
-        # 转换为BGR用于OpenCV处理
-        image_bgr = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
+        # 读取图像（会话内只解码一次，各选项卡共享）
+        decoded_image = image_store.get(uploaded_file)
+        # RGB版本用于显示
+        image_rgb = decoded_image.rgb
+        # BGR版本用于OpenCV处理
+        image_bgr = decoded_image.bgr
         
         # 初始化结果变量
         result_rgb = None
@@ -2697,7 +1250,7 @@ with tabs[0]:
                 beta = st.slider("亮度调整", -50, 50, 0)
                 if st.button("应用对比度调整", use_container_width=True):
                     # 使用BGR版本进行处理
-                    result_bgr = apply_contrast_adjustment(image_bgr, alpha, beta)
+                    result_bgr = render_operation(apply_contrast_adjustment, image_bgr, alpha, beta)
                     # 转换为RGB用于显示
                     result_rgb = cv2.cvtColor(result_bgr, cv2.COLOR_BGR2RGB)
                     
@@ -2705,7 +1258,7 @@ with tabs[0]:
                 gamma = st.slider("伽马值", 0.1, 3.0, 1.0, 0.1)
                 if st.button("应用伽马校正", use_container_width=True):
                     # 使用BGR版本进行处理
-                    result_bgr = apply_gamma_correction(image_bgr, gamma)
+                    result_bgr = render_operation(apply_gamma_correction, image_bgr, gamma)
                     # 转换为RGB用于显示
                     result_rgb = cv2.cvtColor(result_bgr, cv2.COLOR_BGR2RGB)
                     
@@ -2714,14 +1267,14 @@ with tabs[0]:
                 tile_size = st.slider("网格大小", 4, 16, 8, 2)
                 if st.button("应用CLAHE增强", use_container_width=True):
                     # 使用BGR版本进行处理
-                    result_bgr = apply_clahe(image_bgr, clip_limit, (tile_size, tile_size))
+                    result_bgr = render_operation(apply_clahe, image_bgr, clip_limit, (tile_size, tile_size))
                     # 转换为RGB用于显示
                     result_rgb = cv2.cvtColor(result_bgr, cv2.COLOR_BGR2RGB)
                     
             else:  # 直方图均衡化
                 if st.button("应用直方图均衡化", use_container_width=True):
                     # 使用BGR版本进行处理
-                    result_bgr = apply_histogram_equalization(image_bgr)
+                    result_bgr = render_operation(apply_histogram_equalization, image_bgr)
                     # 转换为RGB用于显示
                     result_rgb = cv2.cvtColor(result_bgr, cv2.COLOR_BGR2RGB)
         
@@ -2763,12 +1316,12 @@ with tabs[1]:
     )
     
     if uploaded_file is not None:
-        # 读取图像
-        pil_image = Image.open(uploaded_file)
-        # 保存RGB版本用于显示
-        image_rgb = np.array(pil_image)
-        # 转换为BGR用于OpenCV处理
-        image_bgr = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
+        # 读取图像（会话内只解码一次，各选项卡共享）
+        decoded_image = image_store.get(uploaded_file)
+        # RGB版本用于显示
+        image_rgb = decoded_image.rgb
+        # BGR版本用于OpenCV处理
+        image_bgr = decoded_image.bgr
         
         # 初始化结果变量
         canny_result_rgb = None
@@ -2783,7 +1336,7 @@ with tabs[1]:
             threshold2 = st.slider("高阈值", 100, 300, 100, key="canny2")
             
             if st.button("应用Canny", key="btn_canny", use_container_width=True):
-                canny_result_bgr = apply_canny_edge(image_bgr, threshold1, threshold2)
+                canny_result_bgr = render_operation(apply_canny_edge, image_bgr, threshold1, threshold2)
                 # 转换为RGB用于显示和下载
                 canny_result_rgb = cv2.cvtColor(canny_result_bgr, cv2.COLOR_BGR2RGB)
             
@@ -2801,7 +1354,7 @@ with tabs[1]:
             ksize = st.slider("核大小", 3, 17, 3, step=2, key="sobel")
             
             if st.button("应用Sobel", key="btn_sobel", use_container_width=True):
-                sobel_result_bgr = apply_sobel_edge(image_bgr, ksize)
+                sobel_result_bgr = render_operation(apply_sobel_edge, image_bgr, ksize)
                 # 转换为RGB用于显示和下载
                 sobel_result_rgb = cv2.cvtColor(sobel_result_bgr, cv2.COLOR_BGR2RGB)
             
@@ -2840,7 +1393,7 @@ with tabs[1]:
                 return cv2.cvtColor(laplacian, cv2.COLOR_GRAY2BGR)
             
             if st.button("应用Laplacian", key="btn_laplacian", use_container_width=True):
-                laplacian_result_bgr = apply_enhanced_laplacian(
+                laplacian_result_bgr = render_operation(apply_enhanced_laplacian, 
                     image_bgr, 
                     ksize=laplacian_ksize,
                     scale=laplacian_scale,
@@ -2886,12 +1439,12 @@ with tabs[2]:
     )
     
     if uploaded_file is not None:
-        # 读取图像
-        pil_image = Image.open(uploaded_file)
-        # 保存RGB版本用于显示
-        image_rgb = np.array(pil_image)
-        # 转换为BGR用于OpenCV处理
-        image_bgr = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
+        # 读取图像（会话内只解码一次，各选项卡共享）
+        decoded_image = image_store.get(uploaded_file)
+        # RGB版本用于显示
+        image_rgb = decoded_image.rgb
+        # BGR版本用于OpenCV处理
+        image_bgr = decoded_image.bgr
         
         # 初始化结果变量
         result_rgb = None
@@ -3106,23 +1659,21 @@ with tabs[3]:
     )
     
     if uploaded_file is not None:
-        # 读取图像
-        pil_image = Image.open(uploaded_file)
+        # 读取图像（会话内只解码一次，各选项卡共享）
+        decoded_image = image_store.get(uploaded_file)
         
         # 根据处理模式转换图像
         if processing_mode == "灰度图像锐化":
             # 转换为灰度图像
-            if pil_image.mode != 'L':
-                pil_image = pil_image.convert('L')
-            image_gray = np.array(pil_image)
+            image_gray = decoded_image.gray
             
             # 为兼容OpenCV处理，将灰度图转为3通道BGR格式
             image_bgr = cv2.cvtColor(image_gray, cv2.COLOR_GRAY2BGR)
             image_for_display = image_gray  # 显示用灰度图
         else:
             # 保持彩色图像
-            image_rgb = np.array(pil_image)
-            image_bgr = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
+            image_rgb = decoded_image.rgb
+            image_bgr = decoded_image.bgr
             image_for_display = image_rgb  # 显示用彩色图
         
         # 确保图像是uint8类型
@@ -3138,7 +1689,7 @@ with tabs[3]:
                 st.metric("高度", f"{image_for_display.shape[0]}px")
             with col3:
                 st.metric("模式", processing_mode)
-                st.metric("格式", pil_image.format or "未知")
+                st.metric("格式", decoded_image.format or "未知")
         
         # 显示原始图像
         st.markdown("### 📷 原始图像")
@@ -3172,13 +1723,16 @@ with tabs[3]:
             
             if st.button("🔍 应用锐化滤波器", use_container_width=True, key="sharpen_filter_btn"):
                 with st.spinner("正在应用锐化滤波器..."):
-                    # 使用BGR图像处理
-                    result_bgr = apply_sharpen_filter(image_bgr, kernel_size)
+                    def sharpen_with_strength(image, kernel_size, strength):
+                        """锐化滤波后按强度混合细节"""
+                        result = apply_sharpen_filter(image, kernel_size)
+                        if strength != 1.0:
+                            detail = cv2.subtract(result, image)
+                            result = cv2.addWeighted(image, 1.0, detail, strength, 0)
+                        return result
                     
-                    # 调整锐化强度
-                    if sharpen_strength != 1.0:
-                        detail = cv2.subtract(result_bgr, image_bgr)
-                        result_bgr = cv2.addWeighted(image_bgr, 1.0, detail, sharpen_strength, 0)
+                    # 使用BGR图像处理
+                    result_bgr = render_operation(sharpen_with_strength, image_bgr, kernel_size, sharpen_strength)
                     
                     # 根据处理模式转换结果
                     if processing_mode == "灰度图像锐化":
@@ -3198,7 +1752,7 @@ with tabs[3]:
             if st.button("🎯 应用非锐化掩蔽", use_container_width=True, key="unsharp_btn"):
                 with st.spinner("正在应用非锐化掩蔽..."):
                     # 使用BGR图像处理
-                    result_bgr = apply_unsharp_masking(image_bgr, sigma, amount)
+                    result_bgr = render_operation(apply_unsharp_masking, image_bgr, sigma, amount)
                     
                     # 根据处理模式转换结果
                     if processing_mode == "灰度图像锐化":
@@ -3217,19 +1771,24 @@ with tabs[3]:
             
             if st.button("⚡ 应用拉普拉斯锐化", use_container_width=True, key="laplace_btn"):
                 with st.spinner("正在应用拉普拉斯锐化..."):
-                    # 预处理：如果需要降噪
-                    if noise_reduction:
-                        image_processed = cv2.bilateralFilter(image_bgr, 5, 50, 50)
-                    else:
-                        image_processed = image_bgr
-                    
-                    # 应用拉普拉斯锐化
-                    result_bgr = apply_laplacian_sharpening(image_processed)
+                    def laplacian_with_strength(image, strength, denoise):
+                        """（可选降噪后）拉普拉斯锐化，再按边缘强度混合细节"""
+                        # 预处理：如果需要降噪
+                        if denoise:
+                            image_processed = cv2.bilateralFilter(image, 5, 50, 50)
+                        else:
+                            image_processed = image
+                        
+                        # 应用拉普拉斯锐化
+                        result = apply_laplacian_sharpening(image_processed)
+                        
+                        # 调整边缘强度
+                        if strength != 1.0:
+                            detail = cv2.subtract(result, image)
+                            result = cv2.addWeighted(image, 1.0, detail, strength, 0)
+                        return result
                     
-                    # 调整边缘强度
-                    if edge_strength != 1.0:
-                        detail = cv2.subtract(result_bgr, image_bgr)
-                        result_bgr = cv2.addWeighted(image_bgr, 1.0, detail, edge_strength, 0)
+                    result_bgr = render_operation(laplacian_with_strength, image_bgr, edge_strength, noise_reduction)
                     
                     # 根据处理模式转换结果
                     if processing_mode == "灰度图像锐化":
@@ -3249,7 +1808,7 @@ with tabs[3]:
             if st.button("🚀 应用高频提升滤波", use_container_width=True, key="boost_btn"):
                 with st.spinner("正在应用高频提升滤波..."):
                     # 使用BGR图像处理
-                    result_bgr = apply_high_boost_filter(image_bgr, boost_factor)
+                    result_bgr = render_operation(apply_high_boost_filter, image_bgr, boost_factor)
                     
                     # 根据处理模式转换结果
                     if processing_mode == "灰度图像锐化":
@@ -3271,7 +1830,7 @@ with tabs[3]:
             if st.button("🎨 应用自适应锐化", use_container_width=True, key="adaptive_btn"):
                 with st.spinner("正在应用自适应锐化..."):
                     # 使用BGR图像处理
-                    result_bgr = apply_adaptive_sharpen(image_bgr, strength)
+                    result_bgr = render_operation(apply_adaptive_sharpen, image_bgr, strength)
                     
                     # 根据处理模式转换结果
                     if processing_mode == "灰度图像锐化":
@@ -3285,6 +1844,13 @@ with tabs[3]:
             if result_image.dtype != np.uint8:
                 result_image = result_image.astype(np.uint8)
             
+            # 统计与局部对比在与结果相同的分辨率上进行（预览模式下结果为代理图）
+            if result_image.shape[:2] != image_for_display.shape[:2]:
+                original_for_compare = cv2.resize(image_for_display, (result_image.shape[1], result_image.shape[0]),
+                                                  interpolation=cv2.INTER_AREA)
+            else:
+                original_for_compare = image_for_display
+            
             # 创建对比展示
             st.markdown("### 🖼️ 锐化效果对比")
             
@@ -3332,10 +1898,10 @@ with tabs[3]:
                     
                     # 准备用于计算的图像
                     if processing_mode == "灰度图像锐化":
-                        orig_for_calc = image_for_display
+                        orig_for_calc = original_for_compare
                         proc_for_calc = result_image
                     else:
-                        orig_for_calc = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
+                        orig_for_calc = cv2.cvtColor(original_for_compare, cv2.COLOR_RGB2GRAY)
                         proc_for_calc = cv2.cvtColor(cv2.cvtColor(result_image, cv2.COLOR_RGB2BGR), cv2.COLOR_BGR2GRAY)
                     
                     orig_sharpness = calculate_sharpness(orig_for_calc)
@@ -3348,10 +1914,10 @@ with tabs[3]:
                 with col_stats2:
                     # 亮度变化
                     if processing_mode == "灰度图像锐化":
-                        orig_brightness = np.mean(image_for_display)
+                        orig_brightness = np.mean(original_for_compare)
                         proc_brightness = np.mean(result_image)
                     else:
-                        orig_brightness = np.mean(image_for_display)
+                        orig_brightness = np.mean(original_for_compare)
                         proc_brightness = np.mean(result_image)
                     brightness_change = proc_brightness - orig_brightness
                     st.metric("亮度变化", f"{brightness_change:+.1f}",
@@ -3360,10 +1926,10 @@ with tabs[3]:
                 with col_stats3:
                     # 对比度变化
                     if processing_mode == "灰度图像锐化":
-                        orig_contrast = np.std(image_for_display)
+                        orig_contrast = np.std(original_for_compare)
                         proc_contrast = np.std(result_image)
                     else:
-                        orig_contrast = np.std(image_for_display, axis=(0,1)).mean()
+                        orig_contrast = np.std(original_for_compare, axis=(0,1)).mean()
                         proc_contrast = np.std(result_image, axis=(0,1)).mean()
                     contrast_change = proc_contrast - orig_contrast
                     st.metric("对比度变化", f"{contrast_change:+.1f}",
@@ -3375,61 +1941,41 @@ with tabs[3]:
             # 下载选项
             st.markdown("### 📥 下载锐化结果")
             
-            # 将结果转换为PIL图像
-            if processing_mode == "灰度图像锐化":
-                result_pil = Image.fromarray(result_image, mode='L')
-            else:
-                result_pil = Image.fromarray(result_image)
-            
             col_dl1, col_dl2, col_dl3 = st.columns(3)
             
+            # 灰度模式下显示结果由 result_bgr 转换而来，按 result_bgr 查找全分辨率配方
             with col_dl1:
                 # JPEG格式
-                img_buffer = io.BytesIO()
-                if processing_mode == "灰度图像锐化":
-                    # JPEG不支持纯灰度模式，转换为RGB
-                    result_pil.convert('RGB').save(img_buffer, format="JPEG", quality=95)
-                else:
-                    result_pil.save(img_buffer, format="JPEG", quality=95)
-                img_buffer.seek(0)
-                
-                st.download_button(
-                    label="💾 下载JPEG格式",
-                    data=img_buffer,
-                    file_name=f"锐化_{processing_mode}_{sharpen_method}.jpg",
-                    mime="image/jpeg",
-                    use_container_width=True
+                provide_download_button(
+                    result_image,
+                    f"锐化_{processing_mode}_{sharpen_method}.jpg",
+                    "💾 下载JPEG格式",
+                    unique_key_suffix="sharpen_jpg",
+                    source=result_bgr
                 )
             
             with col_dl2:
                 # PNG格式
-                png_buffer = io.BytesIO()
-                result_pil.save(png_buffer, format="PNG")
-                png_buffer.seek(0)
-                
-                st.download_button(
-                    label="🖼️ 下载PNG格式",
-                    data=png_buffer,
-                    file_name=f"锐化_{processing_mode}_{sharpen_method}.png",
-                    mime="image/png",
-                    use_container_width=True
+                provide_download_button(
+                    result_image,
+                    f"锐化_{processing_mode}_{sharpen_method}.png",
+                    "🖼️ 下载PNG格式",
+                    unique_key_suffix="sharpen_png",
+                    image_format="PNG",
+                    source=result_bgr,
+                    show_note=False
                 )
             
             with col_dl3:
                 # 高质量版本
-                high_buffer = io.BytesIO()
-                if processing_mode == "灰度图像锐化":
-                    result_pil.convert('RGB').save(high_buffer, format="JPEG", quality=100)
-                else:
-                    result_pil.save(high_buffer, format="JPEG", quality=100)
-                high_buffer.seek(0)
-                
-                st.download_button(
-                    label="🌟 最高质量",
-                    data=high_buffer,
-                    file_name=f"锐化_{processing_mode}_{sharpen_method}_高质量.jpg",
-                    mime="image/jpeg",
-                    use_container_width=True
+                provide_download_button(
+                    result_image,
+                    f"锐化_{processing_mode}_{sharpen_method}_高质量.jpg",
+                    "🌟 最高质量",
+                    unique_key_suffix="sharpen_high",
+                    quality=100,
+                    source=result_bgr,
+                    show_note=False
                 )
             
             # 锐化预览
@@ -3437,7 +1983,7 @@ with tabs[3]:
             preview_size = st.slider("预览区域大小", 100, 400, 200, key="preview_size")
             
             # 确保预览区域不超过图像尺寸
-            max_height, max_width = image_for_display.shape[:2]
+            max_height, max_width = original_for_compare.shape[:2]
             preview_size = min(preview_size, max_height-200, max_width-200)
             
             # 选择预览区域
@@ -3446,10 +1992,10 @@ with tabs[3]:
             with col_preview1:
                 # 原始图像预览
                 st.markdown("#### 原始图像局部")
-                if len(image_for_display.shape) == 2:  # 灰度图
-                    preview_orig = image_for_display[100:100+preview_size, 100:100+preview_size]
+                if len(original_for_compare.shape) == 2:  # 灰度图
+                    preview_orig = original_for_compare[100:100+preview_size, 100:100+preview_size]
                 else:  # 彩色图
-                    preview_orig = image_for_display[100:100+preview_size, 100:100+preview_size, :]
+                    preview_orig = original_for_compare[100:100+preview_size, 100:100+preview_size, :]
                 st.image(preview_orig, use_container_width=True, clamp=True)
             
             with col_preview2:
@@ -3516,12 +2062,12 @@ with tabs[4]:
     )
     
     if uploaded_file is not None:
-        # 读取图像
-        pil_image = Image.open(uploaded_file)
-        # 保存RGB版本用于显示
-        image_rgb = np.array(pil_image)
-        # 转换为BGR用于OpenCV处理
-        image_bgr = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
+        # 读取图像（会话内只解码一次，各选项卡共享）
+        decoded_image = image_store.get(uploaded_file)
+        # RGB版本用于显示
+        image_rgb = decoded_image.rgb
+        # BGR版本用于OpenCV处理
+        image_bgr = decoded_image.bgr
         
         # 初始化结果变量
         sampled_rgb = None
@@ -3532,7 +2078,7 @@ with tabs[4]:
         sample_ratio = st.slider("采样比例", 2, 8, 2)
         
         if st.button("应用采样", key="sample_btn", use_container_width=True):
-            # 使用BGR图像处理
+            # 采样改变图像尺寸，直接在原图上处理，显示真实的采样后尺寸（缩放本身开销很小）
             sampled_bgr = apply_sampling(image_bgr, sample_ratio)
             # 转换为RGB用于显示和下载
             sampled_rgb = cv2.cvtColor(sampled_bgr, cv2.COLOR_BGR2RGB)
@@ -3542,7 +2088,7 @@ with tabs[4]:
         quant_levels = st.slider("量化级别", 2, 256, 64)
         
         if st.button("应用量化", key="quant_btn", use_container_width=True):
-            # 使用BGR图像处理
+            # 逐像素量化开销很小，直接在原图上处理
             quantized_bgr = apply_quantization(image_bgr, quant_levels)
             # 转换为RGB用于显示和下载
             quantized_rgb = cv2.cvtColor(quantized_bgr, cv2.COLOR_BGR2RGB)
@@ -3605,12 +2151,12 @@ with tabs[5]:
     )
     
     if uploaded_file is not None:
-        # 读取图像
-        pil_image = Image.open(uploaded_file)
-        # 保存RGB版本用于显示
-        image_rgb = np.array(pil_image)
-        # 转换为BGR用于OpenCV处理
-        image_bgr = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
+        # 读取图像（会话内只解码一次，各选项卡共享）
+        decoded_image = image_store.get(uploaded_file)
+        # RGB版本用于显示
+        image_rgb = decoded_image.rgb
+        # BGR版本用于OpenCV处理
+        image_bgr = decoded_image.bgr
         
         # 初始化结果变量
         result_rgb = None
@@ -3650,10 +2196,10 @@ with tabs[5]:
         if st.button("应用颜色分割", use_container_width=True):
             if color_space == "RGB颜色分割":
                 # 使用BGR图像处理
-                result_bgr = apply_rgb_segmentation(image_bgr, lower_color, upper_color)
+                result_bgr = render_operation(apply_rgb_segmentation, image_bgr, lower_color, upper_color)
             else:
                 # 使用BGR图像处理
-                result_bgr = apply_hsv_segmentation(image_bgr, lower_color, upper_color)
+                result_bgr = render_operation(apply_hsv_segmentation, image_bgr, lower_color, upper_color)
             
             # 转换为RGB用于显示和下载
             result_rgb = cv2.cvtColor(result_bgr, cv2.COLOR_BGR2RGB)
@@ -3699,12 +2245,12 @@ with tabs[6]:
     )
     
     if uploaded_file is not None:
-        # 读取图像
-        pil_image = Image.open(uploaded_file)
-        # 保存RGB版本用于显示
-        image_rgb = np.array(pil_image)
-        # 转换为BGR用于OpenCV处理
-        image_bgr = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
+        # 读取图像（会话内只解码一次，各选项卡共享）
+        decoded_image = image_store.get(uploaded_file)
+        # RGB版本用于显示
+        image_rgb = decoded_image.rgb
+        # BGR版本用于OpenCV处理
+        image_bgr = decoded_image.bgr
         
         # 初始化结果变量
         channels_rgb = None
@@ -3713,7 +2259,7 @@ with tabs[6]:
         st.markdown("### 📊 RGB通道分离")
         if st.button("分离RGB通道", use_container_width=True):
             # 使用BGR图像处理
-            channels_bgr = split_channels(image_bgr)
+            channels_bgr = render_operation(split_channels, image_bgr)
             
             # 将每个通道转换为RGB用于显示
             channels_rgb = []
@@ -3776,7 +2322,7 @@ with tabs[6]:
             }
             
             # 使用BGR图像处理
-            result_bgr = adjust_channel(image_bgr, channel_map[channel_to_adjust], adjustment_value)
+            result_bgr = render_operation(adjust_channel, image_bgr, channel_map[channel_to_adjust], adjustment_value)
             # 转换为RGB用于显示和下载
             result_rgb = cv2.cvtColor(result_bgr, cv2.COLOR_BGR2RGB)
         
@@ -3821,16 +2367,24 @@ with tabs[7]:
     )
     
     if uploaded_file is not None:
-        # 读取图像
-        pil_image = Image.open(uploaded_file)
-        # 保存RGB版本用于显示
-        image_rgb = np.array(pil_image)
-        # 转换为BGR用于OpenCV处理
-        image_bgr = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
+        # 读取图像（会话内只解码一次，各选项卡共享）
+        decoded_image = image_store.get(uploaded_file)
+        # RGB版本用于显示
+        image_rgb = decoded_image.rgb
+        # BGR版本用于OpenCV处理
+        image_bgr = decoded_image.bgr
         
         effect_type = st.selectbox("选择特效类型", 
                                   ["雨点特效", "雪花特效", "樱花特效", "星空特效"])
         
+        # 随机种子：相同种子生成相同的粒子分布，便于对比参数效果
+        effect_seed = st.number_input("随机种子（0 表示每次随机）", min_value=0, max_value=99999, 
+                                      value=0, step=1, key="tab8_seed")
+        effect_seed = int(effect_seed) or None
+        
+        # 粒子的大小与数量以像素为单位、分布随机，代理图上的效果与原图不一致，
+        # 因此特效直接在原图上渲染，显示与下载的是同一结果
+        
         # 初始化结果变量
         result_rgb = None
         result_bgr = None
@@ -3844,7 +2398,7 @@ with tabs[7]:
             
             if st.button("添加雨点特效", use_container_width=True):
                 # 使用BGR图像处理
-                result_bgr = add_rain_effect(image_bgr, intensity, opacity)
+                result_bgr = add_rain_effect(image_bgr, intensity, opacity, seed=effect_seed)
                 # 转换为RGB用于显示
                 result_rgb = cv2.cvtColor(result_bgr, cv2.COLOR_BGR2RGB)
         
@@ -3857,7 +2411,7 @@ with tabs[7]:
             
             if st.button("添加雪花特效", use_container_width=True):
                 # 使用BGR图像处理
-                result_bgr = add_snow_effect(image_bgr, intensity, opacity)
+                result_bgr = add_snow_effect(image_bgr, intensity, opacity, seed=effect_seed)
                 # 转换为RGB用于显示
                 result_rgb = cv2.cvtColor(result_bgr, cv2.COLOR_BGR2RGB)
         
@@ -3867,7 +2421,7 @@ with tabs[7]:
             if st.button("添加樱花特效", use_container_width=True):
                 # 使用BGR图像处理
                 sakura_intensity = intensity / 100.0  # 转换为0.2-2.0的范围
-                result_bgr = apply_sakura_effect(image_bgr, sakura_intensity)
+                result_bgr = apply_sakura_effect(image_bgr, sakura_intensity, seed=effect_seed)
                 # 转换为RGB用于显示
                 result_rgb = cv2.cvtColor(result_bgr, cv2.COLOR_BGR2RGB)
         
@@ -3876,7 +2430,7 @@ with tabs[7]:
             
             if st.button("添加星空特效", use_container_width=True):
                 # 使用BGR图像处理
-                result_bgr = add_starry_night_effect(image_bgr, stars)
+                result_bgr = add_starry_night_effect(image_bgr, stars, seed=effect_seed)
                 # 转换为RGB用于显示
                 result_rgb = cv2.cvtColor(result_bgr, cv2.COLOR_BGR2RGB)
         
@@ -3926,12 +2480,12 @@ with tabs[8]:
     
     if uploaded_file is not None:
         try:
-            # 读取图像
-            pil_image = Image.open(uploaded_file)
-            # 保存RGB版本用于显示
-            image_rgb = np.array(pil_image)
-            # 转换为BGR用于OpenCV处理
-            image_bgr = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
+            # 读取图像（会话内只解码一次，各选项卡共享）
+            decoded_image = image_store.get(uploaded_file)
+            # RGB版本用于显示
+            image_rgb = decoded_image.rgb
+            # BGR版本用于OpenCV处理
+            image_bgr = decoded_image.bgr
             
             # 确保图像是uint8类型
             if image_bgr.dtype != np.uint8:
@@ -3963,7 +2517,7 @@ with tabs[8]:
                 
                 if st.button("🎨 生成油画效果", use_container_width=True, key="oil_btn"):
                     with st.spinner("正在绘制油画..."):
-                        result_bgr = apply_oil_painting_effect(
+                        result_bgr = render_operation(apply_oil_painting_effect, 
                             image_bgr, 
                             radius=radius, 
                             intensity=intensity
@@ -3980,13 +2534,13 @@ with tabs[8]:
                 if st.button("✏️ 生成铅笔素描", use_container_width=True, key="pencil_btn"):
                     with st.spinner("正在绘制素描..."):
                         if style_type == "优雅":
-                            result_bgr = apply_pencil_sketch_effect(
+                            result_bgr = render_operation(apply_pencil_sketch_effect, 
                                 image_bgr, 
                                 style="elegant",
                                 intensity=intensity
                             )
                         else:
-                            result_bgr = apply_pencil_sketch_effect(
+                            result_bgr = render_operation(apply_pencil_sketch_effect, 
                                 image_bgr,
                                 style="artistic",
                                 intensity=intensity
@@ -3998,7 +2552,7 @@ with tabs[8]:
                 
                 if st.button("🖌️ 生成水墨画", use_container_width=True, key="ink_btn"):
                     with st.spinner("正在渲染水墨效果..."):
-                        result_bgr = apply_ink_wash_painting_effect(
+                        result_bgr = render_operation(apply_ink_wash_painting_effect, 
                             image_bgr, 
                             ink_strength=ink_strength
                         )
@@ -4013,7 +2567,7 @@ with tabs[8]:
                 
                 if st.button("🖼️ 生成漫画效果", use_container_width=True, key="comic_btn"):
                     with st.spinner("正在转换为漫画风格..."):
-                        result_bgr = apply_comic_effect(
+                        result_bgr = render_operation(apply_comic_effect, 
                             image_bgr,
                             edge_threshold=edge_threshold,
                             color_style="vibrant" if color_style == "鲜艳" else "soft"
@@ -4029,7 +2583,7 @@ with tabs[8]:
                 
                 if st.button("🎨 生成水彩画", use_container_width=True, key="watercolor_btn"):
                     with st.spinner("正在渲染水彩效果..."):
-                        result_bgr = apply_watercolor_effect(
+                        result_bgr = render_operation(apply_watercolor_effect, 
                             image_bgr,
                             style="classic" if style_type == "经典" else "modern",
                             texture_strength=texture_strength
@@ -4041,6 +2595,8 @@ with tabs[8]:
                 
                 if st.button("✨ 生成波普艺术", use_container_width=True, key="popart_btn"):
                     with st.spinner("正在创建波普艺术..."):
+                        # K-means 随机初始化，代理图与原图的配色可能不同；
+                        # 函数内部已在不超过 800×600 的缩小图上量化，直接处理原图
                         result_bgr = apply_pop_art_effect(
                             image_bgr,
                             num_colors=num_colors
@@ -4070,21 +2626,13 @@ with tabs[8]:
                 # 简单的下载功能
                 st.markdown("### 📥 下载处理结果")
                 
-                # 将结果转换为PIL图像
-                result_pil = Image.fromarray(result_rgb)
-                
-                # 将图像保存到字节流
-                img_buffer = io.BytesIO()
-                result_pil.save(img_buffer, format="JPEG", quality=90)
-                img_buffer.seek(0)
-                
                 # 创建下载按钮
-                st.download_button(
-                    label="💾 下载处理结果",
-                    data=img_buffer,
-                    file_name=f"绘画_{painting_style}.jpg",
-                    mime="image/jpeg",
-                    use_container_width=True
+                provide_download_button(
+                    result_rgb,
+                    f"绘画_{painting_style}.jpg",
+                    "💾 下载处理结果",
+                    unique_key_suffix="painting_jpg",
+                    quality=90
                 )
                 
                 # 其他格式选项
@@ -4093,30 +2641,24 @@ with tabs[8]:
                 
                 with col1:
                     # PNG格式
-                    png_buffer = io.BytesIO()
-                    result_pil.save(png_buffer, format="PNG")
-                    png_buffer.seek(0)
-                    
-                    st.download_button(
-                        label="🖼️ 下载PNG格式",
-                        data=png_buffer,
-                        file_name=f"绘画_{painting_style}.png",
-                        mime="image/png",
-                        use_container_width=True
+                    provide_download_button(
+                        result_rgb,
+                        f"绘画_{painting_style}.png",
+                        "🖼️ 下载PNG格式",
+                        unique_key_suffix="painting_png",
+                        image_format="PNG",
+                        show_note=False
                     )
                 
                 with col2:
                     # 高质量JPEG
-                    jpeg_high_buffer = io.BytesIO()
-                    result_pil.save(jpeg_high_buffer, format="JPEG", quality=100)
-                    jpeg_high_buffer.seek(0)
-                    
-                    st.download_button(
-                        label="🌟 最高质量",
-                        data=jpeg_high_buffer,
-                        file_name=f"绘画_{painting_style}_高质量.jpg",
-                        mime="image/jpeg",
-                        use_container_width=True
+                    provide_download_button(
+                        result_rgb,
+                        f"绘画_{painting_style}_高质量.jpg",
+                        "🌟 最高质量",
+                        unique_key_suffix="painting_high",
+                        quality=100,
+                        show_note=False
                     )
         
         except Exception as e:
@@ -4163,12 +2705,12 @@ with tabs[9]:
     )
     
     if uploaded_file is not None:
-        # 读取图像
-        pil_image = Image.open(uploaded_file)
-        # 保存RGB版本用于显示
-        image_rgb = np.array(pil_image)
-        # 转换为BGR用于OpenCV处理
-        image_bgr = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
+        # 读取图像（会话内只解码一次，各选项卡共享）
+        decoded_image = image_store.get(uploaded_file)
+        # RGB版本用于显示
+        image_rgb = decoded_image.rgb
+        # BGR版本用于OpenCV处理
+        image_bgr = decoded_image.bgr
         
         # 初始化结果变量
         result_rgb = None
@@ -4185,6 +2727,8 @@ with tabs[9]:
             with col2:
                 color_intensity = st.slider("色彩强度", 0.5, 2.0, 1.5, 0.1, 
                                            key="vangogh_color")
+            vangogh_bilinear = st.checkbox("平滑扭曲（双线性插值）", value=False, key="vangogh_bilinear",
+                                           help="扭曲时对相邻像素插值，边缘更平滑")
             
             if st.button("🎨 应用梵高风格", use_container_width=True, key="vangogh_btn"):
                 with st.spinner("正在创作梵高风格..."):
@@ -4193,9 +2737,9 @@ with tabs[9]:
                         hsv = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2HSV)
                         hsv[:,:,1] = cv2.multiply(hsv[:,:,1], color_intensity).clip(0, 255)
                         temp_image = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
-                        result_bgr = apply_van_gogh_style(temp_image, twist_strength)
+                        result_bgr = render_operation(apply_van_gogh_style, temp_image, twist_strength, vangogh_bilinear)
                     else:
-                        result_bgr = apply_van_gogh_style(image_bgr, twist_strength)
+                        result_bgr = render_operation(apply_van_gogh_style, image_bgr, twist_strength, vangogh_bilinear)
                     
                     result_rgb = cv2.cvtColor(result_bgr, cv2.COLOR_BGR2RGB)
         
@@ -4208,6 +2752,7 @@ with tabs[9]:
             
             if st.button("🌌 应用星空风格", use_container_width=True, key="starry_btn"):
                 with st.spinner("正在绘制星空..."):
+                    # 星星位置随机、星芒长度以像素为单位，直接在原图上处理
                     # 调整蓝色强度
                     if blue_intensity != 1.0:
                         lab = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2LAB)
@@ -4230,14 +2775,20 @@ with tabs[9]:
             
             if st.button("🌸 应用莫奈风格", use_container_width=True, key="monet_btn"):
                 with st.spinner("正在创作印象派..."):
-                    result_bgr = apply_monet_style(image_bgr)
+                    def monet_with_color(image, brush_size, color_vivid):
+                        """莫奈风格后调整色彩鲜艳度"""
+                        result = apply_monet_style(image)
+                        
+                        # 调整笔触和色彩
+                        if brush_size != 10 or color_vivid != 1.3:
+                            # 重新调整颜色
+                            hsv = cv2.cvtColor(result, cv2.COLOR_BGR2HSV)
+                            hsv[:,:,1] = cv2.multiply(hsv[:,:,1], color_vivid).clip(0, 255)
+                            result = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+                        return result
                     
-                    # 调整笔触和色彩
-                    if brush_size != 10 or color_vivid != 1.3:
-                        # 重新调整颜色
-                        hsv = cv2.cvtColor(result_bgr, cv2.COLOR_BGR2HSV)
-                        hsv[:,:,1] = cv2.multiply(hsv[:,:,1], color_vivid).clip(0, 255)
-                        result_bgr = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+                    # 随机笔触（笔触大小以像素为单位），直接在原图上处理
+                    result_bgr = monet_with_color(image_bgr, brush_size, color_vivid)
                     
                     result_rgb = cv2.cvtColor(result_bgr, cv2.COLOR_BGR2RGB)
         
@@ -4250,18 +2801,24 @@ with tabs[9]:
             
             if st.button("🔷 应用立体主义风格", use_container_width=True, key="picasso_btn"):
                 with st.spinner("正在创作立体主义作品..."):
-                    result_bgr = apply_picasso_cubist_style(image_bgr)
+                    def picasso_with_colors(image, color_simplify):
+                        """立体主义风格后按颜色简化度重新量化"""
+                        result = apply_picasso_cubist_style(image)
+                        
+                        # 调整颜色简化度
+                        if color_simplify != 8:
+                            pixels = result.reshape((-1, 3))
+                            pixels = np.float32(pixels)
+                            criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 0.2)
+                            _, labels, centers = cv2.kmeans(pixels, color_simplify, None, 
+                                                            criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
+                            centers = np.uint8(centers)
+                            simplified = centers[labels.flatten()]
+                            result = simplified.reshape(result.shape)
+                        return result
                     
-                    # 调整颜色简化度
-                    if color_simplify != 8:
-                        pixels = result_bgr.reshape((-1, 3))
-                        pixels = np.float32(pixels)
-                        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 0.2)
-                        _, labels, centers = cv2.kmeans(pixels, color_simplify, None, 
-                                                        criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
-                        centers = np.uint8(centers)
-                        simplified = centers[labels.flatten()]
-                        result_bgr = simplified.reshape(result_bgr.shape)
+                    # 随机几何块与 K-means 量化，直接在原图上处理
+                    result_bgr = picasso_with_colors(image_bgr, color_simplify)
                     
                     result_rgb = cv2.cvtColor(result_bgr, cv2.COLOR_BGR2RGB)
         
@@ -4274,27 +2831,32 @@ with tabs[9]:
             
             if st.button("🎭 应用动漫风格", use_container_width=True, key="anime_btn"):
                 with st.spinner("正在转换为动漫风格..."):
-                    result_bgr = apply_anime_style(image_bgr)
+                    def anime_with_edges(image, edge_thickness):
+                        """动漫风格后按轮廓粗细重新叠加轮廓"""
+                        result = apply_anime_style(image)
                     
-                    # 调整轮廓粗细
-                    if edge_thickness != 2:
-                        gray = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
-                        g1 = cv2.GaussianBlur(gray, (5, 5), 0.5)
-                        g2 = cv2.GaussianBlur(gray, (5, 5), 2.0)
-                        dog = g1 - g2
-                        _, edges = cv2.threshold(dog, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-                        edges = cv2.ximgproc.thinning(edges)
+                        # 调整轮廓粗细
+                        if edge_thickness != 2:
+                            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+                            g1 = cv2.GaussianBlur(gray, (5, 5), 0.5)
+                            g2 = cv2.GaussianBlur(gray, (5, 5), 2.0)
+                            dog = g1 - g2
+                            _, edges = cv2.threshold(dog, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+                            edges = cv2.ximgproc.thinning(edges)
                         
-                        # 根据厚度调整轮廓
-                        kernel_size = edge_thickness * 2 + 1
-                        kernel = np.ones((kernel_size, kernel_size), np.uint8)
-                        edges_thick = cv2.dilate(edges, kernel)
+                            # 根据厚度调整轮廓
+                            kernel_size = edge_thickness * 2 + 1
+                            kernel = np.ones((kernel_size, kernel_size), np.uint8)
+                            edges_thick = cv2.dilate(edges, kernel)
                         
-                        # 应用新的轮廓
-                        edges_bgr = cv2.cvtColor(edges_thick, cv2.COLOR_GRAY2BGR)
-                        outline_color = (30, 30, 30)
-                        edges_colored = cv2.bitwise_and(edges_bgr, outline_color)
-                        result_bgr = cv2.subtract(result_bgr, edges_colored)
+                            # 应用新的轮廓
+                            edges_bgr = cv2.cvtColor(edges_thick, cv2.COLOR_GRAY2BGR)
+                            outline_color = (30, 30, 30)
+                            edges_colored = cv2.bitwise_and(edges_bgr, outline_color)
+                            result = cv2.subtract(result, edges_colored)
+                        return result
+                    
+                    result_bgr = render_operation(anime_with_edges, image_bgr, edge_thickness)
                     
                     result_rgb = cv2.cvtColor(result_bgr, cv2.COLOR_BGR2RGB)
         
@@ -4519,12 +3081,12 @@ with tabs[10]:
     )
     
     if uploaded_file is not None:
-        # 读取图像
-        pil_image = Image.open(uploaded_file)
-        # 保存RGB版本用于显示
-        image_rgb = np.array(pil_image)
-        # 转换为BGR用于OpenCV处理
-        image_bgr = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
+        # 读取图像（会话内只解码一次，各选项卡共享）
+        decoded_image = image_store.get(uploaded_file)
+        # RGB版本用于显示
+        image_rgb = decoded_image.rgb
+        # BGR版本用于OpenCV处理
+        image_bgr = decoded_image.bgr
         
         # 显示原始图像
         col1, col2 = st.columns(2)
@@ -4683,30 +3245,10 @@ with tabs[10]:
             clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
             l_enhanced = clahe.apply(l)
             
-            # 智能添加颜色
-            height, width = l_enhanced.shape
-            
-            # 根据亮度区域智能上色
-            for i in range(height):
-                for j in range(width):
-                    brightness = l_enhanced[i, j] / 255.0
-                    
-                    # 智能上色规则
-                    if brightness > 0.8:  # 高亮区域（天空/云）
-                        a[i, j] = 128 + int(64 * brightness)  # 偏青色
-                        b[i, j] = 128 + int(96 * brightness)  # 偏蓝色
-                    elif brightness > 0.6:  # 中等偏亮（皮肤/墙壁）
-                        a[i, j] = 140 + int(40 * brightness)  # 偏暖色
-                        b[i, j] = 100 + int(30 * brightness)  # 偏黄色
-                    elif brightness > 0.4:  # 中等亮度（植被）
-                        a[i, j] = 90 + int(70 * brightness)   # 偏绿色
-                        b[i, j] = 120 + int(40 * brightness)  # 偏黄色
-                    elif brightness > 0.2:  # 暗部（土地/阴影）
-                        a[i, j] = 110 + int(30 * brightness)  # 偏棕色
-                        b[i, j] = 80 + int(20 * brightness)   # 偏蓝色
-                    else:  # 很暗的区域
-                        a[i, j] = 128
-                        b[i, j] = 128
+            # 根据亮度区域智能上色（查找表整图映射）
+            a_lut, b_lut = build_smart_colorize_lut()
+            a = a_lut[l_enhanced]
+            b = b_lut[l_enhanced]
             
             # 应用颜色强度
             a_center = 128
@@ -4763,7 +3305,7 @@ with tabs[10]:
             if st.button("🎨 应用上色效果", use_container_width=True):
                 with st.spinner("正在智能上色中..."):
                     # 使用BGR图像处理
-                    result_bgr = enhanced_colorize_old_photo(
+                    result_bgr = render_operation(enhanced_colorize_old_photo, 
                         process_image, 
                         mode=colorize_mode,
                         color_intensity=color_intensity,
@@ -4848,31 +3390,24 @@ with tabs[10]:
             
             with col_dl2:
                 # PNG格式
-                png_buffer = io.BytesIO()
-                result_pil = Image.fromarray(result_rgb)
-                result_pil.save(png_buffer, format="PNG")
-                png_buffer.seek(0)
-                
-                st.download_button(
-                    label="🖼️ 下载PNG格式",
-                    data=png_buffer,
-                    file_name=f"colorized_{colorize_mode}.png",
-                    mime="image/png",
-                    use_container_width=True
+                provide_download_button(
+                    result_rgb, 
+                    f"colorized_{colorize_mode}.png", 
+                    "🖼️ 下载PNG格式",
+                    unique_key_suffix="colorize_png",
+                    image_format="PNG",
+                    show_note=False
                 )
             
             with col_dl3:
                 # 高质量版本
-                high_buffer = io.BytesIO()
-                result_pil.save(high_buffer, format="JPEG", quality=100)
-                high_buffer.seek(0)
-                
-                st.download_button(
-                    label="🌟 最高质量",
-                    data=high_buffer,
-                    file_name=f"colorized_{colorize_mode}_高质量.jpg",
-                    mime="image/jpeg",
-                    use_container_width=True
+                provide_download_button(
+                    result_rgb, 
+                    f"colorized_{colorize_mode}_高质量.jpg", 
+                    "🌟 最高质量",
+                    unique_key_suffix="colorize_high",
+                    quality=100,
+                    show_note=False
                 )
             
             # 添加处理建议
@@ -4956,13 +3491,13 @@ with tabs[11]:
     )
     
     if uploaded_file is not None:
-        # 读取图像
-        pil_image = Image.open(uploaded_file)
-        # 保存RGB版本用于显示
-        image_rgb = np.array(pil_image)
+        # 读取图像（会话内只解码一次，各选项卡共享）
+        decoded_image = image_store.get(uploaded_file)
+        # RGB版本用于显示
+        image_rgb = decoded_image.rgb
         
-        # 转换为BGR用于OpenCV处理
-        image_bgr = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
+        # BGR版本用于OpenCV处理
+        image_bgr = decoded_image.bgr
         
         # 如果图像不是二值图，先转换为灰度再二值化
         if len(image_bgr.shape) == 3:
@@ -4979,13 +3514,13 @@ with tabs[11]:
         kernel_size = st.slider("核大小", 3, 15, 5, step=2)
         
         if operation == "腐蚀":
-            result_bgr = apply_erosion(image_bgr, kernel_size)
+            result_bgr = render_operation(apply_erosion, image_bgr, kernel_size)
         elif operation == "膨胀":
-            result_bgr = apply_dilation(image_bgr, kernel_size)
+            result_bgr = render_operation(apply_dilation, image_bgr, kernel_size)
         elif operation == "开运算":
-            result_bgr = apply_opening(image_bgr, kernel_size)
+            result_bgr = render_operation(apply_opening, image_bgr, kernel_size)
         else:  # 闭运算
-            result_bgr = apply_closing(image_bgr, kernel_size)
+            result_bgr = render_operation(apply_closing, image_bgr, kernel_size)
         
         # 转换为RGB用于显示和下载
         result_rgb = cv2.cvtColor(result_bgr, cv2.COLOR_BGR2RGB)
@@ -5006,6 +3541,176 @@ with tabs[11]:
 
 
 
+# 13. 处理流水线选项卡
+with tabs[12]:
+    st.markdown("### 🔗 处理流水线")
+    
+    st.markdown("""
+    <div class='ideology-card'>
+        <h4>🎯 思政关联：统筹协调的系统观念</h4>
+        <p>
+        处理流水线把多个图像处理步骤<strong style='color: #dc2626;'>统筹</strong>为一个整体，
+        一次完成、可保存、可复现，这体现了<strong style='color: #dc2626;'>系统观念</strong>和协同配合的工作方法。
+        在技术学习中，我们既要掌握单项技能，也要学会整体谋划。
+        </p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # 流水线步骤保存在会话中：[{"id", "op", "params"}]
+    PIPELINE_STEPS_KEY = "lab_pipeline_steps"
+    if PIPELINE_STEPS_KEY not in st.session_state:
+        st.session_state[PIPELINE_STEPS_KEY] = []
+        st.session_state["lab_pipeline_next_id"] = 0
+    pipeline_steps = st.session_state[PIPELINE_STEPS_KEY]
+    
+    def new_pipeline_step(op, params=None):
+        """创建带唯一编号的步骤（编号用于控件key，删除/移动后控件状态不错位）"""
+        step_id = st.session_state["lab_pipeline_next_id"]
+        st.session_state["lab_pipeline_next_id"] = step_id + 1
+        return {"id": step_id, "op": op, "params": get_operation(op).bind(params)}
+    
+    def pipeline_param_input(operation, name, value, key):
+        """根据参数默认值的类型与登记的取值范围生成输入控件"""
+        value_range = operation.ranges.get(name)
+        default = operation.params[name]
+        
+        if isinstance(value_range, list):
+            index = value_range.index(value) if value in value_range else 0
+            return st.selectbox(name, value_range, index=index, key=key)
+        if name == "seed":
+            seed = st.number_input("seed（0 表示每次随机）", min_value=0, value=int(value or 0), step=1, key=key)
+            return int(seed) or None
+        if isinstance(default, bool):
+            return st.checkbox(name, value=bool(value), key=key)
+        if isinstance(default, int) and value_range:
+            return st.slider(name, int(value_range[0]), int(value_range[1]), int(value), key=key)
+        if isinstance(default, float) and value_range:
+            low, high = float(value_range[0]), float(value_range[1])
+            return st.slider(name, low, high, float(value), (high - low) / 100, key=key)
+        if isinstance(default, (int, float)):
+            return st.number_input(name, value=value, key=key)
+        if isinstance(default, tuple):
+            text = st.text_input(f"{name}（逗号分隔）", ", ".join(str(v) for v in value), key=key)
+            try:
+                return tuple(int(v) for v in text.split(","))
+            except ValueError:
+                st.warning(f"参数 {name} 格式不正确，已保留原值")
+                return tuple(value)
+        # 默认值为 None 的参数（如旋涡列表）保持默认
+        return value
+    
+    uploaded_file = st.file_uploader(
+        "📤 选择图像文件", 
+        type=["jpg", "jpeg", "png"], 
+        key="tab13_upload"
+    )
+    
+    # 导入已保存的流水线
+    pipeline_file = st.file_uploader("📂 导入流水线（JSON）", type=["json"], key="pipeline_json_upload")
+    if pipeline_file is not None:
+        pipeline_file_id = getattr(pipeline_file, "file_id", pipeline_file.name)
+        if st.session_state.get("lab_pipeline_loaded") != pipeline_file_id:
+            try:
+                loaded = Pipeline.from_json(pipeline_file.getvalue().decode("utf-8"))
+                pipeline_steps[:] = [new_pipeline_step(step.op, step.params) for step in loaded]
+                st.session_state["lab_pipeline_loaded"] = pipeline_file_id
+                st.success(f"✅ 已导入 {len(loaded)} 个步骤")
+            except Exception as e:
+                st.error(f"导入流水线失败: {str(e)}")
+    
+    # 添加步骤
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        new_op = st.selectbox(
+            "选择操作",
+            [op.name for op in list_operations()],
+            format_func=lambda name: f"{get_operation(name).category} · {get_operation(name).label}",
+            key="pipeline_new_op"
+        )
+    with col2:
+        st.markdown("<br>", unsafe_allow_html=True)
+        if st.button("➕ 添加步骤", use_container_width=True, key="pipeline_add_btn"):
+            pipeline_steps.append(new_pipeline_step(new_op))
+    
+    # 编辑步骤
+    for index, step in enumerate(list(pipeline_steps)):
+        operation = get_operation(step["op"])
+        with st.expander(f"步骤 {index + 1}：{operation.label}", expanded=True):
+            for name, value in list(step["params"].items()):
+                step["params"][name] = pipeline_param_input(
+                    operation, name, value, key=f"pipeline_{step['id']}_{name}"
+                )
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                if st.button("⬆️ 上移", use_container_width=True, key=f"pipeline_up_{step['id']}",
+                             disabled=index == 0):
+                    pipeline_steps[index - 1], pipeline_steps[index] = pipeline_steps[index], pipeline_steps[index - 1]
+                    st.rerun()
+            with col2:
+                if st.button("⬇️ 下移", use_container_width=True, key=f"pipeline_down_{step['id']}",
+                             disabled=index == len(pipeline_steps) - 1):
+                    pipeline_steps[index + 1], pipeline_steps[index] = pipeline_steps[index], pipeline_steps[index + 1]
+                    st.rerun()
+            with col3:
+                if st.button("🗑️ 删除", use_container_width=True, key=f"pipeline_del_{step['id']}"):
+                    pipeline_steps.pop(index)
+                    st.rerun()
+    
+    if pipeline_steps:
+        try:
+            pipeline = Pipeline(PipelineStep(step["op"], step["params"]) for step in pipeline_steps)
+        except ValueError as e:
+            st.error(f"流水线参数有误: {str(e)}")
+            pipeline = None
+        
+        if pipeline is not None:
+            # 颜色空间转换计划
+            conversions = pipeline.plan()
+            if conversions:
+                st.caption("🔄 颜色空间转换：" + "；".join(
+                    f"{get_operation(op).label if op else '输出'}前 {source} → {target}"
+                    for op, source, target in conversions
+                ))
+            else:
+                st.caption("🔄 整条流水线无需额外的颜色空间转换")
+            
+            st.download_button(
+                "💾 导出流水线（JSON）",
+                data=pipeline.to_json(indent=2),
+                file_name="pipeline.json",
+                mime="application/json",
+                use_container_width=True,
+                key="pipeline_json_download"
+            )
+    else:
+        pipeline = None
+        st.info("请添加处理步骤，或导入已保存的流水线")
+    
+    if uploaded_file is not None and pipeline is not None:
+        # 读取图像（会话内只解码一次，各选项卡共享）
+        decoded_image = image_store.get(uploaded_file)
+        image_rgb = decoded_image.rgb
+        image_bgr = decoded_image.bgr
+        
+        if st.button("▶️ 运行流水线", use_container_width=True, key="pipeline_run_btn"):
+            with st.spinner("正在执行流水线..."):
+                start_time = time.time()
+                result_bgr = render_operation(apply_pipeline, image_bgr, pipeline.to_json())
+                elapsed = time.time() - start_time
+                result_rgb = cv2.cvtColor(result_bgr, cv2.COLOR_BGR2RGB)
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                st.image(image_rgb, caption="原始图像", use_container_width=True)
+            with col2:
+                st.image(result_rgb, caption=f"流水线结果（{len(pipeline)} 步，{elapsed:.2f} 秒）",
+                         use_container_width=True)
+            
+            provide_download_button(result_rgb, "pipeline_result.jpg", "📥 下载结果", "pipeline")
+    elif uploaded_file is None:
+        st.info("请上传图像文件开始处理")
+
 # 底部思政总结
 st.markdown("---")
 st.markdown("""
@@ -9,10 +9,16 @@ from datetime import datetime
 import webbrowser
 import matplotlib.pyplot as plt
 import os
-import json
 import uuid
 import shutil
+import math
 from pathlib import Path
+import platform_blobs
+import platform_bootstrap
+import platform_db
+import platform_library
+import platform_migrations
+import platform_search
 plt.rcParams['font.sans-serif'] = ['SimHei']  # 黑体
 plt.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
 
@@ -39,37 +45,94 @@ if 'student_name' not in st.session_state:
 
 # 资源上传相关配置
 UPLOAD_DIR = "uploaded_resources"
-RESOURCES_FILE = "resources_data.json"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 # 实践项目库配置
 PROJECTS_DIR = "projects_library"
-PROJECTS_FILE = "projects_data.json"
-os.makedirs(PROJECTS_DIR, exist_ok=True)
-
-def load_resources():
-    """加载已上传的资源"""
-    if os.path.exists(RESOURCES_FILE):
-        with open(RESOURCES_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return []
-
-def save_resources(resources):
-    """保存资源数据"""
-    with open(RESOURCES_FILE, 'w', encoding='utf-8') as f:
-        json.dump(resources, f, ensure_ascii=False, indent=2)
-
-def load_projects():
-    """加载实践项目"""
-    if os.path.exists(PROJECTS_FILE):
-        with open(PROJECTS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return []
-
-def save_projects(projects):
-    """保存项目数据"""
-    with open(PROJECTS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(projects, f, ensure_ascii=False, indent=2)
+
+# 资源与项目数据存储在数据库中（platform_library），原 JSON 文件在迁移时导入
+DB_PATH = 'image_processing_platform.db'
+
+@platform_bootstrap.once("学习资源中心")
+def init_resource_center():
+    """创建上传目录并确保数据库结构为最新（每个进程只执行一次）"""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    os.makedirs(PROJECTS_DIR, exist_ok=True)
+    platform_migrations.ensure_schema(DB_PATH)
+
+init_resource_center()
+
+def library_read(func, *args, **kwargs):
+    """执行 platform_library 的查询函数"""
+    conn = platform_db.connect(DB_PATH)
+    try:
+        return func(conn.cursor(), *args, **kwargs)
+    finally:
+        conn.close()
+
+def library_write(func, *args, **kwargs):
+    """在写事务中执行 platform_library 的写函数（只写入一条记录，不会覆盖他人的修改）"""
+    conn = platform_db.connect(DB_PATH)
+    try:
+        with platform_db.write_transaction(conn) as c:
+            return func(c, *args, **kwargs)
+    finally:
+        conn.close()
+
+def render_pager(total, key, page_size=platform_library.PAGE_SIZE):
+    """分页选择，返回当前页的起始位置"""
+    pages = max(1, math.ceil(total / page_size))
+    if pages == 1:
+        return 0
+    # 筛选条件变化后总页数可能变少
+    if st.session_state.get(key, 1) > pages:
+        st.session_state[key] = pages
+    page = st.number_input(f"页码（共 {pages} 页，{total} 条）", min_value=1, max_value=pages,
+                           value=1, step=1, key=key)
+    return (page - 1) * page_size
+
+def load_resource_page(search_query, viewer, resource_type, resource_tag):
+    """
+    资源列表的当前页：有检索词时在筛选范围内按相关度检索，否则按上传时间倒序列出
+
+    返回:
+    - (符合条件的资源数, 当前页的资源)
+    """
+    searching = bool(search_query.strip())
+    if searching:
+        within = platform_library.resource_ids_sql(viewer, resource_type, resource_tag)
+        total = library_read(platform_search.count, search_query, ["resource"], viewer, within)
+    else:
+        total = library_read(platform_library.count_resources, viewer, resource_type, resource_tag)
+    if not total:
+        return 0, []
+    offset = render_pager(total, "resource_page")
+    if searching:
+        resource_ids = library_read(platform_search.search_refs, search_query, "resource", viewer, within,
+                                    offset=offset)
+        return total, library_read(platform_library.get_resources, resource_ids)
+    return total, library_read(platform_library.list_resources, viewer, resource_type, resource_tag, offset=offset)
+
+def load_project_page(search_query, project_filters, pager_key):
+    """
+    项目列表的当前页：有检索词时在筛选范围内按相关度检索，否则按创建时间倒序列出
+
+    返回:
+    - (符合条件的项目数, 当前页的项目)
+    """
+    searching = bool(search_query.strip())
+    if searching:
+        within = platform_library.project_ids_sql(**project_filters)
+        total = library_read(platform_search.count, search_query, ["project"], within=within)
+    else:
+        total = library_read(platform_library.count_projects, **project_filters)
+    if not total:
+        return 0, []
+    offset = render_pager(total, pager_key)
+    if searching:
+        project_ids = library_read(platform_search.search_refs, search_query, "project", within=within,
+                                   offset=offset)
+        return total, library_read(platform_library.get_projects, project_ids)
+    return total, library_read(platform_library.list_projects, **project_filters, offset=offset)
 
 # 现代化米色思政主题CSS
 def apply_modern_css():
@@ -966,8 +1029,7 @@ def render_resource_upload():
                     filename = f"{resource_id}_{upload_file.name}"
                     filepath = os.path.join(UPLOAD_DIR, filename)
                     
-                    with open(filepath, "wb") as f:
-                        f.write(upload_file.getbuffer())
+                    platform_blobs.write_upload(upload_file, filepath)
                     
                     # 获取文件大小
                     file_size = upload_file.size
@@ -991,10 +1053,8 @@ def render_resource_upload():
                         "download_count": 0
                     }
                     
-                    # 保存到资源列表
-                    resources = load_resources()
-                    resources.append(resource_data)
-                    save_resources(resources)
+                    # 保存到资源库
+                    library_write(platform_library.add_resource, resource_data)
                     
                     st.success(f"✅ 资源 '{resource_name}' 上传成功！")
                     st.balloons()
@@ -1007,119 +1067,124 @@ def render_resource_upload():
     # 显示已上传的资源
     st.markdown("### 📋 已上传的资源")
     
-    resources = load_resources()
+    # 过滤资源：如果是普通用户，只能看到公开资源和自己上传的；管理员可以看到所有
+    if st.session_state.role == "admin" or st.session_state.role == "teacher":
+        viewer = None
+    else:
+        viewer = st.session_state.username
+    
+    search_query = st.text_input("🔍 搜索资源", placeholder="输入资源名称、描述或标签中的关键词，多个关键词用空格分隔",
+                                 key="resource_search")
+    filter_col1, filter_col2 = st.columns(2)
+    with filter_col1:
+        filter_type = st.selectbox("按类型筛选", ["全部", "文档", "代码", "图片", "视频", "音频", "数据集", "其他"],
+                                   key="resource_filter_type")
+    with filter_col2:
+        tag_options = [tag for tag, _ in library_read(platform_library.list_resource_tags)]
+        filter_tag = st.selectbox("按标签筛选", ["全部"] + tag_options, key="resource_filter_tag")
+    resource_type = None if filter_type == "全部" else filter_type
+    resource_tag = None if filter_tag == "全部" else filter_tag
+    
+    total_resources, resources = load_resource_page(search_query, viewer, resource_type, resource_tag)
     
-    if not resources:
-        st.info("📭 暂无上传的资源")
+    if not total_resources:
+        st.info("📭 没有找到匹配的资源" if search_query.strip() else "📭 暂无可见的资源")
     else:
-        # 过滤资源：如果是普通用户，只能看到公开资源和自己上传的；管理员可以看到所有
-        if st.session_state.role == "admin" or st.session_state.role == "teacher":
-            filtered_resources = resources
-        else:
-            filtered_resources = [
-                r for r in resources 
-                if r.get("is_public", True) or r.get("uploader") == st.session_state.username
-            ]
-        
-        if not filtered_resources:
-            st.info("📭 暂无可见的资源")
-        else:
-            for i, resource in enumerate(filtered_resources):
-                is_owner = resource.get("uploader") == st.session_state.username
-                
-                col1, col2 = st.columns([4, 1])
+        for i, resource in enumerate(resources):
+            is_owner = resource.get("uploader") == st.session_state.username
+            
+            col1, col2 = st.columns([4, 1])
+            
+            with col1:
+                # 资源类型图标
+                type_icons = {
+                    "文档": "📄", "代码": "💻", "图片": "🖼️", 
+                    "视频": "🎬", "音频": "🎵", "数据集": "📊", "其他": "📎"
+                }
+                icon = type_icons.get(resource["type"], "📎")
                 
-                with col1:
-                    # 资源类型图标
-                    type_icons = {
-                        "文档": "📄", "代码": "💻", "图片": "🖼️", 
-                        "视频": "🎬", "音频": "🎵", "数据集": "📊", "其他": "📎"
-                    }
-                    icon = type_icons.get(resource["type"], "📎")
-                    
-                    # 资源卡片
-                    html_parts = []
-
-                    # 第一部分：卡片头部
-                    header = f"""
-                        <div class='uploaded-resource-card'>
-                            <div style="display: flex; justify-content: space-between; align-items: center;">
-                            <h4 style="margin: 0; color: #1f2937;">{icon} {resource['name']}</h4>
-                            <div>
-                    """
+                # 资源卡片
+                html_parts = []
+
+                # 第一部分：卡片头部
+                header = f"""
+                    <div class='uploaded-resource-card'>
+                        <div style="display: flex; justify-content: space-between; align-items: center;">
+                        <h4 style="margin: 0; color: #1f2937;">{icon} {resource['name']}</h4>
+                        <div>
+                """
 
-                    # 处理所有者和隐私标签
-                    owner_tag = '<span style="color: #dc2626; font-weight: bold;">👤 我的</span>' if is_owner else ''
-                    privacy_tag = '' if resource.get('is_public', True) else '<span style="color: #6b7280; font-weight: bold;">🔒 私密</span>'
+                # 处理所有者和隐私标签
+                owner_tag = '<span style="color: #dc2626; font-weight: bold;">👤 我的</span>' if is_owner else ''
+                privacy_tag = '' if resource.get('is_public', True) else '<span style="color: #6b7280; font-weight: bold;">🔒 私密</span>'
 
-                    # 第二部分：描述
-                    description = f"<p style='color: #6b7280; margin: 8px 0;'>{resource['description'] or '无描述'}</p>"
-        
-                    # 第三部分：信息
-                    info = f"""
-                    <div style="display: flex; justify-content: space-between; margin-top: 15px;">
-                        <div>
-                            <span style="color: #6b7280; font-size: 0.9rem;">👤 {resource['uploader']} ({resource['uploader_role']})</span>
-                            <span style="color: #6b7280; font-size: 0.9rem; margin-left: 15px;">🕒 {resource['upload_time']}</span>
-                        </div>
-                        <div>
-                            <span style="color: #6b7280; font-size: 0.9rem;">📦 {resource['file_size']}</span>
-                            <span style="color: #6b7280; font-size: 0.9rem; margin-left: 15px;">📥 下载: {resource.get('download_count', 0)}</span>
-                        </div>
+                # 第二部分：描述
+                description = f"<p style='color: #6b7280; margin: 8px 0;'>{resource['description'] or '无描述'}</p>"
+    
+                # 第三部分：信息
+                info = f"""
+                <div style="display: flex; justify-content: space-between; margin-top: 15px;">
+                    <div>
+                        <span style="color: #6b7280; font-size: 0.9rem;">👤 {resource['uploader']} ({resource['uploader_role']})</span>
+                        <span style="color: #6b7280; font-size: 0.9rem; margin-left: 15px;">🕒 {resource['upload_time']}</span>
                     </div>
-                    """
-
-                    # 第四部分：标签
-                    tags_section = ""
-                    if resource.get('tags'):
-                        tags_list = []
-                        for tag in resource.get('tags', []):
-                            tags_list.append(f'<span class="badge purple" style="font-size: 0.8rem;">{tag}</span>')
-                        tags_html = ' '.join(tags_list)
-                        tags_section = f"<div style='margin-top: 10px;'>{tags_html}</div>"
-
-                    # 组合所有部分
-                    final_html = f"""{header}{owner_tag}{privacy_tag}</div></div>
-                    {description}
-                    {info}
-                    {tags_section}
-                    </div>"""
-
-                    st.markdown(final_html, unsafe_allow_html=True)
-                with col2:
-                    # 下载按钮
-                    filepath = os.path.join(UPLOAD_DIR, resource["filename"])
-                    if os.path.exists(filepath):
-                        with open(filepath, "rb") as f:
-                            file_data = f.read()
-                        
-                        st.download_button(
-                            label="📥 下载",
-                            data=file_data,
-                            file_name=resource["original_filename"],
-                            mime="application/octet-stream",
-                            use_container_width=True,
-                            key=f"download_{resource['id']}_{i}"
-                        )
+                    <div>
+                        <span style="color: #6b7280; font-size: 0.9rem;">📦 {resource['file_size']}</span>
+                        <span style="color: #6b7280; font-size: 0.9rem; margin-left: 15px;">📥 下载: {resource.get('download_count', 0)}</span>
+                    </div>
+                </div>
+                """
+
+                # 第四部分：标签
+                tags_section = ""
+                if resource.get('tags'):
+                    tags_list = []
+                    for tag in resource.get('tags', []):
+                        tags_list.append(f'<span class="badge purple" style="font-size: 0.8rem;">{tag}</span>')
+                    tags_html = ' '.join(tags_list)
+                    tags_section = f"<div style='margin-top: 10px;'>{tags_html}</div>"
+
+                # 组合所有部分
+                final_html = f"""{header}{owner_tag}{privacy_tag}</div></div>
+                {description}
+                {info}
+                {tags_section}
+                </div>"""
+
+                st.markdown(final_html, unsafe_allow_html=True)
+            with col2:
+                # 下载按钮
+                filepath = os.path.join(UPLOAD_DIR, resource["filename"])
+                if os.path.exists(filepath):
+                    with open(filepath, "rb") as f:
+                        file_data = f.read()
                     
-                    # 删除按钮（仅资源所有者或管理员可见）
-                    if is_owner or st.session_state.role in ["admin", "teacher"]:
-                        if st.button("🗑️ 撤销", 
-                                   key=f"delete_{resource['id']}_{i}",
-                                   use_container_width=True,
-                                   type="secondary"):
-                            # 删除文件
-                            try:
-                                if os.path.exists(filepath):
-                                    os.remove(filepath)
-                            except:
-                                pass
-                            
-                            # 从资源列表中移除
-                            resources = [r for r in resources if r["id"] != resource["id"]]
-                            save_resources(resources)
-                            st.success("✅ 资源已撤销")
-                            st.rerun()
+                    st.download_button(
+                        label="📥 下载",
+                        data=file_data,
+                        file_name=resource["original_filename"],
+                        mime="application/octet-stream",
+                        use_container_width=True,
+                        key=f"download_{resource['id']}_{i}"
+                    )
+                
+                # 删除按钮（仅资源所有者或管理员可见）
+                if is_owner or st.session_state.role in ["admin", "teacher"]:
+                    if st.button("🗑️ 撤销", 
+                               key=f"delete_{resource['id']}_{i}",
+                               use_container_width=True,
+                               type="secondary"):
+                        # 从资源库中移除
+                        library_write(platform_library.delete_resource, resource["id"])
+                        
+                        # 删除文件
+                        try:
+                            if os.path.exists(filepath):
+                                os.remove(filepath)
+                        except:
+                            pass
+                        st.success("✅ 资源已撤销")
+                        st.rerun()
 
 # 实践项目库模块
 def render_project_library():
@@ -1171,16 +1236,13 @@ def render_project_library():
     
     st.markdown("---")
     
-    # 加载项目数据
-    projects = load_projects()
-    
     # 根据用户角色显示不同的界面
     if st.session_state.role == "teacher" or st.session_state.role == "admin":
-        render_teacher_project_interface(projects)
+        render_teacher_project_interface()
     else:
-        render_student_project_interface(projects)
+        render_student_project_interface()
 
-def render_teacher_project_interface(projects):
+def render_teacher_project_interface():
     """渲染教师端项目界面"""
     st.markdown("### 👨‍🏫 教师端功能")
     
@@ -1241,8 +1303,7 @@ def render_teacher_project_interface(projects):
                         proposal_filename = f"proposal_{project_id}.{proposal_ext}"
                         proposal_path = os.path.join(project_dir, proposal_filename)
                         
-                        with open(proposal_path, "wb") as f:
-                            f.write(proposal_file.getbuffer())
+                        platform_blobs.write_upload(proposal_file, proposal_path)
                         
                         # 保存数据集文件
                         dataset_files_info = []
@@ -1254,8 +1315,7 @@ def render_teacher_project_interface(projects):
                                 dataset_filename = f"dataset_{dataset_file.name}"
                                 dataset_path = os.path.join(dataset_dir, dataset_filename)
                                 
-                                with open(dataset_path, "wb") as f:
-                                    f.write(dataset_file.getbuffer())
+                                platform_blobs.write_upload(dataset_file, dataset_path)
                                 
                                 file_size = dataset_file.size
                                 file_size_str = f"{file_size/1024:.1f}KB" if file_size < 1024*1024 else f"{file_size/(1024*1024):.1f}MB"
@@ -1274,8 +1334,7 @@ def render_teacher_project_interface(projects):
                             code_filename = f"initial_code_{project_id}.{code_ext}"
                             code_path = os.path.join(project_dir, code_filename)
                             
-                            with open(code_path, "wb") as f:
-                                f.write(initial_code.getbuffer())
+                            platform_blobs.write_upload(initial_code, code_path)
                             
                             file_size = initial_code.size
                             file_size_str = f"{file_size/1024:.1f}KB" if file_size < 1024*1024 else f"{file_size/(1024*1024):.1f}MB"
@@ -1313,8 +1372,7 @@ def render_teacher_project_interface(projects):
                         }
                         
                         # 保存项目数据
-                        projects.append(project_data)
-                        save_projects(projects)
+                        library_write(platform_library.add_project, project_data)
                         
                         st.success(f"✅ 项目 '{project_name}' 创建成功！")
                         st.balloons()
@@ -1325,28 +1383,30 @@ def render_teacher_project_interface(projects):
     with teacher_tab2:
         st.markdown("#### 📋 项目管理")
         
-        if not projects:
+        if not library_read(platform_library.count_projects):
             st.info("📭 暂无实践项目")
         else:
             # 项目筛选
+            facets = library_read(platform_library.project_facets)
+            search_query = st.text_input("🔍 搜索项目", placeholder="输入项目名称、描述、类型或学生姓名中的关键词",
+                                         key="project_search_teacher")
             col1, col2, col3 = st.columns(3)
             with col1:
-                filter_year = st.selectbox("按学年筛选", ["全部"] + list(set(p["academic_year"] for p in projects)), key="filter_year_teacher")
+                filter_year = st.selectbox("按学年筛选", ["全部"] + facets["academic_year"], key="filter_year_teacher")
             with col2:
-                filter_type = st.selectbox("按类型筛选", ["全部"] + list(set(p["type"] for p in projects)), key="filter_type_teacher")
+                filter_type = st.selectbox("按类型筛选", ["全部"] + facets["type"], key="filter_type_teacher")
             with col3:
                 filter_difficulty = st.selectbox("按难度筛选", ["全部", "简单", "中等", "较难", "困难", "挑战"], key="filter_difficulty_teacher")
             
             # 过滤项目
-            filtered_projects = projects
-            if filter_year != "全部":
-                filtered_projects = [p for p in filtered_projects if p["academic_year"] == filter_year]
-            if filter_type != "全部":
-                filtered_projects = [p for p in filtered_projects if p["type"] == filter_type]
-            if filter_difficulty != "全部":
-                filtered_projects = [p for p in filtered_projects if p["difficulty"] == filter_difficulty]
+            project_filters = {
+                "academic_year": None if filter_year == "全部" else filter_year,
+                "project_type": None if filter_type == "全部" else filter_type,
+                "difficulty": None if filter_difficulty == "全部" else filter_difficulty,
+            }
+            total_projects, filtered_projects = load_project_page(search_query, project_filters, "project_page_teacher")
             
-            if not filtered_projects:
+            if not total_projects:
                 st.info("📭 没有符合条件的项目")
 
             else:
@@ -1474,25 +1534,24 @@ def render_teacher_project_interface(projects):
                         # 删除项目（仅创建者或管理员）
                         if project['created_by'] == st.session_state.username or st.session_state.role in ["admin", "teacher"]:
                             if st.button("🗑️ 删除", key=f"delete_project_{project['id']}_{i}", use_container_width=True, type="secondary"):
+                                # 从项目库中移除
+                                library_write(platform_library.delete_project, project['id'])
+                                
                                 # 删除项目目录
                                 project_dir = os.path.join(PROJECTS_DIR, project['id'])
                                 if os.path.exists(project_dir):
                                     shutil.rmtree(project_dir)
                                 
-                                # 从项目列表中移除
-                                projects = [p for p in projects if p['id'] != project['id']]
-                                save_projects(projects)
-                                
                                 st.success("✅ 项目已删除")
                                 st.rerun()
                     
                     st.markdown("---")
 
-def render_student_project_interface(projects):
+def render_student_project_interface():
     """渲染学生端项目界面"""
     st.markdown("### 👨‍🎓 学生端功能")
     
-    if not projects:
+    if not library_read(platform_library.count_projects):
         st.info("📭 暂无可用的实践项目")
         return
     
@@ -1503,20 +1562,22 @@ def render_student_project_interface(projects):
         st.markdown("#### 📚 可参与的项目")
         
         # 项目筛选
+        search_query = st.text_input("🔍 搜索项目", placeholder="输入项目名称、描述、类型或学生姓名中的关键词",
+                                     key="project_search_student")
         col1, col2 = st.columns(2)
         with col1:
             filter_difficulty = st.selectbox("按难度筛选", ["全部", "简单", "中等", "较难", "困难", "挑战"], key="filter_difficulty_student")
         with col2:
-            filter_type = st.selectbox("按类型筛选", ["全部"] + list(set(p["type"] for p in projects)), key="filter_type_student")
+            filter_type = st.selectbox("按类型筛选", ["全部"] + library_read(platform_library.project_facets)["type"], key="filter_type_student")
         
         # 过滤项目
-        filtered_projects = projects
-        if filter_difficulty != "全部":
-            filtered_projects = [p for p in filtered_projects if p["difficulty"] == filter_difficulty]
-        if filter_type != "全部":
-            filtered_projects = [p for p in filtered_projects if p["type"] == filter_type]
+        project_filters = {
+            "project_type": None if filter_type == "全部" else filter_type,
+            "difficulty": None if filter_difficulty == "全部" else filter_difficulty,
+        }
+        total_projects, filtered_projects = load_project_page(search_query, project_filters, "project_page_student")
         
-        if not filtered_projects:
+        if not total_projects:
             st.info("📭 没有符合条件的项目")
         else:
             for i, project in enumerate(filtered_projects):
@@ -1647,31 +1708,20 @@ def render_student_project_interface(projects):
                                     code_path = os.path.join(code_dir, code_filename)
                                     
                                     # 保存代码文件
-                                    with open(code_path, "wb") as f:
-                                        f.write(code_file.getbuffer())
+                                    platform_blobs.write_upload(code_file, code_path)
                                     
                                     # 更新项目数据
-                                    for p in projects:
-                                        if p['id'] == project['id']:
-                                            if 'student_codes' not in p:
-                                                p['student_codes'] = []
-                                            
-                                            code_data = {
-                                                "id": code_id,
-                                                "filename": code_filename,
-                                                "original_name": code_file.name,
-                                                "size": f"{code_file.size/1024:.1f}KB" if code_file.size < 1024*1024 else f"{code_file.size/(1024*1024):.1f}MB",
-                                                "type": code_ext,
-                                                "uploader": st.session_state.username,
-                                                "description": code_description,
-                                                "upload_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                                            }
-                                            
-                                            p['student_codes'].append(code_data)
-                                            p['updated_time'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                                            break
-                                    
-                                    save_projects(projects)
+                                    code_data = {
+                                        "id": code_id,
+                                        "filename": code_filename,
+                                        "original_name": code_file.name,
+                                        "size": f"{code_file.size/1024:.1f}KB" if code_file.size < 1024*1024 else f"{code_file.size/(1024*1024):.1f}MB",
+                                        "type": code_ext,
+                                        "uploader": st.session_state.username,
+                                        "description": code_description,
+                                        "upload_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                                    }
+                                    library_write(platform_library.add_project_code, project['id'], code_data)
                                     
                                     st.success("✅ 代码上传成功！")
                                     st.balloons()
@@ -1685,21 +1735,15 @@ def render_student_project_interface(projects):
     with student_tab2:
         st.markdown("#### 💻 我上传的代码")
         
-        # 查找当前学生上传的代码
-        student_codes = []
-        for project in projects:
-            if 'student_codes' in project:
-                for code in project['student_codes']:
-                    if code['uploader'] == st.session_state.username:
-                        code['project_name'] = project['name']
-                        code['project_id'] = project['id']
-                        student_codes.append(code)
+        # 查找当前学生上传的代码（按上传时间倒序）
+        total_codes = library_read(platform_library.count_student_codes, st.session_state.username)
         
-        if not student_codes:
+        if not total_codes:
             st.info("📭 您还没有上传过代码")
         else:
-            # 按上传时间排序
-            student_codes.sort(key=lambda x: x['upload_time'], reverse=True)
+            offset = render_pager(total_codes, "my_code_page")
+            student_codes = library_read(platform_library.list_student_codes, st.session_state.username,
+                                         offset=offset)
             
             for i, code in enumerate(student_codes):
                 # 在页面开头添加自定义CSS
@@ -1756,17 +1800,12 @@ def render_student_project_interface(projects):
                     # 删除代码（仅上传者可删除）
                     if st.button("🗑️ 删除", key=f"delete_my_code_{code['id']}_{i}", use_container_width=True, type="secondary"):
                         try:
+                            # 从项目数据中移除
+                            library_write(platform_library.delete_project_code, code['id'], st.session_state.username)
+                            
                             # 删除文件
                             if os.path.exists(code_path):
                                 os.remove(code_path)
-                            
-                            # 从项目数据中移除
-                            for project in projects:
-                                if project['id'] == code['project_id'] and 'student_codes' in project:
-                                    project['student_codes'] = [c for c in project['student_codes'] if c['id'] != code['id']]
-                                    break
-                            
-                            save_projects(projects)
                             st.success("✅ 代码已删除")
                             st.rerun()
                             
@@ -5,6 +5,11 @@ import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
 import sqlite3
+import platform_bootstrap
+import platform_db
+import platform_migrations
+import platform_review
+import platform_search
 import pytz  # 新增：用于时区处理
 
 st.set_page_config(
@@ -273,31 +278,12 @@ def apply_modern_css():
 # 数据库操作函数
 def get_db_connection():
     """获取数据库连接"""
-    return sqlite3.connect('image_processing_platform.db')
+    return platform_db.connect('image_processing_platform.db')
 
+@platform_bootstrap.once("我的思政足迹")
 def init_database():
-    """初始化数据库表"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # 创建思政感悟表
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS ideology_reflections (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_username TEXT NOT NULL,
-            reflection_content TEXT NOT NULL,
-            submission_time TEXT NOT NULL,
-            status TEXT DEFAULT 'pending',
-            teacher_feedback TEXT DEFAULT '',
-            score INTEGER DEFAULT 0,
-            word_count INTEGER DEFAULT 0,
-            allow_view_score BOOLEAN DEFAULT TRUE,
-            FOREIGN KEY (student_username) REFERENCES users (username)
-        )
-    """)
-    
-    conn.commit()
-    conn.close()
+    """初始化数据库表（表结构由 platform_migrations 统一管理，每个进程只执行一次）"""
+    platform_migrations.ensure_schema('image_processing_platform.db')
 
 def get_ideology_reflections(student_username=None):
     """获取思政感悟记录"""
@@ -330,6 +316,61 @@ def get_ideology_reflections(student_username=None):
     
     return result
 
+def reflection_record(row):
+    """审核列表查询的元组转为与 get_ideology_reflections 相同的字典"""
+    columns = ['id', 'student_username', 'reflection_content', 'submission_time',
+               'status', 'teacher_feedback', 'score', 'word_count', 'allow_view_score']
+    return dict(zip(columns, row))
+
+def load_reflection_page(filters, key, order="time", descending=True):
+    """
+    按游标分页读取思政感悟，并渲染翻页按钮
+
+    筛选条件或排序变化时回到第一页；每页的起始游标保存在 session_state 中，
+    上一页直接取回之前的游标。
+
+    返回:
+    - (符合条件的记录数, 是否为准确值, 当前页的记录字典)
+    """
+    signature = repr((sorted(filters.items()), order, descending))
+    if st.session_state.get(f"{key}_signature") != signature:
+        st.session_state[f"{key}_signature"] = signature
+        st.session_state[f"{key}_anchors"] = [None]
+    anchors = st.session_state[f"{key}_anchors"]
+
+    conn = get_db_connection()
+    try:
+        c = conn.cursor()
+        total, exact = platform_review.estimate_count(c, "reflections", filters)
+        page = platform_review.fetch_page(c, "reflections", filters, anchors[-1], order, descending)
+    finally:
+        conn.close()
+
+    if len(anchors) > 1 or page.next_key is not None:
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if st.button("⬅️ 上一页", key=f"{key}_prev", disabled=len(anchors) == 1, use_container_width=True):
+                anchors.pop()
+                st.rerun()
+        with col2:
+            st.caption(f"第 {len(anchors)} 页，每页 {platform_review.PAGE_SIZE} 条")
+        with col3:
+            if st.button("下一页 ➡️", key=f"{key}_next", disabled=page.next_key is None, use_container_width=True):
+                anchors.append(page.next_key)
+                st.rerun()
+    return total, exact, [reflection_record(row) for row in page.rows]
+
+def format_total(total, exact):
+    """记录数的显示文本（超过计数上限时显示为估计值）"""
+    return str(total) if exact else f"{total}+"
+
+def search_reflection_ids(query, limit=500):
+    """全文检索思政感悟内容，按相关度返回匹配的记录 ID"""
+    conn = get_db_connection()
+    ids = platform_search.search_refs(conn.cursor(), query, "reflection", limit=limit)
+    conn.close()
+    return ids
+
 def get_all_students():
     """获取所有学生列表"""
     conn = get_db_connection()
@@ -383,18 +424,34 @@ def delete_reflection(reflection_id):
     conn.commit()
     conn.close()
 
+def count_reflections(student_username=None):
+    """
+    在 SQL 中统计思政感悟（可限定学生）
+
+    返回:
+    - (总数, 待审核, 已审核, 已退回, 平均分, 提交过的学生数)；平均分只计算分数大于 0 的记录
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    where = "WHERE student_username = ?" if student_username else ""
+    cursor.execute(f"""
+        SELECT COUNT(*),
+               COALESCE(SUM(status = 'pending'), 0),
+               COALESCE(SUM(status = 'reviewed'), 0),
+               COALESCE(SUM(status = 'returned'), 0),
+               AVG(CASE WHEN score > 0 THEN score END),
+               COUNT(DISTINCT student_username)
+        FROM ideology_reflections {where}
+    """, (student_username,) if student_username else ())
+    row = cursor.fetchone()
+    conn.close()
+    return row
+
 def get_student_stats(student_username):
     """获取学生统计数据 - 修复版"""
-    reflections = get_ideology_reflections(student_username)
-    
-    total_reflections = len(reflections)
-    pending_count = len([r for r in reflections if r['status'] == 'pending'])
-    reviewed_count = len([r for r in reflections if r['status'] == 'reviewed'])
-    returned_count = len([r for r in reflections if r['status'] == 'returned'])
-    
-    # 计算平均分，只计算已评分且分数大于0的记录
-    scored_reflections = [r for r in reflections if r['score'] > 0]
-    avg_score = np.mean([r['score'] for r in scored_reflections]) if scored_reflections else 0
+    total_reflections, pending_count, reviewed_count, returned_count, avg_score, _ = \
+        count_reflections(student_username)
+    avg_score = avg_score or 0
     
     return {
         'total_reflections': total_reflections,
@@ -406,21 +463,17 @@ def get_student_stats(student_username):
 
 def get_class_stats():
     """获取班级统计数据 - 修复版"""
-    all_reflections = get_ideology_reflections()
-    all_students = get_all_students()
+    (total_reflections, pending_count, reviewed_count, returned_count,
+     avg_score, students_with_submissions) = count_reflections()
+    avg_score = avg_score or 0
     
-    total_reflections = len(all_reflections)
-    total_students = len(all_students)
-    pending_count = len([r for r in all_reflections if r['status'] == 'pending'])
-    reviewed_count = len([r for r in all_reflections if r['status'] == 'reviewed'])
-    returned_count = len([r for r in all_reflections if r['status'] == 'returned'])
-    
-    # 计算平均分，只计算已评分且分数大于0的记录
-    scored_reflections = [r for r in all_reflections if r['score'] > 0]
-    avg_score = np.mean([r['score'] for r in scored_reflections]) if scored_reflections else 0
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM users WHERE role = 'student'")
+    total_students = cursor.fetchone()[0]
+    conn.close()
     
     # 计算提交率
-    students_with_submissions = len(set([r['student_username'] for r in all_reflections]))
     submission_rate = round((students_with_submissions / total_students) * 100, 1) if total_students > 0 else 0
     
     return {
@@ -741,13 +794,13 @@ def render_history_records():
     """渲染历史记录页面"""
     st.markdown('<div class="section-title">📚 学习历史记录</div>', unsafe_allow_html=True)
     
-    # 根据角色获取记录
+    # 根据角色获取记录（每次只读取一页）
     if st.session_state.get('role') == 'student':
-        records = get_ideology_reflections(st.session_state.username)
-        title = f"您的学习记录 ({len(records)}条)"
+        total, exact, records = load_reflection_page({"student": st.session_state.username}, "history_page")
+        title = f"您的学习记录 ({format_total(total, exact)}条)"
     else:  # 教师
-        records = get_ideology_reflections()
-        title = f"全班学习记录 ({len(records)}条)"
+        total, exact, records = load_reflection_page({}, "history_page")
+        title = f"全班学习记录 ({format_total(total, exact)}条)"
     
     if records or (st.session_state.get('role') == 'student' and st.session_state.learning_records):
         st.markdown(f"### {title}")
@@ -1116,9 +1169,6 @@ def render_teacher_interface():
     with tab1:
         st.markdown('<div class="section-title">👨‍🏫 学生思政感悟审核</div>', unsafe_allow_html=True)
         
-        # 获取所有学生记录
-        records = get_ideology_reflections()
-        
         # 筛选选项
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -1158,26 +1208,45 @@ def render_teacher_interface():
         with col3:
             sort_option = st.selectbox("排序方式", ["最新提交", "最早提交", "按分数排序"])
         
-        # 应用筛选
-        filtered_records = records
-        if filter_status != "全部":
-            status_map = {"待审核": "pending", "已审核": "reviewed", "已退回": "returned"}
-            filtered_records = [r for r in filtered_records if r['status'] == status_map[filter_status]]
+        filter_keyword = st.text_input("🔍 搜索感悟内容", placeholder="输入关键词，多个关键词用空格分隔",
+                                       key="teacher_keyword_filter")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            conn = get_db_connection()
+            teacher_classes = platform_review.teacher_classes(conn.cursor(), st.session_state.username)
+            conn.close()
+            class_options = {"全部班级": None}
+            class_options.update({f"{name}（{code}）": code for code, name in teacher_classes})
+            filter_class = st.selectbox("筛选班级", list(class_options), key="teacher_class_filter")
+        with col2:
+            filter_dates = st.date_input("提交日期范围", value=(), key="teacher_date_filter")
+        
+        # 筛选条件在 SQL 中执行
+        status_map = {"待审核": "pending", "已审核": "reviewed", "已退回": "returned"}
+        filters = {
+            "status": status_map.get(filter_status),
+            "student_like": filter_student.strip(),
+            "class_code": class_options[filter_class],
+        }
+        if len(filter_dates) > 0:
+            filters["date_from"] = filter_dates[0]
+            filters["date_to"] = filter_dates[-1]
+        if filter_keyword.strip():
+            filters["ids"] = search_reflection_ids(filter_keyword)
         
-        if filter_student:
-            filtered_records = [r for r in filtered_records if filter_student.lower() in r['student_username'].lower()]
+        # 排序方式
+        order, descending = {
+            "最新提交": ("time", True),
+            "最早提交": ("time", False),
+            "按分数排序": ("score", True),
+        }[sort_option]
         
-        # 应用排序
-        if sort_option == "最新提交":
-            filtered_records.sort(key=lambda x: x['submission_time'], reverse=True)
-        elif sort_option == "最早提交":
-            filtered_records.sort(key=lambda x: x['submission_time'])
-        elif sort_option == "按分数排序":
-            filtered_records.sort(key=lambda x: x['score'], reverse=True)
+        total, exact, filtered_records = load_reflection_page(filters, "review_page", order, descending)
         
         # 显示记录
         if filtered_records:
-            st.markdown(f"### 找到 {len(filtered_records)} 条记录")
+            st.markdown(f"### 找到 {format_total(total, exact)} 条记录")
             
             for record in filtered_records:
                 with st.container():
@@ -1245,16 +1314,24 @@ def render_teacher_interface():
         
         # 学生提交情况统计
         st.markdown("### 📊 学生提交情况")
-        all_students = get_all_students()
-        all_records = get_ideology_reflections()
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT u.username, COUNT(r.id)
+            FROM users u
+            LEFT JOIN ideology_reflections r ON r.student_username = u.username
+            WHERE u.role = 'student'
+            GROUP BY u.username
+        """)
+        student_counts = cursor.fetchall()
+        conn.close()
         
         submission_data = []
-        for student in all_students:
-            student_records = [r for r in all_records if r['student_username'] == student]
+        for student, count in student_counts:
             submission_data.append({
                 '学生': student,
-                '提交数量': len(student_records),
-                '状态': '已提交' if len(student_records) > 0 else '未提交'
+                '提交数量': count,
+                '状态': '已提交' if count > 0 else '未提交'
             })
         
         df_submission = pd.DataFrame(submission_data)
@@ -3,11 +3,17 @@ import pandas as pd
 import plotly.express as px
 import datetime
 import sqlite3
+import platform_auth
+import platform_blobs
+import platform_bootstrap
+import platform_db
+import platform_migrations
+import platform_review
+import platform_search
+import platform_writer
+import platform_zip
 import json
 import os
-import zipfile
-import tempfile
-import shutil
 import csv
 import io
 
@@ -296,82 +302,10 @@ def apply_modern_css():
     """, unsafe_allow_html=True)
 
 # 初始化数据库 - 修复版本
+@platform_bootstrap.once("成果展示")
 def init_database():
-    """初始化数据库表 - 修复FOREIGN KEY错误"""
-    try:
-        conn = sqlite3.connect('image_processing_platform.db')
-        c = conn.cursor()
-        
-        # 检查 submitted_projects 表是否存在并获取其列信息
-        c.execute("PRAGMA table_info(submitted_projects)")
-        existing_columns = [column[1] for column in c.fetchall()]
-        
-        # 如果表不存在，创建完整的表结构（不带外键约束）
-        if not existing_columns:
-            c.execute('''
-                CREATE TABLE submitted_projects (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    project_name TEXT NOT NULL,
-                    author_name TEXT NOT NULL,
-                    project_desc TEXT NOT NULL,
-                    submit_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    files TEXT,
-                    file_paths TEXT,
-                    status TEXT DEFAULT '待审核',
-                    review_notes TEXT,
-                    review_time TIMESTAMP,
-                    reviewer TEXT,
-                    user_id INTEGER
-                )
-            ''')
-        else:
-            # 检查并添加缺失的字段
-            if 'file_paths' not in existing_columns:
-                try:
-                    c.execute('ALTER TABLE submitted_projects ADD COLUMN file_paths TEXT')
-                except:
-                    pass
-            
-            if 'reviewer' not in existing_columns:
-                try:
-                    c.execute('ALTER TABLE submitted_projects ADD COLUMN reviewer TEXT')
-                except:
-                    pass
-            
-            if 'user_id' not in existing_columns:
-                try:
-                    c.execute('ALTER TABLE submitted_projects ADD COLUMN user_id INTEGER')
-                except:
-                    pass
-        
-        # 创建意见反馈表
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS feedback (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                feedback_content TEXT NOT NULL,
-                submit_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                ip_address TEXT,
-                user_agent TEXT
-            )
-        ''')
-        
-        # 创建用户表（如果不存在）
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                role TEXT DEFAULT 'student',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
-        return True
-    except Exception as e:
-        st.error(f"数据库初始化失败：{str(e)}")
-        return False
+    """初始化数据库表（表结构由 platform_migrations 统一管理，每个进程只执行一次，失败时下次重跑再试）"""
+    platform_migrations.ensure_schema('image_processing_platform.db')
 
 # 渲染侧边栏 - 修复版本
 def render_sidebar():
@@ -517,9 +451,12 @@ def generate_stats_data():
 
 # 校验用户是否为教师角色
 def verify_teacher_role(username):
-    """校验用户是否为教师角色"""
+    """校验用户是否为教师角色（优先使用登录时签发的会话令牌，不查询 users 表）"""
+    identity = platform_auth.session_identity(st.session_state)
+    if identity is not None and identity.username == username:
+        return identity.role == "teacher"
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
+        conn = platform_db.connect('image_processing_platform.db')
         c = conn.cursor()
         c.execute("SELECT role FROM users WHERE username = ?", (username,))
         result = c.fetchone()
@@ -531,7 +468,7 @@ def verify_teacher_role(username):
 def get_user_id(username):
     """获取用户ID"""
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
+        conn = platform_db.connect('image_processing_platform.db')
         c = conn.cursor()
         c.execute("SELECT id FROM users WHERE username = ?", (username,))
         result = c.fetchone()
@@ -543,7 +480,7 @@ def get_user_id(username):
 def get_feedback_data():
     """从数据库读取意见反馈数据"""
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
+        conn = platform_db.connect('image_processing_platform.db')
         c = conn.cursor()
         
         c.execute('''
@@ -568,8 +505,16 @@ def get_feedback_data():
         st.error(f"读取反馈数据失败：{str(e)}")
         return []
 
+def insert_feedback(c, feedback_content, ip_address, user_agent):
+    """写入一条反馈（由后台写线程在批量事务中执行）"""
+    c.execute('''
+        INSERT INTO feedback (feedback_content, ip_address, user_agent)
+        VALUES (?, ?, ?)
+    ''', (feedback_content, ip_address, user_agent))
+    return c.lastrowid
+
 def save_feedback_to_db(feedback_content):
-    """保存反馈到数据库"""
+    """保存反馈到数据库（经后台写线程批量提交）"""
     try:
         import socket
         import streamlit as st
@@ -586,77 +531,65 @@ def save_feedback_to_db(feedback_content):
         except:
             user_agent = "未知"
         
-        conn = sqlite3.connect('image_processing_platform.db')
-        c = conn.cursor()
-        
-        c.execute('''
-            INSERT INTO feedback (feedback_content, ip_address, user_agent)
-            VALUES (?, ?, ?)
-        ''', (feedback_content, ip_address, user_agent))
-        
-        conn.commit()
-        conn.close()
+        future = platform_writer.submit(insert_feedback, feedback_content, ip_address, user_agent,
+                                        path='image_processing_platform.db')
+        future.result(timeout=platform_writer.RESULT_TIMEOUT)
         return True
     except Exception as e:
         st.error(f"保存反馈失败：{str(e)}")
         return False
 
 def save_uploaded_files(uploaded_files, project_name, author_name):
-    """保存上传的文件到服务器"""
-    try:
-        # 创建上传目录
-        upload_dir = "uploads"
-        if not os.path.exists(upload_dir):
-            os.makedirs(upload_dir)
-        
-        # 创建项目目录
-        project_dir = os.path.join(upload_dir, f"{project_name}_{author_name}")
-        if not os.path.exists(project_dir):
-            os.makedirs(project_dir)
-        
-        saved_files = []
-        file_paths = []
-        
-        for uploaded_file in uploaded_files:
-            # 生成唯一文件名
-            file_ext = os.path.splitext(uploaded_file.name)[1]
-            unique_filename = f"{get_beijing_time().strftime('%Y%m%d_%H%M%S')}_{uploaded_file.name}"
-            file_path = os.path.join(project_dir, unique_filename)
-            
-            # 保存文件
-            with open(file_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            
-            saved_files.append(uploaded_file.name)
-            file_paths.append(file_path)
-        
-        return saved_files, file_paths
-    except Exception as e:
-        st.error(f"保存文件失败：{str(e)}")
-        return [], []
+    """
+    写入上传的文件（内容去重存储），在写事务之外调用
+    
+    返回:
+    - (清单名, 已写入的文件)：文件记录由调用方在写事务中登记
+    """
+    # 项目目录
+    project_dir = os.path.join("uploads", f"{project_name}_{author_name}")
+    
+    # 生成唯一文件名
+    timestamp = get_beijing_time().strftime('%Y%m%d_%H%M%S')
+    stored = platform_blobs.store_uploads(
+        uploaded_files, project_dir, lambda uploaded_file: f"{timestamp}_{uploaded_file.name}")
+    return f"project:{project_name}_{author_name}", stored
 
 def save_submitted_project(project_data, uploaded_files=None):
-    """保存提交的作品到数据库"""
+    """
+    保存提交的作品到数据库
+    
+    上传文件先在事务外写入，写事务中只登记文件记录和插入作品记录，大文件不会阻塞其他写入；
+    事务失败时移除本次写入的文件。
+    """
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
-        c = conn.cursor()
-        
         # 获取用户ID
         user_id = None
         if "logged_in" in st.session_state and st.session_state.logged_in:
             user_id = get_user_id(st.session_state.username)
         
-        files_str = json.dumps(project_data.get('files', []))
-        file_paths_str = json.dumps(project_data.get('file_paths', []))
+        manifest, stored = None, []
+        if uploaded_files:
+            manifest, stored = save_uploaded_files(
+                uploaded_files, project_data['project_name'], project_data['author_name'])
         
-        c.execute('''
-            INSERT INTO submitted_projects (project_name, author_name, project_desc, files, file_paths, user_id)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (project_data['project_name'], project_data['author_name'], 
-              project_data['project_desc'], files_str, file_paths_str, user_id))
-        
-        conn.commit()
-        conn.close()
+        try:
+            conn = platform_db.connect('image_processing_platform.db')
+            try:
+                with platform_db.write_transaction(conn) as c:
+                    platform_blobs.register_stored(c, stored, manifest)
+                    c.execute('''
+                        INSERT INTO submitted_projects (project_name, author_name, project_desc, files, file_paths, user_id)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', (project_data['project_name'], project_data['author_name'], 
+                          project_data['project_desc'],
+                          json.dumps([item.name for item in stored]),
+                          json.dumps([item.path for item in stored]), user_id))
+            finally:
+                conn.close()
+        except Exception:
+            platform_blobs.discard_stored(stored)
+            raise
         return True
     except Exception as e:
         st.error(f"保存作品失败：{str(e)}")
@@ -665,7 +598,7 @@ def save_submitted_project(project_data, uploaded_files=None):
 def get_submitted_projects(user_id=None):
     """获取所有提交的作品"""
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
+        conn = platform_db.connect('image_processing_platform.db')
         c = conn.cursor()
         
         if user_id:
@@ -686,23 +619,7 @@ def get_submitted_projects(user_id=None):
                 ORDER BY submit_time DESC
             ''')
         
-        projects = []
-        for row in c.fetchall():
-            files = json.loads(row[5]) if row[5] else []
-            file_paths = json.loads(row[6]) if row[6] else []
-            projects.append({
-                "id": row[0],
-                "project_name": row[1],
-                "author_name": row[2],
-                "project_desc": row[3],
-                "submit_time": format_beijing_time(row[4]),
-                "files": files,
-                "file_paths": file_paths,
-                "status": row[7],
-                "review_notes": row[8],
-                "review_time": format_beijing_time(row[9]),
-                "reviewer": row[10]
-            })
+        projects = [project_record(row) for row in c.fetchall()]
         
         conn.close()
         return projects
@@ -710,10 +627,89 @@ def get_submitted_projects(user_id=None):
         st.error(f"获取作品失败：{str(e)}")
         return []
 
+def project_record(row):
+    """作品查询的元组转为字典"""
+    files = json.loads(row[5]) if row[5] else []
+    file_paths = json.loads(row[6]) if row[6] else []
+    return {
+        "id": row[0],
+        "project_name": row[1],
+        "author_name": row[2],
+        "project_desc": row[3],
+        "submit_time": format_beijing_time(row[4]),
+        "files": files,
+        "file_paths": file_paths,
+        "status": row[7],
+        "review_notes": row[8],
+        "review_time": format_beijing_time(row[9]),
+        "reviewer": row[10]
+    }
+
+def count_projects_by_status():
+    """按审核状态统计作品数 {状态: 作品数}"""
+    try:
+        conn = platform_db.connect('image_processing_platform.db')
+        counts = platform_review.status_counts(conn.cursor(), "projects")
+        conn.close()
+        return counts
+    except Exception as e:
+        st.error(f"统计作品失败：{str(e)}")
+        return {}
+
+def load_project_review_page(filters, key):
+    """
+    按游标分页读取待审核列表中的作品，并渲染翻页按钮
+
+    筛选条件变化时回到第一页；每页的起始游标保存在 session_state 中。
+
+    返回:
+    - (符合条件的作品数, 是否为准确值, 当前页的作品)
+    """
+    signature = repr(sorted(filters.items()))
+    if st.session_state.get(f"{key}_signature") != signature:
+        st.session_state[f"{key}_signature"] = signature
+        st.session_state[f"{key}_anchors"] = [None]
+    anchors = st.session_state[f"{key}_anchors"]
+
+    try:
+        conn = platform_db.connect('image_processing_platform.db')
+        c = conn.cursor()
+        total, exact = platform_review.estimate_count(c, "projects", filters)
+        page = platform_review.fetch_page(c, "projects", filters, anchors[-1])
+        conn.close()
+    except Exception as e:
+        st.error(f"获取作品失败：{str(e)}")
+        return 0, True, []
+
+    if len(anchors) > 1 or page.next_key is not None:
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if st.button("⬅️ 上一页", key=f"{key}_prev", disabled=len(anchors) == 1, width='stretch'):
+                anchors.pop()
+                st.rerun()
+        with col2:
+            st.caption(f"第 {len(anchors)} 页，每页 {platform_review.PAGE_SIZE} 件")
+        with col3:
+            if st.button("下一页 ➡️", key=f"{key}_next", disabled=page.next_key is None, width='stretch'):
+                anchors.append(page.next_key)
+                st.rerun()
+    return total, exact, [project_record(row) for row in page.rows]
+
+def search_record_ids(query, kind, limit=200):
+    """全文检索作品（work）或意见反馈（feedback），按相关度返回 ID 列表"""
+    try:
+        conn = platform_db.connect('image_processing_platform.db')
+        ids = platform_search.search_refs(conn.cursor(), query, kind, limit=limit)
+        conn.close()
+        return ids
+    except Exception as e:
+        st.error(f"检索失败：{str(e)}")
+        return []
+
 def update_project_status(project_id, status, review_notes=""):
     """更新作品审核状态"""
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
+        conn = platform_db.connect('image_processing_platform.db')
         c = conn.cursor()
         
         c.execute('''
@@ -730,31 +726,19 @@ def update_project_status(project_id, status, review_notes=""):
         return False
 
 def download_project_files(project):
-    """下载项目文件 - 增强版本，确保用户可下载自己的文件"""
+    """下载项目文件 - 点击下载时才流式打包，不写临时文件，确保用户可下载自己的文件"""
     try:
         if not project.get('file_paths'):
             return None
         
-        # 创建临时目录
-        temp_dir = tempfile.mkdtemp()
-        zip_path = os.path.join(temp_dir, f"{project['project_name']}_files.zip")
-        
-        # 创建ZIP文件
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for i, file_path in enumerate(project['file_paths']):
-                if os.path.exists(file_path):
-                    # 使用原始文件名
-                    original_filename = project['files'][i] if i < len(project['files']) else f"file_{i+1}"
-                    zipf.write(file_path, original_filename)
+        entries = []
+        for i, file_path in enumerate(project['file_paths']):
+            if os.path.exists(file_path):
+                # 使用原始文件名
+                original_filename = project['files'][i] if i < len(project['files']) else f"file_{i+1}"
+                entries.append((file_path, original_filename))
         
-        # 读取ZIP文件内容
-        with open(zip_path, 'rb') as f:
-            zip_data = f.read()
-        
-        # 清理临时文件
-        shutil.rmtree(temp_dir)
-        
-        return zip_data
+        return platform_zip.download_data(entries)
     except Exception as e:
         st.error(f"下载文件失败：{str(e)}")
         return None
@@ -915,36 +899,26 @@ def render_admin_dashboard():
     with admin_tabs[0]:
         st.markdown("<h2 style='color:#dc2626;'>📝 作品审核管理</h2>", unsafe_allow_html=True)
         
-        # 获取所有提交的作品
-        submitted_projects = get_submitted_projects()
+        # 各状态的作品数（只统计，不取出作品）
+        status_counts = count_projects_by_status()
         
-        if submitted_projects:
+        if status_counts:
             # 创建筛选选项
             col1, col2 = st.columns([3, 1])
             with col1:
-                search_term = st.text_input("搜索作品名称或作者", placeholder="输入关键词...")
+                search_term = st.text_input("搜索作品名称、描述或作者", placeholder="输入关键词，多个关键词用空格分隔...")
             with col2:
                 status_filter = st.selectbox("筛选状态", ["全部", "待审核", "已通过", "已拒绝"])
             
-            # 筛选作品
-            filtered_projects = submitted_projects
-            if search_term:
-                filtered_projects = [
-                    p for p in filtered_projects 
-                    if search_term.lower() in p["project_name"].lower() 
-                    or search_term.lower() in p["author_name"].lower()
-                ]
-            
-            if status_filter != "全部":
-                filtered_projects = [
-                    p for p in filtered_projects 
-                    if p["status"] == status_filter
-                ]
+            # 筛选条件在 SQL 中执行；检索词先全文检索出匹配的作品
+            filters = {"status": status_filter if status_filter != "全部" else None}
+            if search_term.strip():
+                filters["ids"] = search_record_ids(search_term, "work")
             
             # 显示统计信息
-            pending_count = len([p for p in submitted_projects if p["status"] == "待审核"])
-            approved_count = len([p for p in submitted_projects if p["status"] == "已通过"])
-            rejected_count = len([p for p in submitted_projects if p["status"] == "已拒绝"])
+            pending_count = status_counts.get("待审核", 0)
+            approved_count = status_counts.get("已通过", 0)
+            rejected_count = status_counts.get("已拒绝", 0)
             
             col1, col2, col3 = st.columns(3)
             with col1:
@@ -956,7 +930,10 @@ def render_admin_dashboard():
             
             st.divider()
             
-            # 显示作品列表
+            # 显示作品列表（每次只读取一页）
+            total, exact, filtered_projects = load_project_review_page(filters, "admin_project_page")
+            if search_term.strip() or status_filter != "全部":
+                st.caption(f"找到 {total if exact else f'{total}+'} 件符合条件的作品")
             for project in filtered_projects:
                 with st.expander(f"📄 {project['project_name']} - {project['author_name']}"):
                     col1, col2 = st.columns([3, 1])
@@ -1024,8 +1001,20 @@ def render_admin_dashboard():
         feedback_data = get_feedback_data()
 
         if feedback_data:
+            feedback_search = st.text_input("搜索反馈内容", placeholder="输入关键词，多个关键词用空格分隔...",
+                                            key="feedback_search")
+            shown_feedback = feedback_data
+            if feedback_search.strip():
+                # 全文检索，结果按相关度排序
+                feedback_by_id = {f["序号"]: f for f in feedback_data}
+                shown_feedback = [
+                    feedback_by_id[feedback_id] for feedback_id in search_record_ids(feedback_search, "feedback")
+                    if feedback_id in feedback_by_id
+                ]
+                st.caption(f"找到 {len(shown_feedback)} 条匹配的反馈")
+
             # 显示反馈数据表格
-            feedback_df = pd.DataFrame(feedback_data)
+            feedback_df = pd.DataFrame(shown_feedback)
             st.dataframe(
                 feedback_df,
                 width='stretch',
@@ -1040,7 +1029,7 @@ def render_admin_dashboard():
             )
 
             # 导出反馈数据 - 使用修复的编码函数
-            csv_bytes = export_feedback_to_csv(feedback_data)
+            csv_bytes = export_feedback_to_csv(shown_feedback)
             if csv_bytes:
                 st.download_button(
                     label="📥 导出反馈数据（CSV-GB18030编码）",
@@ -1072,7 +1061,7 @@ def render_admin_dashboard():
         st.markdown("<h2 style='color:#dc2626;'>📊 平台基础统计</h2>", unsafe_allow_html=True)
         
         try:
-            conn = sqlite3.connect('image_processing_platform.db')
+            conn = platform_db.connect('image_processing_platform.db')
             c = conn.cursor()
             
             # 用户统计
@@ -1084,11 +1073,11 @@ def render_admin_dashboard():
             teacher_count = c.fetchone()[0]
             
             # 作品统计
-            submitted_projects = get_submitted_projects()
-            total_projects = len(submitted_projects)
-            pending_projects = len([p for p in submitted_projects if p['status'] == '待审核'])
-            approved_projects = len([p for p in submitted_projects if p['status'] == '已通过'])
-            rejected_projects = len([p for p in submitted_projects if p['status'] == '已拒绝'])
+            status_counts = count_projects_by_status()
+            total_projects = sum(status_counts.values())
+            pending_projects = status_counts.get('待审核', 0)
+            approved_projects = status_counts.get('已通过', 0)
+            rejected_projects = status_counts.get('已拒绝', 0)
             
             # 反馈统计
             feedback_data = get_feedback_data()
@@ -1369,22 +1358,15 @@ def render_main_content():
             
             if submitted:
                 if project_name and author_name and project_desc:
-                    # 保存上传的文件
-                    saved_files = []
-                    file_paths = []
-                    if uploaded_files:
-                        saved_files, file_paths = save_uploaded_files(uploaded_files, project_name, author_name)
-                    
                     # 构建作品数据
                     project_data = {
                         "project_name": project_name,
                         "author_name": author_name,
-                        "project_desc": project_desc,
-                        "files": saved_files,
-                        "file_paths": file_paths
+                        "project_desc": project_desc
                     }
+                    saved_files = [uploaded_file.name for uploaded_file in uploaded_files or []]
                     
-                    # 保存到数据库
+                    # 保存上传的文件和作品记录
                     if save_submitted_project(project_data, uploaded_files):
                         if saved_files:
                             st.success(f"✅ 作品提交成功！已上传 {len(saved_files)} 个文件")
@@ -1433,7 +1415,10 @@ def render_main_content():
 
 def main():
     # 初始化数据库
-    init_database()
+    try:
+        init_database()
+    except Exception as e:
+        st.error(f"数据库初始化失败：{str(e)}")
     
     # 应用CSS样式
     apply_modern_css()
@@ -5,6 +5,10 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import sqlite3
+import platform_attendance
+import platform_bootstrap
+import platform_db
+import platform_migrations
 import bcrypt
 import time
 import random
@@ -38,205 +42,15 @@ def from_beijing_time_str(time_str):
     return datetime.strptime(time_str, '%Y-%m-%d %H:%M:%S')
 
 # 初始化数据库表（用于班级和签到）
+@platform_bootstrap.once("分班和在线签到")
 def init_classroom_db():
-    """初始化班级管理和签到相关数据库表"""
-    conn = sqlite3.connect('image_processing_platform.db')
-    c = conn.cursor()
-    
-    # 创建班级表
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS classrooms (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            class_code VARCHAR(12) UNIQUE NOT NULL,
-            class_name VARCHAR(100) NOT NULL,
-            teacher_username VARCHAR(50) NOT NULL,
-            description TEXT,
-            max_students INTEGER DEFAULT 50,
-            created_at TEXT NOT NULL,
-            is_active BOOLEAN DEFAULT TRUE,
-            subscription_tier VARCHAR(20) DEFAULT 'free',
-            FOREIGN KEY (teacher_username) REFERENCES users (username)
-        )
-    ''')
-    
-    # 创建班级成员表
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS classroom_members (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            class_code VARCHAR(12) NOT NULL,
-            student_username VARCHAR(50) NOT NULL,
-            joined_at TEXT NOT NULL,
-            status VARCHAR(20) DEFAULT 'active',
-            role VARCHAR(20) DEFAULT 'student',
-            UNIQUE(class_code, student_username),
-            FOREIGN KEY (class_code) REFERENCES classrooms (class_code),
-            FOREIGN KEY (student_username) REFERENCES users (username)
-        )
-    ''')
-    
-    # 创建签到活动表
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS attendance_sessions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_code VARCHAR(10) UNIQUE NOT NULL,
-            class_code VARCHAR(12) NOT NULL,
-            session_name VARCHAR(100) NOT NULL,
-            teacher_username VARCHAR(50) NOT NULL,
-            start_time TEXT NOT NULL,
-            end_time TEXT NOT NULL,
-            duration_minutes INTEGER DEFAULT 10,
-            location_lat REAL,
-            location_lng REAL,
-            location_name VARCHAR(100),
-            qr_code_data TEXT,
-            attendance_type VARCHAR(20) DEFAULT 'standard',
-            status VARCHAR(20) DEFAULT 'scheduled',
-            created_at TEXT NOT NULL,
-            total_students INTEGER DEFAULT 0,
-            attended_students INTEGER DEFAULT 0,
-            FOREIGN KEY (class_code) REFERENCES classrooms (class_code),
-            FOREIGN KEY (teacher_username) REFERENCES users (username)
-        )
-    ''')
-    
-    # 创建签到记录表
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS attendance_records (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_code VARCHAR(10) NOT NULL,
-            student_username VARCHAR(50) NOT NULL,
-            class_code VARCHAR(12) NOT NULL,
-            check_in_time TEXT NOT NULL,
-            check_in_method VARCHAR(20) DEFAULT 'manual',
-            device_info TEXT,
-            ip_address VARCHAR(45),
-            location_lat REAL,
-            location_lng REAL,
-            is_late BOOLEAN DEFAULT FALSE,
-            points_earned INTEGER DEFAULT 10,
-            status VARCHAR(20) DEFAULT 'present',
-            UNIQUE(session_code, student_username),
-            FOREIGN KEY (session_code) REFERENCES attendance_sessions (session_code),
-            FOREIGN KEY (student_username) REFERENCES users (username)
-        )
-    ''')
-    
-    # 创建订阅套餐表
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS subscription_plans (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            plan_code VARCHAR(20) UNIQUE NOT NULL,
-            plan_name VARCHAR(50) NOT NULL,
-            price_monthly REAL DEFAULT 0,
-            price_yearly REAL DEFAULT 0,
-            max_classes INTEGER DEFAULT 1,
-            max_students_per_class INTEGER DEFAULT 30,
-            max_attendance_sessions INTEGER DEFAULT 20,
-            features TEXT,
-            is_active BOOLEAN DEFAULT TRUE,
-            created_at TEXT NOT NULL
-        )
-    ''')
-    
-    # 创建教师订阅表
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS teacher_subscriptions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            teacher_username VARCHAR(50) NOT NULL,
-            plan_code VARCHAR(20) NOT NULL,
-            start_date TEXT NOT NULL,
-            end_date TEXT NOT NULL,
-            payment_status VARCHAR(20) DEFAULT 'active',
-            auto_renew BOOLEAN DEFAULT TRUE,
-            FOREIGN KEY (teacher_username) REFERENCES users (username),
-            FOREIGN KEY (plan_code) REFERENCES subscription_plans (plan_code)
-        )
-    ''')
-    
-    # 创建通知表
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS class_notifications (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            class_code VARCHAR(12) NOT NULL,
-            title VARCHAR(200) NOT NULL,
-            content TEXT NOT NULL,
-            notification_type VARCHAR(20) DEFAULT 'announcement',
-            created_by VARCHAR(50) NOT NULL,
-            created_at TEXT NOT NULL,
-            is_urgent BOOLEAN DEFAULT FALSE,
-            FOREIGN KEY (class_code) REFERENCES classrooms (class_code),
-            FOREIGN KEY (created_by) REFERENCES users (username)
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
-    
-    # 初始化默认订阅套餐
-    init_default_plans()
-
-def init_default_plans():
-    """初始化默认的订阅套餐"""
-    default_plans = [
-        {
-            'plan_code': 'free',
-            'plan_name': '免费版',
-            'price_monthly': 0,
-            'price_yearly': 0,
-            'max_classes': 1,
-            'max_students_per_class': 30,
-            'max_attendance_sessions': 10,
-            'features': '基础班级管理,标准签到功能,基本数据分析'
-        },
-        {
-            'plan_code': 'pro',
-            'plan_name': '专业版',
-            'price_monthly': 29.9,
-            'price_yearly': 299,
-            'max_classes': 5,
-            'max_students_per_class': 100,
-            'max_attendance_sessions': 100,
-            'features': '专业版功能,高级数据分析,地理位置签到,批量导入,自定义设置'
-        },
-        {
-            'plan_code': 'enterprise',
-            'plan_name': '企业版',
-            'price_monthly': 99.9,
-            'price_yearly': 999,
-            'max_classes': 50,
-            'max_students_per_class': 500,
-            'max_attendance_sessions': 9999,
-            'features': '企业级功能,API接口,专属客服,高级安全,定制开发'
-        }
-    ]
-    
-    conn = sqlite3.connect('image_processing_platform.db')
-    c = conn.cursor()
-    
-    for plan in default_plans:
-        try:
-            c.execute("SELECT id FROM subscription_plans WHERE plan_code = ?", (plan['plan_code'],))
-            if c.fetchone() is None:
-                created_at = to_beijing_time_str()
-                c.execute('''
-                    INSERT INTO subscription_plans 
-                    (plan_code, plan_name, price_monthly, price_yearly, max_classes, 
-                     max_students_per_class, max_attendance_sessions, features, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    plan['plan_code'], plan['plan_name'], plan['price_monthly'],
-                    plan['price_yearly'], plan['max_classes'], plan['max_students_per_class'],
-                    plan['max_attendance_sessions'], plan['features'], created_at
-                ))
-        except Exception as e:
-            print(f"初始化套餐失败: {str(e)}")
-    
-    conn.commit()
-    conn.close()
+    """初始化班级管理和签到相关数据库表（表结构与默认订阅套餐由 platform_migrations 统一管理，每个进程只执行一次）"""
+    platform_migrations.ensure_schema('image_processing_platform.db')
+
 def delete_classroom_simple(class_code, teacher_username):
     """简单删除班级 - 软删除（标记为不活跃）"""
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
+        conn = platform_db.connect('image_processing_platform.db')
         c = conn.cursor()
         
         # 简单验证：检查班级是否存在且教师匹配
@@ -267,9 +81,9 @@ def delete_classroom_simple(class_code, teacher_username):
     except Exception as e:
         return False, f"删除失败: {str(e)}"
 def get_classroom_stats(class_code):
-    """获取班级统计信息"""
+    """获取班级统计信息（签到数据读取汇总表）"""
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
+        conn = platform_db.connect('image_processing_platform.db')
         c = conn.cursor()
         
         # 获取班级基本信息
@@ -278,18 +92,13 @@ def get_classroom_stats(class_code):
                 c.class_name,
                 c.teacher_username,
                 c.created_at,
-                COUNT(DISTINCT cm.id) as total_members,
-                COUNT(DISTINCT a.id) as total_sessions,
-                COUNT(DISTINCT ar.id) as total_attendance_records
+                (SELECT COUNT(*) FROM classroom_members cm WHERE cm.class_code = c.class_code) as total_members
             FROM classrooms c
-            LEFT JOIN classroom_members cm ON c.class_code = cm.class_code
-            LEFT JOIN attendance_sessions a ON c.class_code = a.class_code
-            LEFT JOIN attendance_records ar ON a.session_code = ar.session_code
             WHERE c.class_code = ?
-            GROUP BY c.id
         """, (class_code,))
         
         result = c.fetchone()
+        summary = platform_attendance.get_class_summary(c, class_code) if result else None
         conn.close()
         
         if result:
@@ -298,8 +107,11 @@ def get_classroom_stats(class_code):
                 'teacher_username': result[1],
                 'created_at': result[2],
                 'total_members': result[3],
-                'total_sessions': result[4],
-                'total_attendance_records': result[5]
+                'total_sessions': summary['total_sessions'],
+                'total_attendance_records': summary['attended_count'],
+                'avg_attendance_rate': summary['avg_attendance_rate'],
+                'late_count': summary['late_count'],
+                'points_total': summary['points_total']
             }
         return None
     except Exception as e:
@@ -316,7 +128,7 @@ def generate_unique_code(prefix="", length=8):
 def create_classroom(teacher_username, class_name, description="", max_students=50):
     """创建新班级"""
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
+        conn = platform_db.connect('image_processing_platform.db')
         c = conn.cursor()
         
         # 检查教师是否有可用的班级名额
@@ -373,7 +185,7 @@ def create_classroom(teacher_username, class_name, description="", max_students=
 def join_classroom(student_username, class_code):
     """学生加入班级"""
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
+        conn = platform_db.connect('image_processing_platform.db')
         c = conn.cursor()
         
         # 检查班级是否存在且活跃
@@ -430,7 +242,7 @@ def create_attendance_session(class_code, teacher_username, session_name,
                              location_name=None, attendance_type='standard'):
     """创建签到活动"""
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
+        conn = platform_db.connect('image_processing_platform.db')
         c = conn.cursor()
         
         # 生成签到代码
@@ -455,6 +267,7 @@ def create_attendance_session(class_code, teacher_username, session_name,
         ''', (session_code, class_code, session_name, teacher_username,
               start_time, end_time, duration_minutes, location_name,
               attendance_type, created_at, total_students))
+        platform_attendance.register_session(c, session_code, class_code, teacher_username, total_students)
         
         conn.commit()
         conn.close()
@@ -464,89 +277,22 @@ def create_attendance_session(class_code, teacher_username, session_name,
 
 def check_in_attendance(session_code, student_username, check_in_method='manual',
                        device_info=None, ip_address=None):
-    """学生签到 - 修改：放宽签到条件"""
+    """学生签到 - 校验与写入在一个事务中完成（允许结束后15分钟内签到）"""
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
-        c = conn.cursor()
-        
-        # 检查签到活动是否存在
-        c.execute("""
-            SELECT class_code, start_time, end_time, status 
-            FROM attendance_sessions 
-            WHERE session_code = ?
-        """, (session_code,))
-        
-        session_info = c.fetchone()
-        if not session_info:
-            return False, "签到活动不存在"
-        
-        # 修改：放宽签到条件，允许非active状态也签到
-        # if session_info[3] != 'active':
-        #     return False, "签到活动未激活"
-        
-        class_code = session_info[0]
-        start_time = from_beijing_time_str(session_info[1])
-        end_time = from_beijing_time_str(session_info[2])
-        current_time = get_beijing_time()
-        
-        # 检查时间是否在有效范围内
-        if current_time < start_time:
-            return False, "签到活动尚未开始"
-        if current_time > end_time:
-            # 修改：允许超时15分钟内签到
-            time_difference = (current_time - end_time).total_seconds() / 60
-            if time_difference > 15:
-                return False, "签到活动已结束"
-        
-        # 检查学生是否在班级中
-        c.execute("""
-            SELECT id FROM classroom_members 
-            WHERE class_code = ? AND student_username = ? AND status = 'active'
-        """, (class_code, student_username))
-        
-        if not c.fetchone():
-            return False, "您不在该班级中"
-        
-        # 检查是否已经签到
-        c.execute("""
-            SELECT id FROM attendance_records 
-            WHERE session_code = ? AND student_username = ?
-        """, (session_code, student_username))
-        
-        if c.fetchone():
-            return False, "您已经签到过了"
-        
-        # 判断是否迟到
-        is_late = current_time > start_time + timedelta(minutes=5)
-        points_earned = 5 if is_late else 10
-        
-        # 记录签到
-        check_in_time = to_beijing_time_str(current_time)
-        c.execute('''
-            INSERT INTO attendance_records 
-            (session_code, student_username, class_code, check_in_time,
-             check_in_method, device_info, ip_address, is_late, points_earned)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (session_code, student_username, class_code, check_in_time,
-              check_in_method, device_info, ip_address, is_late, points_earned))
-        
-        # 更新签到统计
-        c.execute("""
-            UPDATE attendance_sessions 
-            SET attended_students = attended_students + 1 
-            WHERE session_code = ?
-        """, (session_code,))
-        
-        conn.commit()
-        conn.close()
-        return True, "签到成功"
+        return platform_attendance.check_in(
+            session_code, student_username,
+            check_in_method=check_in_method,
+            device_info=device_info,
+            ip_address=ip_address,
+            now=to_beijing_time_str()
+        )
     except Exception as e:
         return False, f"签到失败: {str(e)}"
 
 def get_teacher_classes(teacher_username):
     """获取教师创建的所有班级"""
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
+        conn = platform_db.connect('image_processing_platform.db')
         c = conn.cursor()
         
         c.execute("""
@@ -577,7 +323,7 @@ def get_teacher_classes(teacher_username):
 def get_student_classes(student_username):
     """获取学生加入的所有班级"""
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
+        conn = platform_db.connect('image_processing_platform.db')
         c = conn.cursor()
         
         c.execute("""
@@ -609,7 +355,7 @@ def get_student_classes(student_username):
 def get_class_attendance_sessions(class_code):
     """获取班级的所有签到活动"""
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
+        conn = platform_db.connect('image_processing_platform.db')
         c = conn.cursor()
         
         c.execute("""
@@ -637,7 +383,7 @@ def get_class_attendance_sessions(class_code):
 def get_attendance_details(session_code):
     """获取签到活动的详细信息"""
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
+        conn = platform_db.connect('image_processing_platform.db')
         c = conn.cursor()
         
         # 获取签到活动基本信息
@@ -649,6 +395,12 @@ def get_attendance_details(session_code):
         columns = [description[0] for description in c.description]
         session_dict = dict(zip(columns, session_info)) if session_info else None
         
+        # 迟到人数、积分合计取自签到汇总
+        summary = platform_attendance.get_session_summary(c, session_code)
+        if session_dict and summary:
+            session_dict['late_count'] = summary['late_count']
+            session_dict['points_total'] = summary['points_total']
+        
         # 获取签到记录
         c.execute("""
             SELECT ar.*, u.username 
@@ -1552,26 +1304,18 @@ def render_sidebar():
         # 签到状态
         if st.session_state.logged_in:
             try:
-                conn = sqlite3.connect('image_processing_platform.db')
+                conn = platform_db.connect('image_processing_platform.db')
                 c = conn.cursor()
                 
                 username = st.session_state.username
                 role = st.session_state.role
                 
                 if role == "student":
-                    # 学生签到统计
-                    c.execute("""
-                        SELECT 
-                            COUNT(DISTINCT session_code) as total_sessions,
-                            COUNT(*) as attended_sessions,
-                            AVG(points_earned) as avg_points
-                        FROM attendance_records 
-                        WHERE student_username = ?
-                    """, (username,))
-                    
-                    result = c.fetchone()
+                    # 学生签到统计（读取签到汇总）
+                    result = platform_attendance.get_student_summary(c, username)
                     if result:
-                        total_sessions, attended_sessions, avg_points = result
+                        total_sessions = attended_sessions = result['attended_count']
+                        avg_points = result['avg_points']
                         
                         st.markdown("""
                         <div style='background: linear-gradient(135deg, #f0fdf4, #dcfce7); padding: 20px; 
@@ -1627,7 +1371,7 @@ def render_teacher_dashboard():
 
     # ============ 修改这里：获取真实的统计数据 ============
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
+        conn = platform_db.connect('image_processing_platform.db')
         c = conn.cursor()
         
         # 1. 获取班级数量
@@ -1649,46 +1393,14 @@ def render_teacher_dashboard():
         """, (username,))
         total_students = c.fetchone()[0] or 0
         
-        # 3. 获取签到活动总数
-        c.execute("""
-            SELECT COUNT(*) 
-            FROM attendance_sessions
-            WHERE teacher_username = ?
-        """, (username,))
-        total_sessions = c.fetchone()[0] or 0
+        # 3. 结束已过签到时间的活动，计入到课率
+        if platform_attendance.close_expired_sessions(c, username):
+            conn.commit()
         
-        # 4. 获取平均到课率
-
-        c.execute("""
-            SELECT 
-                session_code,
-                total_students,
-                attended_students
-            FROM attendance_sessions
-            WHERE teacher_username = ?
-            AND status = 'completed'
-            AND total_students > 0
-        """, (username,))
-        
-        sessions = c.fetchall()
-        
-        if sessions:
-            total_attendance_rate = 0
-            valid_sessions = 0
-            
-            for session in sessions:
-                session_code, total_students, attended_students = session
-                if total_students > 0:
-                    rate = (attended_students / total_students) * 100
-                    total_attendance_rate += rate
-                    valid_sessions += 1
-            
-            if valid_sessions > 0:
-                avg_attendance_rate = round(total_attendance_rate / valid_sessions, 1)
-            else:
-                avg_attendance_rate = 0
-        else:
-            avg_attendance_rate = 0        
+        # 4. 签到活动总数与平均到课率（读取班级签到汇总）
+        summary = platform_attendance.get_teacher_summary(c, username)
+        total_sessions = summary['total_sessions']
+        avg_attendance_rate = summary['avg_attendance_rate']
         conn.close()
         
     except Exception as e:
@@ -1699,7 +1411,7 @@ def render_teacher_dashboard():
         total_sessions = 0
         avg_attendance_rate = 0    
     # 统计卡片
-    col1, col2, col3= st.columns(3)
+    col1, col2, col3, col4 = st.columns(4)
     
     # 使用f-string或format方法
     with col1:
@@ -1732,6 +1444,16 @@ def render_teacher_dashboard():
         """
         st.markdown(html3, unsafe_allow_html=True)
     
+    with col4:
+        html4 = f"""
+        <div class='stat-card'>
+            <div>📈</div>
+            <div class='stat-number'>{avg_attendance_rate}%</div>
+            <div class='stat-label'>平均到课率</div>
+        </div>
+        """
+        st.markdown(html4, unsafe_allow_html=True)
+    
     # 获取教师班级数据
     teacher_classes = get_teacher_classes(username)
     
@@ -1811,7 +1533,7 @@ def update_classroom_info(class_code, teacher_username, class_name=None, descrip
         (success, message): 成功标志和信息
     """
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
+        conn = platform_db.connect('image_processing_platform.db')
         c = conn.cursor()
         
         # 验证教师权限
@@ -1979,7 +1701,7 @@ def delete_classroom_enhanced(class_code, teacher_username, delete_type="soft"):
             - 'hard': 硬删除（删除所有相关数据）
     """
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
+        conn = platform_db.connect('image_processing_platform.db')
         c = conn.cursor()
         
         # 验证教师权限
@@ -2048,6 +1770,9 @@ def delete_classroom_enhanced(class_code, teacher_username, delete_type="soft"):
                 DELETE FROM classrooms WHERE class_code = ?
             """, (class_code,))
             
+            # 6. 删除签到汇总
+            platform_attendance.remove_class(c, class_code)
+            
             message = f"班级 '{class_name}' 及相关数据已永久删除"
         
         else:
@@ -2076,7 +1801,7 @@ def render_class_management():
     class_code = st.session_state.selected_class
     
     # 获取班级信息
-    conn = sqlite3.connect('image_processing_platform.db')
+    conn = platform_db.connect('image_processing_platform.db')
     c = conn.cursor()
     
     c.execute("""
@@ -2098,16 +1823,16 @@ def render_class_management():
     username = st.session_state.username
     is_teacher = (role == "teacher" and username == teacher_username)
     
-    # 获取班级成员
+    # 获取班级成员（签到次数读取签到汇总）
     c.execute("""
         SELECT cm.student_username, cm.joined_at, cm.role,
-               (SELECT COUNT(*) FROM attendance_records ar 
-                WHERE ar.student_username = cm.student_username 
-                AND ar.class_code = ?) as attendance_count
+               r.attended_count as attendance_count
         FROM classroom_members cm
+        LEFT JOIN attendance_student_rollups r 
+            ON r.class_code = cm.class_code AND r.student_username = cm.student_username
         WHERE cm.class_code = ? AND cm.status = 'active'
         ORDER BY cm.joined_at
-    """, (class_code, class_code))
+    """, (class_code,))
     
     members = c.fetchall()
     
@@ -2464,7 +2189,7 @@ def render_attendance_checkin():
     
     # 获取学生可用的签到活动
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
+        conn = platform_db.connect('image_processing_platform.db')
         c = conn.cursor()
         
         # 获取学生加入的班级
@@ -2668,7 +2393,7 @@ def render_find_classroom():
         if class_code:
             # 查询班级信息
             try:
-                conn = sqlite3.connect('image_processing_platform.db')
+                conn = platform_db.connect('image_processing_platform.db')
                 c = conn.cursor()
                 
                 c.execute("""
@@ -2736,7 +2461,7 @@ def render_find_classroom():
         
         if class_name_keyword:
             try:
-                conn = sqlite3.connect('image_processing_platform.db')
+                conn = platform_db.connect('image_processing_platform.db')
                 c = conn.cursor()
                 
                 c.execute("""
@@ -2803,7 +2528,7 @@ def render_subscription_plans():
     
     # 获取订阅套餐
     try:
-        conn = sqlite3.connect('image_processing_platform.db')
+        conn = platform_db.connect('image_processing_platform.db')
         c = conn.cursor()
         
         c.execute("""
@@ -2967,10 +2692,8 @@ def render_attendance_detail():
     st.markdown("### 📈 签到统计")
     
     if attendance_records:
-        # 迟到统计
-        late_count = sum(1 for record in attendance_records 
-                        if from_beijing_time_str(record['check_in_time']) > 
-                           from_beijing_time_str(session_info['start_time']) + timedelta(minutes=5))
+        # 迟到统计（签到汇总中已累计）
+        late_count = session_info.get('late_count', 0)
         on_time_count = len(attendance_records) - late_count
         
         fig1 = go.Figure(data=[
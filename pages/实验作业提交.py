@@ -3,10 +3,16 @@ import cv2
 import numpy as np
 from PIL import Image
 import io
+import csv
 from datetime import datetime, timedelta
 import sqlite3
+import platform_blobs
+import platform_bootstrap
+import platform_db
+import platform_migrations
+import platform_review
+import platform_zip
 import os
-import zipfile
 import tempfile
 import shutil
 import base64
@@ -625,10 +631,8 @@ section[data-testid="stSidebar"] {
 """, unsafe_allow_html=True)
 plt.rcParams['font.sans-serif'] = ['SimHei']  # 黑体
 plt.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
-# 创建上传文件存储目录
+# 上传文件存储目录（在 init_assignment_db 中创建）
 UPLOAD_DIR = "assignment_submissions"
-if not os.path.exists(UPLOAD_DIR):
-    os.makedirs(UPLOAD_DIR)
 
 def get_beijing_time():
     """获取北京时间"""
@@ -640,151 +644,36 @@ def get_beijing_time():
 DB_NAME = 'image_processing_platform.db'
 
 # 数据库初始化 - 使用主程序的数据库
+@platform_bootstrap.once("实验作业提交")
 def init_assignment_db():
-    """初始化作业提交数据库 - 使用主程序的数据库"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    
-    # 检查表是否存在
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='assignments'")
-    table_exists = c.fetchone()
-    
-    if not table_exists:
-        # 创建作业表
-        c.execute('''
-            CREATE TABLE assignments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                assignment_type TEXT NOT NULL,  -- 'experiment', 'midterm', 'final'
-                assignment_number INTEGER,
-                title TEXT NOT NULL,
-                description TEXT,
-                deadline TEXT,
-                max_score INTEGER DEFAULT 100,
-                created_at TEXT NOT NULL,
-                teacher_username TEXT,  -- 创建作业的教师
-                experiment_card TEXT,   -- 实验卡内容/附件路径
-                experiment_materials TEXT -- 实验文档/资料
-            )
-        ''')
-    
-    # 检查提交表（使用主程序的experiment_submissions表）
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='experiment_submissions'")
-    submissions_exists = c.fetchone()
-    
-    if not submissions_exists:
-        # 主程序已经创建了experiment_submissions表
-        # 这里只确保字段完整
-        pass
-    
-    # 添加 assignment_type 字段到 experiment_submissions 表（如果不存在）
-    try:
-        c.execute("ALTER TABLE experiment_submissions ADD COLUMN assignment_type TEXT DEFAULT 'experiment'")
-    except sqlite3.OperationalError:
-        # 字段已存在
-        pass
-    
-    conn.commit()
-    conn.close()
-    
-    # 初始化作业数据
-    init_default_assignments()
+    """初始化作业提交数据库与上传目录 - 表结构与默认作业由 platform_migrations 统一管理，每个进程只执行一次"""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    platform_migrations.ensure_schema(DB_NAME)
 
-def init_default_assignments():
-    """初始化默认作业"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    
-    # 检查是否已有作业
-    c.execute("SELECT COUNT(*) FROM assignments")
-    count = c.fetchone()[0]
-    
-    if count == 0:
-        current_time = get_beijing_time().strftime('%Y-%m-%d %H:%M:%S')
-        
-        # 实验作业
-        experiments = [
-            (1, "实验卡1下载", "仔细查看实验卡1的内容"),
-            (2, "实验卡2下载", "仔细查看实验卡2的内容"),
-            (3, "实验卡3下载", "仔细查看实验卡3的内容"),
-            (4, "实验卡4下载", "仔细查看实验卡4的内容"),
-            (5, "实验卡5下载", "仔细查看实验卡5的内容"),
-            (6, "实验卡6下载", "仔细查看实验卡6的内容"),
-            (7, "实验卡7下载", "仔细查看实验卡7的内容"),
-            (8, "实验卡8下载", "仔细查看实验卡8的内容")
-        ]
-        
-        for i, (num, title, desc) in enumerate(experiments):
-            deadline = (get_beijing_time() + timedelta(days=14+i*7)).strftime('%Y-%m-%d')
-            c.execute('''
-                INSERT INTO assignments (assignment_type, assignment_number, title, description, deadline, created_at)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', ('experiment', num, title, desc, deadline, current_time))
-        
-        # 期中作业
-        midterm_deadline = (get_beijing_time() + timedelta(days=60)).strftime('%Y-%m-%d')
-        c.execute('''
-            INSERT INTO assignments (assignment_type, assignment_number, title, description, deadline, created_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', ('midterm', 1, '图像处理综合应用', '根据老师要求和结合学习的数字图形处理的知识,在老师要求时间内提交', midterm_deadline, current_time))
-        
-        # 期末作业
-        final_deadline = (get_beijing_time() + timedelta(days=120)).strftime('%Y-%m-%d')
-        c.execute('''
-            INSERT INTO assignments (assignment_type, assignment_number, title, description, deadline, created_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', ('final', 1, '图像处理项目开发', '根据老师要求和结合学习的数字图形处理的知识，在老师要求时间内提交', final_deadline, current_time))
-    
-    conn.commit()
-    conn.close()
+def safe_upload_filename(uploaded_file):
+    """安全文件名处理"""
+    return "".join(c for c in uploaded_file.name if c.isalnum() or c in "._- ").rstrip()
 
-def save_uploaded_files(uploaded_files, student_username, assignment_id):
-    """保存上传的文件"""
-    saved_files = []
-    if uploaded_files:
-        # 创建按学生和作业分类的目录
-        student_dir = os.path.join(UPLOAD_DIR, student_username)
-        assignment_dir = os.path.join(student_dir, str(assignment_id))
-        
-        if not os.path.exists(assignment_dir):
-            os.makedirs(assignment_dir)
-        
-        for uploaded_file in uploaded_files:
-            # 安全文件名处理
-            safe_filename = "".join(c for c in uploaded_file.name if c.isalnum() or c in "._- ").rstrip()
-            file_path = os.path.join(assignment_dir, safe_filename)
-            
-            with open(file_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            saved_files.append(safe_filename)
-    
-    return saved_files
-
-def save_teacher_experiment_card_files(teacher_username, assignment_id, uploaded_files):
-    """保存教师上传的实验卡附件"""
-    saved_files = []
-    if uploaded_files:
-        # 创建教师目录结构
-        teacher_dir = os.path.join(UPLOAD_DIR, "teachers", teacher_username)
-        assignment_dir = os.path.join(teacher_dir, str(assignment_id))
-        
-        if not os.path.exists(assignment_dir):
-            os.makedirs(assignment_dir)
-        
-        for uploaded_file in uploaded_files:
-            # 安全文件名处理
-            safe_filename = "".join(c for c in uploaded_file.name if c.isalnum() or c in "._- ").rstrip()
-            file_path = os.path.join(assignment_dir, safe_filename)
-            
-            with open(file_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            saved_files.append(safe_filename)
-    
-    return saved_files
+def save_uploaded_files(uploaded_files, student_username, assignment_id, c):
+    """保存上传的文件（按学生和作业分类，内容去重存储，文件记录随调用方的事务提交）"""
+    assignment_dir = os.path.join(UPLOAD_DIR, student_username, str(assignment_id))
+    saved = platform_blobs.save_uploads(c, uploaded_files, assignment_dir,
+                                        f"assignment:{student_username}/{assignment_id}",
+                                        safe_upload_filename)
+    return [filename for filename, _ in saved]
+
+def save_teacher_experiment_card_files(teacher_username, assignment_id, uploaded_files, c):
+    """保存教师上传的实验卡附件（内容去重存储）"""
+    assignment_dir = os.path.join(UPLOAD_DIR, "teachers", teacher_username, str(assignment_id))
+    saved = platform_blobs.save_uploads(c, uploaded_files, assignment_dir,
+                                        f"card:{teacher_username}/{assignment_id}",
+                                        safe_upload_filename)
+    return [filename for filename, _ in saved]
 
 def download_experiment_card(assignment_id):
     """下载实验卡 - 修复版本，解决中文编码问题"""
     try:
-        conn = sqlite3.connect(DB_NAME)
+        conn = platform_db.connect(DB_NAME)
         c = conn.cursor()
         
         # 获取实验卡信息
@@ -801,46 +690,25 @@ def download_experiment_card(assignment_id):
             
         card_content, teacher_username, assignment_number = result
         
-        # 创建临时目录
-        temp_dir = tempfile.mkdtemp()
-        
-        # 创建ZIP文件，指定UTF-8编码
-        zip_filename = f"实验卡_实验{assignment_number}_{datetime.now().strftime('%Y%m%d%H%M%S')}.zip"
-        zip_path = os.path.join(temp_dir, zip_filename)
+        # 实验卡内容直接以内存数据打包，不写临时文件
+        entries = [(card_content.encode("utf-8"), f"实验{assignment_number}_实验卡内容.txt")]
         
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            # 修复中文文件名编码问题
-            zipf.filename_encoding = 'utf-8'
-            
-            # 添加实验卡内容
-            card_filename = f"实验{assignment_number}_实验卡内容.txt"
-            card_path = os.path.join(temp_dir, card_filename)
-            
-            with open(card_path, "w", encoding="utf-8") as f:
-                f.write(card_content)
-            
-            # 使用正确的编码写入文件名
-            zipf.write(card_path, card_filename)
-            
-            # 添加教师上传的附件（如果有）
-            if teacher_username:
-                teacher_dir = os.path.join(UPLOAD_DIR, "teachers", teacher_username, str(assignment_id))
-                if os.path.exists(teacher_dir):
-                    for root, dirs, files in os.walk(teacher_dir):
-                        for file in files:
-                            file_path = os.path.join(root, file)
-                            # 在ZIP文件中创建"附件"目录，保持原文件名
-                            arcname = os.path.join("附件", file)
-                            zipf.write(file_path, arcname)
+        # 添加教师上传的附件（如果有）
+        if teacher_username:
+            teacher_dir = os.path.join(UPLOAD_DIR, "teachers", teacher_username, str(assignment_id))
+            if os.path.exists(teacher_dir):
+                # 在ZIP文件中创建"附件"目录，保持原文件名
+                entries += [(file_path, os.path.join("附件", os.path.basename(file_path)))
+                            for file_path, _ in platform_zip.directory_entries(teacher_dir)]
         
-        return zip_path, None
+        return platform_zip.zip_bytes(entries), None
     except Exception as e:
         return None, f"下载失败：{str(e)}"
 
 def get_assignment_by_id(assignment_id):
     """通过ID获取作业信息"""
     try:
-        conn = sqlite3.connect(DB_NAME)
+        conn = platform_db.connect(DB_NAME)
         c = conn.cursor()
         c.execute('SELECT * FROM assignments WHERE id = ?', (assignment_id,))
         assignment = c.fetchone()
@@ -853,7 +721,7 @@ def get_assignment_by_id(assignment_id):
 def get_assignments_by_type(assignment_type):
     """按类型获取作业列表"""
     try:
-        conn = sqlite3.connect(DB_NAME)
+        conn = platform_db.connect(DB_NAME)
         c = conn.cursor()
         c.execute('SELECT * FROM assignments WHERE assignment_type = ?', (assignment_type,))
         assignments = c.fetchall()
@@ -894,31 +762,16 @@ def get_assignment_files(student_username, assignment_id):
     return []
 
 def create_zip_file(student_username, assignment_id):
-    """创建包含所有提交文件的ZIP包，修复中文文件名编码问题"""
+    """打包学生某次作业的所有提交文件（流式打包，不写临时文件）"""
     assignment_dir = os.path.join(UPLOAD_DIR, student_username, str(assignment_id))
     if os.path.exists(assignment_dir):
-        # 使用临时文件
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as tmp_zip:
-            zip_filename = tmp_zip.name
-            
-        # 创建ZIP文件，使用UTF-8编码
-        with zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED, compresslevel=5) as zipf:
-            # 设置文件名编码为UTF-8
-            zipf.filename_encoding = 'utf-8'
-            
-            for root, dirs, files in os.walk(assignment_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, os.path.dirname(assignment_dir))
-                    # 直接使用原始文件名，ZIP会使用UTF-8编码
-                    zipf.write(file_path, arcname)
-        
-        return zip_filename
+        return platform_zip.zip_bytes(
+            platform_zip.directory_entries(assignment_dir, os.path.dirname(assignment_dir)))
     return None
 
 def get_all_assignments():
     """获取所有作业"""
-    conn = sqlite3.connect(DB_NAME)
+    conn = platform_db.connect(DB_NAME)
     c = conn.cursor()
     c.execute('SELECT * FROM assignments ORDER BY assignment_type, assignment_number')
     assignments = c.fetchall()
@@ -927,7 +780,7 @@ def get_all_assignments():
 
 def get_assignment_by_type(assignment_type):
     """根据类型获取作业"""
-    conn = sqlite3.connect(DB_NAME)
+    conn = platform_db.connect(DB_NAME)
     c = conn.cursor()
     c.execute('SELECT * FROM assignments WHERE assignment_type = ?', (assignment_type,))
     assignments = c.fetchall()
@@ -936,7 +789,7 @@ def get_assignment_by_type(assignment_type):
 
 def get_assignment_id_by_type_and_number(assignment_type, assignment_number):
     """根据作业类型和编号获取作业ID"""
-    conn = sqlite3.connect(DB_NAME)
+    conn = platform_db.connect(DB_NAME)
     c = conn.cursor()
     c.execute("SELECT id FROM assignments WHERE assignment_type = ? AND assignment_number = ?", 
               (assignment_type, assignment_number))
@@ -949,7 +802,7 @@ def get_assignment_id_by_type_and_number(assignment_type, assignment_number):
 
 def get_student_submissions(student_username, assignment_type=None):
     """获取学生的提交记录 - 使用主程序的experiment_submissions表"""
-    conn = sqlite3.connect(DB_NAME)
+    conn = platform_db.connect(DB_NAME)
     c = conn.cursor()
     
     if assignment_type:
@@ -978,7 +831,7 @@ def get_student_submissions(student_username, assignment_type=None):
 def submit_assignment(student_username, student_name, assignment_id, assignment_type, content, uploaded_files):
     """提交作业 - 修复版本，确保assignment_type正确存储"""
     try:
-        conn = sqlite3.connect(DB_NAME)
+        conn = platform_db.connect(DB_NAME)
         c = conn.cursor()
         
         # 获取作业信息
@@ -999,7 +852,7 @@ def submit_assignment(student_username, student_name, assignment_id, assignment_
         submission_time = get_beijing_time().strftime('%Y-%m-%d %H:%M:%S')
         
         # 保存上传的文件
-        saved_files = save_uploaded_files(uploaded_files, student_username, assignment_id)
+        saved_files = save_uploaded_files(uploaded_files, student_username, assignment_id, c)
         file_names_str = ','.join(saved_files) if saved_files else ''
         
         if existing:
@@ -1038,7 +891,7 @@ def submit_assignment(student_username, student_name, assignment_id, assignment_
 
 def get_all_submissions(assignment_type=None):
     """获取所有学生的提交（教师端） - 修复版本"""
-    conn = sqlite3.connect(DB_NAME)
+    conn = platform_db.connect(DB_NAME)
     c = conn.cursor()
     
     if assignment_type:
@@ -1063,10 +916,86 @@ def get_all_submissions(assignment_type=None):
     conn.close()
     return submissions
 
+def summarize_submissions(assignment_type):
+    """
+    在 SQL 中统计某类作业的提交（教师端统计卡片）
+
+    返回:
+    - (总提交数, 待批改数, 已评分数, 已评分提交的平均分)
+    """
+    conn = platform_db.connect(DB_NAME)
+    c = conn.cursor()
+    counts = platform_review.status_counts(c, "submissions", {"assignment_type": assignment_type})
+    average_score = platform_review.average_score(c, "submissions",
+                                                  {"assignment_type": assignment_type, "status": "graded"})
+    conn.close()
+    return sum(counts.values()), counts.get('pending', 0), counts.get('graded', 0), average_score
+
+def render_review_filters(key):
+    """
+    班级与提交日期筛选（教师批改列表）
+
+    返回:
+    - 筛选条件字典，可直接传给 platform_review
+    """
+    conn = platform_db.connect(DB_NAME)
+    teacher_classes = platform_review.teacher_classes(conn.cursor(), st.session_state.get('username', ''))
+    conn.close()
+    class_options = {"全部班级": None}
+    class_options.update({f"{name}（{code}）": code for code, name in teacher_classes})
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        selected_class = st.selectbox("筛选班级", list(class_options), key=f"{key}_class")
+    with col2:
+        dates = st.date_input("提交日期范围", value=(), key=f"{key}_dates")
+    
+    filters = {"class_code": class_options[selected_class]}
+    if len(dates) > 0:
+        filters["date_from"] = dates[0]
+        filters["date_to"] = dates[-1]
+    return filters
+
+def load_submission_page(filters, key):
+    """
+    按游标分页读取提交（最新提交在前），并渲染翻页按钮
+
+    筛选条件变化时回到第一页；每页的起始游标保存在 session_state 中，
+    上一页直接取回之前的游标。
+
+    返回:
+    - (符合条件的提交数, 是否为准确值, 当前页的提交)
+    """
+    signature = repr(sorted(filters.items()))
+    if st.session_state.get(f"{key}_signature") != signature:
+        st.session_state[f"{key}_signature"] = signature
+        st.session_state[f"{key}_anchors"] = [None]
+    anchors = st.session_state[f"{key}_anchors"]
+    
+    conn = platform_db.connect(DB_NAME)
+    c = conn.cursor()
+    total, exact = platform_review.estimate_count(c, "submissions", filters)
+    page = platform_review.fetch_page(c, "submissions", filters, anchors[-1])
+    conn.close()
+    
+    if len(anchors) > 1 or page.next_key is not None:
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if st.button("⬅️ 上一页", key=f"{key}_prev", disabled=len(anchors) == 1, use_container_width=True):
+                anchors.pop()
+                st.rerun()
+        with col2:
+            st.caption(f"第 {len(anchors)} 页，每页 {platform_review.PAGE_SIZE} 个提交")
+        with col3:
+            if st.button("下一页 ➡️", key=f"{key}_next", disabled=page.next_key is None, use_container_width=True):
+                anchors.append(page.next_key)
+                st.rerun()
+    return total, exact, page.rows
+
 def update_submission_score(submission_id, score, feedback, can_view_score, status):
     """更新作业评分"""
     try:
-        conn = sqlite3.connect(DB_NAME)
+        conn = platform_db.connect(DB_NAME)
         c = conn.cursor()
         
         c.execute('''
@@ -1083,7 +1012,7 @@ def update_submission_score(submission_id, score, feedback, can_view_score, stat
 
 def get_submission_stats():
     """获取提交统计信息"""
-    conn = sqlite3.connect(DB_NAME)
+    conn = platform_db.connect(DB_NAME)
     c = conn.cursor()
     
     # 总提交数
@@ -1108,7 +1037,7 @@ def get_submission_stats():
 
 def get_experiment_title(experiment_number):
     """获取实验标题"""
-    conn = sqlite3.connect(DB_NAME)
+    conn = platform_db.connect(DB_NAME)
     c = conn.cursor()
     c.execute("SELECT title FROM assignments WHERE assignment_number = ? AND assignment_type = 'experiment'", (experiment_number,))
     result = c.fetchone()
@@ -1131,7 +1060,7 @@ def get_experiment_title(experiment_number):
 
 def get_experiment_description(experiment_number):
     """获取实验描述"""
-    conn = sqlite3.connect(DB_NAME)
+    conn = platform_db.connect(DB_NAME)
     c = conn.cursor()
     c.execute("SELECT description FROM assignments WHERE assignment_number = ? AND assignment_type = 'experiment'", (experiment_number,))
     result = c.fetchone()
@@ -1155,13 +1084,13 @@ def get_experiment_description(experiment_number):
 def save_experiment_card(assignment_id, teacher_username, card_content, uploaded_files):
     """保存实验卡 - 修复版本"""
     try:
-        conn = sqlite3.connect(DB_NAME)
+        conn = platform_db.connect(DB_NAME)
         c = conn.cursor()
         
         # 保存上传的文件
         saved_files = []
         if uploaded_files:
-            saved_files = save_teacher_experiment_card_files(teacher_username, assignment_id, uploaded_files)
+            saved_files = save_teacher_experiment_card_files(teacher_username, assignment_id, uploaded_files, c)
         
         # 构建实验卡内容，包含文件信息
         experiment_card_content = card_content
@@ -1184,27 +1113,15 @@ def save_experiment_card(assignment_id, teacher_username, card_content, uploaded
 def save_experiment_materials(assignment_id, teacher_username, materials_content, uploaded_files):
     """保存实验文档/资料"""
     try:
-        conn = sqlite3.connect(DB_NAME)
+        conn = platform_db.connect(DB_NAME)
         c = conn.cursor()
         
         # 保存上传的文件
-        saved_files = []
-        if uploaded_files:
-            teacher_dir = os.path.join(UPLOAD_DIR, "teachers", teacher_username, "materials")
-            if not os.path.exists(teacher_dir):
-                os.makedirs(teacher_dir)
-            
-            assignment_dir = os.path.join(teacher_dir, str(assignment_id))
-            if not os.path.exists(assignment_dir):
-                os.makedirs(assignment_dir)
-            
-            for uploaded_file in uploaded_files:
-                safe_filename = "".join(c for c in uploaded_file.name if c.isalnum() or c in "._- ").rstrip()
-                file_path = os.path.join(assignment_dir, safe_filename)
-                
-                with open(file_path, "wb") as f:
-                    f.write(uploaded_file.getbuffer())
-                saved_files.append(safe_filename)
+        assignment_dir = os.path.join(UPLOAD_DIR, "teachers", teacher_username, "materials", str(assignment_id))
+        saved = platform_blobs.save_uploads(c, uploaded_files, assignment_dir,
+                                            f"materials:{teacher_username}/{assignment_id}",
+                                            safe_upload_filename)
+        saved_files = [filename for filename, _ in saved]
         
         # 更新作业表中的实验资料信息
         experiment_materials_content = materials_content
@@ -1225,7 +1142,7 @@ def save_experiment_materials(assignment_id, teacher_username, materials_content
 
 def get_experiment_materials(assignment_id):
     """获取实验文档/资料"""
-    conn = sqlite3.connect(DB_NAME)
+    conn = platform_db.connect(DB_NAME)
     c = conn.cursor()
     c.execute("SELECT experiment_materials FROM assignments WHERE id = ?", (assignment_id,))
     result = c.fetchone()
@@ -1236,7 +1153,11 @@ def get_experiment_materials(assignment_id):
     return ""
 
 def download_student_files(student_username, assignment_id):
-    """下载学生提交的文件，修复中文编码问题"""
+    """
+    学生提交文件的下载数据（供 st.download_button 使用）
+    
+    点击下载时才流式打包（Streamlit 不支持延迟下载时立即打包），不写临时文件
+    """
     if not student_username or not assignment_id:
         st.error("缺少必要参数：学生用户名和作业ID")
         return None
@@ -1247,32 +1168,13 @@ def download_student_files(student_username, assignment_id):
         return None
         
     try:
-        # 使用临时文件
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as tmp_zip:
-            zip_path = tmp_zip.name
-            
-        # 创建ZIP文件，使用UTF-8编码
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            # 设置文件名编码为UTF-8
-            zipf.filename_encoding = 'utf-8'
-            
-            for root, dirs, files in os.walk(assignment_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, os.path.dirname(assignment_dir))
-                    zipf.write(file_path, arcname)
-        
-        # 验证文件是否创建成功
-        if os.path.getsize(zip_path) == 0:
-            st.error("创建的压缩包为空，请检查源文件")
-            os.remove(zip_path)
+        entries = platform_zip.directory_entries(assignment_dir, os.path.dirname(assignment_dir))
+        if not entries:
+            st.error("提交目录中没有文件，请检查源文件")
             return None
-            
-        return zip_path
+        return platform_zip.download_data(entries)
     except Exception as e:
         st.error(f"创建压缩包失败: {str(e)}")
-        if 'zip_path' in locals() and os.path.exists(zip_path):
-            os.remove(zip_path)
         return None
 
 def preview_file(file_path):
@@ -1315,30 +1217,18 @@ def download_single_submission(submission_id, student_username, assignment_type,
         # 获取作业ID
         assignment_id = get_assignment_id_by_type_and_number(assignment_type, assignment_number)
         if not assignment_id:
-            return None, "找不到对应的作业"
+            return None, None, "找不到对应的作业"
         
         # 获取文件目录
         assignment_dir = os.path.join(UPLOAD_DIR, student_username, str(assignment_id))
         if not os.path.exists(assignment_dir):
-            return None, "没有找到提交的文件"
-        
-        # 创建临时ZIP文件
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as tmp_zip:
-            zip_path = tmp_zip.name
+            return None, None, "没有找到提交的文件"
         
-        # 创建ZIP文件，使用UTF-8编码
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            # 设置文件名编码为UTF-8
-            zipf.filename_encoding = 'utf-8'
-            
-            for root, dirs, files in os.walk(assignment_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, os.path.dirname(assignment_dir))
-                    zipf.write(file_path, arcname)
+        zip_data = platform_zip.zip_bytes(
+            platform_zip.directory_entries(assignment_dir, os.path.dirname(assignment_dir)))
         
         filename = f"{student_username}_{assignment_type}_{assignment_number}_submission_{submission_id}.zip"
-        return zip_path, filename, None
+        return zip_data, filename, None
         
     except Exception as e:
         return None, None, f"下载失败: {str(e)}"
@@ -1346,7 +1236,7 @@ def download_single_submission(submission_id, student_username, assignment_type,
 # 新增功能：成绩导出和学生筛选相关函数
 def get_all_students():
     """获取所有学生用户名"""
-    conn = sqlite3.connect(DB_NAME)
+    conn = platform_db.connect(DB_NAME)
     c = conn.cursor()
     c.execute("SELECT DISTINCT student_username FROM experiment_submissions ORDER BY student_username")
     students = [row[0] for row in c.fetchall()]
@@ -1355,7 +1245,7 @@ def get_all_students():
 
 def get_student_grades(student_username=None, assignment_type=None):
     """获取学生成绩数据"""
-    conn = sqlite3.connect(DB_NAME)
+    conn = platform_db.connect(DB_NAME)
     c = conn.cursor()
     
     query = '''
@@ -1450,9 +1340,83 @@ def export_grades_to_excel(student_username=None, assignment_type=None):
     except Exception as e:
         return None, f"导出失败：{str(e)}"
 
+def collect_assignment_submissions(assignment_id):
+    """
+    一次遍历提交目录，收集某次作业所有学生的提交文件
+    
+    返回:
+    - (打包条目 [(文件路径, "学生/文件名")], {学生: 文件数})
+    """
+    entries = []
+    file_counts = {}
+    if not os.path.exists(UPLOAD_DIR):
+        return entries, file_counts
+    
+    with os.scandir(UPLOAD_DIR) as student_dirs:
+        students = sorted(entry.name for entry in student_dirs if entry.is_dir() and entry.name != "teachers")
+    
+    for student_username in students:
+        assignment_dir = os.path.join(UPLOAD_DIR, student_username, str(assignment_id))
+        if not os.path.isdir(assignment_dir):
+            continue
+        student_entries = platform_zip.directory_entries(assignment_dir, os.path.dirname(assignment_dir))
+        # 包内路径为 学生/文件名
+        entries += [(path, os.path.join(student_username, os.path.relpath(path, assignment_dir)))
+                    for path, _ in student_entries]
+        file_counts[student_username] = len(student_entries)
+    return entries, file_counts
+
+def build_submission_manifest(assignment, file_counts):
+    """生成批量下载中的成绩清单 CSV（带 BOM，便于 Excel 打开）"""
+    assignment_id, assignment_type, assignment_number, title = assignment[:4]
+    grades_df = get_student_grades(assignment_type=assignment_type)
+    grades_df = grades_df[grades_df['experiment_number'] == assignment_number]
+    grades = {row.student_username: row for row in grades_df.itertuples(index=False)}
+    
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["学生", "作业类型", "作业编号", "作业标题", "成绩", "状态", "提交时间", "文件数", "包内目录"])
+    for student_username in sorted(set(file_counts) | set(grades)):
+        grade = grades.get(student_username)
+        file_count = file_counts.get(student_username, 0)
+        writer.writerow([
+            student_username, assignment_type, assignment_number, title,
+            grade.score if grade is not None else "",
+            grade.status if grade is not None else "未批改",
+            grade.submission_time if grade is not None else "",
+            file_count,
+            f"{student_username}/" if file_count else "",
+        ])
+    return output.getvalue().encode("utf-8-sig")
+
+def export_assignment_submissions(assignment_id):
+    """
+    批量下载某次作业全班的提交文件（含成绩清单）
+    
+    各文件在线程池中并行压缩；文件和成绩都没有变化时直接返回上次打包的结果
+    
+    返回:
+    - (ZIP 数据, 学生数, 文件数, 是否命中缓存, 错误信息)
+    """
+    try:
+        assignment = get_assignment_by_id(assignment_id)
+        if not assignment:
+            return None, 0, 0, False, "找不到对应的作业"
+        
+        entries, file_counts = collect_assignment_submissions(assignment_id)
+        if not entries:
+            return None, 0, 0, False, "该作业暂无提交文件"
+        
+        manifest = build_submission_manifest(assignment, file_counts)
+        zip_data, cached = platform_zip.cached_zip_bytes(
+            entries + [(manifest, "成绩清单.csv")], f"assignment_submissions:{assignment_id}")
+        return zip_data, len(file_counts), len(entries), cached, None
+    except Exception as e:
+        return None, 0, 0, False, f"打包失败：{str(e)}"
+
 def get_student_summary_stats(student_username=None):
     """获取学生成绩汇总统计"""
-    conn = sqlite3.connect(DB_NAME)
+    conn = platform_db.connect(DB_NAME)
     c = conn.cursor()
     
     query = '''
@@ -1490,7 +1454,7 @@ def get_student_summary_stats(student_username=None):
 
 def get_submission_timeline(student_username=None):
     """获取提交时间线数据"""
-    conn = sqlite3.connect(DB_NAME)
+    conn = platform_db.connect(DB_NAME)
     c = conn.cursor()
     
     query = '''
@@ -1704,29 +1668,16 @@ else:
                     with col2:
                         if st.button(f"📥 下载实验卡", key=f"student_download_card_{assignment_id}"):
                             with st.spinner("正在准备实验卡..."):
-                                zip_path, error = download_experiment_card(assignment_id)
-                                if zip_path and os.path.exists(zip_path):
-                                    with open(zip_path, "rb") as f:
-                                        # 使用UTF-8编码的文件名
-                                        zip_data = f.read()
-                                        # 创建下载按钮
-                                        st.download_button(
-                                            label="✅ 点击下载",
-                                            data=zip_data,
-                                            file_name=f"实验{assignment_number}_实验卡_{datetime.now().strftime('%Y%m%d')}.zip",
-                                            mime="application/zip",
-                                            key=f"student_card_download_{assignment_id}",
-                                            use_container_width=True
-                                        )
-                                    # 清理临时文件
-                                    try:
-                                        temp_dir = os.path.dirname(zip_path)
-                                        if os.path.exists(zip_path):
-                                            os.remove(zip_path)
-                                        if os.path.exists(temp_dir):
-                                            shutil.rmtree(temp_dir)
-                                    except:
-                                        pass
+                                zip_data, error = download_experiment_card(assignment_id)
+                                if zip_data:
+                                    st.download_button(
+                                        label="✅ 点击下载",
+                                        data=zip_data,
+                                        file_name=f"实验{assignment_number}_实验卡_{datetime.now().strftime('%Y%m%d')}.zip",
+                                        mime="application/zip",
+                                        key=f"student_card_download_{assignment_id}",
+                                        use_container_width=True
+                                    )
                                 elif error:
                                     st.error(error)
                                 else:
@@ -1974,18 +1925,16 @@ else:
                                                     break
                                             
                                             if assignment_id:
-                                                zip_path = download_student_files(student_username, assignment_id)
-                                                if zip_path and os.path.exists(zip_path):
-                                                    with open(zip_path, "rb") as f:
-                                                        zip_data = f.read()
-                                                        st.download_button(
-                                                            label="📦 下载本次提交所有文件",
-                                                            data=zip_data,
-                                                            file_name=f"实验{experiment_number}_提交_{submission_time.replace(':', '-').replace(' ', '_')}.zip",
-                                                            mime="application/zip",
-                                                            key=f"student_single_zip_{submission_id}_{experiment_number}_{sub_idx}",
-                                                            use_container_width=True
-                                                        )
+                                                zip_data = download_student_files(student_username, assignment_id)
+                                                if zip_data:
+                                                    st.download_button(
+                                                        label="📦 下载本次提交所有文件",
+                                                        data=zip_data,
+                                                        file_name=f"实验{experiment_number}_提交_{submission_time.replace(':', '-').replace(' ', '_')}.zip",
+                                                        mime="application/zip",
+                                                        key=f"student_single_zip_{submission_id}_{experiment_number}_{sub_idx}",
+                                                        use_container_width=True
+                                                    )
                                                 
                                                 # 单独文件预览和下载
                                                 st.markdown("**🔍 文件预览:**")
@@ -2064,7 +2013,7 @@ else:
                                 if status == 'pending':
                                     if st.button("撤回", key=f"withdraw_{submission_id}_{experiment_number}_{sub_idx}", use_container_width=True):
                                         # 撤回功能
-                                        conn = sqlite3.connect(DB_NAME)
+                                        conn = platform_db.connect(DB_NAME)
                                         c = conn.cursor()
                                         c.execute('DELETE FROM experiment_submissions WHERE id = ? AND student_username = ?', 
                                                  (submission_id, st.session_state.username))
@@ -2079,11 +2028,12 @@ else:
                                         
                                         if assignment_id:
                                             assignment_dir = os.path.join(UPLOAD_DIR, st.session_state.username, str(assignment_id))
-                                            if os.path.exists(assignment_dir):
-                                                shutil.rmtree(assignment_dir)
+                                            platform_blobs.release_manifest(
+                                                c, f"assignment:{st.session_state.username}/{assignment_id}", assignment_dir)
                                         
                                         conn.commit()
                                         conn.close()
+                                        platform_blobs.schedule_gc(DB_NAME)
                                         st.success("提交已撤回！")
                                         st.rerun()
                 else:
@@ -2182,27 +2132,16 @@ else:
                         if current_card:
                             if st.button("📥 下载实验卡", key=f"teacher_download_card_{assignment_id}"):
                                 with st.spinner("正在准备实验卡..."):
-                                    zip_path, error = download_experiment_card(assignment_id)
-                                    if zip_path and os.path.exists(zip_path):
-                                        with open(zip_path, "rb") as f:
-                                            zip_data = f.read()
-                                            st.download_button(
-                                                label="✅ 点击下载",
-                                                data=zip_data,
-                                                file_name=f"实验{experiment_number}_实验卡_{datetime.now().strftime('%Y%m%d')}.zip",
-                                                mime="application/zip",
-                                                key=f"teacher_card_download_{assignment_id}",
-                                                use_container_width=True
-                                            )
-                                        # 清理临时文件
-                                        try:
-                                            temp_dir = os.path.dirname(zip_path)
-                                            if os.path.exists(zip_path):
-                                                os.remove(zip_path)
-                                            if os.path.exists(temp_dir):
-                                                shutil.rmtree(temp_dir)
-                                        except:
-                                            pass
+                                    zip_data, error = download_experiment_card(assignment_id)
+                                    if zip_data:
+                                        st.download_button(
+                                            label="✅ 点击下载",
+                                            data=zip_data,
+                                            file_name=f"实验{experiment_number}_实验卡_{datetime.now().strftime('%Y%m%d')}.zip",
+                                            mime="application/zip",
+                                            key=f"teacher_card_download_{assignment_id}",
+                                            use_container_width=True
+                                        )
                                     elif error:
                                         st.error(error)
                                     else:
@@ -2211,16 +2150,11 @@ else:
             
             # 获取所有学生的实验提交 - 修复版本
             st.markdown("### 📝 学生作业批改")
-            experiment_submissions = get_all_submissions('experiment')
+            # 教师端统计信息（在 SQL 中统计，列表按页读取）
+            total_submissions, pending_submissions, graded_submissions, average_score = \
+                summarize_submissions('experiment')
             
-            if experiment_submissions:
-                # 教师端统计信息
-                total_submissions = len(experiment_submissions)
-                pending_submissions = len([s for s in experiment_submissions if s[6] == 'pending'])  # 第6个是status
-                graded_submissions = len([s for s in experiment_submissions if s[6] == 'graded'])
-                graded_scores = [s[8] for s in experiment_submissions if s[6] == 'graded' and s[8] is not None]  # 第8个是score
-                average_score = sum(graded_scores) / len(graded_scores) if graded_scores else 0
-                
+            if total_submissions:
                 # 显示统计卡片
                 col1, col2, col3, col4 = st.columns(4)
                 with col1:
@@ -2264,15 +2198,12 @@ else:
                     key="teacher_filter_status"
                 )
                 
-                filtered_submissions = experiment_submissions
-                if filter_status == "待批改":
-                    filtered_submissions = [s for s in experiment_submissions if s[6] == 'pending']
-                elif filter_status == "已评分":
-                    filtered_submissions = [s for s in experiment_submissions if s[6] == 'graded']
-                elif filter_status == "已退回":
-                    filtered_submissions = [s for s in experiment_submissions if s[6] == 'returned']
+                filters = render_review_filters("teacher_filter")
+                filters["assignment_type"] = 'experiment'
+                filters["status"] = {"待批改": "pending", "已评分": "graded", "已退回": "returned"}.get(filter_status)
                 
-                st.markdown(f"**找到 {len(filtered_submissions)} 个提交**")
+                total, exact, filtered_submissions = load_submission_page(filters, "teacher_review_page")
+                st.markdown(f"**找到 {total if exact else f'{total}+'} 个提交**")
                 
                 # 显示提交列表
                 for sub_idx, sub in enumerate(filtered_submissions):
@@ -2329,18 +2260,16 @@ else:
                                         assignment_id = get_assignment_id_by_type_and_number('experiment', experiment_number)
                                         if assignment_id:
                                             # 下载完整提交的ZIP包
-                                            zip_path = download_student_files(student_username, assignment_id)
-                                            if zip_path and os.path.exists(zip_path):
-                                                with open(zip_path, "rb") as f:
-                                                    zip_data = f.read()
-                                                    st.download_button(
-                                                        label="📦 下载本次提交完整文件",
-                                                        data=zip_data,
-                                                        file_name=f"{student_username}_实验{experiment_number}_提交.zip",
-                                                        mime="application/zip",
-                                                        use_container_width=True,
-                                                        key=f"teacher_download_full_{submission_id}_{experiment_number}_{student_username}_{sub_idx}"
-                                                    )
+                                            zip_data = download_student_files(student_username, assignment_id)
+                                            if zip_data:
+                                                st.download_button(
+                                                    label="📦 下载本次提交完整文件",
+                                                    data=zip_data,
+                                                    file_name=f"{student_username}_实验{experiment_number}_提交.zip",
+                                                    mime="application/zip",
+                                                    use_container_width=True,
+                                                    key=f"teacher_download_full_{submission_id}_{experiment_number}_{student_username}_{sub_idx}"
+                                                )
                                             
                                             # 文件预览和单独下载
                                             st.markdown("**🔍 文件预览:**")
@@ -2465,26 +2394,16 @@ else:
                         # 下载实验卡按钮
                         if st.button(f"📥 下载期中作业要求", key=f"midterm_download_card_{assignment_id}"):
                             with st.spinner("正在准备作业要求..."):
-                                zip_path, error = download_experiment_card(assignment_id)
-                                if zip_path and os.path.exists(zip_path):
-                                    with open(zip_path, "rb") as f:
-                                        st.download_button(
-                                            label="✅ 点击下载",
-                                            data=f.read(),
-                                            file_name=f"期中作业要求_{datetime.now().strftime('%Y%m%d')}.zip",
-                                            mime="application/zip",
-                                            key=f"midterm_card_download_{assignment_id}",
-                                            use_container_width=True
-                                        )
-                                    # 清理临时文件
-                                    try:
-                                        temp_dir = os.path.dirname(zip_path)
-                                        if os.path.exists(zip_path):
-                                            os.remove(zip_path)
-                                        if os.path.exists(temp_dir):
-                                            shutil.rmtree(temp_dir)
-                                    except:
-                                        pass
+                                zip_data, error = download_experiment_card(assignment_id)
+                                if zip_data:
+                                    st.download_button(
+                                        label="✅ 点击下载",
+                                        data=zip_data,
+                                        file_name=f"期中作业要求_{datetime.now().strftime('%Y%m%d')}.zip",
+                                        mime="application/zip",
+                                        key=f"midterm_card_download_{assignment_id}",
+                                        use_container_width=True
+                                    )
                                 elif error:
                                     st.error(error)
                                 else:
@@ -2644,18 +2563,16 @@ else:
                                                             break
                                                     
                                                     if assignment_id:
-                                                        zip_path = download_student_files(student_username, assignment_id)
-                                                        if zip_path and os.path.exists(zip_path):
-                                                            with open(zip_path, "rb") as f:
-                                                                zip_data = f.read()
-                                                                st.download_button(
-                                                                    label="📦 下载本次提交所有文件",
-                                                                    data=zip_data,
-                                                                    file_name=f"期中作业_提交_{submission_time.replace(':', '-').replace(' ', '_')}.zip",
-                                                                    mime="application/zip",
-                                                                    key=f"midterm_zip_{submission_id}_{sub_idx}",
-                                                                    use_container_width=True
-                                                                )
+                                                        zip_data = download_student_files(student_username, assignment_id)
+                                                        if zip_data:
+                                                            st.download_button(
+                                                                label="📦 下载本次提交所有文件",
+                                                                data=zip_data,
+                                                                file_name=f"期中作业_提交_{submission_time.replace(':', '-').replace(' ', '_')}.zip",
+                                                                mime="application/zip",
+                                                                key=f"midterm_zip_{submission_id}_{sub_idx}",
+                                                                use_container_width=True
+                                                            )
                                                         
                                                         # 文件预览
                                                         st.markdown("**🔍 文件预览:**")
@@ -2756,26 +2673,16 @@ else:
                         # 下载实验卡按钮
                         if st.button(f"📥 下载期末作业要求", key=f"final_download_card_{assignment_id}"):
                             with st.spinner("正在准备作业要求..."):
-                                zip_path, error = download_experiment_card(assignment_id)
-                                if zip_path and os.path.exists(zip_path):
-                                    with open(zip_path, "rb") as f:
-                                        st.download_button(
-                                            label="✅ 点击下载",
-                                            data=f.read(),
-                                            file_name=f"期末作业要求_{datetime.now().strftime('%Y%m%d')}.zip",
-                                            mime="application/zip",
-                                            key=f"final_card_download_{assignment_id}",
-                                            use_container_width=True
-                                        )
-                                    # 清理临时文件
-                                    try:
-                                        temp_dir = os.path.dirname(zip_path)
-                                        if os.path.exists(zip_path):
-                                            os.remove(zip_path)
-                                        if os.path.exists(temp_dir):
-                                            shutil.rmtree(temp_dir)
-                                    except:
-                                        pass
+                                zip_data, error = download_experiment_card(assignment_id)
+                                if zip_data:
+                                    st.download_button(
+                                        label="✅ 点击下载",
+                                        data=zip_data,
+                                        file_name=f"期末作业要求_{datetime.now().strftime('%Y%m%d')}.zip",
+                                        mime="application/zip",
+                                        key=f"final_card_download_{assignment_id}",
+                                        use_container_width=True
+                                    )
                                 elif error:
                                     st.error(error)
                                 else:
@@ -2941,18 +2848,16 @@ else:
                                                             break
                                                     
                                                     if assignment_id:
-                                                        zip_path = download_student_files(student_username, assignment_id)
-                                                        if zip_path and os.path.exists(zip_path):
-                                                            with open(zip_path, "rb") as f:
-                                                                zip_data = f.read()
-                                                                st.download_button(
-                                                                    label="📦 下载本次提交完整项目",
-                                                                    data=zip_data,
-                                                                    file_name=f"期末项目_提交_{submission_time.replace(':', '-').replace(' ', '_')}.zip",
-                                                                    mime="application/zip",
-                                                                    key=f"final_zip_{submission_id}_{sub_idx}",
-                                                                    use_container_width=True
-                                                                )
+                                                        zip_data = download_student_files(student_username, assignment_id)
+                                                        if zip_data:
+                                                            st.download_button(
+                                                                label="📦 下载本次提交完整项目",
+                                                                data=zip_data,
+                                                                file_name=f"期末项目_提交_{submission_time.replace(':', '-').replace(' ', '_')}.zip",
+                                                                mime="application/zip",
+                                                                key=f"final_zip_{submission_id}_{sub_idx}",
+                                                                use_container_width=True
+                                                            )
                                                         
                                                         # 文件预览
                                                         st.markdown("**🔍 文件预览:**")
@@ -3111,27 +3016,16 @@ else:
                             if current_card:
                                 if st.button("📥 下载实验卡", key=f"teacher_tab_download_card_{assignment_id}"):
                                     with st.spinner("正在准备实验卡..."):
-                                        zip_path, error = download_experiment_card(assignment_id)
-                                        if zip_path and os.path.exists(zip_path):
-                                            with open(zip_path, "rb") as f:
-                                                zip_data = f.read()
-                                                st.download_button(
-                                                    label="✅ 点击下载",
-                                                    data=zip_data,
-                                                    file_name=f"实验{experiment_number}_实验卡_{datetime.now().strftime('%Y%m%d')}.zip",
-                                                    mime="application/zip",
-                                                    key=f"teacher_tab_card_download_{assignment_id}",
-                                                    use_container_width=True
-                                                )
-                                            # 清理临时文件
-                                            try:
-                                                temp_dir = os.path.dirname(zip_path)
-                                                if os.path.exists(zip_path):
-                                                    os.remove(zip_path)
-                                                if os.path.exists(temp_dir):
-                                                    shutil.rmtree(temp_dir)
-                                            except:
-                                                pass
+                                        zip_data, error = download_experiment_card(assignment_id)
+                                        if zip_data:
+                                            st.download_button(
+                                                label="✅ 点击下载",
+                                                data=zip_data,
+                                                file_name=f"实验{experiment_number}_实验卡_{datetime.now().strftime('%Y%m%d')}.zip",
+                                                mime="application/zip",
+                                                key=f"teacher_tab_card_download_{assignment_id}",
+                                                use_container_width=True
+                                            )
                                         elif error:
                                             st.error(error)
                                         else:
@@ -3140,16 +3034,11 @@ else:
                 
                 # 实验提交管理
                 st.markdown("### 📝 学生实验提交管理")
-                experiment_submissions = get_all_submissions('experiment')
+                # 教师端统计信息（在 SQL 中统计，列表按页读取）
+                total_submissions, pending_submissions, graded_submissions, average_score = \
+                    summarize_submissions('experiment')
                 
-                if experiment_submissions:
-                    # 教师端统计信息
-                    total_submissions = len(experiment_submissions)
-                    pending_submissions = len([s for s in experiment_submissions if s[6] == 'pending'])
-                    graded_submissions = len([s for s in experiment_submissions if s[6] == 'graded'])
-                    graded_scores = [s[8] for s in experiment_submissions if s[6] == 'graded' and s[8] is not None]
-                    average_score = sum(graded_scores) / len(graded_scores) if graded_scores else 0
-                    
+                if total_submissions:
                     # 显示统计卡片
                     col1, col2, col3, col4 = st.columns(4)
                     with col1:
@@ -3178,22 +3067,14 @@ else:
                         key="teacher_tab_filter_status"
                     )
                     
-                    # 筛选提交
-                    filtered_submissions = experiment_submissions
+                    # 筛选提交（在 SQL 中执行）
+                    filters = render_review_filters("teacher_tab_filter")
+                    filters["assignment_type"] = 'experiment'
+                    filters["student"] = selected_student if selected_student != "全部学生" else None
+                    filters["status"] = {"待批改": "pending", "已评分": "graded", "已退回": "returned"}.get(filter_status)
                     
-                    # 按学生筛选
-                    if selected_student != "全部学生":
-                        filtered_submissions = [s for s in filtered_submissions if s[1] == selected_student]
-                    
-                    # 按状态筛选
-                    if filter_status == "待批改":
-                        filtered_submissions = [s for s in filtered_submissions if s[6] == 'pending']
-                    elif filter_status == "已评分":
-                        filtered_submissions = [s for s in filtered_submissions if s[6] == 'graded']
-                    elif filter_status == "已退回":
-                        filtered_submissions = [s for s in filtered_submissions if s[6] == 'returned']
-                    
-                    st.markdown(f"**找到 {len(filtered_submissions)} 个提交**")
+                    total, exact, filtered_submissions = load_submission_page(filters, "teacher_tab_review_page")
+                    st.markdown(f"**找到 {total if exact else f'{total}+'} 个提交**")
                     
                     # 显示提交列表
                     for sub_idx, sub in enumerate(filtered_submissions):
@@ -3249,18 +3130,16 @@ else:
                                             assignment_id = get_assignment_id_by_type_and_number('experiment', experiment_number)
                                             if assignment_id:
                                                 # 下载完整提交
-                                                zip_path = download_student_files(student_username, assignment_id)
-                                                if zip_path and os.path.exists(zip_path):
-                                                    with open(zip_path, "rb") as f:
-                                                        zip_data = f.read()
-                                                        st.download_button(
-                                                            label="📦 下载本次提交完整文件",
-                                                            data=zip_data,
-                                                            file_name=f"{student_username}_实验{experiment_number}_提交.zip",
-                                                            mime="application/zip",
-                                                            use_container_width=True,
-                                                            key=f"teacher_tab_download_full_{submission_id}_{experiment_number}_{student_username}_{sub_idx}"
-                                                        )
+                                                zip_data = download_student_files(student_username, assignment_id)
+                                                if zip_data:
+                                                    st.download_button(
+                                                        label="📦 下载本次提交完整文件",
+                                                        data=zip_data,
+                                                        file_name=f"{student_username}_实验{experiment_number}_提交.zip",
+                                                        mime="application/zip",
+                                                        use_container_width=True,
+                                                        key=f"teacher_tab_download_full_{submission_id}_{experiment_number}_{student_username}_{sub_idx}"
+                                                    )
                                                 
                                                 # 文件预览
                                                 st.markdown("**🔍 文件预览:**")
@@ -3435,27 +3314,16 @@ else:
                             if experiment_card:
                                 if st.button("📥 下载期中作业要求", key=f"teacher_midterm_download_card_{assignment_id}"):
                                     with st.spinner("正在准备作业要求..."):
-                                        zip_path, error = download_experiment_card(assignment_id)
-                                        if zip_path and os.path.exists(zip_path):
-                                            with open(zip_path, "rb") as f:
-                                                zip_data = f.read()
-                                                st.download_button(
-                                                    label="✅ 点击下载",
-                                                    data=zip_data,
-                                                    file_name=f"期中作业要求_{datetime.now().strftime('%Y%m%d')}.zip",
-                                                    mime="application/zip",
-                                                    key=f"teacher_midterm_card_download_{assignment_id}",
-                                                    use_container_width=True
-                                                )
-                                            # 清理临时文件
-                                            try:
-                                                temp_dir = os.path.dirname(zip_path)
-                                                if os.path.exists(zip_path):
-                                                    os.remove(zip_path)
-                                                if os.path.exists(temp_dir):
-                                                    shutil.rmtree(temp_dir)
-                                            except:
-                                                pass
+                                        zip_data, error = download_experiment_card(assignment_id)
+                                        if zip_data:
+                                            st.download_button(
+                                                label="✅ 点击下载",
+                                                data=zip_data,
+                                                file_name=f"期中作业要求_{datetime.now().strftime('%Y%m%d')}.zip",
+                                                mime="application/zip",
+                                                key=f"teacher_midterm_card_download_{assignment_id}",
+                                                use_container_width=True
+                                            )
                                         elif error:
                                             st.error(error)
                                         else:
@@ -3463,16 +3331,11 @@ else:
                     
                     # 期中提交管理
                     st.markdown("### 📝 期中作业提交管理")
-                    midterm_submissions = get_all_submissions('midterm')
+                    # 统计信息（在 SQL 中统计，列表按页读取）
+                    total_submissions, pending_submissions, graded_submissions, average_score = \
+                        summarize_submissions('midterm')
                     
-                    if midterm_submissions:
-                        # 统计信息
-                        total_submissions = len(midterm_submissions)
-                        pending_submissions = len([s for s in midterm_submissions if s[6] == 'pending'])
-                        graded_submissions = len([s for s in midterm_submissions if s[6] == 'graded'])
-                        graded_scores = [s[8] for s in midterm_submissions if s[6] == 'graded' and s[8] is not None]
-                        average_score = sum(graded_scores) / len(graded_scores) if graded_scores else 0
-                        
+                    if total_submissions:
                         # 显示统计卡片
                         col1, col2, col3, col4 = st.columns(4)
                         with col1:
@@ -3494,11 +3357,13 @@ else:
                             key="teacher_midterm_filter_student"
                         )
                         
-                        # 筛选提交
-                        filtered_submissions = midterm_submissions
+                        # 筛选提交（在 SQL 中执行）
+                        filters = render_review_filters("teacher_midterm_filter")
+                        filters["assignment_type"] = 'midterm'
+                        filters["student"] = selected_student if selected_student != "全部学生" else None
                         
-                        if selected_student != "全部学生":
-                            filtered_submissions = [s for s in filtered_submissions if s[1] == selected_student]
+                        total, exact, filtered_submissions = load_submission_page(filters, "teacher_midterm_review_page")
+                        st.markdown(f"**找到 {total if exact else f'{total}+'} 个提交**")
                         
                         # 显示期中提交列表
                         for sub_idx, sub in enumerate(filtered_submissions):
@@ -3553,18 +3418,16 @@ else:
                                                 assignment_id = get_assignment_id_by_type_and_number('midterm', 1)
                                                 if assignment_id:
                                                     # 下载完整提交
-                                                    zip_path = download_student_files(student_username, assignment_id)
-                                                    if zip_path and os.path.exists(zip_path):
-                                                        with open(zip_path, "rb") as f:
-                                                            zip_data = f.read()
-                                                            st.download_button(
-                                                                label="📦 下载本次提交完整文件",
-                                                                data=zip_data,
-                                                                file_name=f"{student_username}_期中作业_提交.zip",
-                                                                mime="application/zip",
-                                                                use_container_width=True,
-                                                                key=f"teacher_midterm_download_full_{submission_id}_{student_username}_{sub_idx}"
-                                                            )
+                                                    zip_data = download_student_files(student_username, assignment_id)
+                                                    if zip_data:
+                                                        st.download_button(
+                                                            label="📦 下载本次提交完整文件",
+                                                            data=zip_data,
+                                                            file_name=f"{student_username}_期中作业_提交.zip",
+                                                            mime="application/zip",
+                                                            use_container_width=True,
+                                                            key=f"teacher_midterm_download_full_{submission_id}_{student_username}_{sub_idx}"
+                                                        )
                                                     
                                                     # 文件预览
                                                     st.markdown("**🔍 文件预览:**")
@@ -3739,27 +3602,16 @@ else:
                             if experiment_card:
                                 if st.button("📥 下载期末作业要求", key=f"teacher_final_download_card_{assignment_id}"):
                                     with st.spinner("正在准备作业要求..."):
-                                        zip_path, error = download_experiment_card(assignment_id)
-                                        if zip_path and os.path.exists(zip_path):
-                                            with open(zip_path, "rb") as f:
-                                                zip_data = f.read()
-                                                st.download_button(
-                                                    label="✅ 点击下载",
-                                                    data=zip_data,
-                                                    file_name=f"期末作业要求_{datetime.now().strftime('%Y%m%d')}.zip",
-                                                    mime="application/zip",
-                                                    key=f"teacher_final_card_download_{assignment_id}",
-                                                    use_container_width=True
-                                                )
-                                            # 清理临时文件
-                                            try:
-                                                temp_dir = os.path.dirname(zip_path)
-                                                if os.path.exists(zip_path):
-                                                    os.remove(zip_path)
-                                                if os.path.exists(temp_dir):
-                                                    shutil.rmtree(temp_dir)
-                                            except:
-                                                pass
+                                        zip_data, error = download_experiment_card(assignment_id)
+                                        if zip_data:
+                                            st.download_button(
+                                                label="✅ 点击下载",
+                                                data=zip_data,
+                                                file_name=f"期末作业要求_{datetime.now().strftime('%Y%m%d')}.zip",
+                                                mime="application/zip",
+                                                key=f"teacher_final_card_download_{assignment_id}",
+                                                use_container_width=True
+                                            )
                                         elif error:
                                             st.error(error)
                                         else:
@@ -3767,16 +3619,11 @@ else:
                     
                     # 期末提交管理
                     st.markdown("### 📝 期末作业提交管理")
-                    final_submissions = get_all_submissions('final')
+                    # 统计信息（在 SQL 中统计，列表按页读取）
+                    total_submissions, pending_submissions, graded_submissions, average_score = \
+                        summarize_submissions('final')
                     
-                    if final_submissions:
-                        # 统计信息
-                        total_submissions = len(final_submissions)
-                        pending_submissions = len([s for s in final_submissions if s[6] == 'pending'])
-                        graded_submissions = len([s for s in final_submissions if s[6] == 'graded'])
-                        graded_scores = [s[8] for s in final_submissions if s[6] == 'graded' and s[8] is not None]
-                        average_score = sum(graded_scores) / len(graded_scores) if graded_scores else 0
-                        
+                    if total_submissions:
                         # 显示统计卡片
                         col1, col2, col3, col4 = st.columns(4)
                         with col1:
@@ -3798,11 +3645,13 @@ else:
                             key="teacher_final_filter_student"
                         )
                         
-                        # 筛选提交
-                        filtered_submissions = final_submissions
+                        # 筛选提交（在 SQL 中执行）
+                        filters = render_review_filters("teacher_final_filter")
+                        filters["assignment_type"] = 'final'
+                        filters["student"] = selected_student if selected_student != "全部学生" else None
                         
-                        if selected_student != "全部学生":
-                            filtered_submissions = [s for s in filtered_submissions if s[1] == selected_student]
+                        total, exact, filtered_submissions = load_submission_page(filters, "teacher_final_review_page")
+                        st.markdown(f"**找到 {total if exact else f'{total}+'} 个提交**")
                         
                         # 显示期末提交列表
                         for sub_idx, sub in enumerate(filtered_submissions):
@@ -3857,18 +3706,16 @@ else:
                                                 assignment_id = get_assignment_id_by_type_and_number('final', 1)
                                                 if assignment_id:
                                                     # 下载完整提交
-                                                    zip_path = download_student_files(student_username, assignment_id)
-                                                    if zip_path and os.path.exists(zip_path):
-                                                        with open(zip_path, "rb") as f:
-                                                            zip_data = f.read()
-                                                            st.download_button(
-                                                                label="📦 下载本次提交完整文件",
-                                                                data=zip_data,
-                                                                file_name=f"{student_username}_期末作业_提交.zip",
-                                                                mime="application/zip",
-                                                                use_container_width=True,
-                                                                key=f"teacher_final_download_full_{submission_id}_{student_username}_{sub_idx}"
-                                                            )
+                                                    zip_data = download_student_files(student_username, assignment_id)
+                                                    if zip_data:
+                                                        st.download_button(
+                                                            label="📦 下载本次提交完整文件",
+                                                            data=zip_data,
+                                                            file_name=f"{student_username}_期末作业_提交.zip",
+                                                            mime="application/zip",
+                                                            use_container_width=True,
+                                                            key=f"teacher_final_download_full_{submission_id}_{student_username}_{sub_idx}"
+                                                        )
                                                     
                                                     # 文件预览
                                                     st.markdown("**🔍 文件预览:**")
@@ -4169,3 +4016,47 @@ else:
                                 st.pyplot(fig)
                 else:
                     st.info("暂无成绩数据")
+                
+                # 批量下载某次作业全班的提交
+                st.markdown("---")
+                st.markdown("### 📦 批量下载作业提交")
+                
+                all_assignments = get_all_assignments()
+                if all_assignments:
+                    type_names = {'experiment': '实验', 'midterm': '期中作业', 'final': '期末作业'}
+                    assignment_labels = {
+                        assignment[0]: f"{type_names.get(assignment[1], assignment[1])}{assignment[2]}：{assignment[3]}"
+                        for assignment in all_assignments
+                    }
+                    
+                    col1, col2 = st.columns([3, 1])
+                    with col1:
+                        bulk_assignment_id = st.selectbox(
+                            "选择作业",
+                            options=list(assignment_labels),
+                            format_func=assignment_labels.get,
+                            key="bulk_download_assignment"
+                        )
+                    
+                    with col2:
+                        st.markdown("<br>", unsafe_allow_html=True)
+                        bulk_clicked = st.button("📦 打包全班提交", use_container_width=True, key="bulk_download_pack")
+                    
+                    if bulk_clicked:
+                        with st.spinner("正在打包全班提交文件..."):
+                            zip_data, student_count, file_count, cached, error = export_assignment_submissions(bulk_assignment_id)
+                        if zip_data:
+                            cache_note = "（文件未变化，使用上次打包结果）" if cached else ""
+                            st.success(f"✅ 共 {student_count} 名学生、{file_count} 个文件{cache_note}")
+                            st.download_button(
+                                label="✅ 下载全班提交（含成绩清单）",
+                                data=zip_data,
+                                file_name=f"{assignment_labels[bulk_assignment_id].split('：')[0]}_全班提交_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+                                mime="application/zip",
+                                use_container_width=True,
+                                key="bulk_download_file"
+                            )
+                        else:
+                            st.warning(error)
+                else:
+                    st.info("暂无作业信息")
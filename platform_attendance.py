@@ -0,0 +1,455 @@
+"""
+融思政平台 - 签到汇总表
+
+教师控制台、班级统计和签到详情原先每次重跑都从 attendance_records 重新统计，
+平均到课率还要取出全部已结束的签到活动在 Python 中逐个计算。这里维护三张汇总表：
+
+- attendance_session_rollups：每个签到活动的应到人数、签到数、迟到数、积分合计
+- attendance_class_rollups：每个班级的活动数、已结束活动的到课率之和、签到/迟到/积分合计
+- attendance_student_rollups：每个学生在每个班级的签到数、迟到数、积分合计
+
+汇总在签到、创建活动、结束活动的同一事务中增量更新（函数接收调用方的游标，
+不自行提交），读取时只与班级数或学生数相关，与签到记录数无关。
+rebuild_rollups() 可从原始记录完整重建（迁移时回填，或数据修复时使用）。
+
+签到用一条 INSERT ... SELECT 完成活动/时间/成员校验与写入，重复签到由
+UNIQUE(session_code, student_username) 拦截，课堂上几百名学生同时签到时不会出现
+计数丢失或重复记录。check_in() 把签到交给 platform_writer 的后台写线程，
+同一时刻到达的签到合并在一个事务中提交。
+"""
+import sqlite3
+from datetime import datetime, timedelta
+
+import platform_db
+import platform_writer
+
+# 签到活动结束后仍允许签到的分钟数（与签到页面的宽限时间一致）
+CHECK_IN_GRACE_MINUTES = 15
+
+# 开始后超过该分钟数签到记为迟到
+LATE_AFTER_MINUTES = 5
+
+# 准时 / 迟到签到获得的积分
+POINTS_ON_TIME = 10
+POINTS_LATE = 5
+
+# 签到时间的存储格式（北京时间）
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def create_rollup_tables(c):
+    """创建汇总表（由 platform_migrations 调用）"""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_session_rollups (
+            class_code VARCHAR(12) NOT NULL,
+            session_code VARCHAR(10) NOT NULL,
+            teacher_username VARCHAR(50),
+            total_students INTEGER DEFAULT 0,
+            attended_count INTEGER DEFAULT 0,
+            late_count INTEGER DEFAULT 0,
+            points_total INTEGER DEFAULT 0,
+            is_closed BOOLEAN DEFAULT FALSE,
+            updated_at TEXT,
+            PRIMARY KEY (class_code, session_code)
+        )
+    ''')
+    c.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_attendance_session_rollups_session
+        ON attendance_session_rollups (session_code)
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_class_rollups (
+            class_code VARCHAR(12) PRIMARY KEY,
+            teacher_username VARCHAR(50),
+            session_count INTEGER DEFAULT 0,
+            closed_session_count INTEGER DEFAULT 0,
+            rated_session_count INTEGER DEFAULT 0,  -- 已结束且应到人数大于 0 的活动数
+            rate_sum REAL DEFAULT 0,                -- 上述活动的到课率（%）之和
+            attended_count INTEGER DEFAULT 0,
+            late_count INTEGER DEFAULT 0,
+            points_total INTEGER DEFAULT 0,
+            updated_at TEXT
+        )
+    ''')
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_attendance_class_rollups_teacher
+        ON attendance_class_rollups (teacher_username)
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_student_rollups (
+            class_code VARCHAR(12) NOT NULL,
+            student_username VARCHAR(50) NOT NULL,
+            attended_count INTEGER DEFAULT 0,
+            late_count INTEGER DEFAULT 0,
+            points_total INTEGER DEFAULT 0,
+            last_check_in TEXT,
+            PRIMARY KEY (class_code, student_username)
+        )
+    ''')
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_attendance_student_rollups_student
+        ON attendance_student_rollups (student_username)
+    ''')
+
+
+def attendance_rate(attended, total):
+    """到课率（%），应到人数为 0 时为 0"""
+    return attended / total * 100 if total else 0.0
+
+
+def _now():
+    return (datetime.utcnow() + timedelta(hours=8)).strftime(TIME_FORMAT)
+
+
+def _ensure_class_row(c, class_code):
+    c.execute('''
+        INSERT OR IGNORE INTO attendance_class_rollups (class_code, teacher_username, updated_at)
+        SELECT class_code, teacher_username, ? FROM classrooms WHERE class_code = ?
+    ''', (_now(), class_code))
+
+
+# ======================= 增量维护 =======================
+
+def register_session(c, session_code, class_code, teacher_username, total_students):
+    """新建签到活动时登记汇总行"""
+    now = _now()
+    c.execute('''
+        INSERT OR IGNORE INTO attendance_session_rollups
+        (class_code, session_code, teacher_username, total_students, updated_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (class_code, session_code, teacher_username, total_students, now))
+    _ensure_class_row(c, class_code)
+    c.execute('''
+        UPDATE attendance_class_rollups
+        SET session_count = session_count + 1, updated_at = ?
+        WHERE class_code = ?
+    ''', (now, class_code))
+
+
+def record_check_in(c, session_code, class_code, student_username, is_late, points_earned, check_in_time):
+    """记录一次成功签到"""
+    late = 1 if is_late else 0
+    now = _now()
+    c.execute('''
+        UPDATE attendance_session_rollups
+        SET attended_count = attended_count + 1, late_count = late_count + ?,
+            points_total = points_total + ?, updated_at = ?
+        WHERE session_code = ?
+    ''', (late, points_earned, now, session_code))
+    _ensure_class_row(c, class_code)
+    c.execute('''
+        UPDATE attendance_class_rollups
+        SET attended_count = attended_count + 1, late_count = late_count + ?,
+            points_total = points_total + ?, updated_at = ?
+        WHERE class_code = ?
+    ''', (late, points_earned, now, class_code))
+    c.execute('''
+        INSERT INTO attendance_student_rollups
+        (class_code, student_username, attended_count, late_count, points_total, last_check_in)
+        VALUES (?, ?, 1, ?, ?, ?)
+        ON CONFLICT (class_code, student_username) DO UPDATE SET
+            attended_count = attended_count + 1,
+            late_count = late_count + excluded.late_count,
+            points_total = points_total + excluded.points_total,
+            last_check_in = excluded.last_check_in
+    ''', (class_code, student_username, late, points_earned, check_in_time))
+
+
+def close_session(c, session_code):
+    """
+    结束签到活动：标记为 completed，并把到课率计入班级汇总
+
+    返回:
+    - 是否本次结束（已结束的活动返回 False）
+    """
+    c.execute('''
+        SELECT class_code, total_students, attended_count FROM attendance_session_rollups
+        WHERE session_code = ? AND NOT is_closed
+    ''', (session_code,))
+    row = c.fetchone()
+    if row is None:
+        return False
+
+    class_code, total_students, attended_count = row
+    now = _now()
+    c.execute('''
+        UPDATE attendance_session_rollups SET is_closed = TRUE, updated_at = ?
+        WHERE session_code = ?
+    ''', (now, session_code))
+    c.execute('''
+        UPDATE attendance_class_rollups
+        SET closed_session_count = closed_session_count + 1,
+            rated_session_count = rated_session_count + ?,
+            rate_sum = rate_sum + ?,
+            updated_at = ?
+        WHERE class_code = ?
+    ''', (1 if total_students > 0 else 0, attendance_rate(attended_count, total_students), now, class_code))
+    c.execute('''
+        UPDATE attendance_sessions SET status = 'completed', attended_students = ?
+        WHERE session_code = ?
+    ''', (attended_count, session_code))
+    return True
+
+
+def close_expired_sessions(c, teacher_username=None, grace_minutes=CHECK_IN_GRACE_MINUTES):
+    """
+    结束已过签到宽限时间的活动
+
+    返回:
+    - 本次结束的活动数
+    """
+    cutoff = ((datetime.utcnow() + timedelta(hours=8)) - timedelta(minutes=grace_minutes)).strftime(TIME_FORMAT)
+    query = "SELECT session_code FROM attendance_sessions WHERE status != 'completed' AND end_time < ?"
+    params = [cutoff]
+    if teacher_username:
+        query += " AND teacher_username = ?"
+        params.append(teacher_username)
+    c.execute(query, params)
+    return sum(close_session(c, session_code) for (session_code,) in c.fetchall())
+
+
+def remove_class(c, class_code):
+    """删除班级的全部汇总（班级被彻底删除时调用）"""
+    for table in ("attendance_session_rollups", "attendance_class_rollups", "attendance_student_rollups"):
+        c.execute(f"DELETE FROM {table} WHERE class_code = ?", (class_code,))
+
+
+def rebuild_rollups(c):
+    """从 attendance_sessions / attendance_records 完整重建汇总"""
+    now = _now()
+    for table in ("attendance_session_rollups", "attendance_class_rollups", "attendance_student_rollups"):
+        c.execute(f"DELETE FROM {table}")
+
+    c.execute('''
+        INSERT INTO attendance_session_rollups
+        (class_code, session_code, teacher_username, total_students,
+         attended_count, late_count, points_total, is_closed, updated_at)
+        SELECT a.class_code, a.session_code, a.teacher_username, a.total_students,
+               COUNT(ar.id), COALESCE(SUM(ar.is_late), 0), COALESCE(SUM(ar.points_earned), 0),
+               a.status = 'completed', ?
+        FROM attendance_sessions a
+        LEFT JOIN attendance_records ar ON ar.session_code = a.session_code
+        GROUP BY a.session_code
+    ''', (now,))
+
+    c.execute('''
+        INSERT INTO attendance_class_rollups
+        (class_code, teacher_username, session_count, closed_session_count,
+         rated_session_count, rate_sum, attended_count, late_count, points_total, updated_at)
+        SELECT c.class_code, c.teacher_username,
+               COUNT(r.session_code),
+               COALESCE(SUM(r.is_closed), 0),
+               COALESCE(SUM(r.is_closed AND r.total_students > 0), 0),
+               COALESCE(SUM(CASE WHEN r.is_closed AND r.total_students > 0
+                                 THEN r.attended_count * 100.0 / r.total_students END), 0),
+               COALESCE(SUM(r.attended_count), 0),
+               COALESCE(SUM(r.late_count), 0),
+               COALESCE(SUM(r.points_total), 0),
+               ?
+        FROM classrooms c
+        LEFT JOIN attendance_session_rollups r ON r.class_code = c.class_code
+        GROUP BY c.class_code
+    ''', (now,))
+
+    c.execute('''
+        INSERT INTO attendance_student_rollups
+        (class_code, student_username, attended_count, late_count, points_total, last_check_in)
+        SELECT class_code, student_username, COUNT(*), COALESCE(SUM(is_late), 0),
+               COALESCE(SUM(points_earned), 0), MAX(check_in_time)
+        FROM attendance_records
+        GROUP BY class_code, student_username
+    ''')
+
+
+# ======================= 签到 =======================
+
+# 校验活动存在、在签到时间内、学生是班级有效成员后写入签到记录；
+# 任一条件不满足时 SELECT 无结果，重复签到由唯一约束忽略
+CHECK_IN_SQL = '''
+    INSERT INTO attendance_records
+    (session_code, student_username, class_code, check_in_time,
+     check_in_method, device_info, ip_address, is_late, points_earned)
+    SELECT a.session_code, cm.student_username, a.class_code, :now,
+           :method, :device, :ip,
+           :now > datetime(a.start_time, :late_offset),
+           CASE WHEN :now > datetime(a.start_time, :late_offset) THEN :late_points ELSE :points END
+    FROM attendance_sessions a
+    JOIN classroom_members cm ON cm.class_code = a.class_code
+    WHERE a.session_code = :session_code
+      AND cm.student_username = :student
+      AND cm.status = 'active'
+      AND :now >= a.start_time
+      AND :now <= datetime(a.end_time, :grace_offset)
+    ON CONFLICT (session_code, student_username) DO NOTHING
+'''
+
+
+def _check_in_failure(c, session_code, student_username, now):
+    """签到未写入时判断原因（只在失败时执行）"""
+    c.execute('''
+        SELECT start_time, datetime(end_time, ?) FROM attendance_sessions
+        WHERE session_code = ?
+    ''', (f"+{CHECK_IN_GRACE_MINUTES} minutes", session_code))
+    session = c.fetchone()
+    if session is None:
+        return "签到活动不存在"
+    start_time, close_time = session
+    if now < start_time:
+        return "签到活动尚未开始"
+    if now > close_time:
+        return "签到活动已结束"
+    c.execute('''
+        SELECT id FROM attendance_records WHERE session_code = ? AND student_username = ?
+    ''', (session_code, student_username))
+    if c.fetchone():
+        return "您已经签到过了"
+    return "您不在该班级中"
+
+
+def apply_check_in(c, session_code, student_username, check_in_method='manual', device_info=None,
+                   ip_address=None, now=None):
+    """
+    在调用方的写事务中执行一次签到（不提交）
+
+    返回:
+    - (是否成功, 提示信息)
+    """
+    now = now or _now()
+    c.execute(CHECK_IN_SQL, {
+        "now": now,
+        "method": check_in_method,
+        "device": device_info,
+        "ip": ip_address,
+        "late_offset": f"+{LATE_AFTER_MINUTES} minutes",
+        "grace_offset": f"+{CHECK_IN_GRACE_MINUTES} minutes",
+        "points": POINTS_ON_TIME,
+        "late_points": POINTS_LATE,
+        "session_code": session_code,
+        "student": student_username,
+    })
+    if c.rowcount != 1:
+        # 没有写入任何数据，只需判断原因
+        return False, _check_in_failure(c, session_code, student_username, now)
+
+    record_id = c.lastrowid
+    c.execute('''
+        UPDATE attendance_sessions
+        SET attended_students = attended_students + 1
+        WHERE session_code = ?
+    ''', (session_code,))
+    c.execute("SELECT class_code, is_late, points_earned FROM attendance_records WHERE id = ?", (record_id,))
+    class_code, is_late, points_earned = c.fetchone()
+    record_check_in(c, session_code, class_code, student_username, is_late, points_earned, now)
+    return True, "签到成功"
+
+
+def submit_check_in(session_code, student_username, check_in_method='manual', device_info=None,
+                    ip_address=None, now=None, path=platform_db.DB_PATH):
+    """
+    把签到交给后台写线程，与同一时刻的其他签到合并在一个事务中提交
+
+    签到时间在提交时确定，不受排队时间影响。
+
+    返回:
+    - concurrent.futures.Future，结果为 (是否成功, 提示信息)
+    """
+    return platform_writer.submit(apply_check_in, session_code, student_username, check_in_method,
+                                  device_info, ip_address, now or _now(), path=path)
+
+
+def check_in(session_code, student_username, check_in_method='manual', device_info=None,
+             ip_address=None, now=None, path=platform_db.DB_PATH):
+    """
+    学生签到（等待后台写线程提交后返回）
+
+    参数:
+    - now: 签到时间（北京时间字符串，默认当前时间）
+    - path: 数据库文件
+
+    返回:
+    - (是否成功, 提示信息)
+    """
+    future = submit_check_in(session_code, student_username, check_in_method, device_info,
+                             ip_address, now, path)
+    try:
+        return future.result(timeout=platform_writer.RESULT_TIMEOUT)
+    except sqlite3.Error as e:
+        return False, f"签到失败: {str(e)}"
+    except TimeoutError:
+        return False, "签到人数较多，请稍后刷新查看签到结果"
+
+
+# ======================= 读取 =======================
+
+def get_teacher_summary(c, teacher_username):
+    """教师名下所有班级的签到汇总（只读取班级汇总行）"""
+    c.execute('''
+        SELECT COALESCE(SUM(session_count), 0), COALESCE(SUM(rated_session_count), 0),
+               COALESCE(SUM(rate_sum), 0), COALESCE(SUM(attended_count), 0),
+               COALESCE(SUM(late_count), 0), COALESCE(SUM(points_total), 0)
+        FROM attendance_class_rollups
+        WHERE teacher_username = ?
+    ''', (teacher_username,))
+    session_count, rated_count, rate_sum, attended, late, points = c.fetchone()
+    return {
+        'total_sessions': session_count,
+        'avg_attendance_rate': round(rate_sum / rated_count, 1) if rated_count else 0,
+        'attended_count': attended,
+        'late_count': late,
+        'points_total': points,
+    }
+
+
+def get_class_summary(c, class_code):
+    """单个班级的签到汇总，班级没有汇总行时返回全 0"""
+    c.execute('''
+        SELECT session_count, closed_session_count, rated_session_count, rate_sum,
+               attended_count, late_count, points_total
+        FROM attendance_class_rollups WHERE class_code = ?
+    ''', (class_code,))
+    row = c.fetchone() or (0, 0, 0, 0, 0, 0, 0)
+    session_count, closed_count, rated_count, rate_sum, attended, late, points = row
+    return {
+        'total_sessions': session_count,
+        'closed_sessions': closed_count,
+        'avg_attendance_rate': round(rate_sum / rated_count, 1) if rated_count else 0,
+        'attended_count': attended,
+        'late_count': late,
+        'points_total': points,
+    }
+
+
+def get_session_summary(c, session_code):
+    """单个签到活动的汇总"""
+    c.execute('''
+        SELECT total_students, attended_count, late_count, points_total, is_closed
+        FROM attendance_session_rollups WHERE session_code = ?
+    ''', (session_code,))
+    row = c.fetchone()
+    if row is None:
+        return None
+    total, attended, late, points, closed = row
+    return {
+        'total_students': total,
+        'attended_count': attended,
+        'late_count': late,
+        'points_total': points,
+        'is_closed': bool(closed),
+        'attendance_rate': attendance_rate(attended, total),
+    }
+
+
+def get_student_summary(c, student_username):
+    """学生在所有班级的签到汇总"""
+    c.execute('''
+        SELECT COALESCE(SUM(attended_count), 0), COALESCE(SUM(late_count), 0),
+               COALESCE(SUM(points_total), 0)
+        FROM attendance_student_rollups WHERE student_username = ?
+    ''', (student_username,))
+    attended, late, points = c.fetchone()
+    return {
+        'attended_count': attended,
+        'late_count': late,
+        'points_total': points,
+        'avg_points': points / attended if attended else 0,
+    }
@@ -0,0 +1,298 @@
+"""
+融思政平台 - 登录认证服务
+
+bcrypt 校验一次密码需要几十到上百毫秒的 CPU 时间。原先登录、修改密码都在页面脚本线程上
+直接调用 bcrypt，上课开始时全班集中登录，几十个哈希同时抢占 CPU，同一进程里所有人的页面
+重跑都跟着变慢。这里把认证集中到一处：
+
+- 哈希计算交给固定大小的工作线程池（HASH_WORKERS 个线程，bcrypt 计算期间释放 GIL），
+  排队中的认证请求超过 MAX_PENDING 时直接提示稍后重试，不再无限堆积；
+- 登录成功后签发带 HMAC 签名的会话令牌（用户名、角色、凭据版本、过期时间），页面重跑时
+  只校验签名，不再重新校验密码；凭据版本由 users 表中的密码哈希与角色派生，修改密码或
+  角色后旧令牌立即失效（查询结果经 platform_db.cached_query 缓存，users 表有写入时失效）；
+- 记录登录次数、失败次数、被限流次数与耗时分布，get_auth_metrics() 返回汇总。
+
+    ok, role, token = platform_auth.login(username, password)
+    identity = platform_auth.verify_token(token)   # Identity(username, role, expires) 或 None
+"""
+import atexit
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import math
+import os
+import secrets
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import bcrypt
+
+import platform_db
+
+logger = logging.getLogger(__name__)
+
+# 哈希工作线程数
+HASH_WORKERS = int(os.environ.get("PLATFORM_AUTH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# 同时排队（含正在计算）的认证请求上限，超过时直接拒绝
+MAX_PENDING = int(os.environ.get("PLATFORM_AUTH_MAX_PENDING", "64"))
+
+# 等待哈希结果的超时（秒）
+HASH_TIMEOUT = 30
+
+# 会话令牌有效期（秒）
+SESSION_TTL = int(os.environ.get("PLATFORM_SESSION_TTL", str(12 * 3600)))
+
+# 令牌签名密钥；未配置时每个进程随机生成（进程重启后 Streamlit 会话本身也不再保留）
+SESSION_SECRET = os.environ.get("PLATFORM_SESSION_SECRET", "").encode("utf-8") or secrets.token_bytes(32)
+
+# 计算耗时分布时保留的最近样本数
+LATENCY_SAMPLES = 1000
+
+# 用户不存在时也做一次同等耗时的校验，避免通过响应时间判断用户名是否存在
+# （预先计算的哈希，导入模块时不做哈希计算）
+_DUMMY_HASH = b"$2b$12$cfoMVA6EyoPl/dwovu/yp.wUzZqKkL48YRXmi.h.buBABHW1D3xAm"
+
+Identity = namedtuple("Identity", ["username", "role", "expires"])
+
+
+class AuthBusy(RuntimeError):
+    """认证请求过多，已达到排队上限"""
+
+
+class AuthService:
+    """密码哈希线程池与认证统计"""
+
+    def __init__(self, workers=HASH_WORKERS, max_pending=MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._started = time.monotonic()
+        self.logins = 0
+        self.failed = 0
+        self.rejected = 0
+        self.hashes = 0
+        self.hash_seconds = 0.0
+
+    def _run(self, func, *args):
+        """在线程池中执行哈希计算并等待结果；排队已满时抛出 AuthBusy"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            logger.warning("认证请求排队已满（%d），拒绝本次请求", self.max_pending)
+            raise AuthBusy("当前登录人数较多，请稍后重试")
+        try:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix="platform-auth")
+                executor = self._executor
+            start = time.perf_counter()
+            result = executor.submit(func, *args).result(timeout=HASH_TIMEOUT)
+            with self._lock:
+                self.hashes += 1
+                self.hash_seconds += time.perf_counter() - start
+            return result
+        finally:
+            self._slots.release()
+
+    def check_password(self, password, hashed_password):
+        return self._run(bcrypt.checkpw, password.encode("utf-8"), hashed_password)
+
+    def hash_password(self, password):
+        return self._run(bcrypt.hashpw, password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+
+    def record_login(self, ok, seconds):
+        with self._lock:
+            self.logins += 1
+            self.failed += 0 if ok else 1
+            self._latencies.append(seconds)
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            uptime = time.monotonic() - self._started
+            logins, failed, rejected = self.logins, self.failed, self.rejected
+            hashes, hash_seconds = self.hashes, self.hash_seconds
+
+        def percentile(pct):
+            if not latencies:
+                return 0.0
+            index = max(0, min(len(latencies) - 1, math.ceil(pct / 100 * len(latencies)) - 1))
+            return round(latencies[index] * 1000, 1)
+
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "logins": logins,
+            "failed": failed,
+            "rejected": rejected,
+            "logins_per_min": round(logins / uptime * 60, 1) if uptime > 0 else 0,
+            "p50_ms": percentile(50),
+            "p99_ms": percentile(99),
+            "avg_hash_ms": round(hash_seconds / hashes * 1000, 1) if hashes else 0,
+        }
+
+
+service = AuthService()
+
+
+def hash_password(password):
+    """生成加盐哈希（在线程池中计算）"""
+    return service.hash_password(password)
+
+
+def credential_version(password_hash, role):
+    """凭据版本：密码哈希与角色的摘要（修改密码或角色后改变）"""
+    return hashlib.sha256(f"{password_hash}|{role}".encode("utf-8")).hexdigest()[:16]
+
+
+@platform_db.cached_query(tables=("users",))
+def current_credential(username, path=platform_db.DB_PATH):
+    """
+    用户当前的凭据版本（用户不存在时为 None）
+
+    本进程写入 users 表后缓存立即失效；其他进程的修改最多延迟一个缓存有效期。
+    """
+    conn = platform_db.connect(path)
+    try:
+        c = conn.cursor()
+        c.execute("SELECT password, role FROM users WHERE username = ?", (username,))
+        row = c.fetchone()
+    finally:
+        conn.close()
+    return credential_version(*row) if row else None
+
+
+def login(username, password, path=platform_db.DB_PATH):
+    """
+    校验用户名与密码
+
+    返回:
+    - (是否成功, 角色, 会话令牌)；失败时角色与令牌为 None
+
+    认证请求过多时抛出 AuthBusy。
+    """
+    start = time.perf_counter()
+    conn = platform_db.connect(path)
+    try:
+        c = conn.cursor()
+        c.execute("SELECT password, role FROM users WHERE username = ?", (username,))
+        row = c.fetchone()
+    finally:
+        conn.close()
+
+    if row:
+        hashed_password, role = row
+        ok = service.check_password(password, hashed_password.encode("utf-8"))
+    else:
+        service.check_password(password, _DUMMY_HASH)
+        ok, role = False, None
+    service.record_login(ok, time.perf_counter() - start)
+    if not ok:
+        return False, None, None
+    return True, role, issue_token(username, role, version=credential_version(hashed_password, role))
+
+
+def change_password(username, old_password, new_password, path=platform_db.DB_PATH):
+    """
+    校验旧密码后更新为新密码（之前签发的令牌随之失效，调用方需为当前会话重新签发）
+
+    返回:
+    - (是否成功, 提示信息)
+    """
+    ok, _, _ = login(username, old_password, path)
+    if not ok:
+        return False, "旧密码错误"
+    hashed_new_password = hash_password(new_password)
+    conn = platform_db.connect(path)
+    try:
+        with platform_db.write_transaction(conn) as c:
+            c.execute("UPDATE users SET password = ? WHERE username = ?", (hashed_new_password, username))
+    finally:
+        conn.close()
+    return True, "密码修改成功！"
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _sign(payload):
+    return _b64encode(hmac.new(SESSION_SECRET, payload.encode("utf-8"), hashlib.sha256).digest())
+
+
+def issue_token(username, role, ttl=SESSION_TTL, version=None, path=platform_db.DB_PATH):
+    """
+    签发会话令牌：base64(JSON 载荷).签名
+
+    参数:
+    - version: 凭据版本（默认查询 users 表中的当前值）
+    """
+    if version is None:
+        version = current_credential(username, path)
+    payload = _b64encode(json.dumps({"u": username, "r": role, "v": version, "exp": int(time.time()) + ttl},
+                                    ensure_ascii=False).encode("utf-8"))
+    return f"{payload}.{_sign(payload)}"
+
+
+def verify_token(token, path=platform_db.DB_PATH):
+    """
+    校验会话令牌的签名、有效期与凭据版本
+
+    返回:
+    - Identity(用户名, 角色, 过期时间)；令牌缺失、被篡改、已过期，或签发后修改过密码、
+      角色（凭据版本不一致）时返回 None
+    """
+    if not token or "." not in token:
+        return None
+    payload, signature = token.rsplit(".", 1)
+    if not hmac.compare_digest(signature.encode("utf-8"), _sign(payload).encode("ascii")):
+        return None
+    try:
+        data = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+    if data.get("exp", 0) < time.time():
+        return None
+    if data.get("v") is None or data.get("v") != current_credential(data.get("u"), path):
+        return None
+    return Identity(data["u"], data["r"], datetime.fromtimestamp(data["exp"]))
+
+
+def session_identity(state):
+    """
+    当前会话的登录身份（state 为 st.session_state）
+
+    令牌与会话中的用户名一致时返回 Identity，否则返回 None，调用方按未登录处理或回退到查询数据库。
+    """
+    identity = verify_token(state.get("auth_token"))
+    if identity is None or identity.username != state.get("username"):
+        return None
+    return identity
+
+
+def get_auth_metrics():
+    """登录次数、限流次数与耗时分布"""
+    return service.stats()
+
+
+atexit.register(service.close)
@@ -0,0 +1,449 @@
+"""
+融思政平台 - 上传文件去重存储
+
+实验提交、作品征集和实验卡附件原先都把上传内容原样写到各自的目录中，学生经常上传
+相同的示例图片和报告模板，同一份内容在磁盘上存了几十份。这里按内容寻址存储：
+
+- 文件内容按 SHA-256 存为 BLOB_DIR/ab/cd/<摘要>，相同内容只写一次；
+- 各提交目录中的文件是指向该内容的硬链接（文件系统不支持时退回为复制），页面读取、
+  预览、打包下载仍按原路径访问，不需要任何改动；
+- blobs 表记录每份内容的大小和引用数，blob_refs 表记录每个文件路径引用的内容，并按
+  “清单”（一次提交、一个作品、一份实验卡）分组；引用数由触发器随 blob_refs 的增删改
+  在同一事务中维护；
+- 撤回、删除只需删除引用并移除链接（引用数减一），引用数归零的内容由后台写线程
+  （platform_writer）统一回收。
+
+上传内容按 UPLOAD_CHUNK_SIZE 分块写入临时文件，边写边计算摘要和大小：超过
+MAX_UPLOAD_BYTES 或图片扩展名与文件头不符时中止并删除临时文件（UploadRejected），
+不会留下写了一半的文件。
+
+与 platform_attendance 一样，写函数接收调用方的游标、不自行提交，文件记录与提交记录
+在同一事务中生效。上传文件可能很大，写事务期间其他写入（签到、反馈）都要排队，因此
+可以分两步：先在事务外 store_uploads() 写入内容和链接，再在事务中 register_stored()
+只登记记录；事务回滚时用 discard_stored() 移除本次新建的链接。
+"""
+import hashlib
+import io
+import logging
+import os
+import shutil
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import platform_db
+import platform_writer
+
+logger = logging.getLogger(__name__)
+
+# 内容存储目录（与各上传目录位于同一文件系统时才能使用硬链接）
+BLOB_DIR = os.environ.get("PLATFORM_BLOB_DIR", "blob_store")
+
+# 每次回收的内容数上限
+GC_BATCH = 500
+
+# 上传写入的块大小（字节）
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# 单个上传文件的大小上限（字节）
+MAX_UPLOAD_BYTES = int(os.environ.get("PLATFORM_UPLOAD_MAX_MB", "200")) * 1024 * 1024
+
+# 图片扩展名对应的文件头
+IMAGE_SIGNATURES = {
+    ".png": (b"\x89PNG\r\n\x1a\n",),
+    ".jpg": (b"\xff\xd8\xff",),
+    ".jpeg": (b"\xff\xd8\xff",),
+    ".gif": (b"GIF87a", b"GIF89a"),
+    ".bmp": (b"BM",),
+    ".tif": (b"II*\x00", b"MM\x00*"),
+    ".tiff": (b"II*\x00", b"MM\x00*"),
+    ".webp": (b"RIFF",),
+}
+
+
+def create_tables(c):
+    """创建内容表、引用表及维护引用数的触发器（由 platform_migrations 调用）"""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS blobs (
+            hash TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL
+        )
+    ''')
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_blobs_unreferenced
+        ON blobs (hash) WHERE refcount <= 0
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS blob_refs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            manifest TEXT NOT NULL,      -- 所属清单，如 experiment:学生_提交ID
+            path TEXT NOT NULL UNIQUE,   -- 文件在上传目录中的路径
+            filename TEXT NOT NULL,      -- 原始文件名
+            hash TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    ''')
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_blob_refs_manifest
+        ON blob_refs (manifest)
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_blob_refs_insert AFTER INSERT ON blob_refs
+        BEGIN
+            UPDATE blobs SET refcount = refcount + 1 WHERE hash = NEW.hash;
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_blob_refs_delete AFTER DELETE ON blob_refs
+        BEGIN
+            UPDATE blobs SET refcount = refcount - 1 WHERE hash = OLD.hash;
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_blob_refs_update AFTER UPDATE OF hash ON blob_refs
+        WHEN OLD.hash != NEW.hash
+        BEGIN
+            UPDATE blobs SET refcount = refcount - 1 WHERE hash = OLD.hash;
+            UPDATE blobs SET refcount = refcount + 1 WHERE hash = NEW.hash;
+        END
+    ''')
+
+
+def _now():
+    return (datetime.utcnow() + timedelta(hours=8)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def blob_path(digest):
+    """内容文件的路径"""
+    return os.path.join(BLOB_DIR, digest[:2], digest[2:4], digest)
+
+
+def _temp_path(path):
+    return f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+
+
+class UploadRejected(ValueError):
+    """上传文件超过大小限制，或内容与扩展名不符"""
+
+
+def _too_large(filename, max_bytes):
+    return UploadRejected(f"文件 {filename} 超过 {max_bytes / (1024 * 1024):.0f}MB 的大小限制")
+
+
+def check_upload_size(uploaded_file, max_bytes=MAX_UPLOAD_BYTES):
+    """按上传对象声明的大小提前拒绝超限文件（读取任何数据之前）"""
+    size = getattr(uploaded_file, "size", None)
+    if max_bytes and size is not None and size > max_bytes:
+        raise _too_large(uploaded_file.name, max_bytes)
+
+
+def check_image_header(head, filename):
+    """
+    只看文件头校验图片格式（不解码图像）
+
+    扩展名是图片格式但文件头不符时拒绝；其他扩展名不做检查。
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    signatures = IMAGE_SIGNATURES.get(ext)
+    if signatures is None:
+        return
+    if ext == ".webp":
+        matched = head[:4] == b"RIFF" and head[8:12] == b"WEBP"
+    else:
+        matched = any(head.startswith(signature) for signature in signatures)
+    if not matched:
+        raise UploadRejected(f"文件 {filename} 的内容不是有效的 {ext[1:].upper()} 图片")
+
+
+def stream_to_file(fileobj, path, filename, max_bytes=MAX_UPLOAD_BYTES, chunk_size=UPLOAD_CHUNK_SIZE):
+    """
+    按固定大小的块把上传内容写入 path，同时计算摘要和大小
+
+    写入先落到同目录的临时文件，超限或校验失败时删除临时文件，path 保持不变。
+
+    返回:
+    - (SHA-256 摘要, 字节数)
+    """
+    if hasattr(fileobj, "size"):
+        check_upload_size(fileobj, max_bytes)
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp = _temp_path(path)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(temp, "wb") as f:
+            while True:
+                block = fileobj.read(chunk_size)
+                if not block:
+                    break
+                if size == 0:
+                    check_image_header(block[:16], filename)
+                size += len(block)
+                if max_bytes and size > max_bytes:
+                    raise _too_large(filename, max_bytes)
+                digest.update(block)
+                f.write(block)
+        os.replace(temp, path)
+    except BaseException:
+        _remove_file(temp)
+        raise
+    return digest.hexdigest(), size
+
+
+def write_upload(uploaded_file, path, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    把 Streamlit 上传的文件流式写入 path（不经过去重存储）
+
+    返回:
+    - (SHA-256 摘要, 字节数)
+    """
+    return stream_to_file(uploaded_file, path, uploaded_file.name, max_bytes)
+
+
+def _store_blob(fileobj, filename, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    流式写入内容文件：先写到临时文件并计算摘要，内容已存在时丢弃临时文件
+
+    返回:
+    - (摘要, 字节数)
+    """
+    temp_dir = os.path.join(BLOB_DIR, "tmp")
+    temp = os.path.join(temp_dir, uuid.uuid4().hex)
+    digest, size = stream_to_file(fileobj, temp, filename, max_bytes)
+    path = blob_path(digest)
+    if os.path.exists(path):
+        _remove_file(temp)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp, path)
+    return digest, size
+
+
+def _materialize(digest, path, restore):
+    """
+    在 path 放置指向内容的硬链接
+
+    先链接到临时名再替换，不会截断已有文件——已有文件可能与其他提交共享同一份内容。
+
+    参数:
+    - restore: 内容文件刚被回收时重新写入内容的函数
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp = _temp_path(path)
+    try:
+        os.link(blob_path(digest), temp)
+    except FileNotFoundError:
+        restore()
+        os.link(blob_path(digest), temp)
+    except OSError:
+        # 跨文件系统或不支持硬链接：退回为复制
+        shutil.copyfile(blob_path(digest), temp)
+    os.replace(temp, path)
+
+
+# 已写入内容和链接、尚未登记的文件
+# - saved_name: 保存的文件名；name: 原始文件名；created: 链接是否为本次新建
+StoredFile = namedtuple("StoredFile", ["saved_name", "path", "name", "digest", "size", "created"])
+
+
+def _register(c, path, filename, digest, size, manifest):
+    """登记内容与文件引用"""
+    c.execute('''
+        INSERT INTO blobs (hash, size, refcount, created_at) VALUES (?, ?, 0, ?)
+        ON CONFLICT (hash) DO NOTHING
+    ''', (digest, size, _now()))
+    c.execute('''
+        INSERT INTO blob_refs (manifest, path, filename, hash, created_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (path) DO UPDATE SET
+            manifest = excluded.manifest, filename = excluded.filename,
+            hash = excluded.hash, created_at = excluded.created_at
+    ''', (manifest, os.path.normpath(path), filename, digest, _now()))
+
+
+def _store_file(path, fileobj, filename, max_bytes):
+    """内容按块流式去重存储，并在 path 处放置链接（不登记）"""
+    created = not os.path.exists(path)
+    digest, size = _store_blob(fileobj, filename, max_bytes)
+    _materialize(digest, path, lambda: _store_blob(fileobj, filename, max_bytes))
+    return StoredFile(os.path.basename(path), path, filename, digest, size, created)
+
+
+def put_stream(c, path, fileobj, manifest, filename=None, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    保存一个文件：内容按块流式去重存储，path 处放置链接，并登记到清单
+
+    返回:
+    - 内容摘要
+    """
+    stored = _store_file(path, fileobj, filename or os.path.basename(path), max_bytes)
+    _register(c, stored.path, stored.name, stored.digest, stored.size, manifest)
+    return stored.digest
+
+
+def put_bytes(c, path, data, manifest, filename=None):
+    """保存内存中的数据（见 put_stream）"""
+    return put_stream(c, path, io.BytesIO(data), manifest, filename, max_bytes=None)
+
+
+def store_uploads(uploaded_files, directory, name_func=None, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    写入 Streamlit 上传的文件内容并放置链接，不登记（可在事务外调用）
+
+    先按声明的大小检查全部文件，任一超限时一个都不写入；写到一半某个文件被拒绝时，
+    移除本次已新建的链接后再抛出异常。
+
+    参数:
+    - name_func: 由上传文件得到保存文件名的函数（默认使用原文件名）
+
+    返回:
+    - [StoredFile]，交给 register_stored() 登记
+    """
+    uploaded_files = list(uploaded_files or [])
+    for uploaded_file in uploaded_files:
+        check_upload_size(uploaded_file, max_bytes)
+    stored = []
+    try:
+        for uploaded_file in uploaded_files:
+            filename = name_func(uploaded_file) if name_func else uploaded_file.name
+            path = os.path.join(directory, filename)
+            stored.append(_store_file(path, uploaded_file, uploaded_file.name, max_bytes))
+    except BaseException:
+        discard_stored(stored)
+        raise
+    return stored
+
+
+def register_stored(c, stored, manifest):
+    """在调用方的事务中登记 store_uploads() 写入的文件"""
+    for item in stored:
+        _register(c, item.path, item.name, item.digest, item.size, manifest)
+
+
+def discard_stored(stored):
+    """
+    登记失败（事务回滚）后移除本次新建的链接
+
+    覆盖已有文件的链接保留原路径：该路径仍有已提交的引用。内容文件没有登记，
+    之后相同内容的上传会直接复用。
+    """
+    for item in stored:
+        if item.created:
+            _remove_file(item.path)
+
+
+def save_uploads(c, uploaded_files, directory, manifest, name_func=None, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    保存 Streamlit 上传的文件并登记到调用方的事务（见 store_uploads）
+
+    返回:
+    - [(保存的文件名, 路径)]
+    """
+    stored = store_uploads(uploaded_files, directory, name_func, max_bytes)
+    try:
+        register_stored(c, stored, manifest)
+    except BaseException:
+        discard_stored(stored)
+        raise
+    return [(item.saved_name, item.path) for item in stored]
+
+
+def manifest_files(c, manifest):
+    """清单中的文件 [(文件名, 路径, 摘要, 大小)]"""
+    c.execute('''
+        SELECT r.filename, r.path, r.hash, b.size
+        FROM blob_refs r LEFT JOIN blobs b ON b.hash = r.hash
+        WHERE r.manifest = ?
+        ORDER BY r.id
+    ''', (manifest,))
+    return c.fetchall()
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def release_path(c, path):
+    """删除一个文件的引用并移除链接"""
+    c.execute("DELETE FROM blob_refs WHERE path = ?", (os.path.normpath(path),))
+    _remove_file(path)
+
+
+def release_manifest(c, manifest, directory=None):
+    """
+    删除整个清单：各文件的引用数减一并移除链接
+
+    参数:
+    - directory: 清单对应的目录；一并删除（包括启用去重存储之前保存的文件）
+
+    返回:
+    - 释放的引用数
+    """
+    c.execute("SELECT path FROM blob_refs WHERE manifest = ?", (manifest,))
+    paths = [row[0] for row in c.fetchall()]
+    c.execute("DELETE FROM blob_refs WHERE manifest = ?", (manifest,))
+    for path in paths:
+        _remove_file(path)
+    if directory and os.path.exists(directory):
+        shutil.rmtree(directory)
+    return len(paths)
+
+
+def collect_garbage(c, limit=GC_BATCH):
+    """
+    回收引用数归零的内容
+
+    内容文件只是新链接的来源，已有链接不受影响；回收与新的保存并发时，
+    保存方发现内容文件不存在会重新写入。
+
+    返回:
+    - 回收的内容数
+    """
+    c.execute("SELECT hash FROM blobs WHERE refcount <= 0 LIMIT ?", (limit,))
+    digests = [row[0] for row in c.fetchall()]
+    for digest in digests:
+        c.execute("DELETE FROM blobs WHERE hash = ? AND refcount <= 0", (digest,))
+        if c.rowcount:
+            _remove_file(blob_path(digest))
+    if digests:
+        logger.info("回收了 %d 份无引用的上传内容", len(digests))
+    return len(digests)
+
+
+def schedule_gc(path=platform_db.DB_PATH):
+    """在后台写线程中回收无引用的内容（调用方提交事务之后调用）"""
+    return platform_writer.submit(collect_garbage, path=path)
+
+
+def get_blob_stats(c):
+    """
+    去重效果统计
+
+    返回:
+    - {"files": 文件数, "logical_bytes": 按文件计的总大小,
+       "blobs": 内容数, "stored_bytes": 实际存储的大小, "unreferenced": 待回收的内容数}
+    """
+    c.execute('''
+        SELECT COUNT(*), COALESCE(SUM(b.size), 0)
+        FROM blob_refs r JOIN blobs b ON b.hash = r.hash
+    ''')
+    files, logical_bytes = c.fetchone()
+    c.execute('''
+        SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(refcount <= 0), 0)
+        FROM blobs
+    ''')
+    blobs, stored_bytes, unreferenced = c.fetchone()
+    return {
+        "files": files,
+        "logical_bytes": logical_bytes,
+        "blobs": blobs,
+        "stored_bytes": stored_bytes,
+        "unreferenced": unreferenced,
+    }
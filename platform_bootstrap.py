@@ -0,0 +1,144 @@
+"""
+融思政平台 - 进程级初始化注册表
+
+Streamlit 每次交互都会从头重新执行页面脚本，页面顶部的初始化代码（数据库迁移检查、
+创建上传目录等）也跟着每次重跑。这里为这些初始化提供统一的“每个进程只执行一次”入口：
+
+- run_once(name, func, ...) / @once(name)：同名任务在进程内只成功执行一次，之后直接返回
+  第一次的结果；首次执行由该任务自己的锁保护，多个会话同时打开页面时只有一个线程执行，
+  其余线程等待它完成；执行失败不记为完成，下次调用会重试；
+- 分别记录首次执行（冷启动）的耗时和之后每次调用（页面重跑）的耗时，
+  get_bootstrap_metrics() 返回汇总，用于区分冷启动成本与稳定状态下的重跑成本。
+
+    @platform_bootstrap.once("实验作业页面")
+    def init_assignment_db():
+        platform_migrations.ensure_schema(DB_NAME)
+"""
+import functools
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class BootstrapTask:
+    """一个初始化任务的执行状态与耗时统计"""
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.done = False
+        self.result = None
+        # 在另一个任务的首次执行中被调用（其耗时已计入外层任务）
+        self.nested = False
+        self.cold_seconds = 0.0
+        self.failures = 0
+        # 首次执行期间其他线程等待的次数与时间
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.reruns = 0
+        self.rerun_seconds = 0.0
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "done": self.done,
+            "nested": self.nested,
+            "cold_ms": round(self.cold_seconds * 1000, 1),
+            "failures": self.failures,
+            "waits": self.waits,
+            "wait_ms": round(self.wait_seconds * 1000, 1),
+            "reruns": self.reruns,
+            "rerun_avg_us": round(self.rerun_seconds / self.reruns * 1e6, 1) if self.reruns else 0,
+        }
+
+
+_tasks = OrderedDict()
+_tasks_lock = threading.Lock()
+# 当前线程正在首次执行的任务层数
+_local = threading.local()
+
+
+def _get_task(name):
+    with _tasks_lock:
+        task = _tasks.get(name)
+        if task is None:
+            task = _tasks[name] = BootstrapTask(name)
+    return task
+
+
+def run_once(name, func, *args, **kwargs):
+    """
+    执行名为 name 的初始化任务（每个进程只成功执行一次）
+
+    返回:
+    - func 第一次成功执行的返回值
+    """
+    start = time.perf_counter()
+    task = _get_task(name)
+    waited = False
+    if not task.done:
+        waited = True
+        with task.lock:
+            # 获得锁后再次确认，其他线程可能已经执行完成
+            if not task.done:
+                depth = getattr(_local, "depth", 0)
+                _local.depth = depth + 1
+                try:
+                    result = func(*args, **kwargs)
+                except Exception:
+                    task.failures += 1
+                    logger.exception("初始化任务 %s 执行失败", name)
+                    raise
+                finally:
+                    _local.depth = depth
+                task.nested = depth > 0
+                task.result = result
+                task.cold_seconds = time.perf_counter() - start
+                task.done = True
+                logger.info("初始化任务 %s 完成，用时 %.3fs", name, task.cold_seconds)
+                return result
+    elapsed = time.perf_counter() - start
+    with task.lock:
+        if waited:
+            task.waits += 1
+            task.wait_seconds += elapsed
+        else:
+            task.reruns += 1
+            task.rerun_seconds += elapsed
+    return task.result
+
+
+def once(name):
+    """装饰器：被装饰的函数通过 run_once 执行"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return run_once(name, func, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_bootstrap_metrics():
+    """
+    各初始化任务的耗时汇总
+
+    返回:
+    - {"tasks": [每个任务的统计], "cold_ms": 冷启动总耗时, "reruns": 重跑调用次数, "rerun_avg_us": 重跑平均耗时}
+      任务统计中的 waits / wait_ms 为首次执行期间其他会话等待的次数与时间，不计入重跑耗时。
+
+    冷启动总耗时只累加最外层任务，嵌套任务的耗时已包含在外层任务中。
+    """
+    with _tasks_lock:
+        tasks = list(_tasks.values())
+    stats = [task.stats() for task in tasks]
+    reruns = sum(task.reruns for task in tasks)
+    rerun_seconds = sum(task.rerun_seconds for task in tasks)
+    return {
+        "tasks": stats,
+        "cold_ms": round(sum(task.cold_seconds for task in tasks if not task.nested) * 1000, 1),
+        "reruns": reruns,
+        "rerun_avg_us": round(rerun_seconds / reruns * 1e6, 1) if reruns else 0,
+    }
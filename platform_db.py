@@ -0,0 +1,426 @@
+"""
+融思政平台 - 共享 SQLite 数据访问
+
+各页面原先在每个数据函数里 sqlite3.connect(...) 并在查询后关闭，默认的回滚日志模式下，
+课堂上几十名学生同时签到时容易出现 "database is locked"。这里统一提供：
+
+- 连接池：按数据库文件维护空闲连接，connect() 取出连接，conn.close() 把连接归还池中
+  （归还前回滚未提交的事务，与真正关闭连接时的行为一致）。同一时刻一个连接只被一个线程使用；
+- WAL 日志模式与忙等待超时：读写互不阻塞，写锁冲突时等待而不是立即报错；
+- 预编译语句复用：连接长期存活，sqlite3 内置的语句缓存可以跨请求命中；
+- 查询耗时统计：按 SQL 语句汇总执行次数与耗时，慢查询写入日志；
+- 查询结果缓存：cached_query 装饰的统计查询在短时间内复用结果，连接提交
+  涉及相关表的写入后自动失效。
+
+页面代码把 sqlite3.connect(路径) 换成 platform_db.connect(路径) 即可，其余用法不变
+（cursor / execute / commit / close、pandas.read_sql_query 等）。
+"""
+import contextlib
+import functools
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 平台默认数据库（相对于启动目录，与各页面原有路径一致）
+DB_PATH = "image_processing_platform.db"
+
+# 写锁冲突时的最长等待时间（秒）
+BUSY_TIMEOUT = float(os.environ.get("PLATFORM_DB_BUSY_TIMEOUT", "15"))
+
+# 每个数据库保留的空闲连接数上限
+POOL_MAX_IDLE = int(os.environ.get("PLATFORM_DB_POOL_SIZE", "16"))
+
+# 每个连接缓存的预编译语句数
+STATEMENT_CACHE_SIZE = 256
+
+# 超过该耗时（秒）的查询写入警告日志
+SLOW_QUERY_SECONDS = 0.2
+
+# cached_query 的默认有效期（秒）
+QUERY_CACHE_TTL = float(os.environ.get("PLATFORM_DB_CACHE_TTL", "30"))
+
+# 识别写语句所修改的表
+_WRITE_TABLE_RE = re.compile(
+    r"\b(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+[\"`\[]?(\w+)",
+    re.IGNORECASE,
+)
+
+
+# ======================= 查询耗时统计 =======================
+
+class QueryStats:
+    """按 SQL 语句汇总的执行次数与耗时（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    @staticmethod
+    def normalize(sql):
+        """合并空白字符，使同一语句的不同排版归为一类"""
+        return re.sub(r"\s+", " ", sql).strip()[:300]
+
+    def record(self, sql, seconds):
+        key = self.normalize(sql)
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                entry = self._stats[key] = {"count": 0, "total": 0.0, "max": 0.0}
+            entry["count"] += 1
+            entry["total"] += seconds
+            entry["max"] = max(entry["max"], seconds)
+        if seconds >= SLOW_QUERY_SECONDS:
+            logger.warning("慢查询 %.3fs: %s", seconds, key)
+
+    def snapshot(self, limit=None):
+        """按总耗时降序返回 [{"sql", "count", "total", "avg", "max"}]"""
+        with self._lock:
+            rows = [
+                {"sql": sql, "count": e["count"], "total": e["total"],
+                 "avg": e["total"] / e["count"], "max": e["max"]}
+                for sql, e in self._stats.items()
+            ]
+        rows.sort(key=lambda row: row["total"], reverse=True)
+        return rows[:limit] if limit else rows
+
+    def summary(self):
+        """全部查询的总次数与总耗时"""
+        with self._lock:
+            count = sum(e["count"] for e in self._stats.values())
+            total = sum(e["total"] for e in self._stats.values())
+        return {"count": count, "total": total, "avg": total / count if count else 0.0}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+query_stats = QueryStats()
+
+
+class TimedCursor(sqlite3.Cursor):
+    """记录每次执行耗时的游标"""
+
+    def _note_writes(self, sql):
+        # 记录本事务修改过的表，提交时使相关查询缓存失效
+        written = getattr(self.connection, "written_tables", None)
+        if written is not None:
+            written.update(name.lower() for name in _WRITE_TABLE_RE.findall(sql))
+
+    def execute(self, sql, parameters=()):
+        self._note_writes(sql)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            query_stats.record(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._note_writes(sql)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            query_stats.record(sql, time.perf_counter() - start)
+
+    def executescript(self, sql_script):
+        self._note_writes(sql_script)
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            query_stats.record(sql_script, time.perf_counter() - start)
+            # 脚本在自动提交模式下执行，执行完毕（且未留下未结束的事务）即已生效
+            if not self.connection.in_transaction:
+                self.connection.commit()
+
+
+# ======================= 查询结果缓存 =======================
+
+class QueryCache:
+    """
+    按依赖表失效的查询结果缓存（线程安全）
+
+    每条结果记录依赖的表，任一表被提交写入后立即失效，否则在有效期后过期。
+    只能感知本进程内的写入，其他进程写入后最多延迟一个有效期。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}       # 键 -> (过期时间, 依赖表, 结果)
+        self._generations = {}   # 表 -> 失效次数
+        self.hits = 0
+        self.misses = 0
+
+    def generations(self, tables):
+        with self._lock:
+            return tuple(self._generations.get(table, 0) for table in tables)
+
+    def get(self, key):
+        """返回 (是否命中, 结果)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return True, entry[2]
+            self._entries.pop(key, None)
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value, ttl, tables, generations):
+        """写入结果；计算期间依赖表已失效时丢弃，避免缓存过期数据"""
+        with self._lock:
+            if tuple(self._generations.get(table, 0) for table in tables) != generations:
+                return
+            self._entries[key] = (time.monotonic() + ttl, frozenset(tables), value)
+
+    def invalidate(self, *tables):
+        """使依赖这些表的结果失效"""
+        tables = {table.lower() for table in tables}
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            for key in [k for k, e in self._entries.items() if e[1] & tables]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+query_cache = QueryCache()
+
+
+def cached_query(ttl=QUERY_CACHE_TTL, tables=()):
+    """
+    缓存查询函数结果的装饰器
+
+    参数:
+    - ttl: 有效期（秒）
+    - tables: 结果依赖的表，这些表有写入提交时缓存失效
+
+    函数抛出异常时不缓存。原函数保存在 wrapper.uncached。
+    """
+    tables = tuple(table.lower() for table in tables)
+
+    def decorator(func):
+        # 以模块名+函数名为键，Streamlit 重跑页面重新定义函数后仍命中同一缓存
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())))
+            hit, value = query_cache.get(key)
+            if hit:
+                return value
+            generations = query_cache.generations(tables)
+            value = func(*args, **kwargs)
+            query_cache.put(key, value, ttl, tables, generations)
+            return value
+
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+def invalidate_tables(*tables):
+    """手动使依赖这些表的查询缓存失效（例如绕过连接池写入之后）"""
+    query_cache.invalidate(*tables)
+
+
+# ======================= 连接池 =======================
+
+class PooledConnection(sqlite3.Connection):
+    """连接池中的连接：close() 归还到池中而不是真正关闭"""
+
+    _pool = None
+    _checked_out = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.written_tables = set()
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def commit(self):
+        super().commit()
+        if self.written_tables:
+            query_cache.invalidate(*self.written_tables)
+            self.written_tables.clear()
+
+    def rollback(self):
+        super().rollback()
+        self.written_tables.clear()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # `with conn:` 在 C 层提交/回滚，不经过上面的 commit()/rollback()
+        result = super().__exit__(exc_type, exc_value, traceback)
+        if exc_type is None:
+            if self.written_tables:
+                query_cache.invalidate(*self.written_tables)
+        self.written_tables.clear()
+        return result
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.release(self)
+        else:
+            super().close()
+
+    def close_physical(self):
+        """真正关闭底层连接"""
+        self._pool = None
+        super().close()
+
+
+class ConnectionPool:
+    """单个数据库文件的连接池"""
+
+    def __init__(self, path, max_idle=POOL_MAX_IDLE, busy_timeout=BUSY_TIMEOUT):
+        self.path = path
+        self.max_idle = max_idle
+        self.busy_timeout = busy_timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        # 同一进程内的写事务先在这里排队，避免大量线程在 SQLite 忙等待中轮询
+        self.write_lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            factory=PooledConnection,
+            check_same_thread=False,   # 连接会在不同线程间复用，但同一时刻只归一个线程使用
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+        conn._pool = self
+        with self._lock:
+            self.created += 1
+        return conn
+
+    def acquire(self):
+        """取出一个连接（没有空闲连接时新建）"""
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+            if conn is not None:
+                self.reused += 1
+        if conn is None:
+            conn = self._open()
+        conn._checked_out = True
+        return conn
+
+    def release(self, conn):
+        """归还连接：回滚未提交的事务并恢复默认设置"""
+        if not conn._checked_out:
+            return  # 重复 close() 时忽略
+        conn._checked_out = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.written_tables.clear()
+            conn.row_factory = None
+            conn.text_factory = str
+        except sqlite3.Error:
+            conn.close_physical()
+            return
+
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close_physical()
+
+    def close_all(self):
+        """关闭全部空闲连接"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close_physical()
+
+    def stats(self):
+        with self._lock:
+            return {"path": self.path, "idle": len(self._idle),
+                    "created": self.created, "reused": self.reused}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path=DB_PATH):
+    """获取数据库文件对应的连接池（按绝对路径区分）"""
+    key = os.path.abspath(path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(path)
+        return pool
+
+
+def connect(path=DB_PATH):
+    """从连接池取出连接，用法与 sqlite3.connect 相同，用完调用 conn.close() 归还"""
+    return get_pool(path).acquire()
+
+
+@contextlib.contextmanager
+def write_transaction(conn):
+    """
+    在 BEGIN IMMEDIATE 写事务中执行，正常结束时提交、异常时回滚
+
+    同一进程内的写事务先获取连接池的进程内锁再开始，按到达顺序依次执行；
+    与其他进程之间仍由 busy_timeout 协调。
+
+        with platform_db.write_transaction(conn) as c:
+            c.execute(...)
+    """
+    pool = conn._pool
+    lock = pool.write_lock if pool is not None else contextlib.nullcontext()
+    with lock:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn.cursor()
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+
+def close_all_pools():
+    """关闭所有连接池中的空闲连接"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
+
+
+def get_db_metrics():
+    """连接池与查询耗时的汇总信息"""
+    with _pools_lock:
+        pools = [pool.stats() for pool in _pools.values()]
+    return {"pools": pools, "queries": query_stats.summary(), "top_queries": query_stats.snapshot(limit=10),
+            "cache": query_cache.stats()}
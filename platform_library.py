@@ -0,0 +1,456 @@
+"""
+融思政平台 - 学习资源与实践项目库存储
+
+学习资源中心原先把全部资源和项目分别存成 resources_data.json、projects_data.json：
+每次页面重跑都读取并解析整个文件，每次上传、删除都重新序列化整个文件（indent=2），
+两个人同时上传时后写入的一方会覆盖前一方的修改。这里改为数据库表：
+
+- 资源、项目、学生代码各占一行，上传、删除、下载计数只写一行，在写事务中执行；
+- 资源标签单独成表，按标签、类型、上传者、公开状态的筛选都走索引；
+- 列表按页查询（LIMIT/OFFSET），页面的开销与每页条数相关，与资源库总量无关；
+- 迁移时一次性导入原有的 JSON 文件（导入后原文件保留，不再读写）。
+
+返回的资源、项目仍是与原 JSON 结构相同的字典，页面的展示代码不需要改动。
+与 platform_attendance 一样，函数接收调用方的游标，写函数不自行提交。
+"""
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# 原 JSON 数据文件（迁移时导入）
+RESOURCES_FILE = "resources_data.json"
+PROJECTS_FILE = "projects_data.json"
+
+# 列表默认每页条数
+PAGE_SIZE = 20
+
+RESOURCE_COLUMNS = ["id", "name", "type", "description", "filename", "original_filename", "file_size",
+                    "file_ext", "uploader", "uploader_role", "upload_time", "is_public", "download_count"]
+PROJECT_COLUMNS = ["id", "name", "student_name", "student_id", "academic_year", "type", "difficulty",
+                   "description", "status", "created_by", "created_time", "updated_time", "download_count"]
+# 项目中以 JSON 文本存储的文件信息列
+PROJECT_JSON_COLUMNS = ["proposal_file", "datasets", "initial_code"]
+CODE_COLUMNS = ["id", "project_id", "filename", "original_name", "type", "size", "uploader",
+                "description", "upload_time"]
+
+
+def create_tables(c):
+    """创建资源、标签、项目和学生代码表（由 platform_migrations 调用）"""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS library_resources (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            type TEXT NOT NULL,
+            description TEXT DEFAULT '',
+            filename TEXT NOT NULL,
+            original_filename TEXT NOT NULL,
+            file_size TEXT,
+            file_ext TEXT,
+            uploader TEXT NOT NULL,
+            uploader_role TEXT,
+            upload_time TEXT NOT NULL,
+            is_public BOOLEAN DEFAULT TRUE,
+            download_count INTEGER DEFAULT 0
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS library_resource_tags (
+            resource_id TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            PRIMARY KEY (resource_id, tag),
+            FOREIGN KEY (resource_id) REFERENCES library_resources (id) ON DELETE CASCADE
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS library_projects (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            student_name TEXT DEFAULT '',
+            student_id TEXT DEFAULT '',
+            academic_year TEXT,
+            type TEXT,
+            difficulty TEXT,
+            description TEXT DEFAULT '',
+            status TEXT,
+            proposal_file TEXT,   -- JSON：选题文档信息
+            datasets TEXT,        -- JSON：数据集文件列表
+            initial_code TEXT,    -- JSON：初始代码信息
+            created_by TEXT NOT NULL,
+            created_time TEXT NOT NULL,
+            updated_time TEXT NOT NULL,
+            download_count INTEGER DEFAULT 0
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS library_project_codes (
+            id TEXT PRIMARY KEY,
+            project_id TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            original_name TEXT NOT NULL,
+            type TEXT,
+            size TEXT,
+            uploader TEXT NOT NULL,
+            description TEXT DEFAULT '',
+            upload_time TEXT NOT NULL,
+            FOREIGN KEY (project_id) REFERENCES library_projects (id) ON DELETE CASCADE
+        )
+    ''')
+    indexes = [
+        # 列表按上传时间倒序逐条过滤可见性，多数资源公开时读满一页即可停止
+        ("idx_library_resources_time", "library_resources", "upload_time"),
+        ("idx_library_resources_uploader", "library_resources", "uploader, upload_time"),
+        ("idx_library_resources_type", "library_resources", "type, upload_time"),
+        ("idx_library_resource_tags_tag", "library_resource_tags", "tag, resource_id"),
+        ("idx_library_projects_created", "library_projects", "created_time"),
+        ("idx_library_projects_year", "library_projects", "academic_year, created_time"),
+        ("idx_library_projects_type", "library_projects", "type, created_time"),
+        ("idx_library_projects_difficulty", "library_projects", "difficulty, created_time"),
+        ("idx_library_project_codes_project", "library_project_codes", "project_id, upload_time"),
+        ("idx_library_project_codes_uploader", "library_project_codes", "uploader, upload_time"),
+    ]
+    for name, table, columns in indexes:
+        c.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+
+
+def _load_json(path):
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        logger.exception("无法读取 %s，跳过导入", path)
+        return []
+
+
+def import_json_files(c, resources_file=RESOURCES_FILE, projects_file=PROJECTS_FILE):
+    """
+    导入原有的 JSON 数据（已存在的 ID 跳过）
+
+    返回:
+    - (导入的资源数, 导入的项目数)
+    """
+    resources = 0
+    for resource in _load_json(resources_file):
+        resources += add_resource(c, resource, ignore_existing=True)
+    projects = 0
+    for project in _load_json(projects_file):
+        projects += add_project(c, project, ignore_existing=True)
+    if resources or projects:
+        logger.info("从 JSON 文件导入 %d 个资源、%d 个项目", resources, projects)
+    return resources, projects
+
+
+# ======================= 学习资源 =======================
+
+def add_resource(c, resource, ignore_existing=False):
+    """
+    新增一个资源（resource 为与原 JSON 相同结构的字典）
+
+    返回:
+    - 是否插入（ignore_existing 时 ID 已存在返回 False）
+    """
+    values = [resource.get(column) for column in RESOURCE_COLUMNS]
+    values[RESOURCE_COLUMNS.index("is_public")] = bool(resource.get("is_public", True))
+    values[RESOURCE_COLUMNS.index("download_count")] = resource.get("download_count", 0)
+    verb = "INSERT OR IGNORE" if ignore_existing else "INSERT"
+    c.execute(f'''
+        {verb} INTO library_resources ({", ".join(RESOURCE_COLUMNS)})
+        VALUES ({", ".join("?" * len(RESOURCE_COLUMNS))})
+    ''', values)
+    if not c.rowcount:
+        return False
+    c.executemany("INSERT OR IGNORE INTO library_resource_tags (resource_id, tag) VALUES (?, ?)",
+                  [(resource["id"], tag) for tag in resource.get("tags", [])])
+    return True
+
+
+def delete_resource(c, resource_id):
+    """
+    删除一个资源及其标签
+
+    返回:
+    - 被删除资源的存储文件名（资源不存在时为 None），由调用方在提交后删除文件
+    """
+    c.execute("SELECT filename FROM library_resources WHERE id = ?", (resource_id,))
+    row = c.fetchone()
+    if row is None:
+        return None
+    c.execute("DELETE FROM library_resource_tags WHERE resource_id = ?", (resource_id,))
+    c.execute("DELETE FROM library_resources WHERE id = ?", (resource_id,))
+    return row[0]
+
+
+def _resource_filter(viewer=None, resource_type=None, tag=None):
+    """
+    资源列表的筛选条件
+
+    参数:
+    - viewer: 学生用户名，只返回公开资源和该学生自己上传的；None 表示不限（教师、管理员）
+    """
+    clauses, params = [], []
+    if viewer is not None:
+        clauses.append("(r.is_public OR r.uploader = ?)")
+        params.append(viewer)
+    if resource_type:
+        clauses.append("r.type = ?")
+        params.append(resource_type)
+    if tag:
+        clauses.append("r.id IN (SELECT resource_id FROM library_resource_tags WHERE tag = ?)")
+        params.append(tag)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+
+def resource_ids_sql(viewer=None, resource_type=None, tag=None):
+    """符合条件的资源 ID 子查询 (SQL, 参数)，用于在筛选范围内全文检索"""
+    where, params = _resource_filter(viewer, resource_type, tag)
+    return f"SELECT r.id FROM library_resources r {where}", params
+
+
+def count_resources(c, viewer=None, resource_type=None, tag=None):
+    """符合条件的资源数"""
+    where, params = _resource_filter(viewer, resource_type, tag)
+    c.execute(f"SELECT COUNT(*) FROM library_resources r {where}", params)
+    return c.fetchone()[0]
+
+
+def _fetch_resources(c, sql, params):
+    """执行资源查询（选出 RESOURCE_COLUMNS），附上各资源的标签"""
+    c.execute(sql, params)
+    resources = []
+    for row in c.fetchall():
+        resource = dict(zip(RESOURCE_COLUMNS, row))
+        resource["is_public"] = bool(resource["is_public"])
+        resource["tags"] = []
+        resources.append(resource)
+    if resources:
+        by_id = {resource["id"]: resource for resource in resources}
+        c.execute(f'''
+            SELECT resource_id, tag FROM library_resource_tags
+            WHERE resource_id IN ({", ".join("?" * len(by_id))})
+            ORDER BY rowid
+        ''', list(by_id))
+        for resource_id, tag in c.fetchall():
+            by_id[resource_id]["tags"].append(tag)
+    return resources
+
+
+def list_resources(c, viewer=None, resource_type=None, tag=None, limit=PAGE_SIZE, offset=0):
+    """
+    按上传时间倒序分页列出资源
+
+    返回:
+    - [资源字典]，tags 为标签列表、is_public 为布尔值
+    """
+    where, params = _resource_filter(viewer, resource_type, tag)
+    return _fetch_resources(c, f'''
+        SELECT {", ".join("r." + column for column in RESOURCE_COLUMNS)}
+        FROM library_resources r {where}
+        ORDER BY r.upload_time DESC, r.rowid DESC
+        LIMIT ? OFFSET ?
+    ''', params + [limit, offset])
+
+
+def get_resources(c, resource_ids):
+    """按给定顺序取出资源（如全文检索的结果），不存在的 ID 跳过"""
+    if not resource_ids:
+        return []
+    resources = _fetch_resources(c, f'''
+        SELECT {", ".join(RESOURCE_COLUMNS)} FROM library_resources
+        WHERE id IN ({", ".join("?" * len(resource_ids))})
+    ''', list(resource_ids))
+    by_id = {resource["id"]: resource for resource in resources}
+    return [by_id[resource_id] for resource_id in resource_ids if resource_id in by_id]
+
+
+def list_resource_tags(c, limit=50):
+    """最常用的标签 [(标签, 资源数)]"""
+    c.execute('''
+        SELECT tag, COUNT(*) AS n FROM library_resource_tags
+        GROUP BY tag ORDER BY n DESC, tag LIMIT ?
+    ''', (limit,))
+    return c.fetchall()
+
+
+# ======================= 实践项目 =======================
+
+def add_project(c, project, ignore_existing=False):
+    """
+    新增一个项目（project 为与原 JSON 相同结构的字典，student_codes 一并写入）
+
+    返回:
+    - 是否插入（ignore_existing 时 ID 已存在返回 False）
+    """
+    columns = PROJECT_COLUMNS + PROJECT_JSON_COLUMNS
+    values = [project.get(column) for column in PROJECT_COLUMNS]
+    values[PROJECT_COLUMNS.index("download_count")] = project.get("download_count", 0)
+    values += [json.dumps(project.get(column), ensure_ascii=False) for column in PROJECT_JSON_COLUMNS]
+    verb = "INSERT OR IGNORE" if ignore_existing else "INSERT"
+    c.execute(f'''
+        {verb} INTO library_projects ({", ".join(columns)})
+        VALUES ({", ".join("?" * len(columns))})
+    ''', values)
+    if not c.rowcount:
+        return False
+    for code in project.get("student_codes", []):
+        add_project_code(c, project["id"], code, touch=False)
+    return True
+
+
+def delete_project(c, project_id):
+    """删除一个项目及其学生代码记录（项目目录由调用方在提交后删除）"""
+    c.execute("DELETE FROM library_project_codes WHERE project_id = ?", (project_id,))
+    c.execute("DELETE FROM library_projects WHERE id = ?", (project_id,))
+    return c.rowcount > 0
+
+
+def add_project_code(c, project_id, code, touch=True):
+    """
+    为项目新增一份学生代码
+
+    参数:
+    - touch: 同时更新项目的 updated_time
+    """
+    values = [project_id if column == "project_id" else code.get(column) for column in CODE_COLUMNS]
+    c.execute(f'''
+        INSERT INTO library_project_codes ({", ".join(CODE_COLUMNS)})
+        VALUES ({", ".join("?" * len(CODE_COLUMNS))})
+    ''', values)
+    if touch:
+        c.execute("UPDATE library_projects SET updated_time = ? WHERE id = ?", (code["upload_time"], project_id))
+
+
+def delete_project_code(c, code_id, uploader=None):
+    """
+    删除一份学生代码（给出 uploader 时只删除该学生自己的）
+
+    返回:
+    - 是否删除
+    """
+    if uploader is None:
+        c.execute("DELETE FROM library_project_codes WHERE id = ?", (code_id,))
+    else:
+        c.execute("DELETE FROM library_project_codes WHERE id = ? AND uploader = ?", (code_id, uploader))
+    return c.rowcount > 0
+
+
+def _project_filter(academic_year=None, project_type=None, difficulty=None):
+    clauses, params = [], []
+    for column, value in (("academic_year", academic_year), ("type", project_type), ("difficulty", difficulty)):
+        if value:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+
+def project_ids_sql(academic_year=None, project_type=None, difficulty=None):
+    """符合条件的项目 ID 子查询 (SQL, 参数)，用于在筛选范围内全文检索"""
+    where, params = _project_filter(academic_year, project_type, difficulty)
+    return f"SELECT id FROM library_projects {where}", params
+
+
+def count_projects(c, academic_year=None, project_type=None, difficulty=None):
+    """符合条件的项目数"""
+    where, params = _project_filter(academic_year, project_type, difficulty)
+    c.execute(f"SELECT COUNT(*) FROM library_projects {where}", params)
+    return c.fetchone()[0]
+
+
+def _fetch_projects(c, sql, params):
+    """执行项目查询（选出 PROJECT_COLUMNS + PROJECT_JSON_COLUMNS），附上各项目的学生代码"""
+    columns = PROJECT_COLUMNS + PROJECT_JSON_COLUMNS
+    c.execute(sql, params)
+    projects = []
+    for row in c.fetchall():
+        project = dict(zip(columns, row))
+        for column in PROJECT_JSON_COLUMNS:
+            project[column] = json.loads(project[column]) if project[column] else None
+        project["datasets"] = project["datasets"] or []
+        project["student_codes"] = []
+        if project["status"] is None:
+            del project["status"]
+        projects.append(project)
+    if projects:
+        by_id = {project["id"]: project for project in projects}
+        c.execute(f'''
+            SELECT {", ".join(CODE_COLUMNS)} FROM library_project_codes
+            WHERE project_id IN ({", ".join("?" * len(by_id))})
+            ORDER BY upload_time, rowid
+        ''', list(by_id))
+        for row in c.fetchall():
+            code = dict(zip(CODE_COLUMNS, row))
+            by_id[code.pop("project_id")]["student_codes"].append(code)
+    return projects
+
+
+def list_projects(c, academic_year=None, project_type=None, difficulty=None, limit=PAGE_SIZE, offset=0):
+    """
+    按创建时间倒序分页列出项目
+
+    返回:
+    - [项目字典]，含 proposal_file、datasets、initial_code 与该项目的 student_codes
+    """
+    where, params = _project_filter(academic_year, project_type, difficulty)
+    return _fetch_projects(c, f'''
+        SELECT {", ".join(PROJECT_COLUMNS + PROJECT_JSON_COLUMNS)} FROM library_projects {where}
+        ORDER BY created_time DESC, rowid DESC
+        LIMIT ? OFFSET ?
+    ''', params + [limit, offset])
+
+
+def get_projects(c, project_ids):
+    """按给定顺序取出项目（如全文检索的结果），不存在的 ID 跳过"""
+    if not project_ids:
+        return []
+    projects = _fetch_projects(c, f'''
+        SELECT {", ".join(PROJECT_COLUMNS + PROJECT_JSON_COLUMNS)} FROM library_projects
+        WHERE id IN ({", ".join("?" * len(project_ids))})
+    ''', list(project_ids))
+    by_id = {project["id"]: project for project in projects}
+    return [by_id[project_id] for project_id in project_ids if project_id in by_id]
+
+
+def project_facets(c):
+    """
+    项目筛选项
+
+    返回:
+    - {"academic_year": [学年], "type": [项目类型]}
+    """
+    facets = {}
+    for column in ("academic_year", "type"):
+        c.execute(f"SELECT DISTINCT {column} FROM library_projects WHERE {column} IS NOT NULL ORDER BY {column}")
+        facets[column] = [row[0] for row in c.fetchall()]
+    return facets
+
+
+def count_student_codes(c, uploader):
+    """学生上传的代码数"""
+    c.execute("SELECT COUNT(*) FROM library_project_codes WHERE uploader = ?", (uploader,))
+    return c.fetchone()[0]
+
+
+def list_student_codes(c, uploader, limit=PAGE_SIZE, offset=0):
+    """
+    学生上传的代码，按上传时间倒序分页
+
+    返回:
+    - [代码字典]，含 project_id 与 project_name
+    """
+    c.execute(f'''
+        SELECT {", ".join("pc." + column for column in CODE_COLUMNS)}, p.name
+        FROM library_project_codes pc JOIN library_projects p ON p.id = pc.project_id
+        WHERE pc.uploader = ?
+        ORDER BY pc.upload_time DESC, pc.rowid DESC
+        LIMIT ? OFFSET ?
+    ''', (uploader, limit, offset))
+    codes = []
+    for row in c.fetchall():
+        code = dict(zip(CODE_COLUMNS, row[:-1]))
+        code["project_name"] = row[-1]
+        codes.append(code)
+    return codes
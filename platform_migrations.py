@@ -0,0 +1,725 @@
+"""
+融思政平台 - 数据库结构迁移
+
+此前各页面在导入时各自建表，并用 PRAGMA table_info + ALTER TABLE 临时补列，
+同一张表（如 experiment_submissions）在不同页面中的定义还不一致；除 UNIQUE 约束外
+没有任何二级索引，按学生、班级、签到码、状态筛选的查询都要全表扫描。
+
+这里统一管理表结构：
+- 迁移按版本号登记（@migration），已执行的版本记录在 schema_migrations 表中，
+  每个迁移在独立的写事务中执行，只会执行一次；
+- ensure_schema() 在每个进程中只执行一次（经 platform_bootstrap 登记并计时），页面重跑时不再重复建表、补列；
+- 登记热点查询（register_hot_query），可输出其 EXPLAIN QUERY PLAN，
+  检查是否命中索引。
+
+命令行：
+    python platform_migrations.py            # 执行未完成的迁移并显示当前版本
+    python platform_migrations.py --explain  # 输出热点查询的执行计划
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+
+import platform_attendance
+import platform_blobs
+import platform_bootstrap
+import platform_db
+import platform_library
+import platform_search
+
+logger = logging.getLogger(__name__)
+
+# 全部已登记的迁移（版本号 -> Migration）
+MIGRATIONS = OrderedDict()
+
+# 全部已登记的热点查询（名称 -> HotQuery）
+HOT_QUERIES = OrderedDict()
+
+Migration = namedtuple("Migration", ["version", "description", "func"])
+HotQuery = namedtuple("HotQuery", ["name", "sql", "params"])
+
+
+def migration(version, description):
+    """
+    登记迁移的装饰器
+
+    参数:
+    - version: 版本号（正整数，按从小到大执行）
+    - description: 迁移说明
+    被装饰的函数接收一个游标，在写事务内执行，不要自行提交。
+    """
+    def decorator(func):
+        if version in MIGRATIONS:
+            raise ValueError(f"迁移版本重复: {version}")
+        MIGRATIONS[version] = Migration(version, description, func)
+        return func
+    return decorator
+
+
+def register_hot_query(name, sql, params=()):
+    """登记热点查询（params 为执行计划分析时使用的示例参数）"""
+    HOT_QUERIES[name] = HotQuery(name, sql, tuple(params))
+
+
+def add_missing_columns(c, table, columns):
+    """为已存在的表补齐缺失的列，columns 为 {列名: 类型及默认值}"""
+    c.execute(f"PRAGMA table_info({table})")
+    existing = {row[1] for row in c.fetchall()}
+    for name, definition in columns.items():
+        if name not in existing:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+
+def _beijing_now():
+    return datetime.utcnow() + timedelta(hours=8)
+
+
+# ======================= 迁移 =======================
+
+@migration(1, "基础表结构")
+def _create_base_tables(c):
+    # 用户表
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            role TEXT NOT NULL,
+            create_time TEXT NOT NULL
+        )
+    ''')
+    add_missing_columns(c, "users", {"create_time": "TEXT"})
+
+    # 实验/作业提交表（实验室与作业提交页面共用）
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS experiment_submissions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_username TEXT NOT NULL,
+            experiment_number INTEGER NOT NULL,
+            experiment_title TEXT NOT NULL,
+            submission_content TEXT NOT NULL,
+            submission_time TEXT NOT NULL,
+            status TEXT DEFAULT 'pending',
+            teacher_feedback TEXT DEFAULT '',
+            score INTEGER DEFAULT 0,
+            resubmission_count INTEGER DEFAULT 0,
+            allow_view_score BOOLEAN DEFAULT TRUE,
+            can_view_score BOOLEAN DEFAULT 0,
+            file_names TEXT DEFAULT '',
+            assignment_type TEXT DEFAULT 'experiment',
+            FOREIGN KEY (student_username) REFERENCES users (username)
+        )
+    ''')
+    add_missing_columns(c, "experiment_submissions", {
+        "resubmission_count": "INTEGER DEFAULT 0",
+        "allow_view_score": "BOOLEAN DEFAULT TRUE",
+        "can_view_score": "BOOLEAN DEFAULT 0",
+        "file_names": "TEXT DEFAULT ''",
+        "assignment_type": "TEXT DEFAULT 'experiment'",
+    })
+
+    # 思政感悟表
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS ideology_reflections (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_username TEXT NOT NULL,
+            reflection_content TEXT NOT NULL,
+            submission_time TEXT NOT NULL,
+            status TEXT DEFAULT 'pending',
+            teacher_feedback TEXT DEFAULT '',
+            score INTEGER DEFAULT 0,
+            word_count INTEGER DEFAULT 0,
+            allow_view_score BOOLEAN DEFAULT TRUE,
+            FOREIGN KEY (student_username) REFERENCES users (username)
+        )
+    ''')
+
+    # 学习进度表
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS learning_progress (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            progress_type TEXT NOT NULL,
+            progress_value REAL DEFAULT 0,
+            update_time TEXT NOT NULL,
+            FOREIGN KEY (username) REFERENCES users (username)
+        )
+    ''')
+
+    # 成果展示：作品提交表（不带外键约束）
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS submitted_projects (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            project_name TEXT NOT NULL,
+            author_name TEXT NOT NULL,
+            project_desc TEXT NOT NULL,
+            submit_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            files TEXT,
+            file_paths TEXT,
+            status TEXT DEFAULT '待审核',
+            review_notes TEXT,
+            review_time TIMESTAMP,
+            reviewer TEXT,
+            user_id INTEGER
+        )
+    ''')
+    add_missing_columns(c, "submitted_projects", {
+        "file_paths": "TEXT",
+        "reviewer": "TEXT",
+        "user_id": "INTEGER",
+    })
+
+    # 意见反馈表
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS feedback (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            feedback_content TEXT NOT NULL,
+            submit_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            ip_address TEXT,
+            user_agent TEXT
+        )
+    ''')
+
+    # 班级表
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS classrooms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            class_code VARCHAR(12) UNIQUE NOT NULL,
+            class_name VARCHAR(100) NOT NULL,
+            teacher_username VARCHAR(50) NOT NULL,
+            description TEXT,
+            max_students INTEGER DEFAULT 50,
+            created_at TEXT NOT NULL,
+            is_active BOOLEAN DEFAULT TRUE,
+            subscription_tier VARCHAR(20) DEFAULT 'free',
+            FOREIGN KEY (teacher_username) REFERENCES users (username)
+        )
+    ''')
+
+    # 班级成员表
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS classroom_members (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            class_code VARCHAR(12) NOT NULL,
+            student_username VARCHAR(50) NOT NULL,
+            joined_at TEXT NOT NULL,
+            status VARCHAR(20) DEFAULT 'active',
+            role VARCHAR(20) DEFAULT 'student',
+            UNIQUE(class_code, student_username),
+            FOREIGN KEY (class_code) REFERENCES classrooms (class_code),
+            FOREIGN KEY (student_username) REFERENCES users (username)
+        )
+    ''')
+
+    # 签到活动表
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_code VARCHAR(10) UNIQUE NOT NULL,
+            class_code VARCHAR(12) NOT NULL,
+            session_name VARCHAR(100) NOT NULL,
+            teacher_username VARCHAR(50) NOT NULL,
+            start_time TEXT NOT NULL,
+            end_time TEXT NOT NULL,
+            duration_minutes INTEGER DEFAULT 10,
+            location_lat REAL,
+            location_lng REAL,
+            location_name VARCHAR(100),
+            qr_code_data TEXT,
+            attendance_type VARCHAR(20) DEFAULT 'standard',
+            status VARCHAR(20) DEFAULT 'scheduled',
+            created_at TEXT NOT NULL,
+            total_students INTEGER DEFAULT 0,
+            attended_students INTEGER DEFAULT 0,
+            FOREIGN KEY (class_code) REFERENCES classrooms (class_code),
+            FOREIGN KEY (teacher_username) REFERENCES users (username)
+        )
+    ''')
+
+    # 签到记录表
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_code VARCHAR(10) NOT NULL,
+            student_username VARCHAR(50) NOT NULL,
+            class_code VARCHAR(12) NOT NULL,
+            check_in_time TEXT NOT NULL,
+            check_in_method VARCHAR(20) DEFAULT 'manual',
+            device_info TEXT,
+            ip_address VARCHAR(45),
+            location_lat REAL,
+            location_lng REAL,
+            is_late BOOLEAN DEFAULT FALSE,
+            points_earned INTEGER DEFAULT 10,
+            status VARCHAR(20) DEFAULT 'present',
+            UNIQUE(session_code, student_username),
+            FOREIGN KEY (session_code) REFERENCES attendance_sessions (session_code),
+            FOREIGN KEY (student_username) REFERENCES users (username)
+        )
+    ''')
+
+    # 订阅套餐表
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS subscription_plans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            plan_code VARCHAR(20) UNIQUE NOT NULL,
+            plan_name VARCHAR(50) NOT NULL,
+            price_monthly REAL DEFAULT 0,
+            price_yearly REAL DEFAULT 0,
+            max_classes INTEGER DEFAULT 1,
+            max_students_per_class INTEGER DEFAULT 30,
+            max_attendance_sessions INTEGER DEFAULT 20,
+            features TEXT,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TEXT NOT NULL
+        )
+    ''')
+
+    # 教师订阅表
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS teacher_subscriptions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            teacher_username VARCHAR(50) NOT NULL,
+            plan_code VARCHAR(20) NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            payment_status VARCHAR(20) DEFAULT 'active',
+            auto_renew BOOLEAN DEFAULT TRUE,
+            FOREIGN KEY (teacher_username) REFERENCES users (username),
+            FOREIGN KEY (plan_code) REFERENCES subscription_plans (plan_code)
+        )
+    ''')
+
+    # 班级通知表
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS class_notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            class_code VARCHAR(12) NOT NULL,
+            title VARCHAR(200) NOT NULL,
+            content TEXT NOT NULL,
+            notification_type VARCHAR(20) DEFAULT 'announcement',
+            created_by VARCHAR(50) NOT NULL,
+            created_at TEXT NOT NULL,
+            is_urgent BOOLEAN DEFAULT FALSE,
+            FOREIGN KEY (class_code) REFERENCES classrooms (class_code),
+            FOREIGN KEY (created_by) REFERENCES users (username)
+        )
+    ''')
+
+    # 作业表
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS assignments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            assignment_type TEXT NOT NULL,  -- 'experiment', 'midterm', 'final'
+            assignment_number INTEGER,
+            title TEXT NOT NULL,
+            description TEXT,
+            deadline TEXT,
+            max_score INTEGER DEFAULT 100,
+            created_at TEXT NOT NULL,
+            teacher_username TEXT,  -- 创建作业的教师
+            experiment_card TEXT,   -- 实验卡内容/附件路径
+            experiment_materials TEXT -- 实验文档/资料
+        )
+    ''')
+
+
+@migration(2, "热点查询索引")
+def _create_query_indexes(c):
+    indexes = [
+        # 学生查看自己的提交、教师按状态筛选待批改
+        ("idx_experiment_submissions_student", "experiment_submissions", "student_username, submission_time"),
+        ("idx_experiment_submissions_status", "experiment_submissions", "status, submission_time"),
+        ("idx_experiment_submissions_assignment", "experiment_submissions", "assignment_type, experiment_number"),
+        ("idx_ideology_reflections_student", "ideology_reflections", "student_username, submission_time"),
+        ("idx_ideology_reflections_status", "ideology_reflections", "status"),
+        # 按 class_code 的查询已由 UNIQUE(class_code, student_username) 覆盖
+        ("idx_classroom_members_student", "classroom_members", "student_username, status"),
+        ("idx_classroom_members_status", "classroom_members", "class_code, status"),
+        ("idx_attendance_sessions_class", "attendance_sessions", "class_code, start_time"),
+        ("idx_attendance_sessions_status", "attendance_sessions", "status"),
+        # 按 session_code 的查询已由 UNIQUE(session_code, student_username) 覆盖
+        ("idx_attendance_records_student", "attendance_records", "student_username, class_code"),
+        ("idx_attendance_records_class", "attendance_records", "class_code, status"),
+        ("idx_submitted_projects_user", "submitted_projects", "user_id, submit_time"),
+        ("idx_submitted_projects_status", "submitted_projects", "status, submit_time"),
+        ("idx_classrooms_teacher", "classrooms", "teacher_username"),
+        ("idx_assignments_type_number", "assignments", "assignment_type, assignment_number"),
+    ]
+    for name, table, columns in indexes:
+        c.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+
+
+@migration(3, "默认教师账号")
+def _seed_default_teachers(c):
+    import bcrypt
+
+    for username in ["yhh", "yhh1", "yhh2", "yhh3", "yhh4"]:
+        c.execute("SELECT id FROM users WHERE username = ?", (username,))
+        if c.fetchone() is None:
+            hashed_password = bcrypt.hashpw("23123yhh".encode('utf-8'), bcrypt.gensalt())
+            c.execute(
+                "INSERT INTO users (username, password, role, create_time) VALUES (?, ?, ?, ?)",
+                (username, hashed_password.decode('utf-8'), "teacher",
+                 datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            )
+            logger.info("创建教师账号: %s", username)
+
+
+@migration(4, "默认订阅套餐")
+def _seed_default_plans(c):
+    default_plans = [
+        ('free', '免费版', 0, 0, 1, 30, 10, '基础班级管理,标准签到功能,基本数据分析'),
+        ('pro', '专业版', 29.9, 299, 5, 100, 100, '专业版功能,高级数据分析,地理位置签到,批量导入,自定义设置'),
+        ('enterprise', '企业版', 99.9, 999, 50, 500, 9999, '企业级功能,API接口,专属客服,高级安全,定制开发'),
+    ]
+    created_at = _beijing_now().strftime('%Y-%m-%d %H:%M:%S')
+    for plan in default_plans:
+        c.execute("SELECT id FROM subscription_plans WHERE plan_code = ?", (plan[0],))
+        if c.fetchone() is None:
+            c.execute('''
+                INSERT INTO subscription_plans
+                (plan_code, plan_name, price_monthly, price_yearly, max_classes,
+                 max_students_per_class, max_attendance_sessions, features, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', plan + (created_at,))
+
+
+@migration(5, "默认作业")
+def _seed_default_assignments(c):
+    c.execute("SELECT COUNT(*) FROM assignments")
+    if c.fetchone()[0] > 0:
+        return
+
+    now = _beijing_now()
+    current_time = now.strftime('%Y-%m-%d %H:%M:%S')
+    rows = []
+    # 实验作业
+    for i in range(8):
+        num = i + 1
+        deadline = (now + timedelta(days=14 + i * 7)).strftime('%Y-%m-%d')
+        rows.append(('experiment', num, f"实验卡{num}下载", f"仔细查看实验卡{num}的内容", deadline))
+    # 期中、期末作业
+    rows.append(('midterm', 1, '图像处理综合应用',
+                 '根据老师要求和结合学习的数字图形处理的知识,在老师要求时间内提交',
+                 (now + timedelta(days=60)).strftime('%Y-%m-%d')))
+    rows.append(('final', 1, '图像处理项目开发',
+                 '根据老师要求和结合学习的数字图形处理的知识，在老师要求时间内提交',
+                 (now + timedelta(days=120)).strftime('%Y-%m-%d')))
+
+    c.executemany('''
+        INSERT INTO assignments (assignment_type, assignment_number, title, description, deadline, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [row + (current_time,) for row in rows])
+
+
+@migration(6, "签到汇总表")
+def _create_attendance_rollups(c):
+    platform_attendance.create_rollup_tables(c)
+    # 回填已有的签到数据
+    platform_attendance.rebuild_rollups(c)
+
+
+@migration(7, "上传文件去重存储")
+def _create_blob_tables(c):
+    platform_blobs.create_tables(c)
+
+
+@migration(8, "学习资源与实践项目库")
+def _create_library_tables(c):
+    platform_library.create_tables(c)
+    # 导入原有的 JSON 数据
+    platform_library.import_json_files(c)
+
+
+@migration(9, "全文检索索引")
+def _create_search_index(c):
+    platform_search.create_index(c)
+
+
+@migration(10, "审核列表分页索引")
+def _create_review_indexes(c):
+    indexes = [
+        # 教师审核列表按提交时间游标翻页（不筛选、按状态、按作业类型）
+        ("idx_ideology_reflections_time", "ideology_reflections", "submission_time"),
+        ("idx_ideology_reflections_status_time", "ideology_reflections", "status, submission_time"),
+        ("idx_experiment_submissions_time", "experiment_submissions", "submission_time"),
+        ("idx_experiment_submissions_type_time", "experiment_submissions", "assignment_type, submission_time"),
+        ("idx_submitted_projects_time", "submitted_projects", "submit_time"),
+    ]
+    for name, table, columns in indexes:
+        c.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+
+
+# ======================= 迁移执行 =======================
+
+def _ensure_version_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TEXT NOT NULL,
+            seconds REAL DEFAULT 0
+        )
+    ''')
+    conn.commit()
+
+
+def applied_versions(conn):
+    """已执行的迁移版本号集合"""
+    return {row[0] for row in conn.execute("SELECT version FROM schema_migrations")}
+
+
+def current_version(path=platform_db.DB_PATH):
+    """数据库当前的结构版本（未执行任何迁移时为 0）"""
+    conn = platform_db.connect(path)
+    try:
+        _ensure_version_table(conn)
+        return max(applied_versions(conn), default=0)
+    finally:
+        conn.close()
+
+
+def migrate(path=platform_db.DB_PATH, target=None):
+    """
+    执行未完成的迁移
+
+    参数:
+    - path: 数据库文件
+    - target: 最高执行到的版本（默认全部）
+
+    返回:
+    - 本次执行的迁移 [(版本号, 说明, 耗时秒数)]
+
+    每个迁移在 BEGIN IMMEDIATE 事务中执行并记录版本，多个进程同时启动时，
+    后获得写锁的进程会看到版本已记录而跳过。
+    """
+    conn = platform_db.connect(path)
+    executed = []
+    try:
+        _ensure_version_table(conn)
+        for version in sorted(MIGRATIONS):
+            if target is not None and version > target:
+                break
+            if version in applied_versions(conn):
+                continue
+
+            item = MIGRATIONS[version]
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 获得写锁后再次确认，避免与其他进程重复执行
+                if version in applied_versions(conn):
+                    conn.rollback()
+                    continue
+                start = time.perf_counter()
+                item.func(conn.cursor())
+                seconds = time.perf_counter() - start
+                conn.execute(
+                    "INSERT INTO schema_migrations (version, description, applied_at, seconds) VALUES (?, ?, ?, ?)",
+                    (version, item.description, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), seconds)
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                logger.exception("数据库迁移 %s（%s）失败", version, item.description)
+                raise
+            logger.info("数据库迁移 %s（%s）完成，用时 %.3fs", version, item.description, seconds)
+            executed.append((version, item.description, seconds))
+    finally:
+        conn.close()
+    return executed
+
+
+def ensure_schema(path=platform_db.DB_PATH):
+    """
+    确保数据库结构为最新（每个进程、每个数据库文件只执行一次）
+
+    各页面在导入时调用，Streamlit 重跑页面时直接返回。
+    """
+    platform_bootstrap.run_once(f"数据库结构迁移 {os.path.abspath(path)}", migrate, path)
+
+
+# ======================= 热点查询执行计划 =======================
+
+register_hot_query(
+    "学生实验提交列表",
+    "SELECT * FROM experiment_submissions WHERE student_username = ? ORDER BY submission_time DESC",
+    ("student",),
+)
+register_hot_query(
+    "待批改提交",
+    "SELECT COUNT(*) FROM experiment_submissions WHERE status = ?",
+    ("pending",),
+)
+register_hot_query(
+    "作业重复提交检查",
+    "SELECT id, resubmission_count FROM experiment_submissions "
+    "WHERE student_username = ? AND experiment_number = ? AND assignment_type = ?",
+    ("student", 1, "experiment"),
+)
+register_hot_query(
+    "按作业类型的提交列表",
+    "SELECT es.*, a.title FROM experiment_submissions es "
+    "JOIN assignments a ON es.experiment_number = a.assignment_number AND es.assignment_type = a.assignment_type "
+    "WHERE es.assignment_type = ? ORDER BY es.submission_time DESC",
+    ("experiment",),
+)
+register_hot_query(
+    "学生思政感悟列表",
+    "SELECT * FROM ideology_reflections WHERE student_username = ? ORDER BY submission_time DESC",
+    ("student",),
+)
+register_hot_query(
+    "学生加入的班级",
+    "SELECT class_code FROM classroom_members WHERE student_username = ? AND status = 'active'",
+    ("student",),
+)
+register_hot_query(
+    "班级在读人数",
+    "SELECT COUNT(*) FROM classroom_members WHERE class_code = ? AND status = 'active'",
+    ("ABC123",),
+)
+register_hot_query(
+    "班级签到活动",
+    "SELECT * FROM attendance_sessions WHERE class_code = ? ORDER BY start_time DESC",
+    ("ABC123",),
+)
+register_hot_query(
+    "签到重复检查",
+    "SELECT id FROM attendance_records WHERE session_code = ? AND student_username = ?",
+    ("S12345", "student"),
+)
+register_hot_query(
+    "成员签到次数",
+    "SELECT COUNT(*) FROM attendance_records WHERE student_username = ? AND class_code = ?",
+    ("student", "ABC123"),
+)
+register_hot_query(
+    "用户作品列表",
+    "SELECT * FROM submitted_projects WHERE user_id = ? ORDER BY submit_time DESC",
+    (1,),
+)
+register_hot_query(
+    "待审核作品",
+    "SELECT * FROM submitted_projects WHERE status = ? ORDER BY submit_time DESC",
+    ("待审核",),
+)
+register_hot_query(
+    "提交文件清单",
+    "SELECT path FROM blob_refs WHERE manifest = ?",
+    ("experiment:student_1",),
+)
+register_hot_query(
+    "待回收的上传内容",
+    "SELECT hash FROM blobs WHERE refcount <= 0 LIMIT ?",
+    (500,),
+)
+register_hot_query(
+    "学生可见的资源",
+    "SELECT id FROM library_resources r WHERE (r.is_public OR r.uploader = ?) "
+    "ORDER BY r.upload_time DESC, r.rowid DESC LIMIT ? OFFSET ?",
+    ("student", 20, 0),
+)
+register_hot_query(
+    "按标签筛选资源",
+    "SELECT id FROM library_resources r "
+    "WHERE r.id IN (SELECT resource_id FROM library_resource_tags WHERE tag = ?) "
+    "ORDER BY r.upload_time DESC, r.rowid DESC LIMIT ? OFFSET ?",
+    ("OpenCV", 20, 0),
+)
+register_hot_query(
+    "按类型筛选项目",
+    "SELECT id FROM library_projects WHERE type = ? ORDER BY created_time DESC, rowid DESC LIMIT ? OFFSET ?",
+    ("课程设计", 20, 0),
+)
+register_hot_query(
+    "学生上传的项目代码",
+    "SELECT id FROM library_project_codes WHERE uploader = ? ORDER BY upload_time DESC, rowid DESC LIMIT ? OFFSET ?",
+    ("student", 20, 0),
+)
+register_hot_query(
+    "思政感悟审核列表（翻页）",
+    "SELECT r.id FROM ideology_reflections r WHERE r.status = ? AND (r.submission_time, r.id) < (?, ?) "
+    "ORDER BY r.submission_time DESC, r.id DESC LIMIT ?",
+    ("pending", "2024-01-01 00:00:00", 100, 21),
+)
+register_hot_query(
+    "作业批改列表（翻页）",
+    "SELECT es.id FROM experiment_submissions es JOIN assignments a "
+    "ON es.experiment_number = a.assignment_number AND es.assignment_type = a.assignment_type "
+    "WHERE es.assignment_type = ? AND (es.submission_time, es.id) < (?, ?) "
+    "ORDER BY es.submission_time DESC, es.id DESC LIMIT ?",
+    ("experiment", "2024-01-01 00:00:00", 100, 21),
+)
+register_hot_query(
+    "作品审核列表（翻页）",
+    "SELECT p.id FROM submitted_projects p WHERE (p.submit_time, p.id) < (?, ?) "
+    "ORDER BY p.submit_time DESC, p.id DESC LIMIT ?",
+    ("2024-01-01 00:00:00", 100, 21),
+)
+
+
+def explain_query(conn, sql, params=()):
+    """返回查询的 EXPLAIN QUERY PLAN 明细行"""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def is_full_scan(detail):
+    """执行计划中的一行是否为不走索引的全表扫描"""
+    return detail.startswith("SCAN ") and " USING " not in detail
+
+
+def explain_hot_queries(path=platform_db.DB_PATH):
+    """
+    输出全部热点查询的执行计划
+
+    返回:
+    - [{"name", "sql", "plan": [明细行], "full_scan": bool}]
+    """
+    conn = platform_db.connect(path)
+    try:
+        reports = []
+        for query in HOT_QUERIES.values():
+            plan = explain_query(conn, query.sql, query.params)
+            reports.append({
+                "name": query.name,
+                "sql": query.sql,
+                "plan": plan,
+                "full_scan": any(is_full_scan(detail) for detail in plan),
+            })
+        return reports
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="融思政平台数据库结构迁移")
+    parser.add_argument("--db", default=platform_db.DB_PATH, help="数据库文件（默认 %(default)s）")
+    parser.add_argument("--target", type=int, default=None, help="最高执行到的版本")
+    parser.add_argument("--explain", action="store_true", help="输出热点查询的执行计划")
+    args = parser.parse_args(argv)
+
+    for version, description, seconds in migrate(args.db, args.target):
+        print(f"已执行迁移 {version}: {description}（{seconds:.3f}s）")
+    print(f"当前结构版本: {current_version(args.db)} / {max(MIGRATIONS)}")
+
+    if args.explain:
+        full_scans = 0
+        for report in explain_hot_queries(args.db):
+            marker = "全表扫描" if report["full_scan"] else "索引"
+            print(f"\n[{marker}] {report['name']}\n  {report['sql']}")
+            for detail in report["plan"]:
+                print(f"    {detail}")
+            full_scans += report["full_scan"]
+        if full_scans:
+            print(f"\n{full_scans} 个热点查询未使用索引")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""
+融思政平台 - 教师审核列表的分页查询
+
+实验/作业提交、思政感悟和成果作品到学期中会累积上千条，审核页面原先一次取出全部记录，
+在 Python 中筛选，再为每条记录渲染一个展开框。这里改为在 SQL 中完成筛选和分页：
+
+- 状态、学生、班级、日期范围、作业类型等筛选条件都拼成 WHERE 子句，走 (条件列, 时间) 索引；
+- 按游标（keyset）翻页：以 (排序列, id) 作为翻页位置，下一页查询
+  WHERE (排序列, id) < (?, ?)，只读取一页的数据，翻到后面的页也不需要 OFFSET 跳过前面的行，
+  翻页期间有记录被批改、移出筛选范围也不会跳过或重复；
+- 总数只数到 COUNT_CAP 条为止，超过时显示为估计值，大表上不需要完整计数。
+
+用法:
+    page = platform_review.fetch_page(c, "reflections", {"status": "pending"})
+    page.rows       # 当前页的记录（与原查询相同的元组）
+    page.next_key   # 下一页的游标，None 表示已是最后一页
+
+与 platform_library 一样，函数接收调用方的游标，只读不写。
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+# 每页条数
+PAGE_SIZE = 20
+# 计数上限：超过时只返回估计值
+COUNT_CAP = 1000
+
+# 审核列表的数据来源
+# - table: FROM 子句；columns: 选出的列（与页面原查询的列顺序一致）
+# - orders: 可选的排序方式 -> 排序列；student / status / time / score: 筛选用到的列
+# - class_sql: 班级筛选条件（参数为班级代码）
+# - extra: 其他等值筛选条件名 -> 列
+ReviewSource = namedtuple("ReviewSource", [
+    "name", "table", "columns", "id_column", "orders",
+    "student", "status", "time", "score", "class_sql", "extra",
+])
+
+# (用户名列) 属于班级的在读学生
+_MEMBER_SQL = ("{student} IN (SELECT student_username FROM classroom_members "
+               "WHERE class_code = ? AND status = 'active')")
+
+SOURCES = {
+    source.name: source for source in [
+        # 思政感悟（我的思政足迹 - 教师审核）
+        ReviewSource(
+            name="reflections",
+            table="ideology_reflections r",
+            columns=("r.id, r.student_username, r.reflection_content, r.submission_time, r.status, "
+                     "r.teacher_feedback, r.score, r.word_count, r.allow_view_score"),
+            id_column="r.id",
+            orders={"time": "r.submission_time", "score": "COALESCE(r.score, 0)"},
+            student="r.student_username",
+            status="r.status",
+            time="r.submission_time",
+            score="r.score",
+            class_sql=_MEMBER_SQL.format(student="r.student_username"),
+            extra={},
+        ),
+        # 实验/期中/期末作业提交（实验作业提交 - 教师批改）
+        ReviewSource(
+            name="submissions",
+            table=("experiment_submissions es JOIN assignments a "
+                   "ON es.experiment_number = a.assignment_number AND es.assignment_type = a.assignment_type"),
+            columns=("es.id, es.student_username, es.experiment_number, es.experiment_title, "
+                     "es.submission_content, es.submission_time, es.status, es.teacher_feedback, es.score, "
+                     "es.resubmission_count, es.allow_view_score, a.title, a.assignment_type, a.assignment_number"),
+            id_column="es.id",
+            orders={"time": "es.submission_time", "score": "COALESCE(es.score, 0)"},
+            student="es.student_username",
+            status="es.status",
+            time="es.submission_time",
+            score="es.score",
+            class_sql=_MEMBER_SQL.format(student="es.student_username"),
+            extra={"assignment_type": "es.assignment_type"},
+        ),
+        # 图像处理实验室的实验提交
+        ReviewSource(
+            name="experiments",
+            table="experiment_submissions es JOIN users u ON es.student_username = u.username",
+            columns="es.*, u.role",
+            id_column="es.id",
+            orders={"time": "es.submission_time", "score": "COALESCE(es.score, 0)"},
+            student="es.student_username",
+            status="es.status",
+            time="es.submission_time",
+            score="es.score",
+            class_sql=_MEMBER_SQL.format(student="es.student_username"),
+            extra={"experiment_number": "es.experiment_number"},
+        ),
+        # 成果展示作品（作者姓名不是用户名，班级通过 user_id 关联）
+        ReviewSource(
+            name="projects",
+            table="submitted_projects p",
+            columns=("p.id, p.project_name, p.author_name, p.project_desc, p.submit_time, p.files, "
+                     "p.file_paths, p.status, p.review_notes, p.review_time, p.reviewer"),
+            id_column="p.id",
+            orders={"time": "p.submit_time"},
+            student=None,
+            status="p.status",
+            time="p.submit_time",
+            score=None,
+            class_sql=("p.user_id IN (SELECT u.id FROM users u JOIN classroom_members m "
+                       "ON m.student_username = u.username WHERE m.class_code = ? AND m.status = 'active')"),
+            extra={"user_id": "p.user_id"},
+        ),
+    ]
+}
+
+Page = namedtuple("Page", ["rows", "next_key"])
+
+
+def get_source(name):
+    source = SOURCES.get(name)
+    if source is None:
+        raise ValueError(f"未知的审核列表: {name}")
+    return source
+
+
+def _day_text(value, days=0):
+    """日期（date/datetime 或 YYYY-MM-DD 文本）转为可与时间列比较的文本"""
+    if isinstance(value, str):
+        value = datetime.strptime(value[:10], "%Y-%m-%d").date()
+    elif isinstance(value, datetime):
+        value = value.date()
+    return (value + timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+def build_filter(source, filters=None):
+    """
+    把筛选条件转为 WHERE 子句
+
+    参数 filters（值为 None 或空的条件会被忽略）:
+    - status: 状态；student: 学生用户名；student_like: 用户名包含的文本
+    - class_code: 班级代码（只包含在读学生）
+    - date_from / date_to: 提交日期范围（含两端，date 或 YYYY-MM-DD）
+    - ids: 限定的记录 ID（如全文检索的结果）
+    - 以及 source.extra 中的等值条件（如 assignment_type）
+
+    返回:
+    - (条件列表, 参数列表)
+    """
+    clauses, params = [], []
+    for name, value in (filters or {}).items():
+        if value is None or value == "":
+            continue
+        if name == "status":
+            clauses.append(f"{source.status} = ?")
+            params.append(value)
+        elif name in ("student", "student_like"):
+            if source.student is None:
+                raise ValueError(f"{source.name} 不支持按学生筛选")
+            if name == "student":
+                clauses.append(f"{source.student} = ?")
+                params.append(value)
+            else:
+                clauses.append(f"instr(lower({source.student}), ?) > 0")
+                params.append(value.lower())
+        elif name == "class_code":
+            clauses.append(source.class_sql)
+            params.append(value)
+        elif name == "date_from":
+            clauses.append(f"{source.time} >= ?")
+            params.append(_day_text(value))
+        elif name == "date_to":
+            # 时间列为 "YYYY-MM-DD HH:MM:SS" 文本，小于次日即包含当天
+            clauses.append(f"{source.time} < ?")
+            params.append(_day_text(value, days=1))
+        elif name == "ids":
+            ids = [int(i) for i in value]
+            clauses.append(f"{source.id_column} IN ({','.join('?' * len(ids)) or 'NULL'})")
+            params.extend(ids)
+        elif name in source.extra:
+            clauses.append(f"{source.extra[name]} = ?")
+            params.append(value)
+        else:
+            raise ValueError(f"{source.name} 不支持筛选条件: {name}")
+    return clauses, params
+
+
+def _where_sql(clauses):
+    return f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+
+def fetch_page(c, source_name, filters=None, after=None, order="time", descending=True, limit=PAGE_SIZE):
+    """
+    按游标读取一页记录
+
+    参数:
+    - after: 上一页返回的 next_key（None 为第一页）
+    - order: 排序方式（source.orders 的键），相同值再按 id 排序
+    - descending: 是否倒序（默认最新/最高分在前）
+
+    返回:
+    - Page(当前页记录, 下一页游标)
+    """
+    source = get_source(source_name)
+    order_column = source.orders[order]
+    clauses, params = build_filter(source, filters)
+    if after is not None:
+        clauses.append(f"({order_column}, {source.id_column}) {'<' if descending else '>'} (?, ?)")
+        params.extend(after)
+    direction = "DESC" if descending else "ASC"
+    # 多取一条判断是否还有下一页；排序列放在选出列的末尾，用于生成游标
+    c.execute(f'''
+        SELECT {source.columns}, {order_column}, {source.id_column}
+        FROM {source.table}
+        {_where_sql(clauses)}
+        ORDER BY {order_column} {direction}, {source.id_column} {direction}
+        LIMIT ?
+    ''', params + [limit + 1])
+    rows = c.fetchall()
+    next_key = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_key = tuple(rows[-1][-2:])
+    return Page([tuple(row[:-2]) for row in rows], next_key)
+
+
+def estimate_count(c, source_name, filters=None, cap=COUNT_CAP):
+    """
+    符合条件的记录数，最多数到 cap 条
+
+    返回:
+    - (记录数, 是否为准确值)；超过 cap 时返回 (cap, False)
+    """
+    source = get_source(source_name)
+    clauses, params = build_filter(source, filters)
+    c.execute(f'''
+        SELECT COUNT(*) FROM (
+            SELECT 1 FROM {source.table} {_where_sql(clauses)} LIMIT ?
+        )
+    ''', params + [cap + 1])
+    count = c.fetchone()[0]
+    if count > cap:
+        return cap, False
+    return count, True
+
+
+def status_counts(c, source_name, filters=None):
+    """按状态统计记录数 {状态: 记录数}"""
+    source = get_source(source_name)
+    clauses, params = build_filter(source, filters)
+    c.execute(f'''
+        SELECT {source.status}, COUNT(*) FROM {source.table}
+        {_where_sql(clauses)}
+        GROUP BY {source.status}
+    ''', params)
+    return dict(c.fetchall())
+
+
+def average_score(c, source_name, filters=None, positive_only=False):
+    """
+    平均分（没有分数时为 0）
+
+    参数:
+    - positive_only: 只统计分数大于 0 的记录（未评分的分数默认为 0）
+    """
+    source = get_source(source_name)
+    clauses, params = build_filter(source, filters)
+    clauses.append(f"{source.score} > 0" if positive_only else f"{source.score} IS NOT NULL")
+    c.execute(f"SELECT AVG({source.score}) FROM {source.table} {_where_sql(clauses)}", params)
+    return c.fetchone()[0] or 0
+
+
+def teacher_classes(c, teacher_username):
+    """教师创建的班级 [(班级代码, 班级名称)]"""
+    c.execute('''
+        SELECT class_code, class_name FROM classrooms
+        WHERE teacher_username = ? AND is_active
+        ORDER BY created_at DESC
+    ''', (teacher_username,))
+    return c.fetchall()
@@ -0,0 +1,298 @@
+"""
+融思政平台 - 全文检索
+
+作品审核原先把全部作品读入 Python 后逐条做子串匹配，学习资源、项目库没有搜索功能。
+这里为资源、实践项目、成果展示作品、思政感悟和意见反馈建立统一的全文索引：
+
+- search_index 为 FTS5 虚拟表，使用 SQLite 内置的 trigram 分词器（按 3 个字符的
+  滑动窗口切分，中文不需要分词词典）；结果按 bm25 相关度排序，支持分页；
+- 索引行由各来源表上的触发器在同一事务中维护，页面写入数据时不需要额外调用；
+- 每个来源占用一段 rowid（来源编号 << 40 加上来源行的 rowid），触发器按 rowid
+  直接定位索引行，更新、删除不需要扫描索引；
+- trigram 无法检索少于 3 个字符的词（如“图像”“滤波”），这类词改为在索引内容上
+  逐行匹配；与长词同时出现时先由长词缩小范围；
+- 当前 SQLite 不支持 FTS5 或 trigram 时，search_index 退化为普通表，全部检索词
+  逐行匹配，功能不变。
+
+命令行：
+    python platform_search.py 图像处理              # 检索全部内容
+    python platform_search.py 图像处理 --kind resource
+    python platform_search.py --rebuild             # 按来源表重建索引
+"""
+import argparse
+import logging
+import sys
+from collections import namedtuple
+
+import platform_db
+
+logger = logging.getLogger(__name__)
+
+# 搜索结果默认每页条数
+PAGE_SIZE = 20
+
+# 来源行 rowid 之前的偏移位数
+ROWID_SHIFT = 40
+
+# trigram 分词器可检索的最短词长
+MIN_MATCH_LENGTH = 3
+
+# 检索结果中摘要的词数
+SNIPPET_TOKENS = 24
+
+Source = namedtuple("Source", ["kind", "code", "table", "label", "ref", "owner", "public", "title", "body",
+                               "tags", "watch"])
+Hit = namedtuple("Hit", ["kind", "ref_id", "title", "snippet", "score"])
+
+# 索引来源；表达式中的 {row} 在触发器中替换为 NEW / OLD，重建时替换为来源表
+SOURCES = [
+    Source("resource", 1, "library_resources", "学习资源",
+           ref="{row}.id", owner="{row}.uploader", public="{row}.is_public",
+           title="{row}.name", body="{row}.description",
+           tags="(SELECT group_concat(tag, ' ') FROM library_resource_tags WHERE resource_id = {row}.id)",
+           watch=["name", "description", "uploader", "is_public"]),
+    Source("project", 2, "library_projects", "实践项目",
+           ref="{row}.id", owner="{row}.created_by", public="1",
+           title="{row}.name", body="{row}.description",
+           tags="coalesce({row}.type, '') || ' ' || coalesce({row}.academic_year, '') || ' ' || "
+                "coalesce({row}.student_name, '')",
+           watch=["name", "description", "type", "academic_year", "student_name", "created_by"]),
+    Source("work", 3, "submitted_projects", "成果展示作品",
+           ref="{row}.id", owner="{row}.author_name", public="0",
+           title="{row}.project_name", body="{row}.project_desc", tags="{row}.author_name",
+           watch=["project_name", "project_desc", "author_name"]),
+    Source("reflection", 4, "ideology_reflections", "思政感悟",
+           ref="{row}.id", owner="{row}.student_username", public="0",
+           title="''", body="{row}.reflection_content", tags="{row}.student_username",
+           watch=["reflection_content", "student_username"]),
+    Source("feedback", 5, "feedback", "意见反馈",
+           ref="{row}.id", owner="''", public="0",
+           title="''", body="{row}.feedback_content", tags="''",
+           watch=["feedback_content"]),
+]
+SOURCES_BY_KIND = {source.kind: source for source in SOURCES}
+
+
+def _rowid(source, row):
+    return f"(({source.code} << {ROWID_SHIFT}) + {row}.rowid)"
+
+
+def _select_values(source, row):
+    """索引行各列的表达式（rowid, kind, ref_id, owner, public, title, body, tags）"""
+    expressions = [source.ref, source.owner, source.public, source.title, source.body, source.tags]
+    return ", ".join([_rowid(source, row), f"'{source.kind}'"] +
+                     [f"coalesce({expression.format(row=row)}, '')" for expression in expressions])
+
+
+def _insert_sql(source, row):
+    return (f"INSERT INTO search_index (rowid, kind, ref_id, owner, public, title, body, tags) "
+            f"SELECT {_select_values(source, row)}")
+
+
+def fts_available(c):
+    """当前 SQLite 是否支持 FTS5 的 trigram 分词器"""
+    try:
+        c.execute("CREATE VIRTUAL TABLE temp.fts_probe USING fts5(x, tokenize='trigram')")
+        c.execute("DROP TABLE temp.fts_probe")
+        return True
+    except Exception:
+        return False
+
+
+def is_fts(c):
+    """search_index 是否为 FTS5 表（否则为逐行匹配的普通表）"""
+    c.execute("SELECT sql FROM sqlite_master WHERE name = 'search_index'")
+    row = c.fetchone()
+    return bool(row) and "fts5" in row[0].lower()
+
+
+def create_index(c):
+    """创建索引表与各来源表上的触发器，并按现有数据建立索引（由 platform_migrations 调用）"""
+    if fts_available(c):
+        c.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+                kind UNINDEXED, ref_id UNINDEXED, owner UNINDEXED, public UNINDEXED,
+                title, body, tags,
+                tokenize = 'trigram'
+            )
+        ''')
+    else:
+        logger.warning("当前 SQLite 不支持 FTS5 trigram 分词器，全文检索将逐行匹配")
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS search_index (
+                rowid INTEGER PRIMARY KEY,
+                kind TEXT, ref_id TEXT, owner TEXT, public INTEGER,
+                title TEXT, body TEXT, tags TEXT
+            )
+        ''')
+
+    for source in SOURCES:
+        name = f"trg_search_{source.kind}"
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {name}_insert AFTER INSERT ON {source.table}
+            BEGIN
+                {_insert_sql(source, "NEW")};
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {name}_delete AFTER DELETE ON {source.table}
+            BEGIN
+                DELETE FROM search_index WHERE rowid = {_rowid(source, "OLD")};
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {name}_update AFTER UPDATE OF {", ".join(source.watch)} ON {source.table}
+            BEGIN
+                DELETE FROM search_index WHERE rowid = {_rowid(source, "OLD")};
+                {_insert_sql(source, "NEW")};
+            END
+        ''')
+
+    # 资源标签在单独的表中，增删标签时刷新资源的 tags 列
+    resource = SOURCES_BY_KIND["resource"]
+    for event, row in (("insert", "NEW"), ("delete", "OLD")):
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_search_resource_tag_{event}
+            AFTER {event.upper()} ON library_resource_tags
+            BEGIN
+                UPDATE search_index
+                SET tags = coalesce((SELECT group_concat(tag, ' ') FROM library_resource_tags
+                                     WHERE resource_id = {row}.resource_id), '')
+                WHERE rowid = ({resource.code} << {ROWID_SHIFT}) +
+                    (SELECT rowid FROM library_resources WHERE id = {row}.resource_id);
+            END
+        ''')
+
+    rebuild_index(c)
+
+
+def rebuild_index(c):
+    """
+    按来源表重建全部索引行
+
+    返回:
+    - 索引行数
+    """
+    c.execute("DELETE FROM search_index")
+    for source in SOURCES:
+        c.execute(f"{_insert_sql(source, source.table)} FROM {source.table}")
+    c.execute("SELECT COUNT(*) FROM search_index")
+    return c.fetchone()[0]
+
+
+def split_query(query):
+    """
+    把检索词拆成可由索引匹配的长词与逐行匹配的短词
+
+    返回:
+    - (FTS5 MATCH 表达式或 None, [短词])
+    """
+    long_terms, short_terms = [], []
+    for term in query.split():
+        if len(term) >= MIN_MATCH_LENGTH:
+            long_terms.append('"' + term.replace('"', '""') + '"')
+        else:
+            short_terms.append(term.lower())
+    return (" AND ".join(long_terms) or None), short_terms
+
+
+def _where(c, query, kinds=None, viewer=None, within=None):
+    """检索条件；返回 (WHERE 子句, 参数, 是否使用 MATCH)"""
+    match, short_terms = split_query(query)
+    if not is_fts(c) and match:
+        # 普通表：长词也逐行匹配
+        short_terms += [term.lower() for term in query.split() if len(term) >= MIN_MATCH_LENGTH]
+        match = None
+    clauses, params = [], []
+    if match:
+        clauses.append("search_index MATCH ?")
+        params.append(match)
+    for term in short_terms:
+        clauses.append("instr(lower(title || ' ' || body || ' ' || tags), ?) > 0")
+        params.append(term)
+    if kinds:
+        clauses.append(f"kind IN ({', '.join('?' * len(kinds))})")
+        params.extend(kinds)
+    if viewer is not None:
+        # 学生只能检索公开内容和自己的内容
+        clauses.append("(public = 1 OR owner = ?)")
+        params.append(viewer)
+    if within is not None:
+        sql, within_params = within
+        clauses.append(f"ref_id IN ({sql})")
+        params.extend(within_params)
+    return f"WHERE {' AND '.join(clauses)}", params, bool(match)
+
+
+def count(c, query, kinds=None, viewer=None, within=None):
+    """命中的条数"""
+    if not query.split():
+        return 0
+    where, params, _ = _where(c, query, kinds, viewer, within)
+    c.execute(f"SELECT COUNT(*) FROM search_index {where}", params)
+    return c.fetchone()[0]
+
+
+def search(c, query, kinds=None, viewer=None, within=None, limit=PAGE_SIZE, offset=0):
+    """
+    全文检索
+
+    参数:
+    - query: 检索词，空格分隔的多个词需同时出现
+    - kinds: 限定来源（SOURCES 中的 kind）
+    - viewer: 学生用户名，只返回公开内容和该学生自己的内容；None 表示不限
+    - within: (SQL, 参数)，只返回来源 ID 在该子查询结果中的内容（与其他筛选条件组合）
+
+    返回:
+    - [Hit]，按相关度排序（只有短词时按时间倒序）
+    """
+    if not query.split():
+        return []
+    where, params, matched = _where(c, query, kinds, viewer, within)
+    if matched:
+        columns = f"snippet(search_index, -1, '【', '】', '…', {SNIPPET_TOKENS}), bm25(search_index, 0, 0, 0, 0, 5, 1, 2)"
+        order = "ORDER BY bm25(search_index, 0, 0, 0, 0, 5, 1, 2)"
+    else:
+        columns = "substr(body, 1, 80), 0"
+        order = "ORDER BY rowid DESC"
+    c.execute(f'''
+        SELECT kind, ref_id, title, {columns}
+        FROM search_index {where}
+        {order}
+        LIMIT ? OFFSET ?
+    ''', params + [limit, offset])
+    return [Hit(*row) for row in c.fetchall()]
+
+
+def search_refs(c, query, kind, viewer=None, within=None, limit=PAGE_SIZE, offset=0):
+    """检索单一来源，按相关度返回来源记录的 ID 列表"""
+    return [hit.ref_id for hit in search(c, query, [kind], viewer, within, limit, offset)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="融思政平台全文检索")
+    parser.add_argument("query", nargs="?", default="", help="检索词")
+    parser.add_argument("--db", default=platform_db.DB_PATH, help="数据库文件（默认 %(default)s）")
+    parser.add_argument("--kind", choices=list(SOURCES_BY_KIND), action="append", help="限定来源（可重复）")
+    parser.add_argument("--limit", type=int, default=PAGE_SIZE, help="返回条数")
+    parser.add_argument("--rebuild", action="store_true", help="按来源表重建索引")
+    args = parser.parse_args(argv)
+
+    conn = platform_db.connect(args.db)
+    try:
+        if args.rebuild:
+            with platform_db.write_transaction(conn) as c:
+                print(f"已重建索引：{rebuild_index(c)} 行")
+        if args.query:
+            c = conn.cursor()
+            print(f"共 {count(c, args.query, args.kind)} 条结果（{'FTS5' if is_fts(c) else '逐行匹配'}）")
+            for hit in search(c, args.query, args.kind, limit=args.limit):
+                label = SOURCES_BY_KIND[hit.kind].label
+                print(f"[{label} {hit.ref_id}] {hit.title}\n    {hit.snippet}")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
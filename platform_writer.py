@@ -0,0 +1,194 @@
+"""
+融思政平台 - 后台批量写入队列
+
+上课签到时全班在半分钟内集中提交，每次签到单独开一个写事务并提交，SQLite 的写锁
+让它们逐个执行，每次提交都要落盘一次。这里把写操作交给每个数据库唯一的后台写线程：
+
+- submit(job, *参数) 立即返回 concurrent.futures.Future，调用方可以 .result() 等待结果；
+- 写线程取出第一个任务后再等待一个很短的窗口，把这段时间内到达的任务放进同一个事务，
+  一次提交（一次落盘）完成一批写入；
+- 每个任务在自己的 SAVEPOINT 中执行，单个任务出错只回滚它自己，异常通过 Future 返回；
+- 事务提交成功后才设置 Future 的结果，调用方拿到“成功”时数据已经写入。
+
+任务是形如 job(c, *参数) 的函数，c 为事务中的游标，返回值即 Future 的结果：
+
+    future = platform_writer.submit(insert_feedback, content, ip_address, user_agent)
+    future.result(timeout=platform_writer.RESULT_TIMEOUT)
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import platform_db
+
+logger = logging.getLogger(__name__)
+
+# 取到第一个任务后继续收集同批任务的时间窗口（秒）
+BATCH_WINDOW = float(os.environ.get("PLATFORM_WRITER_BATCH_WINDOW", "0.005"))
+
+# 每个事务最多包含的任务数
+MAX_BATCH = int(os.environ.get("PLATFORM_WRITER_MAX_BATCH", "200"))
+
+# 调用方等待写入结果的默认超时（秒）
+RESULT_TIMEOUT = platform_db.BUSY_TIMEOUT * 2
+
+# 关闭队列的哨兵
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """单个数据库文件的后台写入队列（一个写线程）"""
+
+    def __init__(self, path, batch_window=BATCH_WINDOW, max_batch=MAX_BATCH):
+        self.path = path
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self.jobs = 0
+        self.failed = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.write_seconds = 0.0
+
+    def submit(self, job, *args, **kwargs):
+        """提交一个写任务，返回 Future"""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("写入队列已关闭")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"platform-writer:{self.path}",
+                                                daemon=True)
+                self._thread.start()
+            self._queue.put((future, job, args, kwargs))
+        return future
+
+    def _collect(self, first):
+        """以 first 开头，收集时间窗口内到达的任务"""
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # 先写完这一批，再由主循环退出
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [entry for entry in self._collect(item) if entry[0].set_running_or_notify_cancel()]
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch):
+        """在一个事务中执行一批任务，提交后再通知各自的 Future"""
+        outcomes = []
+        start = time.perf_counter()
+        conn = platform_db.connect(self.path)
+        try:
+            with platform_db.write_transaction(conn) as c:
+                for index, (_, job, args, kwargs) in enumerate(batch):
+                    savepoint = f"job_{index}"
+                    c.execute(f"SAVEPOINT {savepoint}")
+                    try:
+                        outcomes.append((True, job(c, *args, **kwargs)))
+                    except Exception as e:
+                        c.execute(f"ROLLBACK TO {savepoint}")
+                        outcomes.append((False, e))
+                    c.execute(f"RELEASE {savepoint}")
+        except Exception as e:
+            # 提交失败：整批都没有写入
+            logger.exception("批量写入失败（%d 个任务）", len(batch))
+            outcomes = [(False, e)] * len(batch)
+        finally:
+            conn.close()
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.batches += 1
+            self.jobs += len(batch)
+            self.failed += sum(1 for ok, _ in outcomes if not ok)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            self.write_seconds += elapsed
+
+        for (future, _, _, _), (ok, value) in zip(batch, outcomes):
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def close(self, timeout=None):
+        """写完已提交的任务后停止写线程"""
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "path": self.path,
+                "pending": self._queue.qsize(),
+                "jobs": self.jobs,
+                "failed": self.failed,
+                "batches": self.batches,
+                "avg_batch": round(self.jobs / self.batches, 1) if self.batches else 0,
+                "largest_batch": self.largest_batch,
+                "write_ms": round(self.write_seconds * 1000, 1),
+            }
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_queue(path=platform_db.DB_PATH):
+    """获取数据库文件对应的写入队列（每个文件一个）"""
+    key = os.path.abspath(path)
+    with _queues_lock:
+        writer = _queues.get(key)
+        if writer is None:
+            writer = _queues[key] = WriteBehindQueue(path)
+    return writer
+
+
+def submit(job, *args, path=platform_db.DB_PATH, **kwargs):
+    """把写任务交给 path 对应的后台写线程，返回 Future"""
+    return get_queue(path).submit(job, *args, **kwargs)
+
+
+def close_all_queues(timeout=None):
+    """写完所有已提交的任务并停止写线程"""
+    with _queues_lock:
+        writers = list(_queues.values())
+        _queues.clear()
+    for writer in writers:
+        writer.close(timeout)
+
+
+def get_writer_metrics():
+    """各写入队列的批量统计"""
+    with _queues_lock:
+        return [writer.stats() for writer in _queues.values()]
+
+
+# 进程退出前写完队列中剩余的任务
+atexit.register(close_all_queues, timeout=platform_db.BUSY_TIMEOUT)
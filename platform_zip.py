@@ -0,0 +1,347 @@
+"""
+融思政平台 - 流式 ZIP 打包
+
+作业和作品的下载原先先把完整的 ZIP 写到临时文件（tempfile / mkdtemp），再整个读回内存交给
+st.download_button，部分函数还会把临时文件留在磁盘上，实验室页面甚至在每个提交目录旁边
+生成一个常驻的 .zip。这里提供不落盘的打包：
+
+- iter_zip(条目) 逐段生成 ZIP 数据：源文件按块读取、按块压缩，打包过程中只在内存中保留
+  当前的数据块，不创建任何临时文件（输出不可定位，文件大小等信息写在数据描述符中）；
+- JPEG/PNG/ZIP/PDF/Office 文档等本身已压缩的格式直接存储（ZIP_STORED），不再重复压缩；
+- 条目为 (源, 包内路径)，源可以是文件路径，也可以是内存中的 bytes（如导出的 CSV）；
+- download_data(条目) 供 st.download_button 使用：Streamlit 支持延迟下载时返回一个函数，
+  点击下载时才打包；否则直接返回打包好的 bytes；
+- 批量导出（如一次作业全班的提交）用 zip_bytes_parallel：各条目在线程池中读取和压缩
+  （zlib 压缩时释放 GIL），再按原顺序依次写入归档；cached_zip_bytes 以文件的修改时间和
+  大小为键缓存结果，文件未变化时重复下载不再打包。
+"""
+import collections
+import functools
+import hashlib
+import io
+import os
+import struct
+import threading
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+# 本身已经压缩的格式：直接存储，重复压缩只耗 CPU、几乎不减小体积
+STORED_EXTENSIONS = frozenset({
+    ".jpg", ".jpeg", ".png", ".gif", ".webp",
+    ".zip", ".rar", ".7z", ".gz", ".bz2", ".xz",
+    ".pdf", ".docx", ".xlsx", ".pptx",
+    ".mp3", ".mp4", ".mov", ".avi",
+})
+
+# 读取源文件的块大小（字节）
+CHUNK_SIZE = 1 << 20
+
+# 并行打包的压缩级别与线程数
+COMPRESS_LEVEL = 6
+PACK_WORKERS = min(8, (os.cpu_count() or 1) + 2)
+
+# 打包结果缓存的总大小上限（字节）
+ARCHIVE_CACHE_BYTES = int(os.environ.get("PLATFORM_ZIP_CACHE_MB", "256")) * 1024 * 1024
+
+
+def compression_for(arcname):
+    """按扩展名选择压缩方式"""
+    if os.path.splitext(arcname)[1].lower() in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+class _StreamSink:
+    """只追加、不可定位的输出：zipfile 写入的数据暂存在这里，由 iter_zip 逐段取走"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def directory_entries(directory, arc_root=None):
+    """
+    目录下所有文件的打包条目（按路径排序）
+
+    参数:
+    - arc_root: 包内路径相对的目录（默认 directory 本身）
+    """
+    arc_root = arc_root or directory
+    entries = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            entries.append((path, os.path.relpath(path, arc_root)))
+    return entries
+
+
+def iter_zip(entries, chunk_size=CHUNK_SIZE):
+    """
+    逐段生成 ZIP 数据
+
+    参数:
+    - entries: [(源, 包内路径)]，源为文件路径或 bytes
+    """
+    sink = _StreamSink()
+    with zipfile.ZipFile(sink, "w") as zf:
+        for source, arcname in entries:
+            if isinstance(source, (bytes, bytearray)):
+                zinfo = zipfile.ZipInfo(arcname, time.localtime()[:6])
+                zinfo.file_size = len(source)
+                stream = io.BytesIO(source)
+            else:
+                zinfo = zipfile.ZipInfo.from_file(source, arcname)
+                stream = open(source, "rb")
+            zinfo.compress_type = compression_for(arcname)
+            with stream, zf.open(zinfo, "w") as dest:
+                while True:
+                    block = stream.read(chunk_size)
+                    if not block:
+                        break
+                    dest.write(block)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    # 中央目录
+    yield sink.drain()
+
+
+def zip_bytes(entries):
+    """打包为 bytes"""
+    return b"".join(iter_zip(entries))
+
+
+def write_zip(entries, fileobj):
+    """把 ZIP 数据逐段写入文件对象（可以是不可定位的流），返回写入的字节数"""
+    written = 0
+    for data in iter_zip(entries):
+        fileobj.write(data)
+        written += len(data)
+    return written
+
+
+@functools.lru_cache(maxsize=None)
+def supports_deferred_download():
+    """当前 Streamlit 的 download_button 是否支持传入函数、点击时才生成数据"""
+    try:
+        from streamlit.runtime.media_file_manager import MediaFileManager
+    except ImportError:
+        return False
+    return hasattr(MediaFileManager, "add_deferred")
+
+
+def download_data(entries):
+    """
+    st.download_button 的 data 参数
+
+    支持延迟下载时返回一个函数（页面重跑时不打包，点击下载时才打包），否则返回 bytes。
+    """
+    entries = list(entries)
+    if supports_deferred_download():
+        return functools.partial(zip_bytes, entries)
+    return zip_bytes(entries)
+
+
+# ======================= 并行打包 =======================
+
+# 已压缩完成、等待写入归档的条目
+PackedEntry = collections.namedtuple(
+    "PackedEntry", ["arcname", "date_time", "crc", "file_size", "compress_type", "payload"])
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END_RECORD = struct.Struct("<IHHHHIIH")
+
+# 文件名使用 UTF-8 编码（通用标志位 11）
+_FLAG_UTF8 = 0x800
+
+# 不使用 ZIP64 时的大小与条目数上限
+_ZIP32_LIMIT = 0xFFFFFFFF
+_ZIP32_MAX_ENTRIES = 0xFFFF
+
+
+def pack_entry(source, arcname, compresslevel=COMPRESS_LEVEL):
+    """读取并压缩一个条目（在工作线程中执行）"""
+    if isinstance(source, (bytes, bytearray)):
+        data = bytes(source)
+        date_time = time.localtime()[:6]
+    else:
+        with open(source, "rb") as f:
+            data = f.read()
+        date_time = time.localtime(os.stat(source).st_mtime)[:6]
+    compress_type = compression_for(arcname)
+    payload = data
+    if compress_type == zipfile.ZIP_DEFLATED:
+        compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -15)
+        payload = compressor.compress(data) + compressor.flush()
+        if len(payload) >= len(data):
+            # 压缩后反而更大，改为直接存储
+            compress_type, payload = zipfile.ZIP_STORED, data
+    return PackedEntry(arcname, date_time, zlib.crc32(data), len(data), compress_type, payload)
+
+
+def _dos_date_time(date_time):
+    year, month, day, hour, minute, second = date_time
+    year = min(max(year, 1980), 2107)
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+
+def iter_packed_zip(packed):
+    """把 PackedEntry 依次写成 ZIP 数据（逐段生成）"""
+    offset = 0
+    central = []
+    for entry in packed:
+        if len(central) >= _ZIP32_MAX_ENTRIES:
+            raise ValueError("条目过多，无法打包为一个归档")
+        if offset > _ZIP32_LIMIT or entry.file_size > _ZIP32_LIMIT or len(entry.payload) > _ZIP32_LIMIT:
+            raise ValueError("归档超过 4 GB，请缩小导出范围")
+        name = entry.arcname.replace(os.sep, "/").encode("utf-8")
+        dos_time, dos_date = _dos_date_time(entry.date_time)
+        version = 20 if entry.compress_type == zipfile.ZIP_DEFLATED else 10
+        header = _LOCAL_HEADER.pack(
+            0x04034b50, version, _FLAG_UTF8, entry.compress_type, dos_time, dos_date,
+            entry.crc, len(entry.payload), entry.file_size, len(name), 0)
+        central.append(_CENTRAL_HEADER.pack(
+            0x02014b50, (3 << 8) | 20, version, _FLAG_UTF8, entry.compress_type, dos_time, dos_date,
+            entry.crc, len(entry.payload), entry.file_size, len(name), 0, 0, 0, 0,
+            0o100644 << 16, offset) + name)
+        yield header + name
+        yield entry.payload
+        offset += len(header) + len(name) + len(entry.payload)
+
+    directory = b"".join(central)
+    if offset > _ZIP32_LIMIT:
+        raise ValueError("归档超过 4 GB，请缩小导出范围")
+    yield directory + _END_RECORD.pack(0x06054b50, 0, 0, len(central), len(central),
+                                       len(directory), offset, 0)
+
+
+def iter_zip_parallel(entries, workers=None, max_pending=None, compresslevel=COMPRESS_LEVEL):
+    """
+    在线程池中读取和压缩条目，按原顺序逐段生成 ZIP 数据
+
+    参数:
+    - max_pending: 同时在途的条目数上限（默认 4 倍线程数），限制内存中的待写数据
+    """
+    workers = workers or PACK_WORKERS
+    max_pending = max_pending or workers * 4
+
+    def packed():
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="platform-zip") as executor:
+            pending = collections.deque()
+            for source, arcname in entries:
+                pending.append(executor.submit(pack_entry, source, arcname, compresslevel))
+                if len(pending) >= max_pending:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    return iter_packed_zip(packed())
+
+
+def zip_bytes_parallel(entries, workers=None):
+    """并行打包为 bytes"""
+    return b"".join(iter_zip_parallel(entries, workers))
+
+
+# ======================= 打包结果缓存 =======================
+
+def entries_fingerprint(entries):
+    """条目指纹：文件按 (包内路径, 修改时间, 大小)，内存数据按内容摘要"""
+    digest = hashlib.sha1()
+    for source, arcname in entries:
+        digest.update(arcname.encode("utf-8") + b"\0")
+        if isinstance(source, (bytes, bytearray)):
+            digest.update(hashlib.sha1(source).digest())
+        else:
+            stat = os.stat(source)
+            digest.update(f"{stat.st_mtime_ns}:{stat.st_size}".encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ArchiveCache:
+    """按总字节数限制的 LRU 打包结果缓存（线程安全）"""
+
+    def __init__(self, max_bytes=ARCHIVE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._items = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._items[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def discard(self, namespace):
+        """删除某一命名空间下的全部缓存"""
+        with self._lock:
+            for key in [key for key in self._items if key[0] == namespace]:
+                self._bytes -= len(self._items.pop(key))
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+
+archive_cache = ArchiveCache()
+
+
+def cached_zip_bytes(entries, namespace):
+    """
+    并行打包并缓存结果
+
+    缓存键为 (namespace, 条目指纹)：同一命名空间下任一文件的修改时间或大小变化、
+    条目增减时重新打包，否则直接返回上次的结果。
+
+    返回:
+    - (ZIP 数据, 是否命中缓存)
+    """
+    entries = list(entries)
+    key = (namespace, entries_fingerprint(entries))
+    data = archive_cache.get(key)
+    if data is not None:
+        return data, True
+    data = zip_bytes_parallel(entries)
+    # 同一命名空间只保留最新的一份
+    archive_cache.discard(namespace)
+    archive_cache.put(key, data)
+    return data, False